@@ -0,0 +1,154 @@
+"""
+警報規則狀態（冷卻時間、遲滯重新啟用、升級等級）
+價格在閾值附近來回時，同一條規則不應每次輪詢都發送通知、消耗 LINE 額度：
+  - 冷卻時間：觸發後 cooldown 秒內不再以相同等級通知
+  - 遲滯帶：觸發後數值需回落到「閾值 - 遲滯帶」以下才重新啟用
+  - 升級：尚未重新啟用前，數值每再超過一個升級間距就以更高等級通知一次（不受冷卻限制）
+
+每條規則以鍵（例如 "XAU:price_change"）對應一筆緊湊的狀態 [啟用, 等級, 上次觸發時間]，
+每次評估只讀寫一個字典項目（O(1)），保存在 alert_state.json，跨執行與重新啟動保留。
+"""
+
+import json
+import os
+
+
+ALERT_STATE_FILE = "alert_state.json"
+
+DEFAULT_COOLDOWN_SECONDS = 60 * 60   # 觸發後 1 小時內不重複通知
+DEFAULT_REARM_BAND = 1.0             # 需回落到閾值以下 1 個百分點才重新啟用
+DEFAULT_ESCALATION_STEP = 2.5        # 每再超過 2.5 個百分點升級一次
+MAX_ESCALATION_LEVEL = 3
+
+PRICE_CHANGE_RULE = 'price_change'
+
+
+class AlertPolicy:
+    """
+    單一規則的冷卻、遲滯與升級設定
+    """
+
+    def __init__(self, cooldown_seconds=DEFAULT_COOLDOWN_SECONDS, rearm_band=DEFAULT_REARM_BAND,
+                 escalation_step=DEFAULT_ESCALATION_STEP, max_level=MAX_ESCALATION_LEVEL):
+        """
+        Args:
+            cooldown_seconds (float): 觸發後的冷卻秒數
+            rearm_band (float): 遲滯帶寬度（與閾值同單位）
+            escalation_step (float): 升級間距（與閾值同單位），0 表示不升級
+            max_level (int): 最高等級
+        """
+        self.cooldown_seconds = cooldown_seconds
+        self.rearm_band = rearm_band
+        self.escalation_step = escalation_step
+        self.max_level = max_level
+
+
+DEFAULT_ALERT_POLICY = AlertPolicy()
+
+
+class AlertStateStore:
+    """
+    以規則鍵索引的警報狀態
+    """
+
+    def __init__(self, path=ALERT_STATE_FILE):
+        """
+        Args:
+            path (str): 狀態檔路徑
+        """
+        self.path = path
+        self._entries = {}  # {規則鍵: [啟用 (1/0), 等級, 上次觸發時間]}
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def state(self, key):
+        """
+        Returns:
+            dict: {'armed', 'level', 'last_fired'}，沒有紀錄時為初始狀態
+        """
+        armed, level, last_fired = self._entries.get(key, (1, 0, None))
+        return {'armed': bool(armed), 'level': level, 'last_fired': last_fired}
+
+    def evaluate(self, key, value, threshold, now, policy=DEFAULT_ALERT_POLICY):
+        """
+        以最新數值評估一條規則並更新狀態
+
+        Args:
+            key (str): 規則鍵
+            value (float): 最新數值（例如價格變化 %），None 表示沒有資料
+            threshold (float): 觸發閾值
+            now (float): Unix 秒
+            policy (AlertPolicy): 冷卻、遲滯與升級設定
+
+        Returns:
+            dict: 需要通知時返回 {'key', 'level', 'escalated', 'value', 'threshold'}，否則 None
+        """
+        if value is None:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = [1, 0, None]
+            self._entries[key] = entry
+        armed, level, last_fired = entry
+
+        if armed:
+            if value < threshold:
+                return None
+            if last_fired is not None and now - last_fired < policy.cooldown_seconds:
+                print(f"ℹ️  警報規則 {key} 仍在冷卻中（{now - last_fired:.0f}/{policy.cooldown_seconds:.0f} 秒），不重複通知")
+                return None
+            entry[:] = [0, 1, now]
+            self._dirty = True
+            return {'key': key, 'level': 1, 'escalated': False, 'value': value, 'threshold': threshold}
+
+        # 已觸發：回落到遲滯帶以下才重新啟用
+        if value < threshold - policy.rearm_band:
+            entry[0], entry[1] = 1, 0
+            self._dirty = True
+            return None
+        if (policy.escalation_step > 0 and level < policy.max_level
+                and value >= threshold + level * policy.escalation_step):
+            entry[1], entry[2] = level + 1, now
+            self._dirty = True
+            return {'key': key, 'level': level + 1, 'escalated': True, 'value': value, 'threshold': threshold}
+        print(f"ℹ️  警報規則 {key} 已通知（等級 {level}），等待數值回落到 {threshold - policy.rearm_band:.2f} 以下再重新啟用")
+        return None
+
+    @classmethod
+    def load(cls, path=ALERT_STATE_FILE):
+        """
+        讀取狀態檔
+
+        Returns:
+            AlertStateStore: 狀態
+        """
+        store = cls(path)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                store._entries = {key: list(entry) for key, entry in data.get('rules', {}).items()}
+        except Exception as e:
+            print(f"⚠️  讀取警報狀態時發生錯誤: {e}")
+        return store
+
+    def save(self):
+        """
+        狀態有變更時寫入狀態檔
+        """
+        if not self._dirty:
+            return
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'rules': self._entries}, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            print(f"⚠️  保存警報狀態時發生錯誤: {e}")
+
+
+def rule_key(asset, rule):
+    return f"{asset}:{rule}"
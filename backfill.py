@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+歷史價格回補工具
+從 CoinGecko market_chart/range 與幣安 klines 分段抓取歷史價格，
+以執行緒池並行抓取各段，並依主機限制請求速率，結果直接寫入歷史價格儲存檔。
+已完成的分段會記錄在進度檔中，中斷後重新執行即可從未完成的分段繼續。
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+import get_gold_price
+from retry_policy import RetryPolicy
+from price_history import (
+    HISTORY_FILE,
+    count_points_in_range,
+    load_price_history,
+    merge_price_points,
+    save_price_history,
+)
+
+
+PROGRESS_FILE = "backfill_progress.json"
+
+# 每段涵蓋 30 天的小時資料（720 筆，低於幣安 klines 單次上限 1000 筆）
+CHUNK_SECONDS = 30 * 24 * 3600
+POINT_INTERVAL_SECONDS = 3600
+
+# 已有資料達到預期筆數的比例時視為已回補，不再重新抓取
+COVERAGE_RATIO = 0.9
+
+# 各主機的請求速率預算（每秒請求數, 突發上限）
+# CoinGecko 免費 API 約每分鐘 30 次，幣安限制寬鬆許多
+HOST_RATE_LIMITS = {
+    'coingecko': (0.5, 1),
+    'binance': (5.0, 5),
+}
+
+SOURCES = ('coingecko', 'binance')
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'application/json'
+}
+
+# 回補是離線批次工作，不受單次執行的時間預算限制，但同樣使用指數退避與 Retry-After
+BACKFILL_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=30.0, timeout=30)
+
+
+class HostRateLimiter:
+    """
+    單一主機的權杖桶速率限制器（執行緒安全）
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        Args:
+            rate (float): 每秒補充的權杖數（即每秒允許的請求數）
+            burst (int): 權杖桶容量（允許的突發請求數）
+        """
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        取得一個權杖，不足時阻塞等待
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+def plan_chunks(start_ts, end_ts, chunk_seconds=CHUNK_SECONDS):
+    """
+    將時間範圍切成固定網格上的分段
+    分段邊界對齊 chunk_seconds 的整數倍，確保每次執行產生相同的分段鍵值
+
+    Args:
+        start_ts (int): 起始時間（Unix 秒）
+        end_ts (int): 結束時間（Unix 秒）
+        chunk_seconds (int): 每段秒數
+
+    Returns:
+        list: [(分段起始, 分段結束), ...]
+    """
+    chunks = []
+    chunk_start = (int(start_ts) // chunk_seconds) * chunk_seconds
+    while chunk_start < end_ts:
+        chunks.append((chunk_start, chunk_start + chunk_seconds))
+        chunk_start += chunk_seconds
+    return chunks
+
+
+def chunk_key(source, start_ts, end_ts):
+    """產生分段在進度檔中的鍵值"""
+    return f"{source}:{start_ts}:{end_ts}"
+
+
+def load_backfill_progress(path=PROGRESS_FILE):
+    """
+    讀取已完成的分段
+
+    Returns:
+        set: 已完成分段的鍵值集合
+    """
+    if not os.path.exists(path):
+        return set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return set(json.load(f).get('completed_chunks', []))
+    except Exception as e:
+        print(f"⚠️  讀取回補進度時發生錯誤: {e}")
+        return set()
+
+
+def save_backfill_progress(completed, path=PROGRESS_FILE):
+    """保存已完成的分段"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'completed_chunks': sorted(completed)}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _get_json(url, params, limiter, policy=None):
+    """
+    在速率預算內發送 GET 請求並解析 JSON，429 時依 Retry-After 等待後重試
+
+    Returns:
+        object: 解析後的 JSON 資料
+
+    Raises:
+        requests.exceptions.RequestException: 重試後仍失敗
+    """
+    policy = policy or BACKFILL_RETRY_POLICY
+    response, _ = policy.get(url, before_attempt=limiter.acquire, params=params,
+                             headers=REQUEST_HEADERS)
+    if response is None:
+        raise requests.exceptions.RetryError(f"重試 {policy.max_attempts} 次後仍失敗: {url}")
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_coingecko_range(start_ts, end_ts, limiter):
+    """
+    從 CoinGecko market_chart/range 抓取 PAXG/USD 歷史價格
+    查詢範圍在 1-90 天之間時 CoinGecko 自動回傳小時資料
+
+    Returns:
+        list: [(Unix 秒, 價格), ...]
+    """
+    url = f"{get_gold_price.COINGECKO_BASE_URL}/api/v3/coins/pax-gold/market_chart/range"
+    params = {'vs_currency': 'usd', 'from': start_ts, 'to': end_ts}
+    data = _get_json(url, params, limiter)
+    # 回傳格式: {"prices": [[毫秒時間戳, 價格], ...], ...}
+    return [(int(ms // 1000), float(price)) for ms, price in data.get('prices', [])
+            if start_ts <= ms // 1000 < end_ts]
+
+
+def fetch_binance_klines(start_ts, end_ts, limiter):
+    """
+    從幣安 /api/v3/klines 抓取 PAXG/USDT 小時 K 線，以收盤價作為該小時價格
+
+    Returns:
+        list: [(Unix 秒, 價格), ...]
+    """
+    url = f"{get_gold_price.BINANCE_BASE_URL}/api/v3/klines"
+    params = {
+        'symbol': 'PAXGUSDT',
+        'interval': '1h',
+        'startTime': start_ts * 1000,
+        'endTime': end_ts * 1000 - 1,
+        'limit': 1000
+    }
+    data = _get_json(url, params, limiter)
+    # 每根 K 線格式: [開盤時間(毫秒), 開, 高, 低, 收, ...]
+    return [(int(kline[0] // 1000), float(kline[4])) for kline in data]
+
+
+FETCHERS = {
+    'coingecko': fetch_coingecko_range,
+    'binance': fetch_binance_klines,
+}
+
+
+def run_backfill(days=365, sources=SOURCES, workers=4,
+                 history_file=HISTORY_FILE, progress_file=PROGRESS_FILE, now_ts=None):
+    """
+    回補最近 days 天的歷史價格
+
+    Args:
+        days (int): 回補天數
+        sources (iterable): 要回補的資料來源
+        workers (int): 並行抓取的執行緒數
+        history_file (str): 歷史價格檔案路徑
+        progress_file (str): 回補進度檔案路徑
+        now_ts (int, optional): 目前時間（Unix 秒），預設為系統時間
+
+    Returns:
+        dict: 統計資訊 {'fetched': 抓取分段數, 'skipped': 略過分段數, 'failed': 失敗分段數, 'points': 新增價格點數}
+    """
+    now_ts = int(now_ts if now_ts is not None else time.time())
+    start_ts = now_ts - days * 24 * 3600
+
+    history = load_price_history(history_file)
+    completed = load_backfill_progress(progress_file)
+    limiters = {source: HostRateLimiter(*HOST_RATE_LIMITS[source]) for source in sources}
+
+    stats = {'fetched': 0, 'skipped': 0, 'failed': 0, 'points': 0}
+    pending = []
+    expected_points = CHUNK_SECONDS // POINT_INTERVAL_SECONDS
+
+    for source in sources:
+        for chunk_start, chunk_end in plan_chunks(start_ts, now_ts):
+            key = chunk_key(source, chunk_start, chunk_end)
+            if key in completed:
+                stats['skipped'] += 1
+                continue
+            # 尚未結束的分段只檢查已過去的部分
+            covered_end = min(chunk_end, now_ts)
+            expected = expected_points * (covered_end - chunk_start) / CHUNK_SECONDS
+            if count_points_in_range(history, source, chunk_start, covered_end) >= expected * COVERAGE_RATIO:
+                stats['skipped'] += 1
+                if chunk_end <= now_ts:
+                    completed.add(key)
+                continue
+            pending.append((source, chunk_start, chunk_end))
+
+    print(f"回補範圍: 最近 {days} 天，來源: {', '.join(sources)}")
+    print(f"  待抓取分段: {len(pending)}，略過分段: {stats['skipped']}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(FETCHERS[source], chunk_start, min(chunk_end, now_ts), limiters[source]):
+                (source, chunk_start, chunk_end)
+            for source, chunk_start, chunk_end in pending
+        }
+        for future in as_completed(futures):
+            source, chunk_start, chunk_end = futures[future]
+            try:
+                points = future.result()
+            except Exception as e:
+                stats['failed'] += 1
+                print(f"  ✗ {source} 分段 {chunk_start}-{chunk_end} 抓取失敗: {e}")
+                continue
+
+            added = merge_price_points(history, source, points)
+            stats['fetched'] += 1
+            stats['points'] += added
+            # 只有完全落在過去的分段才標記為完成，最新的分段下次執行時會再補齊
+            if chunk_end <= now_ts:
+                completed.add(chunk_key(source, chunk_start, chunk_end))
+            # 每完成一段就寫回，確保中斷後不需重新抓取
+            save_price_history(history, history_file)
+            save_backfill_progress(completed, progress_file)
+            print(f"  ✓ {source} 分段 {chunk_start}-{chunk_end}: {len(points)} 筆，新增 {added} 筆")
+
+    save_backfill_progress(completed, progress_file)
+    print(f"回補完成: 抓取 {stats['fetched']} 段，略過 {stats['skipped']} 段，"
+          f"失敗 {stats['failed']} 段，新增 {stats['points']} 筆價格")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回補黃金歷史價格")
+    parser.add_argument('--days', type=int, default=365, help="回補天數（預設 365）")
+    parser.add_argument('--source', dest='sources', action='append', choices=SOURCES,
+                        help="資料來源，可重複指定（預設全部）")
+    parser.add_argument('--workers', type=int, default=4, help="並行抓取的執行緒數（預設 4）")
+    parser.add_argument('--history-file', default=HISTORY_FILE, help="歷史價格檔案路徑")
+    parser.add_argument('--progress-file', default=PROGRESS_FILE, help="回補進度檔案路徑")
+    args = parser.parse_args()
+
+    run_backfill(
+        days=args.days,
+        sources=tuple(args.sources or SOURCES),
+        workers=args.workers,
+        history_file=args.history_file,
+        progress_file=args.progress_file,
+    )
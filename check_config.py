@@ -7,6 +7,7 @@ import os
 import sys
 from linebot import LineBotApi
 from linebot.exceptions import LineBotApiError
+from monitor_config import CONFIG_FILE, ConfigError, load_config
 
 def main():
     print("=" * 60)
@@ -44,6 +45,22 @@ def main():
     print()
     print("=" * 60)
     
+    # 檢查設定檔（規則、排程、收件者與通知管道）
+    print("【設定檔檢查】")
+    print("-" * 60)
+    try:
+        config = load_config()
+        print(f"✓ 設定檔驗證通過")
+        for line in config.summary():
+            print(f"  {line}")
+    except ConfigError as e:
+        print(f"✗ 設定檔有誤（{CONFIG_FILE}）:")
+        for error in e.errors:
+            print(f"  - {error}")
+    
+    print()
+    print("=" * 60)
+    
     # 如果兩個都有設定，進行驗證
     if channel_token and user_id:
         print("【驗證 Channel Token】")
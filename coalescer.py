@@ -0,0 +1,123 @@
+"""
+通知合併視窗
+價格快速變動時，數個規則可能在幾秒內相繼成立（價格變化、區間變化、恢復通知、整點報告），
+原本每則都各自推播一次。合併視窗把同一收件者的通知保留一小段時間（COALESCE_WINDOW_SECONDS），
+期間內的通知合併為一則訊息發送，減少 API 呼叫與對使用者的打擾；
+緊急通知（例如升級後的價格警報）不等待，直接發送。
+
+Coalescer 設計為管線階段的處理函數：add() 只把通知放入暫存並立即返回，不佔用階段的工作者；
+每個收件者的視窗由計時工作在視窗結束時送出（emit），因此同時開啟視窗的收件者再多也不會阻塞後續通知。
+"""
+
+import asyncio
+import os
+
+
+COALESCE_WINDOW_SECONDS = float(os.getenv("COALESCE_WINDOW_SECONDS", "10"))
+
+# 價格警報升級到此等級以上時視為緊急，不等待合併
+URGENT_LEVEL = 2
+
+# 合併時的排列順序（警報在前，報告在後）
+KIND_PRIORITY = ('alert', 'window_alert', 'indicator_alert', 'error', 'recovery', 'report')
+
+MERGE_SEPARATOR = "\n\n" + "─" * 16 + "\n\n"
+
+
+def is_urgent(message):
+    """
+    Returns:
+        bool: 升級後的價格警報返回 True
+    """
+    return message['kind'] == 'alert' and message.get('level', 1) >= URGENT_LEVEL
+
+
+def _priority(message):
+    kind = message['kind']
+    return KIND_PRIORITY.index(kind) if kind in KIND_PRIORITY else len(KIND_PRIORITY)
+
+
+def merge_notifications(batch):
+    """
+    將多則通知合併為一則
+
+    Args:
+        batch (list): 通知 [{'kind', 'text', 'tick', ...}, ...]（依到達順序）
+
+    Returns:
+        dict: 合併後的通知，kind 為最優先的類型，parts 保留原始通知供發送後的後續處理，user_id 為這批通知的收件者
+    """
+    ordered = sorted(batch, key=_priority)
+    text = f"📬 合併 {len(batch)} 則通知\n\n" + MERGE_SEPARATOR.join(message['text'] for message in ordered)
+    return {'kind': ordered[0]['kind'], 'text': text, 'tick': batch[-1]['tick'], 'parts': ordered,
+            'user_id': batch[0].get('user_id')}
+
+
+class Coalescer:
+    """
+    依收件者合併短時間內的通知
+    """
+
+    def __init__(self, window=COALESCE_WINDOW_SECONDS, key=None, urgent=is_urgent, merge=merge_notifications,
+                 emit=None):
+        """
+        Args:
+            window (float): 合併視窗秒數，0 表示不合併
+            key (callable, optional): 收件者鍵值函數，預設為通知的 'user_id'（None 表示預設收件對象）
+            urgent (callable): 判斷通知是否緊急（不等待合併）
+            merge (callable): 將一批通知合併為一則
+            emit (callable, optional): async 函數，視窗結束時接收要發送的通知（例如下游佇列的 put）
+        """
+        self.window = window
+        self.key = key or (lambda message: message.get('user_id'))
+        self.urgent = urgent
+        self.merge = merge
+        self.emit = emit
+        self.merged = 0  # 被併入其他通知的數量
+        self._pending = {}  # {收件者: [通知, ...]}
+        self._timers = set()  # 視窗結束時送出通知的計時工作（含正在送出的）
+
+    def pending(self):
+        """
+        Returns:
+            int: 開啟中或正在送出的視窗數
+        """
+        return len(self._timers)
+
+    async def add(self, message):
+        """
+        加入一則通知，不等待視窗結束
+
+        Args:
+            message (dict): 通知
+
+        Returns:
+            dict: 緊急通知或不合併時返回原通知；其餘放入視窗暫存，返回 None（視窗結束時由 emit 送出）
+        """
+        if self.window <= 0 or self.urgent(message):
+            return message
+        key = self.key(message)
+        if key in self._pending:
+            self._pending[key].append(message)
+            return None
+        self._pending[key] = [message]
+        timer = asyncio.create_task(self._flush_later(key))
+        self._timers.add(timer)
+        timer.add_done_callback(self._timers.discard)
+        return None
+
+    async def _flush_later(self, key):
+        try:
+            await asyncio.sleep(self.window)
+            batch = self._pending.pop(key)
+            if len(batch) == 1:
+                message = batch[0]
+            else:
+                self.merged += len(batch) - 1
+                print(f"ℹ️  {self.window:g} 秒內的 {len(batch)} 則通知合併為一則發送")
+                message = self.merge(batch)
+            await self.emit(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️  送出合併通知時發生錯誤: {e}")
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+黃金價格監控常駐程式
+以分段管線持續監控價格：擷取 → 正規化 → 儲存 → 評估 → 產生訊息 → 合併 → 發送
+各階段以有界佇列串接，LINE 發送變慢時過時的價格跳動與報告會被合併，擷取不會因此停滯；
+短時間內相繼成立的通知在合併視窗內併為一則訊息。
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from alert_state import ALERT_STATE_FILE, PRICE_CHANGE_RULE, AlertStateStore, rule_key
+from coalescer import COALESCE_WINDOW_SECONDS, Coalescer
+from delivery_queue import PriorityDeliveryQueue
+from error_throttle import (
+    ERROR_THROTTLE_FILE,
+    FETCH_ERROR,
+    ErrorThrottle,
+    format_error_summary,
+    format_recovery_message,
+    format_throttle_note,
+)
+
+from get_bot_gold_price import get_bot_gold_price
+from get_gold_price import get_gold_price
+from indicators import INDICATOR_STATE_FILE, IndicatorSet, format_indicator_triggers, gate_indicator_triggers
+import line_notify
+from line_delivery import LINE_DELIVERY_FILE, LineDelivery
+from line_quota import DIGEST, LINE_QUOTA_FILE, MODE_LABELS, QuotaTracker, format_quota_status
+from main import (
+    DAILY_PRICE_FILE,
+    LAST_PRICE_FILE,
+    LAST_REPORT_FILE,
+    calculate_price_change,
+    format_alert_message,
+    format_fetch_error_message,
+    format_indicator_alert_message,
+    format_notification_message,
+    format_window_alert_message,
+    get_taiwan_time,
+    load_daily_range,
+    load_last_price,
+    load_last_report_time,
+    save_daily_range,
+    save_last_price,
+    save_last_report_time,
+    update_daily_range,
+)
+from monitor_config import CHANNELS, INDICATORS, PRICE_CHANGE, SCHEDULE, SOURCES, SUBSCRIBERS, WINDOWS, ConfigWatcher
+from notifier import Notifier
+from outbox import DELIVERED, OUTBOX_FILE, QUEUED, Outbox
+from pipeline import BLOCK, COALESCE, Pipeline, Stage
+from price_window import WINDOW_SNAPSHOT_FILE, PriceRingBuffer
+from price_history import HISTORY_FILE, load_price_history
+from quantile_sketch import PRICE_DISTRIBUTION_FILE, PriceDistribution
+from range_index import RangeIndex
+from report_schedule import DEFAULT_SUBSCRIBER, REPORT_SCHEDULE_FILE, ReportScheduler
+from retry_policy import Deadline
+from tick_dedup import TickDeduplicator
+from window_alerts import GOLD_ASSET, WINDOW_ALERT_STATE_FILE, WindowAlertMonitor, format_window_changes
+
+
+POLL_INTERVAL = 60  # 秒
+MIN_FETCH_BUDGET = 30  # 每次擷取的最短時間預算（秒），擷取間隔很短時使用
+DELIVER_BUDGET = 60  # 每則通知（含重試）的時間預算（秒）
+
+
+def _get_bot_price_safe(deadline=None):
+    try:
+        return get_bot_gold_price(deadline)
+    except Exception as e:
+        print(f"⚠️  獲取台灣銀行價格時發生錯誤: {e}")
+        return None
+
+
+class PriceDaemon:
+    """
+    常駐監控程式的狀態與各階段處理函數
+    """
+
+    def __init__(self, state_dir='.', interval=POLL_INTERVAL, max_ticks=None,
+                 threshold=None, deliver_concurrency=4, coalesce_window=None, config_path=None):
+        """
+        Args:
+            state_dir (str): 狀態檔案（daily_price.json 等）所在目錄
+            interval (float): 擷取價格的間隔秒數
+            max_ticks (int, optional): 擷取次數上限，未指定時持續執行
+            threshold (float, optional): 價格變化警報閾值（%），預設使用設定檔的閾值
+            deliver_concurrency (int): 同時發送的 LINE 請求數
+            coalesce_window (float, optional): 通知合併視窗秒數，預設為 COALESCE_WINDOW_SECONDS（不超過擷取間隔）
+            config_path (str, optional): 設定檔路徑，預設為 monitor_config.CONFIG_FILE
+
+        Raises:
+            ConfigError: 設定檔內容有誤
+        """
+        # 規則、排程、收件者、價格來源與通知管道來自設定檔（沒有設定檔時依環境變數），
+        # 每次擷取前檢查設定檔是否修改，只重建有變動的部分
+        self.config_watcher = ConfigWatcher(config_path)
+        config = self.config_watcher.load()
+        self.interval = interval
+        self.max_ticks = max_ticks
+        self.threshold = config.threshold if threshold is None else threshold
+        self.alert_policy = config.alert_policy
+        self.sources = config.sources
+        self.deliver_concurrency = deliver_concurrency
+        self.daily_price_file = os.path.join(state_dir, DAILY_PRICE_FILE)
+        self.last_price_file = os.path.join(state_dir, LAST_PRICE_FILE)
+        self.last_report_file = os.path.join(state_dir, LAST_REPORT_FILE)
+        self.window_snapshot_file = os.path.join(state_dir, WINDOW_SNAPSHOT_FILE)
+
+        self.current_date = None
+        self.day_high = None
+        self.day_low = None
+        self.last_price = load_last_price(self.last_price_file)
+        # 日報表依各訂閱者的排程發送，每個時段只發送一次
+        self.report_scheduler = ReportScheduler.load(config.schedules, get_taiwan_time(),
+                                                     os.path.join(state_dir, REPORT_SCHEDULE_FILE),
+                                                     last_report_time=load_last_report_time(self.last_report_file))
+        self.deduplicator = TickDeduplicator()
+        self.deduplicator.seed_from_last_price_file(self.last_price_file)
+        # 近期價格保存在記憶體中，重新啟動時從快照還原
+        self.window = PriceRingBuffer.restore(self.window_snapshot_file)
+        self.window_alerts = WindowAlertMonitor.load(os.path.join(state_dir, WINDOW_ALERT_STATE_FILE),
+                                                     config.window_rules)
+        self.distribution = PriceDistribution.load(os.path.join(state_dir, PRICE_DISTRIBUTION_FILE))
+        self.indicators = IndicatorSet.load(os.path.join(state_dir, INDICATOR_STATE_FILE), config.indicator_rules,
+                                            os.path.join(state_dir, HISTORY_FILE))
+        self.alert_state = AlertStateStore.load(os.path.join(state_dir, ALERT_STATE_FILE))
+        self.error_throttle = ErrorThrottle.load(os.path.join(state_dir, ERROR_THROTTLE_FILE))
+        self.quota = QuotaTracker.load(os.path.join(state_dir, LINE_QUOTA_FILE),
+                                       delivery=LineDelivery.load(os.path.join(state_dir, LINE_DELIVERY_FILE)),
+                                       audience=config.recipients(line_notify.USER_ID),
+                                       report_audience=config.report_recipients(line_notify.USER_ID))
+        # 未送達的通知保留在 outbox，每次擷取後在背景重送
+        self.outbox = Outbox.load(os.path.join(state_dir, OUTBOX_FILE))
+        self._replay_task = None
+        # LINE 以外的通知管道（webhook、Telegram、電子郵件），各有自己的工作者
+        self.notifier = Notifier(config.channels)
+        # 短時間內相繼成立的通知合併為一則發送
+        if coalesce_window is None:
+            coalesce_window = min(COALESCE_WINDOW_SECONDS, interval)
+        self.coalescer = Coalescer(coalesce_window, key=self._coalesce_key)
+        # 回補的歷史價格建立靜態索引，之後收到的價格加入即時尾端
+        self.range_index = RangeIndex.from_history(load_price_history(os.path.join(state_dir, HISTORY_FILE)))
+
+    def _coalesce_key(self, message):
+        # 預設日報表與警報的收件對象相同時（沒有訂閱者有自己的排程）併入同一個視窗
+        user_id = message.get('user_id')
+        if user_id == DEFAULT_SUBSCRIBER and self.quota.report_audience is None:
+            return None
+        return user_id
+
+    # ---- 擷取 ----
+
+    async def ingest(self):
+        """定時擷取國際金價與台灣銀行牌價"""
+        ticks = 0
+        while self.max_ticks is None or ticks < self.max_ticks:
+            started = time.monotonic()
+            await self.reload_config()
+            # 每次擷取（含重試等待）都在一個擷取間隔內結束，不會拖慢下一次擷取
+            deadline = Deadline(max(self.interval, MIN_FETCH_BUDGET))
+            price_data = await asyncio.to_thread(get_gold_price, deadline, self.sources)
+            bot_price = await asyncio.to_thread(_get_bot_price_safe, deadline)
+            ticks += 1
+            self.schedule_replay()
+            yield {
+                'source': 'gold',
+                'price_data': price_data,
+                'bot_price': bot_price,
+                'fetched_at': time.time(),
+            }
+            if self.max_ticks is None or ticks < self.max_ticks:
+                await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def reload_config(self):
+        """設定檔修改後重新載入，只重建內容有變動的區段"""
+        changed = self.config_watcher.poll()
+        if not changed:
+            return
+        config = self.config_watcher.config
+        if PRICE_CHANGE in changed:
+            self.threshold = config.threshold
+            self.alert_policy = config.alert_policy
+        if WINDOWS in changed:
+            self.window_alerts.set_rules(config.window_rules)
+        if INDICATORS in changed:
+            self.indicators.set_rules(config.indicator_rules)
+        if SUBSCRIBERS in changed:
+            self.quota.audience = config.recipients(line_notify.USER_ID)
+            self.quota.report_audience = config.report_recipients(line_notify.USER_ID)
+        if SUBSCRIBERS in changed or SCHEDULE in changed:
+            # 排程未變動的訂閱者保留原本的下一次時間
+            self.report_scheduler.update(config.schedules, get_taiwan_time())
+        if SOURCES in changed:
+            self.sources = config.sources
+        if CHANNELS in changed:
+            # 新的管道先啟動，舊的管道送完佇列中的通知後關閉
+            previous, self.notifier = self.notifier, Notifier(config.channels)
+            await self.notifier.start()
+            await previous.stop()
+
+    def send(self, message, user_id, notification_id):
+        return self.quota.send(message, get_taiwan_time(), user_id, notification_id, Deadline(DELIVER_BUDGET))
+
+    def schedule_replay(self):
+        """outbox 有待送通知且沒有進行中的重送時，在背景重送（不阻塞擷取）"""
+        if self.outbox.pending() and (self._replay_task is None or self._replay_task.done()):
+            self._replay_task = asyncio.create_task(asyncio.to_thread(self.outbox.replay, self.send))
+
+    # ---- 各階段 ----
+
+    async def normalize(self, raw):
+        taiwan_time = get_taiwan_time()
+        utc_now = datetime.utcnow()
+        if raw['price_data'] is None:
+            return {'kind': 'fetch_error', 'taiwan_time': taiwan_time, 'utc_now': utc_now,
+                    'fetched_at': raw['fetched_at']}
+        quote = raw['price_data']
+        # 去重閘門：價格與上游時間戳未變的跳動標記為重複，下游只檢查報告排程
+        # （在正規化佇列之後檢查：佇列中被較新跳動取代的跳動不會讓較新的跳動被誤判為重複）
+        duplicate = self.deduplicator.is_duplicate(quote.source, quote.price, quote.upstream_ts)
+        return {
+            'kind': 'tick',
+            'price': quote.price,
+            'open_price': quote.open_price,
+            'price_source': quote.source,
+            'upstream_ts': quote.upstream_ts,
+            'duplicate': duplicate,
+            'bot_price': raw['bot_price'],
+            'fetched_at': raw['fetched_at'],
+            'taiwan_time': taiwan_time,
+            'utc_now': utc_now,
+        }
+
+    async def store(self, tick):
+        if tick['kind'] != 'tick':
+            return tick
+        current_date = tick['taiwan_time'].strftime('%Y-%m-%d')
+        if current_date != self.current_date:
+            self.day_high, self.day_low = load_daily_range(current_date, self.daily_price_file)
+            # 以記憶體中當日（台灣時間）的價格補上檔案未記錄到的高低點
+            day_start = tick['taiwan_time'].replace(hour=0, minute=0, second=0, microsecond=0)
+            window_high, window_low = self.window.high_low(day_start.timestamp())
+            if window_high is not None:
+                self.day_high, self.day_low = update_daily_range(window_high, self.day_high, self.day_low)
+                self.day_high, self.day_low = update_daily_range(window_low, self.day_high, self.day_low)
+            self.current_date = current_date
+        if tick['duplicate'] and self.day_high is not None:
+            # 價格未變化，當日範圍與上次價格都不需更新
+            tick['day_high'] = self.day_high
+            tick['day_low'] = self.day_low
+            tick['last_price'] = self.last_price
+            return tick
+        self.window.append(tick['fetched_at'], tick['price'])
+        self.distribution.update(GOLD_ASSET, tick['taiwan_time'].date(), tick['price'])
+        self.range_index.add(tick['fetched_at'], tick['price'])
+        self.day_high, self.day_low = update_daily_range(tick['price'], self.day_high, self.day_low)
+        tick['day_high'] = self.day_high
+        tick['day_low'] = self.day_low
+        tick['last_price'] = self.last_price
+        self.last_price = tick['price']
+        await asyncio.to_thread(save_daily_range, current_date, self.day_high, self.day_low,
+                                tick['taiwan_time'], self.daily_price_file)
+        await asyncio.to_thread(save_last_price, tick['price'], tick['utc_now'],
+                                tick['taiwan_time'], self.last_price_file,
+                                tick['price_source'], tick['upstream_ts'])
+        return tick
+
+    async def evaluate(self, tick):
+        if tick['kind'] == 'fetch_error':
+            # 第一次失敗立即通知，之後依指數退避間隔才再通知
+            decision = self.error_throttle.record_failure(FETCH_ERROR, tick['fetched_at'])
+            if not decision['notify']:
+                print(f"ℹ️  價格獲取已連續失敗 {decision['failures']} 次，未到下次通知時間，略過錯誤通知")
+                return []
+            return [{'kind': 'error', 'tick': tick, 'decision': decision}]
+
+        notifications = []
+        for recovery in self.error_throttle.record_success(FETCH_ERROR, tick['fetched_at']):
+            notifications.append({'kind': 'recovery', 'tick': tick, 'recovery': recovery})
+        change = None
+        decision = None
+        triggers = []
+        indicator_triggers = []
+        if not tick['duplicate']:
+            change = calculate_price_change(tick['price'], tick['last_price'])
+            decision = self.alert_state.evaluate(rule_key(GOLD_ASSET, PRICE_CHANGE_RULE), change,
+                                                 self.threshold, tick['fetched_at'], self.alert_policy)
+            triggers = self.window_alerts.update(GOLD_ASSET, tick['fetched_at'], tick['price'])
+            self.indicators.update(tick['price'])
+            indicator_triggers = gate_indicator_triggers(self.indicators.evaluate(), self.indicators.rules,
+                                                         self.alert_state, GOLD_ASSET, tick['fetched_at'],
+                                                         self.alert_policy)
+        # 同時觸發的區間變化與技術指標併入同一則警報
+        extra = {'triggers': triggers, 'indicator_triggers': indicator_triggers,
+                 'indicator_values': dict(self.indicators.values)}
+        if decision:
+            print(f"\n⚠️  價格變化超過 {self.threshold}% ({change:.2f}%)，觸發警報通知（等級 {decision['level']}）")
+            notifications.append({'kind': 'alert', 'tick': tick, 'change': change,
+                                  'level': decision['level'], **extra})
+        elif triggers:
+            print(f"\n⚠️  區間價格變化超過閾值，觸發區間警報通知")
+            notifications.append({'kind': 'window_alert', 'tick': tick, **extra})
+        elif indicator_triggers:
+            print(f"\n⚠️  技術指標規則成立，觸發指標警報通知")
+            notifications.append({'kind': 'indicator_alert', 'tick': tick, **extra})
+
+        # 到期的日報表排程；取出的時段在發送完成前不會再次取出
+        taiwan_time = tick['taiwan_time']
+        due_reports = self.report_scheduler.pop_due(taiwan_time)
+        if due_reports and not self.quota.allows_report(taiwan_time):
+            # 額度不足時日報表降級為每日固定時段的摘要，略過的時段不補發
+            print(f"ℹ️  LINE 額度{MODE_LABELS[self.quota.mode(taiwan_time)]}，本時段不發送日報表")
+            for item in due_reports:
+                self.report_scheduler.complete(item['subscriber'], item['slot'])
+            self.report_scheduler.save()
+            return notifications
+        # 摘要模式下的報告在發送佇列中排在最後
+        digest = self.quota.mode(taiwan_time) == DIGEST
+        for item in due_reports:
+            notifications.append({'kind': 'report', 'tick': tick, 'digest': digest, 'schedule': item,
+                                  'user_id': item['subscriber']})
+        return notifications
+
+    async def render(self, notification):
+        tick = notification['tick']
+        kind = notification['kind']
+        if kind == 'error':
+            text = format_fetch_error_message(tick['taiwan_time'].strftime('%Y-%m-%d %H:%M:%S'),
+                                              tick['utc_now'].strftime('%Y-%m-%d %H:%M:%S'))
+            text += format_throttle_note(notification['decision'])
+        elif kind == 'recovery':
+            text = format_recovery_message(notification['recovery'], tick['taiwan_time'].strftime('%Y-%m-%d %H:%M:%S'))
+        elif kind == 'indicator_alert':
+            text = format_indicator_alert_message(tick['price'], tick['day_high'], tick['day_low'],
+                                                  tick['bot_price'], notification['indicator_triggers'],
+                                                  notification['indicator_values'])
+        elif kind == 'window_alert':
+            text = format_window_alert_message(tick['price'], tick['day_high'], tick['day_low'],
+                                               tick['bot_price'], notification['triggers'])
+            if notification['indicator_triggers']:
+                text += "\n\n" + format_indicator_triggers(notification['indicator_triggers'],
+                                                            notification['indicator_values'])
+        elif kind == 'alert':
+            text = format_alert_message(tick['price'], tick['day_high'], tick['day_low'],
+                                        tick['bot_price'], tick['last_price'], notification['change'],
+                                        notification['level'])
+            if notification['triggers']:
+                text += "\n\n" + format_window_changes(notification['triggers'])
+            if notification['indicator_triggers']:
+                text += "\n\n" + format_indicator_triggers(notification['indicator_triggers'],
+                                                            notification['indicator_values'])
+            return {'kind': kind, 'text': text, 'tick': tick, 'level': notification['level']}
+        else:
+            percentiles = self.distribution.percentiles(GOLD_ASSET, tick['price'], tick['taiwan_time'].date())
+            highlights = self.range_index.highlights(tick['price'], tick['fetched_at'])
+            text = format_notification_message(tick['price'], tick['day_high'], tick['day_low'],
+                                               tick['bot_price'], percentiles, highlights)
+            error_summary = self.error_throttle.report_summary()
+            if error_summary:
+                text += "\n" + format_error_summary(error_summary) + "\n"
+            quota_status = format_quota_status(self.quota, tick['taiwan_time'])
+            if quota_status:
+                text += "\n" + quota_status + "\n"
+            return {'kind': kind, 'text': text, 'tick': tick, 'error_summary': error_summary,
+                    'digest': notification['digest'], 'schedule': notification['schedule'],
+                    'user_id': notification['user_id']}
+        return {'kind': kind, 'text': text, 'tick': tick}
+
+    async def deliver(self, message):
+        # 合併後的通知保留原始通知，發送後逐一處理報告的後續狀態
+        parts = message.get('parts', [message])
+        reports = [part for part in parts if part['kind'] == 'report']
+        # 每則通知帶固定的 retry key 重試；同一排程時段的日報表使用相同的通知 ID
+        # （合併後的內容不同，使用新的 ID，避免被當成已送達的報告略過）
+        notification_id = None
+        if reports and len(parts) == 1:
+            notification_id = reports[0]['schedule']['notification_id']
+        # 先寫入 outbox 再發送，未送達的在之後的擷取重送；其他管道同時發送
+        line_send = asyncio.to_thread(self.outbox.deliver, message['text'], self.send,
+                                      notification_id, message.get('user_id'), message['kind'])
+        if self.notifier.channels:
+            status, _ = await asyncio.gather(line_send, self.notifier.notify(message['text'], message['kind']))
+        else:
+            status = await line_send
+        success = status in (DELIVERED, QUEUED)
+        if not reports:
+            return None
+        # 送達後記錄時段並排入下一次；失敗時放回排程，下一次擷取重新發送同一時段
+        for report in reports:
+            schedule = report['schedule']
+            if success:
+                self.report_scheduler.complete(schedule['subscriber'], schedule['slot'])
+            else:
+                self.report_scheduler.release(schedule['subscriber'], schedule['slot'])
+        # 每次報告時保存價格分布，異常結束時最多遺失一小時的資料
+        # （在事件迴圈中執行，避免與儲存階段同時修改）
+        self.distribution.save()
+        self.report_scheduler.save()
+        if success:
+            report = reports[0]
+            self.error_throttle.clear_report_summary(report['error_summary'])
+            if report['schedule']['subscriber'] == DEFAULT_SUBSCRIBER:
+                await asyncio.to_thread(save_last_report_time, report['tick']['utc_now'],
+                                        report['tick']['taiwan_time'], self.last_report_file)
+        return None
+
+    # ---- 管線 ----
+
+    def build_pipeline(self):
+        """
+        Returns:
+            Pipeline: 擷取 → 正規化 → 儲存 → 評估 → 產生訊息 → 合併 → 發送 的管線
+        """
+        # 警報優先於錯誤通知、報告與摘要；報告與錯誤通知只保留最新一則，各類警報不合併
+        deliver = Stage('deliver', self.deliver, concurrency=self.deliver_concurrency,
+                        queue=PriorityDeliveryQueue(50, key=_delivery_key))
+        # 合併視窗結束時直接送入發送佇列，不佔用合併階段的工作者
+        self.coalescer.emit = deliver.queue.put
+
+        async def render(notification):
+            message = await self.render(notification)
+            # 緊急警報不進入合併佇列，直接排入發送佇列
+            if self.coalescer.urgent(message):
+                await deliver.queue.put(message)
+                return None
+            return message
+
+        return Pipeline(self.ingest, [
+            # 下游落後時只保留最新的價格跳動
+            Stage('normalize', self.normalize, queue_size=2, overflow=COALESCE,
+                  key=lambda raw: raw['source']),
+            Stage('store', self.store, queue_size=10, overflow=BLOCK),
+            Stage('evaluate', self.evaluate, queue_size=10, overflow=BLOCK),
+            Stage('render', render, concurrency=2, queue_size=20, overflow=BLOCK),
+            # 同一收件者視窗內的通知合併為一則；加入視窗後立即返回，視窗由計時工作送出
+            Stage('coalesce', self.coalescer.add, queue_size=20, overflow=BLOCK, pending=self.coalescer.pending),
+            deliver,
+        ])
+
+    async def run(self):
+        pipeline = self.build_pipeline()
+        await asyncio.to_thread(self.quota.sync, get_taiwan_time())
+        await self.notifier.start()
+        try:
+            await pipeline.run()
+        finally:
+            await self.notifier.stop()
+            if self._replay_task is not None:
+                await asyncio.gather(self._replay_task, return_exceptions=True)
+            self.outbox.compact()
+            self.window.snapshot(self.window_snapshot_file)
+            self.window_alerts.save()
+            self.distribution.save()
+            self.indicators.save()
+            self.alert_state.save()
+            self.error_throttle.save()
+            self.quota.save()
+            self.report_scheduler.save()
+            print(f"管線統計: {pipeline.stats()}")
+            print(f"發送排隊時間: {pipeline.stages[-1].queue.wait_stats()}")
+            if self.coalescer.merged:
+                print(f"合併通知: {self.coalescer.merged} 則")
+
+
+def _delivery_key(message):
+    # 合併後的通知與各類警報不被取代；不同訂閱者的報告各自保留
+    if 'parts' in message or message['kind'] in ('alert', 'window_alert', 'indicator_alert'):
+        return None
+    return (message['kind'], message.get('user_id'))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="黃金價格監控常駐程式")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="擷取價格的間隔秒數")
+    parser.add_argument('--max-ticks', type=int, default=None, help="擷取次數上限（測試用）")
+    parser.add_argument('--state-dir', default='.', help="狀態檔案目錄")
+    parser.add_argument('--coalesce-window', type=float, default=None, help="通知合併視窗秒數（0 表示不合併）")
+    parser.add_argument('--config', default=None, help="設定檔路徑（預設 monitor_config.json，修改後自動重新載入）")
+    args = parser.parse_args()
+
+    daemon = PriceDaemon(state_dir=args.state_dir, interval=args.interval, max_ticks=args.max_ticks,
+                         coalesce_window=args.coalesce_window, config_path=args.config)
+    try:
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        print("常駐程式已停止")
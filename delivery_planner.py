@@ -0,0 +1,121 @@
+"""
+依收件對象選擇最省的 LINE 發送方式
+同一則日報表以逐一 push 發送給每位訂閱者是最貴的方式（每人一次 API 呼叫）。
+規劃器依收件對象決定：
+  - 只有一位收件者：push
+  - 多位收件者：multicast，每次最多 500 個 User ID
+  - 已建立受眾（audience group）：narrowcast，一次呼叫
+  - 所有好友：broadcast，一次呼叫
+每種方式送達的對象相同；額度依實際收到訊息的人數計算，因此只在收件對象等於所有好友時使用 broadcast，
+不會多發給沒有訂閱的好友。
+"""
+
+import os
+
+
+PUSH = 'push'
+MULTICAST = 'multicast'
+NARROWCAST = 'narrowcast'
+BROADCAST = 'broadcast'
+
+# LINE multicast 單次最多 500 個收件者
+MULTICAST_LIMIT = 500
+
+
+class Audience:
+    """
+    一則通知的收件對象
+    """
+
+    def __init__(self, user_ids=(), everyone=False, follower_count=None, audience_group_id=None):
+        """
+        Args:
+            user_ids (iterable): 收件者 User ID（重複的會被移除）
+            everyone (bool): 是否發送給所有好友
+            follower_count (int, optional): 好友數，用於估算 broadcast 的額度
+            audience_group_id (int, optional): 與 user_ids 相同對象的受眾 ID，可改用 narrowcast
+        """
+        self.user_ids = list(dict.fromkeys(uid for uid in user_ids if uid))
+        self.everyone = everyone
+        self.follower_count = follower_count
+        self.audience_group_id = audience_group_id
+
+    def __len__(self):
+        if self.everyone:
+            return self.follower_count if self.follower_count is not None else len(self.user_ids)
+        return len(self.user_ids)
+
+    @classmethod
+    def from_env(cls, default_user_id=None):
+        """
+        從環境變數讀取收件對象
+          - LINE_BROADCAST=1：發送給所有好友（LINE_FOLLOWER_COUNT 可提供好友數）
+          - LINE_AUDIENCE_GROUP_ID：受眾 ID
+          - USER_IDS：以逗號分隔的 User ID，未設定時使用 USER_ID
+
+        Returns:
+            Audience: 收件對象
+        """
+        user_ids = [uid.strip() for uid in os.getenv("USER_IDS", "").split(',') if uid.strip()]
+        if not user_ids and default_user_id:
+            user_ids = [default_user_id]
+        follower_count = os.getenv("LINE_FOLLOWER_COUNT")
+        audience_group_id = os.getenv("LINE_AUDIENCE_GROUP_ID")
+        return cls(user_ids,
+                   everyone=os.getenv("LINE_BROADCAST", "") in ("1", "true", "yes"),
+                   follower_count=int(follower_count) if follower_count else None,
+                   audience_group_id=int(audience_group_id) if audience_group_id else None)
+
+
+def plan_delivery(audience):
+    """
+    規劃發送方式
+
+    Args:
+        audience (Audience): 收件對象
+
+    Returns:
+        list: 發送步驟 [{'kind', 'to', 'audience_group_id', 'recipients'}, ...]，
+              recipients 為該步驟消耗的額度（收到訊息的人數）
+    """
+    if audience.everyone:
+        return [{'kind': BROADCAST, 'to': None, 'audience_group_id': None, 'recipients': len(audience)}]
+    user_ids = audience.user_ids
+    if not user_ids:
+        return []
+    if len(user_ids) == 1:
+        return [{'kind': PUSH, 'to': user_ids[0], 'audience_group_id': None, 'recipients': 1}]
+    if audience.audience_group_id is not None and len(user_ids) > MULTICAST_LIMIT:
+        return [{'kind': NARROWCAST, 'to': None, 'audience_group_id': audience.audience_group_id,
+                 'recipients': len(user_ids)}]
+    return [{'kind': MULTICAST, 'to': user_ids[start:start + MULTICAST_LIMIT], 'audience_group_id': None,
+             'recipients': len(user_ids[start:start + MULTICAST_LIMIT])}
+            for start in range(0, len(user_ids), MULTICAST_LIMIT)]
+
+
+def plan_cost(steps):
+    """
+    Returns:
+        tuple: (API 呼叫次數, 消耗的訊息額度)
+    """
+    return len(steps), sum(step['recipients'] for step in steps)
+
+
+def naive_cost(audience):
+    """
+    Returns:
+        tuple: 逐一 push 時的 (API 呼叫次數, 消耗的訊息額度)
+    """
+    return len(audience), len(audience)
+
+
+def format_plan(steps):
+    """
+    Returns:
+        str: 發送計畫摘要，例如 "multicast x 3（1,200 人）"
+    """
+    if not steps:
+        return "無收件者"
+    calls, recipients = plan_cost(steps)
+    return f"{steps[0]['kind']} x {calls}（{recipients:,} 人）"
+
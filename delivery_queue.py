@@ -0,0 +1,136 @@
+"""
+依優先順序發送的通知佇列
+額度或速率受限時，大量的整點報告可能排在緊急的價格警報前面。本佇列以 heap 排序：
+  警報 → 錯誤／恢復通知 → 整點報告 → 摘要
+同一優先等級內依收件者公平輪流（start-time fair queuing：每位收件者的第 n 則排在所有收件者的第 n-1 則之後），
+單一收件者的大量通知不會讓其他收件者一直等待。
+每個優先等級分別統計排隊等待時間。
+
+介面與 pipeline.BoundedQueue 相同（put / get / qsize / dropped / coalesced），可作為管線階段的輸入佇列。
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+
+
+ALERT = 0
+ERROR = 1
+REPORT = 2
+DIGEST = 3
+
+PRIORITY_LABELS = {ALERT: '警報', ERROR: '錯誤通知', REPORT: '報告', DIGEST: '摘要'}
+
+KIND_PRIORITIES = {
+    'alert': ALERT,
+    'window_alert': ALERT,
+    'indicator_alert': ALERT,
+    'error': ERROR,
+    'recovery': ERROR,
+    'report': REPORT,
+    'digest': DIGEST,
+}
+
+
+def priority_of(message):
+    """
+    Returns:
+        int: 通知的優先等級（數字越小越優先），未知類型視為報告
+    """
+    if message.get('digest'):
+        return DIGEST
+    return KIND_PRIORITIES.get(message.get('kind'), REPORT)
+
+
+class PriorityDeliveryQueue:
+    """
+    依優先等級與收件者公平排序的有界非同步佇列
+    """
+
+    def __init__(self, maxsize, priority=priority_of, recipient=None, key=None):
+        """
+        Args:
+            maxsize (int): 佇列容量，已滿時上游等待
+            priority (callable): 通知的優先等級
+            recipient (callable, optional): 收件者鍵值函數，預設為通知的 'user_id'
+            key (callable, optional): 合併鍵值函數，相同鍵值的通知以新值取代舊值（保留原本的排隊位置），
+                返回 None 表示不可合併
+        """
+        self.maxsize = max(1, maxsize)
+        self.priority = priority
+        self.recipient = recipient or (lambda message: message.get('user_id'))
+        self.key = key
+        self.dropped = 0
+        self.coalesced = 0
+        self._heap = []  # [(優先等級, 虛擬完成時間, 序號, 項目記錄)]
+        self._by_key = {}  # {合併鍵值: 項目記錄}
+        self._virtual_time = {}  # {優先等級: 最近取出項目的虛擬開始時間}
+        self._finish = {}  # {(優先等級, 收件者): 該收件者最後一則的虛擬完成時間}
+        self._sequence = itertools.count()
+        self._waits = {}  # {優先等級: {'count', 'total', 'max'}}
+        self._condition = None
+
+    @property
+    def _changed(self):
+        # 延後到事件迴圈中才建立（Python 3.9 的 Condition 建立時即綁定事件迴圈）
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def qsize(self):
+        return len(self._heap)
+
+    async def put(self, item):
+        """放入通知，相同合併鍵值的通知直接取代；佇列已滿時等待"""
+        async with self._changed:
+            item_key = self.key(item) if self.key else None
+            if item_key is not None and item_key in self._by_key:
+                self._by_key[item_key]['item'] = item
+                self.coalesced += 1
+                self._changed.notify_all()
+                return
+            while len(self._heap) >= self.maxsize:
+                await self._changed.wait()
+            priority = self.priority(item)
+            flow = (priority, self.recipient(item))
+            start = max(self._virtual_time.get(priority, 0), self._finish.get(flow, 0))
+            self._finish[flow] = start + 1
+            record = {'item': item, 'key': item_key, 'start': start, 'enqueued_at': time.monotonic()}
+            heapq.heappush(self._heap, (priority, start + 1, next(self._sequence), record))
+            if item_key is not None:
+                self._by_key[item_key] = record
+            self._changed.notify_all()
+
+    async def get(self):
+        """取出優先等級最高、虛擬完成時間最早的通知，佇列為空時等待"""
+        async with self._changed:
+            while not self._heap:
+                await self._changed.wait()
+            priority, _, _, record = heapq.heappop(self._heap)
+            self._virtual_time[priority] = max(self._virtual_time.get(priority, 0), record['start'])
+            if record['key'] is not None:
+                self._by_key.pop(record['key'], None)
+            self._record_wait(priority, time.monotonic() - record['enqueued_at'])
+            self._changed.notify_all()
+            return record['item']
+
+    def _record_wait(self, priority, waited):
+        stats = self._waits.setdefault(priority, {'count': 0, 'total': 0.0, 'max': 0.0})
+        stats['count'] += 1
+        stats['total'] += waited
+        stats['max'] = max(stats['max'], waited)
+
+    def wait_stats(self):
+        """
+        Returns:
+            dict: {優先等級名稱: {'count', 'mean_ms', 'max_ms'}}，各等級的排隊等待時間
+        """
+        return {
+            PRIORITY_LABELS.get(priority, str(priority)): {
+                'count': stats['count'],
+                'mean_ms': stats['total'] / stats['count'] * 1000,
+                'max_ms': stats['max'] * 1000,
+            }
+            for priority, stats in sorted(self._waits.items())
+        }
@@ -95,10 +95,10 @@ def test_gold_price_api():
         price_data = get_gold_price()
         if price_data:
             print("✓ API 連接成功")
-            print(f"  當前價格: ${price_data.get('current_price', 0):.2f}")
-            print(f"  開盤價格: ${price_data.get('open_price', 0):.2f}")
-            print(f"  當天最高: ${price_data.get('day_high', 0):.2f}")
-            print(f"  當天最低: ${price_data.get('day_low', 0):.2f}")
+            print(f"  資料來源: {price_data.source}")
+            print(f"  當前價格: ${price_data.price:.2f}")
+            print(f"  開盤價格: ${price_data.open_price:.2f}")
+            print(f"  耗時: {price_data.latency:.2f} 秒（重試 {price_data.retry_count} 次）")
             return True
         else:
             print("✗ API 連接失敗")
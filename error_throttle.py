@@ -0,0 +1,248 @@
+"""
+錯誤通知節流
+API 中斷期間每次執行都發送錯誤通知會讓 LINE 每 10 分鐘收到一則相同的訊息。
+依錯誤類別（例如價格獲取失敗、系統錯誤的例外類別）分別記錄：
+  - 第一次失敗立即通知
+  - 之後以指數退避的間隔（30 分鐘、1 小時、2 小時…最多 6 小時）才再通知一次
+  - 恢復正常時只發送一則恢復通知
+  - 被略過的錯誤通知次數併入下一次日報表
+
+狀態保存在 error_throttle.json，跨執行保留。
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+
+ERROR_THROTTLE_FILE = "error_throttle.json"
+
+FETCH_ERROR = 'fetch_error'
+SYSTEM_ERROR = 'system_error'
+
+ERROR_LABELS = {
+    FETCH_ERROR: '黃金價格獲取失敗',
+    SYSTEM_ERROR: '系統錯誤',
+}
+
+BASE_BACKOFF_SECONDS = 30 * 60
+MAX_BACKOFF_SECONDS = 6 * 60 * 60
+
+
+def error_label(error_class):
+    """
+    Returns:
+        str: 錯誤類別的中文名稱（"system_error:ValueError" 顯示為「系統錯誤（ValueError）」）
+    """
+    base, _, detail = error_class.partition(':')
+    label = ERROR_LABELS.get(base, base)
+    return f"{label}（{detail}）" if detail else label
+
+
+class ErrorThrottle:
+    """
+    依錯誤類別節流錯誤通知
+    """
+
+    def __init__(self, path=ERROR_THROTTLE_FILE, base_backoff=BASE_BACKOFF_SECONDS, max_backoff=MAX_BACKOFF_SECONDS):
+        """
+        Args:
+            path (str): 狀態檔路徑
+            base_backoff (float): 第一次通知後到下一次通知的最短間隔（秒）
+            max_backoff (float): 通知間隔上限（秒）
+        """
+        self.path = path
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._errors = {}      # {錯誤類別: 進行中的錯誤狀態}
+        self._unreported = {}  # {錯誤類別: 尚未在日報表中回報的略過次數}
+
+    def backoff(self, notified):
+        """
+        Args:
+            notified (int): 已發送的通知數
+
+        Returns:
+            float: 距離上次通知需要等待的秒數
+        """
+        return min(self.base_backoff * (2 ** max(notified - 1, 0)), self.max_backoff)
+
+    def record_failure(self, error_class, now):
+        """
+        記錄一次失敗並決定是否發送通知
+
+        Args:
+            error_class (str): 錯誤類別
+            now (float): Unix 秒
+
+        Returns:
+            dict: {'notify', 'failures', 'suppressed', 'first_failure', 'next_notify_at'}
+                  suppressed 為上次通知後被略過的次數
+        """
+        state = self._errors.get(error_class)
+        if state is None:
+            state = {'first_failure': now, 'failures': 0, 'notified': 0,
+                     'last_notified': None, 'suppressed': 0}
+            self._errors[error_class] = state
+        state['failures'] += 1
+
+        due = state['last_notified'] is None or now - state['last_notified'] >= self.backoff(state['notified'])
+        suppressed = state['suppressed']
+        if due:
+            state['notified'] += 1
+            state['last_notified'] = now
+            state['suppressed'] = 0
+        else:
+            state['suppressed'] += 1
+            self._unreported[error_class] = self._unreported.get(error_class, 0) + 1
+        return {
+            'notify': due,
+            'failures': state['failures'],
+            'suppressed': suppressed if due else state['suppressed'],
+            'first_failure': state['first_failure'],
+            'next_notify_at': state['last_notified'] + self.backoff(state['notified']),
+        }
+
+    def record_success(self, error_class, now):
+        """
+        記錄恢復正常，結束該類別（含 "類別:細項"）進行中的錯誤
+
+        Args:
+            error_class (str): 錯誤類別
+            now (float): Unix 秒
+
+        Returns:
+            list: 需要發送恢復通知的錯誤 [{'error_class', 'failures', 'first_failure', 'duration'}, ...]
+        """
+        recoveries = []
+        for key in [key for key in self._errors if key == error_class or key.startswith(error_class + ':')]:
+            state = self._errors.pop(key)
+            if state['notified']:
+                recoveries.append({'error_class': key, 'failures': state['failures'],
+                                   'first_failure': state['first_failure'],
+                                   'duration': now - state['first_failure']})
+        return recoveries
+
+    def active(self):
+        """
+        Returns:
+            list: 進行中的錯誤類別
+        """
+        return list(self._errors)
+
+    def report_summary(self):
+        """
+        Returns:
+            dict: {錯誤類別: 尚未回報的略過次數}
+        """
+        return dict(self._unreported)
+
+    def clear_report_summary(self, summary=None):
+        """
+        日報表發送成功後清除已回報的略過次數
+
+        Args:
+            summary (dict, optional): 報告中實際回報的次數（之後新增的略過次數保留到下一次報告），
+                未指定時全部清除
+        """
+        if summary is None:
+            self._unreported = {}
+            return
+        for error_class, count in summary.items():
+            remaining = self._unreported.get(error_class, 0) - count
+            if remaining > 0:
+                self._unreported[error_class] = remaining
+            else:
+                self._unreported.pop(error_class, None)
+
+    @classmethod
+    def load(cls, path=ERROR_THROTTLE_FILE):
+        """
+        讀取狀態檔
+
+        Returns:
+            ErrorThrottle: 節流器
+        """
+        throttle = cls(path)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                throttle._errors = data.get('errors', {})
+                throttle._unreported = data.get('unreported', {})
+        except Exception as e:
+            print(f"⚠️  讀取錯誤通知節流狀態時發生錯誤: {e}")
+        return throttle
+
+    def save(self):
+        """
+        寫入狀態檔
+        """
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'errors': self._errors, 'unreported': self._unreported}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️  保存錯誤通知節流狀態時發生錯誤: {e}")
+
+
+def _format_duration(seconds):
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} 分鐘"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} 小時 {minutes} 分鐘" if minutes else f"{hours} 小時"
+
+
+def _format_taiwan_time(ts):
+    return datetime.fromtimestamp(ts, timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def format_throttle_note(decision):
+    """
+    Args:
+        decision (dict): record_failure 的結果
+
+    Returns:
+        str: 錯誤通知中的連續失敗說明，第一次失敗時為空字串
+    """
+    if decision['failures'] <= 1:
+        return ""
+    note = f"\n\n【連續失敗】\n"
+    note += f"自 {_format_taiwan_time(decision['first_failure'])} 起已連續失敗 {decision['failures']} 次\n"
+    if decision['suppressed']:
+        note += f"期間略過 {decision['suppressed']} 則相同通知\n"
+    note += f"下次通知最快: {_format_taiwan_time(decision['next_notify_at'])}（恢復時會另行通知）"
+    return note
+
+
+def format_recovery_message(recovery, taiwan_time):
+    """
+    Args:
+        recovery (dict): record_success 返回的恢復資訊
+        taiwan_time (str): 台灣時間字串
+
+    Returns:
+        str: 恢復通知
+    """
+    message = f"✅ {error_label(recovery['error_class'])}已恢復\n\n"
+    message += f"恢復時間: {taiwan_time}\n"
+    message += f"開始時間: {_format_taiwan_time(recovery['first_failure'])}\n"
+    message += f"持續時間: {_format_duration(recovery['duration'])}\n"
+    message += f"失敗次數: {recovery['failures']}"
+    return message
+
+
+def format_error_summary(summary):
+    """
+    Args:
+        summary (dict): report_summary 的結果
+
+    Returns:
+        str: 日報表中的【錯誤摘要】段落
+    """
+    lines = ["【錯誤摘要】"]
+    for error_class, count in sorted(summary.items()):
+        lines.append(f"{error_label(error_class)}: 略過 {count} 則通知")
+    return "\n".join(lines)
@@ -6,22 +6,33 @@
 import requests
 from bs4 import BeautifulSoup
 import re
+import os
+import time
+from datetime import datetime, timezone, timedelta
 
+from quotes import BotQuote
+from retry_policy import RetryPolicy
 
-def get_bot_gold_price():
+
+# 台灣銀行網站基礎網址（可用環境變數指向本機替身伺服器，見 stand_in_servers.py）
+BOT_BASE_URL = os.getenv("BOT_BASE_URL", "https://rate.bot.com.tw").rstrip('/')
+
+# 台灣銀行頁面的重試策略（台灣銀行價格僅供參考，嘗試次數較少）
+BOT_RETRY_POLICY = RetryPolicy(max_attempts=2, base_delay=1.0, max_delay=5.0, timeout=15)
+
+
+def get_bot_gold_price(deadline=None):
     """
     爬取台灣銀行黃金牌告匯率頁面，獲取「本行賣出」的黃金存摺價格（台幣/公克）
     
+    Args:
+        deadline (Deadline, optional): 時間預算，預設為本次執行的預算
+    
     Returns:
-        dict: 包含價格信息的字典，格式如下：
-            {
-                'price': float,  # 價格（台幣/公克）
-                'unit': str,      # 單位（通常是 '台幣/公克'）
-                'source': str     # 數據來源（'台灣銀行'）
-            }
-            如果獲取失敗則返回 None
+        BotQuote: 「本行賣出」價格（台幣/公克），含掛牌時間與抓取耗時
+                  如果獲取失敗則返回 None
     """
-    url = 'https://rate.bot.com.tw/gold?Lang=zh-TW'
+    url = f'{BOT_BASE_URL}/gold?Lang=zh-TW'
     
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -32,11 +43,15 @@ def get_bot_gold_price():
         'Upgrade-Insecure-Requests': '1'
     }
     
+    started = time.monotonic()
     try:
         print("嘗試爬取台灣銀行黃金牌告匯率...")
         print(f"  目標網址: {url}")
         
-        response = requests.get(url, headers=headers, timeout=15)
+        response, retry_count = BOT_RETRY_POLICY.get(url, deadline=deadline, headers=headers)
+        if response is None:
+            print("  ✗ 無法連接台灣銀行網站")
+            return None
         response.raise_for_status()
         
         # 檢查回應編碼
@@ -44,6 +59,7 @@ def get_bot_gold_price():
             response.encoding = 'utf-8'
         
         soup = BeautifulSoup(response.text, 'html.parser')
+        posted_ts = _extract_posted_time(soup.get_text())
         
         # 方法1: 尋找包含「黃金存摺」的表格行
         # 台灣銀行的表格結構可能有多種，我們嘗試多種方法
@@ -91,11 +107,9 @@ def get_bot_gold_price():
                         # 黃金存摺價格通常在 2000-5000 台幣/公克之間
                         if price and 1000 < price < 10000:
                             print(f"  ✓ 成功獲取黃金存摺本行賣出價格: {price} 台幣/公克")
-                            return {
-                                'price': price,
-                                'unit': '台幣/公克',
-                                'source': '台灣銀行'
-                            }
+                            return BotQuote(price, upstream_ts=posted_ts,
+                                            latency=time.monotonic() - started,
+                                            retry_count=retry_count)
                         elif price:
                             print(f"  ⚠️  找到價格 {price}，但可能不是正確的欄位，繼續尋找...")
         
@@ -127,11 +141,9 @@ def get_bot_gold_price():
                     price = _extract_price(match)
                     if price and price > 100:  # 黃金價格應該大於 100
                         print(f"  ✓ 成功獲取黃金存摺本行賣出價格: {price} 台幣/公克")
-                        return {
-                            'price': price,
-                            'unit': '台幣/公克',
-                            'source': '台灣銀行'
-                        }
+                        return BotQuote(price, upstream_ts=posted_ts,
+                                        latency=time.monotonic() - started,
+                                        retry_count=retry_count)
         
         print("  ✗ 無法找到黃金存摺本行賣出價格")
         print(f"  網頁內容預覽（前500字元）: {response.text[:500]}")
@@ -169,6 +181,26 @@ def _extract_price(price_text):
     return None
 
 
+def _extract_posted_time(page_text):
+    """
+    從頁面文字中提取掛牌時間（例如「掛牌時間：2025/12/19 16:00」）
+    
+    Args:
+        page_text (str): 頁面文字
+        
+    Returns:
+        int: 掛牌時間（Unix 秒），如果無法提取則返回 None
+    """
+    match = re.search(r'掛牌時間[：:]\s*(\d{4}/\d{1,2}/\d{1,2})\s+(\d{1,2}:\d{2})', page_text)
+    if not match:
+        return None
+    try:
+        posted = datetime.strptime(f"{match.group(1)} {match.group(2)}", '%Y/%m/%d %H:%M')
+        return int(posted.replace(tzinfo=timezone(timedelta(hours=8))).timestamp())
+    except ValueError:
+        return None
+
+
 if __name__ == "__main__":
     # 測試函數
     print("=" * 60)
@@ -183,8 +215,8 @@ if __name__ == "__main__":
         print("=" * 60)
         print("✓ 測試成功！")
         print("=" * 60)
-        print(f"價格: {result['price']} {result['unit']}")
-        print(f"數據來源: {result['source']}")
+        print(f"價格: {result.price} {result.unit}")
+        print(f"數據來源: {result.source}")
     else:
         print()
         print("=" * 60)
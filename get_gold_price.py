@@ -1,46 +1,74 @@
-import requests
 import os
 import sys
 from datetime import datetime
-import ssl
+import time
 import urllib3
 from urllib3.util.ssl_ import create_urllib3_context
 
+from quotes import PriceQuote
+from retry_policy import RetryPolicy, get_run_deadline
+
 # 禁用 SSL 警告（如果使用 verify=False）
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# API 基礎網址（可用環境變數指向本機替身伺服器，見 stand_in_servers.py）
+COINGECKO_BASE_URL = os.getenv("COINGECKO_BASE_URL", "https://api.coingecko.com").rstrip('/')
+BINANCE_BASE_URL = os.getenv("BINANCE_BASE_URL", "https://api.binance.com").rstrip('/')
+
+# 各 API 的重試策略（指數退避加抖動，429 時依 Retry-After 等待）
+COINGECKO_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=20.0, timeout=30)
+BINANCE_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=10.0, timeout=15)
+# GitHub Actions 環境網路較不穩定，增加嘗試次數與超時時間
+BINANCE_RETRY_POLICY_GHA = RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=10.0, timeout=30)
+
+# 價格來源的預設使用順序（可由設定檔 monitor_config.json 的 sources 調整）
+DEFAULT_SOURCES = ('coingecko', 'binance')
+SOURCE_LABELS = {'coingecko': 'CoinGecko', 'binance': '幣安'}
+
 
-def get_gold_price():
+def get_gold_price(deadline=None, sources=DEFAULT_SOURCES):
     """
     獲取黃金現貨價格（XAU/USD）
-    優先使用 CoinGecko API 獲取 PAXG/USD 價格
+    預設優先使用 CoinGecko API 獲取 PAXG/USD 價格
     如果 CoinGecko API 失敗，則使用幣安 API 作為備用
     PAXG (Paxos Gold) 是與黃金掛鉤的穩定幣，1 PAXG = 1 盎司黃金
     
+    Args:
+        deadline (Deadline, optional): 所有 API 共用的時間預算，預設為本次執行的預算
+        sources (iterable): 依序嘗試的價格來源（PRICE_SOURCES 的名稱）
+    
     Returns:
-        dict: 包含 current_price (當前價格) 和 open_price (開盤價) 的字典
-              如果獲取失敗則返回 None
+        PriceQuote: 包含來源、當前價格、開盤價、上游時間戳、耗時與重試次數的報價
+                    如果獲取失敗則返回 None
     """
-    # 優先使用 CoinGecko API（無地理位置限制）
-    result = get_gold_price_coingecko()
-    
-    # 如果 CoinGecko API 失敗，使用幣安 API 作為備用
-    if result is None:
-        print("CoinGecko API 失敗，嘗試使用幣安 API 作為備用...")
-        result = get_gold_price_binance()
+    deadline = deadline or get_run_deadline()
+    result = None
+    previous = None
+    for name in sources:
+        # 前一個來源失敗時使用下一個作為備用
+        if previous is not None:
+            print(f"{SOURCE_LABELS[previous]} API 失敗，嘗試使用{SOURCE_LABELS[name]} API 作為備用...")
+        result = PRICE_SOURCES[name](deadline)
+        if result is not None:
+            break
+        previous = name
     
     return result
 
 
-def get_gold_price_binance():
+def get_gold_price_binance(deadline=None):
     """
-    使用幣安 API 獲取黃金價格（PAXG/USDT）
+    使用幣安 24 小時行情 API 獲取黃金價格（PAXG/USDT）
     PAXG (Paxos Gold) 是與黃金掛鉤的穩定幣，1 PAXG = 1 盎司黃金
     
+    Args:
+        deadline (Deadline, optional): 時間預算，預設為本次執行的預算
+    
     Returns:
-        dict: 包含 current_price (當前價格) 和 open_price (開盤價) 的字典
-              如果獲取失敗則返回 None
+        PriceQuote: 包含來源、當前價格、開盤價、上游時間戳、耗時與重試次數的報價
+                    如果獲取失敗則返回 None
     """
+    started = time.monotonic()
     try:
         # 檢測是否在 GitHub Actions 環境中
         is_github_actions = os.getenv("GITHUB_ACTIONS") == "true"
@@ -58,7 +86,7 @@ def get_gold_price_binance():
                 print(f"  ⚠️  網路連接測試失敗: {net_test_error}")
         
         print("嘗試使用幣安 API (Binance)...")
-        api_url = "https://api.binance.com/api/v3/ticker/price?symbol=PAXGUSDT"
+        api_url = f"{BINANCE_BASE_URL}/api/v3/ticker/24hr?symbol=PAXGUSDT"
         print(f"  API URL: {api_url}")
         
         headers = {
@@ -66,119 +94,26 @@ def get_gold_price_binance():
             'Accept': 'application/json'
         }
         
-        # 在 GitHub Actions 環境中，增加超時時間
-        timeout = 30 if is_github_actions else 15
-        print(f"  請求超時設定: {timeout} 秒")
-        
-        # 嘗試正常 SSL 連接，最多重試 5 次（GitHub Actions 環境中增加重試次數）
-        max_retries = 5 if is_github_actions else 3
-        print(f"  最大重試次數: {max_retries}")
-        response = None
-        for attempt in range(max_retries):
-            try:
-                if attempt > 0:
-                    print(f"  重試第 {attempt} 次...")
-                
-                response = requests.get(api_url, headers=headers, timeout=timeout, verify=True)
-                
-                if response.status_code == 200:
-                    break
-                elif response.status_code == 429:
-                    # 請求頻率過高，等待後重試
-                    if attempt < max_retries - 1:
-                        import time
-                        wait_time = (attempt + 1) * 2
-                        print(f"  請求頻率過高，等待 {wait_time} 秒後重試...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print(f"  幣安 API 請求頻率過高，狀態碼: {response.status_code}")
-                        if response.text:
-                            print(f"  錯誤訊息: {response.text[:200]}")
-                        return None
-                elif response.status_code == 451:
-                    # 451 錯誤表示地理位置限制，不需要重試，直接返回 None 讓備用 API 處理
-                    print(f"  幣安 API 返回 451 錯誤（地理位置限制）")
-                    if response.text:
-                        print(f"  錯誤訊息: {response.text[:200]}")
-                    print("  將嘗試使用備用 API...")
-                    return None
-                else:
-                    print(f"  幣安 API 請求失敗，狀態碼: {response.status_code}")
-                    if response.text:
-                        print(f"  錯誤訊息: {response.text[:200]}")
-                    # 非 429/451 錯誤時，如果不是最後一次重試，繼續重試
-                    if attempt < max_retries - 1:
-                        import time
-                        time.sleep(2)
-                        continue
-                    else:
-                        return None
-                    
-            except (requests.exceptions.SSLError, ssl.SSLError) as ssl_error:
-                # 如果 SSL 錯誤，嘗試使用備用 SSL 設定
-                if attempt == 0:
-                    print(f"  SSL 錯誤: {ssl_error}，嘗試使用備用 SSL 設定...")
-                try:
-                    response = requests.get(api_url, headers=headers, timeout=timeout, verify=False)
-                    if response.status_code == 200:
-                        print("  ✓ 使用備用 SSL 設定成功")
-                        break
-                    else:
-                        print(f"  備用 SSL 設定請求失敗，狀態碼: {response.status_code}")
-                        if attempt < max_retries - 1:
-                            import time
-                            time.sleep(2)
-                            continue
-                        else:
-                            return None
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        print(f"  備用 SSL 設定也失敗: {e}，重試中...")
-                        import time
-                        time.sleep(2)
-                        continue
-                    else:
-                        print(f"  SSL 錯誤且備用設定也失敗: {e}")
-                        return None
-                        
-            except requests.exceptions.Timeout:
-                if attempt < max_retries - 1:
-                    print(f"  請求超時，重試中...")
-                    import time
-                    time.sleep(2)
-                    continue
-                else:
-                    print(f"  幣安 API 請求超時，已重試 {max_retries} 次")
-                    return None
-                    
-            except requests.exceptions.ConnectionError as conn_error:
-                if attempt < max_retries - 1:
-                    print(f"  連接錯誤: {conn_error}，重試中...")
-                    import time
-                    time.sleep(2)
-                    continue
-                else:
-                    print(f"  幣安 API 連接失敗: {conn_error}")
-                    return None
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"  發生錯誤: {e}，重試中...")
-                    import time
-                    time.sleep(2)
-                    continue
-                else:
-                    print(f"  幣安 API 請求發生未預期錯誤: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    return None
+        # 重試策略：指數退避加抖動，並受本次執行的時間預算限制
+        policy = BINANCE_RETRY_POLICY_GHA if is_github_actions else BINANCE_RETRY_POLICY
+        print(f"  請求超時設定: {policy.timeout} 秒")
+        print(f"  最大嘗試次數: {policy.max_attempts}")
+        # 451 不在重試狀態碼內，會直接返回
+        response, attempt = policy.get(api_url, deadline=deadline, ssl_fallback=True, headers=headers)
         
         # 檢查 response 是否存在
         if response is None:
             print(f"  幣安 API 請求失敗，無法獲取回應")
             return None
         
+        if response.status_code == 451:
+            # 451 錯誤表示地理位置限制，直接返回 None 讓備用 API 處理
+            print(f"  幣安 API 返回 451 錯誤（地理位置限制）")
+            if response.text:
+                print(f"  錯誤訊息: {response.text[:200]}")
+            print("  將嘗試使用備用 API...")
+            return None
+        
         if response.status_code != 200:
             print(f"  幣安 API 請求失敗，狀態碼: {response.status_code}")
             if response.text:
@@ -193,31 +128,40 @@ def get_gold_price_binance():
             print(f"  回應內容: {response.text[:200]}")
             return None
         
-        # 幣安 API 返回格式: {"symbol":"PAXGUSDT","price":"2345.67"}
-        if 'price' in data:
+        # 幣安 24 小時行情返回格式:
+        # {"symbol":"PAXGUSDT","lastPrice":"2345.67","openPrice":"2340.00","closeTime":1700000000000,...}
+        if 'lastPrice' in data:
             try:
-                current_price = float(data['price'])
+                current_price = float(data['lastPrice'])
                 
                 if current_price > 0:
                     print(f"✓ 使用幣安 API 獲取數據成功")
                     print(f"  當前價格: ${current_price:.2f}")
                     
-                    # 幣安 API 只提供當前價格，使用當前價格作為開盤價、最高價、最低價的近似值
-                    return {
-                        'current_price': current_price,
-                        'open_price': current_price,  # 使用當前價格作為開盤價
-                        'day_high': current_price,    # 使用當前價格作為最高價
-                        'day_low': current_price      # 使用當前價格作為最低價
-                    }
+                    # 24 小時前的開盤價，缺少時使用當前價格
+                    open_price = float(data.get('openPrice') or 0) or current_price
+                    # closeTime 為最後一筆成交的統計時間（毫秒），作為上游時間戳
+                    close_time = data.get('closeTime')
+                    upstream_ts = int(close_time) // 1000 if close_time else None
+                    
+                    # 當日最高價、最低價由 main.py 自行追蹤
+                    return PriceQuote(
+                        source='binance',
+                        price=current_price,
+                        open_price=open_price,
+                        upstream_ts=upstream_ts,
+                        latency=time.monotonic() - started,
+                        retry_count=attempt
+                    )
                 else:
                     print(f"  幣安 API 返回的價格無效: {current_price}")
                     return None
             except (ValueError, TypeError) as price_error:
                 print(f"  幣安 API 價格轉換失敗: {price_error}")
-                print(f"  價格值: {data.get('price', 'N/A')}")
+                print(f"  價格值: {data.get('lastPrice', 'N/A')}")
                 return None
         else:
-            print("  幣安 API 回應格式錯誤，缺少 'price' 欄位")
+            print("  幣安 API 回應格式錯誤，缺少 'lastPrice' 欄位")
             print(f"  回應內容: {str(data)[:200]}")
             return None
             
@@ -229,21 +173,25 @@ def get_gold_price_binance():
         return None
 
 
-def get_gold_price_coingecko():
+def get_gold_price_coingecko(deadline=None):
     """
     使用 CoinGecko API 獲取黃金價格（PAXG/USD）
     CoinGecko 是免費的加密貨幣和商品價格 API，沒有地理位置限制
     PAXG (Paxos Gold) 是與黃金掛鉤的穩定幣，1 PAXG = 1 盎司黃金
     
+    Args:
+        deadline (Deadline, optional): 時間預算，預設為本次執行的預算
+    
     Returns:
-        dict: 包含 current_price (當前價格) 和 open_price (開盤價) 的字典
-              如果獲取失敗則返回 None
+        PriceQuote: 包含來源、當前價格、開盤價、上游時間戳、耗時與重試次數的報價
+                    如果獲取失敗則返回 None
     """
+    started = time.monotonic()
     try:
         print("嘗試使用 CoinGecko API...")
         # CoinGecko API: 獲取 PAXG 價格（以 USD 計價）
         # PAXG 的 CoinGecko ID 是 "pax-gold"
-        api_url = "https://api.coingecko.com/api/v3/simple/price?ids=pax-gold&vs_currencies=usd&include_24hr_change=true&include_24hr_vol=true"
+        api_url = f"{COINGECKO_BASE_URL}/api/v3/simple/price?ids=pax-gold&vs_currencies=usd&include_24hr_change=true&include_24hr_vol=true&include_last_updated_at=true"
         print(f"  API URL: {api_url}")
         
         headers = {
@@ -251,71 +199,17 @@ def get_gold_price_coingecko():
             'Accept': 'application/json'
         }
         
-        # CoinGecko 免費 API 有速率限制，但通常比幣安更寬鬆
-        timeout = 30
-        max_retries = 3
-        print(f"  請求超時設定: {timeout} 秒")
-        print(f"  最大重試次數: {max_retries}")
-        
-        response = None
-        for attempt in range(max_retries):
-            try:
-                if attempt > 0:
-                    print(f"  重試第 {attempt} 次...")
-                    import time
-                    time.sleep(2)
-                
-                response = requests.get(api_url, headers=headers, timeout=timeout, verify=True)
-                
-                if response.status_code == 200:
-                    break
-                elif response.status_code == 429:
-                    # 請求頻率過高，等待後重試
-                    if attempt < max_retries - 1:
-                        import time
-                        wait_time = (attempt + 1) * 3
-                        print(f"  請求頻率過高，等待 {wait_time} 秒後重試...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print(f"  CoinGecko API 請求頻率過高，狀態碼: {response.status_code}")
-                        return None
-                else:
-                    print(f"  CoinGecko API 請求失敗，狀態碼: {response.status_code}")
-                    if response.text:
-                        print(f"  錯誤訊息: {response.text[:200]}")
-                    if attempt < max_retries - 1:
-                        continue
-                    else:
-                        return None
-                        
-            except requests.exceptions.Timeout:
-                if attempt < max_retries - 1:
-                    print(f"  請求超時，重試中...")
-                    continue
-                else:
-                    print(f"  CoinGecko API 請求超時，已重試 {max_retries} 次")
-                    return None
-                    
-            except requests.exceptions.ConnectionError as conn_error:
-                if attempt < max_retries - 1:
-                    print(f"  連接錯誤: {conn_error}，重試中...")
-                    continue
-                else:
-                    print(f"  CoinGecko API 連接失敗: {conn_error}")
-                    return None
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"  發生錯誤: {e}，重試中...")
-                    continue
-                else:
-                    print(f"  CoinGecko API 請求發生錯誤: {e}")
-                    return None
+        # CoinGecko 免費 API 有速率限制，429 時依 Retry-After 或指數退避等待
+        policy = COINGECKO_RETRY_POLICY
+        print(f"  請求超時設定: {policy.timeout} 秒")
+        print(f"  最大嘗試次數: {policy.max_attempts}")
+        response, attempt = policy.get(api_url, deadline=deadline, headers=headers)
         
         # 檢查 response 是否存在
         if response is None or response.status_code != 200:
             print(f"  CoinGecko API 請求失敗")
+            if response is not None and response.text:
+                print(f"  狀態碼: {response.status_code}，錯誤訊息: {response.text[:200]}")
             return None
         
         # 解析回應
@@ -326,7 +220,7 @@ def get_gold_price_coingecko():
             print(f"  回應內容: {response.text[:200]}")
             return None
         
-        # CoinGecko API 返回格式: {"pax-gold":{"usd":2345.67,"usd_24h_change":0.5}}
+        # CoinGecko API 返回格式: {"pax-gold":{"usd":2345.67,"usd_24h_change":0.5,"last_updated_at":1700000000}}
         if 'pax-gold' in data and 'usd' in data['pax-gold']:
             try:
                 current_price = float(data['pax-gold']['usd'])
@@ -343,13 +237,14 @@ def get_gold_price_coingecko():
                     else:
                         open_price = current_price
                     
-                    # 使用當前價格作為最高價和最低價的近似值
-                    return {
-                        'current_price': current_price,
-                        'open_price': open_price,
-                        'day_high': current_price,
-                        'day_low': current_price
-                    }
+                    return PriceQuote(
+                        source='coingecko',
+                        price=current_price,
+                        open_price=open_price,
+                        upstream_ts=data['pax-gold'].get('last_updated_at'),
+                        latency=time.monotonic() - started,
+                        retry_count=attempt
+                    )
                 else:
                     print(f"  CoinGecko API 返回的價格無效: {current_price}")
                     return None
@@ -370,13 +265,19 @@ def get_gold_price_coingecko():
         return None
 
 
+PRICE_SOURCES = {
+    'coingecko': get_gold_price_coingecko,
+    'binance': get_gold_price_binance,
+}
+
+
 if __name__ == "__main__":
     # 測試函數
     price_data = get_gold_price()
     if price_data:
-        print(f"當前價格: ${price_data['current_price']:.2f}")
-        print(f"開盤價格: ${price_data['open_price']:.2f}")
-        change = ((price_data['current_price'] - price_data['open_price']) / price_data['open_price']) * 100
+        print(f"當前價格: ${price_data.price:.2f}")
+        print(f"開盤價格: ${price_data.open_price:.2f}")
+        change = ((price_data.price - price_data.open_price) / price_data.open_price) * 100
         print(f"漲跌幅: {change:+.2f}%")
     else:
         print("無法獲取黃金價格")
@@ -0,0 +1,637 @@
+"""
+技術指標（SMA、EMA、RSI、布林通道、MACD）
+每個指標都有兩種計算方式：
+  - 增量版本（類別）：即時路徑每筆價格 O(1) 更新，狀態可保存，不需重新處理歷史
+  - 批次版本（函數）：以 NumPy 向量化計算整段歷史，供回補與重播使用
+兩者在浮點誤差（相對 1e-9）內結果一致，見 test_indicators.py。
+沒有狀態檔時（第一次執行或狀態檔遺失），IndicatorSet.seed 以批次版本重播 price_history.json，
+設定增量狀態後即時路徑從歷史的最後一筆接續，不必等待數十筆新價格才有指標值。
+
+週期以「價格跳動筆數」計算（main.py 每 10 分鐘一筆）。
+指標狀態保存在 indicator_state.json，警報規則可引用指標值，例如 "rsi_14 > 70"。
+預設不啟用任何規則，規則只來自設定檔（monitor_config.json 的 rules.indicators）；
+觸發後經 AlertStateStore 套用與價格變化警報相同的冷卻時間，避免指標來回穿越時頻繁通知。
+"""
+
+import json
+import math
+import os
+from collections import deque
+
+from alert_state import DEFAULT_ALERT_POLICY, AlertPolicy, rule_key
+from price_history import get_price_series, load_price_history
+
+try:
+    import numpy as np
+except ImportError:  # 即時路徑不需要 NumPy，只有批次計算需要
+    np = None
+
+
+INDICATOR_STATE_FILE = "indicator_state.json"
+
+# 增量版本定期以 math.fsum 重新計算視窗總和，避免長時間執行累積誤差
+_RESUM_INTERVAL = 1000
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("批次計算需要 NumPy，請執行 pip install numpy")
+
+
+def _last(values):
+    """批次結果的最後一筆，資料不足（NaN）時為 None"""
+    if len(values) == 0 or math.isnan(values[-1]):
+        return None
+    return float(values[-1])
+
+
+# ---- 增量版本 ----
+
+class SMA:
+    """簡單移動平均"""
+
+    def __init__(self, period):
+        self.period = period
+        self._window = deque()
+        self._sum = 0.0
+        self._updates = 0
+        self.value = None
+
+    def update(self, price):
+        self._window.append(price)
+        self._sum += price
+        if len(self._window) > self.period:
+            self._sum -= self._window.popleft()
+        self._updates += 1
+        if self._updates % _RESUM_INTERVAL == 0:
+            self._sum = math.fsum(self._window)
+        if len(self._window) == self.period:
+            self.value = self._sum / self.period
+        return self.value
+
+    def seed(self, prices):
+        """以批次版本計算整段價格後設定狀態（等同依序 update 每筆價格）"""
+        self._window = deque(prices[-self.period:])
+        self._sum = math.fsum(self._window)
+        self._updates = len(prices)
+        self.value = _last(sma(prices, self.period))
+
+    def to_dict(self):
+        return {'window': list(self._window), 'value': self.value}
+
+    def load_dict(self, data):
+        self._window = deque(data.get('window', []))
+        self._sum = math.fsum(self._window)
+        self.value = data.get('value')
+
+
+class EMA:
+    """指數移動平均，以前 period 筆的簡單平均作為起始值"""
+
+    def __init__(self, period, alpha=None):
+        self.period = period
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self._seed = []
+        self.value = None
+
+    def update(self, price):
+        if self.value is None:
+            self._seed.append(price)
+            if len(self._seed) == self.period:
+                self.value = math.fsum(self._seed) / self.period
+                self._seed = []
+        else:
+            self.value = self.value + self.alpha * (price - self.value)
+        return self.value
+
+    def seed(self, prices):
+        """以批次版本計算整段價格後設定狀態（等同依序 update 每筆價格）"""
+        self.value = _last(ema(prices, self.period, self.alpha))
+        self._seed = [] if self.value is not None else [float(price) for price in prices]
+
+    def to_dict(self):
+        return {'seed': self._seed, 'value': self.value}
+
+    def load_dict(self, data):
+        self._seed = list(data.get('seed', []))
+        self.value = data.get('value')
+
+
+class RSI:
+    """相對強弱指標（Wilder 平滑，即 alpha = 1/period 的 EMA）"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self._gain = EMA(period, alpha=1.0 / period)
+        self._loss = EMA(period, alpha=1.0 / period)
+        self._last_price = None
+        self.value = None
+
+    def update(self, price):
+        if self._last_price is not None:
+            change = price - self._last_price
+            average_gain = self._gain.update(max(change, 0.0))
+            average_loss = self._loss.update(max(-change, 0.0))
+            if average_gain is not None:
+                self.value = _rsi_value(average_gain, average_loss)
+        self._last_price = price
+        return self.value
+
+    def seed(self, prices):
+        """以批次版本計算整段價格後設定狀態（等同依序 update 每筆價格）"""
+        changes = np.diff(np.asarray(prices, dtype=float))
+        self._gain.seed(np.maximum(changes, 0.0))
+        self._loss.seed(np.maximum(-changes, 0.0))
+        self._last_price = prices[-1] if prices else None
+        self.value = _last(rsi(prices, self.period))
+
+    def to_dict(self):
+        return {'gain': self._gain.to_dict(), 'loss': self._loss.to_dict(),
+                'last_price': self._last_price, 'value': self.value}
+
+    def load_dict(self, data):
+        self._gain.load_dict(data.get('gain', {}))
+        self._loss.load_dict(data.get('loss', {}))
+        self._last_price = data.get('last_price')
+        self.value = data.get('value')
+
+
+def _rsi_value(average_gain, average_loss):
+    if average_loss == 0:
+        return 100.0 if average_gain > 0 else 50.0
+    return 100.0 - 100.0 / (1.0 + average_gain / average_loss)
+
+
+class Bollinger:
+    """
+    布林通道（中軌為 SMA，上下軌為中軌 ± width 倍母體標準差）
+    以視窗第一筆價格為平移基準累計一次與二次和，避免大數相減的誤差
+    """
+
+    def __init__(self, period=20, width=2.0):
+        self.period = period
+        self.width = width
+        self._window = deque()
+        self._shift = None
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._updates = 0
+        self.value = None  # (上軌, 中軌, 下軌)
+
+    def _resum(self):
+        self._shift = self._window[0]
+        self._sum = math.fsum(x - self._shift for x in self._window)
+        self._sum_sq = math.fsum((x - self._shift) ** 2 for x in self._window)
+
+    def update(self, price):
+        if self._shift is None:
+            self._shift = price
+        self._window.append(price)
+        deviation = price - self._shift
+        self._sum += deviation
+        self._sum_sq += deviation * deviation
+        if len(self._window) > self.period:
+            old = self._window.popleft() - self._shift
+            self._sum -= old
+            self._sum_sq -= old * old
+        self._updates += 1
+        if self._updates % _RESUM_INTERVAL == 0:
+            self._resum()
+        if len(self._window) == self.period:
+            mean = self._sum / self.period
+            variance = max(self._sum_sq / self.period - mean * mean, 0.0)
+            middle = self._shift + mean
+            band = self.width * math.sqrt(variance)
+            self.value = (middle + band, middle, middle - band)
+        return self.value
+
+    def seed(self, prices):
+        """以批次版本計算整段價格後設定狀態（等同依序 update 每筆價格）"""
+        self._window = deque(prices[-self.period:])
+        self._shift = None
+        if self._window:
+            self._resum()
+        self._updates = len(prices)
+        upper, middle, lower = bollinger(prices, self.period, self.width)
+        self.value = None if _last(middle) is None else (_last(upper), _last(middle), _last(lower))
+
+    def to_dict(self):
+        return {'window': list(self._window), 'value': list(self.value) if self.value else None}
+
+    def load_dict(self, data):
+        self._window = deque(data.get('window', []))
+        self._shift = None
+        if self._window:
+            self._resum()
+        value = data.get('value')
+        self.value = tuple(value) if value else None
+
+
+class MACD:
+    """MACD（快線 EMA - 慢線 EMA，訊號線為 MACD 的 EMA）"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self._fast = EMA(fast)
+        self._slow = EMA(slow)
+        self._signal = EMA(signal)
+        self.value = None  # (MACD, 訊號線, 柱狀體)
+
+    def update(self, price):
+        fast = self._fast.update(price)
+        slow = self._slow.update(price)
+        if slow is not None:
+            macd = fast - slow
+            signal = self._signal.update(macd)
+            if signal is not None:
+                self.value = (macd, signal, macd - signal)
+        return self.value
+
+    def seed(self, prices):
+        """以批次版本計算整段價格後設定狀態（等同依序 update 每筆價格）"""
+        self._fast.seed(prices)
+        self._slow.seed(prices)
+        # 訊號線從慢線有值的那一筆開始累積
+        line = ema(prices, self._fast.period) - ema(prices, self._slow.period)
+        self._signal.seed(line[self._slow.period - 1:])
+        line, signal, histogram = macd(prices, self._fast.period, self._slow.period, self._signal.period)
+        self.value = None if _last(signal) is None else (_last(line), _last(signal), _last(histogram))
+
+    def to_dict(self):
+        return {'fast': self._fast.to_dict(), 'slow': self._slow.to_dict(),
+                'signal': self._signal.to_dict(), 'value': list(self.value) if self.value else None}
+
+    def load_dict(self, data):
+        self._fast.load_dict(data.get('fast', {}))
+        self._slow.load_dict(data.get('slow', {}))
+        self._signal.load_dict(data.get('signal', {}))
+        value = data.get('value')
+        self.value = tuple(value) if value else None
+
+
+# ---- 批次版本（NumPy）----
+
+def _ema_recursive(values, alpha, seed, start):
+    """
+    從 start 開始以 seed 為起始值計算 EMA，分段使用封閉解向量化：
+    y[t] = d^t * y[0] + alpha * Σ d^(t-k) * x[k]，每段長度限制在 d^(-段長) <= 1e3 以維持精度
+    """
+    result = np.full(len(values), np.nan)
+    if start >= len(values):
+        return result
+    result[start] = seed
+    decay = 1.0 - alpha
+    if decay <= 0:
+        result[start:] = values[start:]
+        result[start] = seed
+        return result
+    block = max(1, int(3 * math.log(10) / -math.log(decay)))
+    previous = seed
+    position = start + 1
+    while position < len(values):
+        chunk = values[position:position + block]
+        steps = np.arange(1, len(chunk) + 1)
+        powers = decay ** steps
+        scaled = np.cumsum(chunk / powers)
+        block_values = powers * (previous + alpha * scaled)
+        result[position:position + len(chunk)] = block_values
+        previous = block_values[-1]
+        position += len(chunk)
+    return result
+
+
+def sma(values, period):
+    """
+    Returns:
+        ndarray: 簡單移動平均，前 period-1 筆為 NaN
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if len(values) >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(values, period)
+        result[period - 1:] = windows.sum(axis=1) / period
+    return result
+
+
+def ema(values, period, alpha=None):
+    """
+    Returns:
+        ndarray: 指數移動平均（以前 period 筆的簡單平均為起始值），前 period-1 筆為 NaN
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=float)
+    if len(values) < period:
+        return np.full(len(values), np.nan)
+    alpha = alpha if alpha is not None else 2.0 / (period + 1)
+    seed = math.fsum(values[:period]) / period
+    return _ema_recursive(values, alpha, seed, period - 1)
+
+
+def rsi(values, period=14):
+    """
+    Returns:
+        ndarray: RSI（0-100），前 period 筆為 NaN
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if len(values) <= period:
+        return result
+    changes = np.diff(values)
+    average_gain = ema(np.maximum(changes, 0.0), period, alpha=1.0 / period)
+    average_loss = ema(np.maximum(-changes, 0.0), period, alpha=1.0 / period)
+    valid = ~np.isnan(average_gain)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = average_gain / average_loss
+        value = 100.0 - 100.0 / (1.0 + ratio)
+    value = np.where(average_loss == 0, np.where(average_gain > 0, 100.0, 50.0), value)
+    result[1:][valid] = value[valid]
+    return result
+
+
+def bollinger(values, period=20, width=2.0):
+    """
+    Returns:
+        tuple: (上軌, 中軌, 下軌) ndarray，前 period-1 筆為 NaN
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=float)
+    middle = sma(values, period)
+    band = np.full(len(values), np.nan)
+    if len(values) >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(values, period)
+        band[period - 1:] = width * windows.std(axis=1)
+    return middle + band, middle, middle - band
+
+
+def macd(values, fast=12, slow=26, signal=9):
+    """
+    Returns:
+        tuple: (MACD, 訊號線, 柱狀體) ndarray，資料不足處為 NaN
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=float)
+    line = ema(values, fast) - ema(values, slow)
+    signal_line = np.full(len(values), np.nan)
+    start = slow - 1
+    if len(values) > start:
+        signal_line[start:] = ema(line[start:], signal)
+    valid = ~np.isnan(signal_line)
+    line = np.where(valid, line, np.nan)
+    return line, signal_line, line - signal_line
+
+
+# ---- 指標組合與警報規則 ----
+
+# 預設不啟用任何規則：RSI、布林通道、MACD 在線附近來回時會反覆觸發，需在設定檔中明確啟用
+DEFAULT_INDICATOR_RULES = ()
+
+# AlertStateStore 中指標規則的鍵前綴，例如 "XAU:indicator:rsi_14 > 70"
+INDICATOR_RULE_PREFIX = 'indicator:'
+
+_COMPARATORS = {
+    '>': lambda left, right: left > right,
+    '<': lambda left, right: left < right,
+    '>=': lambda left, right: left >= right,
+    '<=': lambda left, right: left <= right,
+}
+
+_CROSSES = ('crosses_above', 'crosses_below')
+
+_RULE_LABELS = {
+    'rsi_14 > 70': 'RSI 超買',
+    'rsi_14 < 30': 'RSI 超賣',
+    'price > bb_upper': '突破布林上軌',
+    'price < bb_lower': '跌破布林下軌',
+    'macd_hist crosses_above 0': 'MACD 黃金交叉',
+    'macd_hist crosses_below 0': 'MACD 死亡交叉',
+}
+
+
+def parse_rule(text):
+    """
+    解析警報規則，例如 "rsi_14 > 70"、"price < bb_lower"、"macd_hist crosses_above 0"
+
+    Returns:
+        tuple: (左側名稱, 運算子, 右側名稱或數值)
+
+    Raises:
+        ValueError: 規則格式錯誤
+    """
+    parts = text.split()
+    if len(parts) != 3 or (parts[1] not in _COMPARATORS and parts[1] not in _CROSSES):
+        raise ValueError(f"無效的指標規則: {text}")
+    left, operator, right = parts
+    try:
+        right = float(right)
+    except ValueError:
+        pass
+    return left, operator, right
+
+
+class IndicatorSet:
+    """
+    即時路徑使用的指標組合，保存狀態並以邊緣觸發評估警報規則（條件由否轉是時才觸發）
+    """
+
+    def __init__(self, rules=DEFAULT_INDICATOR_RULES, path=INDICATOR_STATE_FILE):
+        self.path = path
+        self.rules = [(text, parse_rule(text)) for text in rules]
+        self.indicators = {
+            'sma_20': SMA(20),
+            'ema_12': EMA(12),
+            'rsi_14': RSI(14),
+            'bollinger': Bollinger(20, 2.0),
+            'macd': MACD(12, 26, 9),
+        }
+        self.values = {}
+        self._previous = {}
+        self._active = {}  # {規則: 上次是否成立}
+
+    def set_rules(self, rules):
+        """
+        更換警報規則（設定檔重新載入時），指標狀態不受影響，仍存在的規則保留觸發狀態
+
+        Raises:
+            ValueError: 規則格式錯誤
+        """
+        self.rules = [(text, parse_rule(text)) for text in rules]
+        self._active = {text: active for text, active in self._active.items() if text in dict(self.rules)}
+
+    def update(self, price):
+        """
+        以新價格更新所有指標
+
+        Returns:
+            dict: 指標值（資料不足的指標不列出），包含 'price'
+        """
+        for indicator in self.indicators.values():
+            indicator.update(price)
+        self._previous = self.values
+        self.values = self._collect(price)
+        return self.values
+
+    def _collect(self, price):
+        values = {'price': price}
+        for name in ('sma_20', 'ema_12', 'rsi_14'):
+            value = self.indicators[name].value
+            if value is not None:
+                values[name] = value
+        bands = self.indicators['bollinger'].value
+        if bands is not None:
+            values['bb_upper'], values['bb_middle'], values['bb_lower'] = bands
+        macd_value = self.indicators['macd'].value
+        if macd_value is not None:
+            values['macd'], values['macd_signal'], values['macd_hist'] = macd_value
+        return values
+
+    def seed(self, prices):
+        """
+        以批次版本（NumPy）重播整段價格並設定增量狀態，結果與依序 update 每筆價格相同（浮點誤差內）；
+        規則的觸發狀態依最後一筆價格設定，歷史中已成立的條件不會在下一筆價格時再次觸發
+
+        Args:
+            prices (list): 依時間排序的價格
+        """
+        _require_numpy()
+        prices = [float(price) for price in prices]
+        if not prices:
+            return
+        # 先重播到倒數第二筆，最後一筆以 update 套用，讓交叉規則有前一筆的指標值
+        for indicator in self.indicators.values():
+            indicator.seed(prices[:-1])
+        self.values = self._collect(prices[-2]) if len(prices) > 1 else {}
+        self.update(prices[-1])
+        self.evaluate()
+
+    def _operand(self, values, operand):
+        return operand if isinstance(operand, float) else values.get(operand)
+
+    def evaluate(self):
+        """
+        評估警報規則
+
+        Returns:
+            list: 本次新觸發的規則 [{'rule', 'label', 'value'}, ...]
+        """
+        triggered = []
+        for text, (left, operator, right) in self.rules:
+            current_left = self._operand(self.values, left)
+            current_right = self._operand(self.values, right)
+            if current_left is None or current_right is None:
+                self._active[text] = False
+                continue
+            if operator in _CROSSES:
+                previous_left = self._operand(self._previous, left)
+                previous_right = self._operand(self._previous, right)
+                if previous_left is None or previous_right is None:
+                    active = False
+                elif operator == 'crosses_above':
+                    active = previous_left <= previous_right and current_left > current_right
+                else:
+                    active = previous_left >= previous_right and current_left < current_right
+                if active:
+                    triggered.append({'rule': text, 'label': _RULE_LABELS.get(text, text), 'value': current_left})
+                continue
+            active = _COMPARATORS[operator](current_left, current_right)
+            if active and not self._active.get(text, False):
+                triggered.append({'rule': text, 'label': _RULE_LABELS.get(text, text), 'value': current_left})
+            self._active[text] = active
+        return triggered
+
+    @classmethod
+    def load(cls, path=INDICATOR_STATE_FILE, rules=DEFAULT_INDICATOR_RULES, history_path=None):
+        """
+        Args:
+            path (str): 狀態檔路徑
+            rules (iterable): 警報規則
+            history_path (str, optional): 歷史價格檔案，狀態檔不存在時以其中的價格序列重播
+
+        Returns:
+            IndicatorSet: 從狀態檔還原的指標組合（檔案不存在時為新的組合，或從歷史價格重播的組合）
+        """
+        indicator_set = cls(rules, path)
+        if not os.path.exists(path):
+            series = get_price_series(load_price_history(history_path)) if history_path else []
+            if series:
+                try:
+                    indicator_set.seed([price for _, price in series])
+                    print(f"ℹ️  沒有指標狀態，已從 {len(series)} 筆歷史價格重播")
+                except ImportError as e:
+                    print(f"⚠️  無法從歷史價格重播指標: {e}")
+            return indicator_set
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for name, indicator in indicator_set.indicators.items():
+                if name in data.get('indicators', {}):
+                    indicator.load_dict(data['indicators'][name])
+            indicator_set.values = data.get('values', {})
+            indicator_set._active = data.get('active', {})
+        except Exception as e:
+            print(f"⚠️  讀取指標狀態時發生錯誤: {e}")
+        return indicator_set
+
+    def save(self):
+        """
+        寫入狀態檔
+        """
+        data = {
+            'version': 1,
+            'indicators': {name: indicator.to_dict() for name, indicator in self.indicators.items()},
+            'values': self.values,
+            'active': self._active,
+        }
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️  保存指標狀態時發生錯誤: {e}")
+
+
+def gate_indicator_triggers(triggers, rules, alert_state, asset, now, policy=DEFAULT_ALERT_POLICY):
+    """
+    以警報狀態的冷卻時間過濾指標警報：同一條規則觸發後 cooldown 秒內再次成立不重複通知
+
+    每次評估都以 1（本次觸發）/ 0（未觸發）更新每條規則的狀態，未觸發時即重新啟用，
+    因此是否通知只取決於冷卻時間（指標規則沒有升級等級）。
+
+    Args:
+        triggers (list): IndicatorSet.evaluate 返回的警報
+        rules (list): IndicatorSet.rules
+        alert_state (AlertStateStore): 警報狀態
+        asset (str): 資產代號
+        now (float): Unix 秒
+        policy (AlertPolicy): 使用其中的冷卻時間
+
+    Returns:
+        list: 需要通知的警報
+    """
+    gate = AlertPolicy(cooldown_seconds=policy.cooldown_seconds, rearm_band=0.5, escalation_step=0)
+    hits = {trigger['rule'] for trigger in triggers}
+    passed = set()
+    for text, _ in rules:
+        decision = alert_state.evaluate(rule_key(asset, INDICATOR_RULE_PREFIX + text),
+                                        1.0 if text in hits else 0.0, 1.0, now, gate)
+        if decision:
+            passed.add(text)
+    return [trigger for trigger in triggers if trigger['rule'] in passed]
+
+
+def format_indicator_triggers(triggers, values):
+    """
+    Returns:
+        str: 訊息中的【技術指標】段落
+    """
+    lines = ["【技術指標】"]
+    for trigger in triggers:
+        lines.append(f"{trigger['label']}（{trigger['rule']}）")
+    if 'rsi_14' in values:
+        lines.append(f"RSI(14): {values['rsi_14']:.1f}")
+    if 'bb_upper' in values:
+        lines.append(f"布林通道: ${values['bb_lower']:.2f} - ${values['bb_upper']:.2f}")
+    if 'macd' in values:
+        lines.append(f"MACD: {values['macd']:.2f}（訊號 {values['macd_signal']:.2f}）")
+    return "\n".join(lines)
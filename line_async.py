@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+非同步 LINE Messaging API 用戶端
+send_line_push 每次呼叫都重新驗證 Token、建立新的 LineBotApi，並以同步 SDK 發送（每次一個新連線）。
+AsyncLineClient 在建立時驗證一次 Token，所有請求共用同一個 aiohttp 連線池（HTTP/1.1 keep-alive），
+可同時有多個發送中的請求，適合在 asyncio 程式（例如 daemon.py）中大量發送。
+
+支援的端點：push、multicast、narrowcast、broadcast、訊息額度與使用者個人資料。
+錯誤以 LineBotApiError 拋出（與 SDK 相同），因此 409（retry key 已被接受）等狀態碼的處理方式不變。
+
+用法：
+  python line_async.py --count 200 --latency 0.02   # 在本機替身伺服器上與 SDK 發送方式比較
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+from linebot.exceptions import LineBotApiError
+from linebot.models.error import Error
+
+import line_notify
+
+
+# 連線池大小（同時發送中的請求上限）
+DEFAULT_POOL_SIZE = 32
+# 閒置的 keep-alive 連線保留秒數
+KEEPALIVE_SECONDS = 30
+
+
+class AsyncLineClient:
+    """
+    共用連線池的非同步 LINE Messaging API 用戶端
+    """
+
+    def __init__(self, token=None, base_url=None, pool_size=DEFAULT_POOL_SIZE, timeout=line_notify.LINE_TIMEOUT):
+        """
+        Args:
+            token (str, optional): Channel Access Token，未指定時使用 CHANNEL_ACCESS_TOKEN
+            base_url (str, optional): Messaging API 基礎網址，未指定時使用 LINE_API_BASE_URL
+            pool_size (int): 連線池大小（同時發送中的請求上限）
+            timeout (float): 單一請求的預設逾時秒數
+
+        Raises:
+            ValueError: Token 設定有誤
+        """
+        token_cleaned = line_notify.clean_token(token if token is not None else line_notify.CHANNEL_ACCESS_TOKEN)
+        if token_cleaned is None:
+            raise ValueError("CHANNEL_ACCESS_TOKEN 設定有誤")
+        self.base_url = (base_url or line_notify.LINE_API_BASE_URL).rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._headers = {
+            'Authorization': f'Bearer {token_cleaned}',
+            'Content-Type': 'application/json',
+        }
+        self._session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """建立連線池（必須在事件迴圈中呼叫）"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=KEEPALIVE_SECONDS)
+            self._session = aiohttp.ClientSession(headers=self._headers, connector=connector)
+
+    async def close(self):
+        """關閉連線池"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method, path, payload=None, retry_key=None, timeout=None):
+        """
+        發送一個 API 請求
+
+        Returns:
+            tuple: (回應內容 dict, X-Line-Request-Id)
+
+        Raises:
+            LineBotApiError: LINE 回應錯誤狀態碼
+            asyncio.TimeoutError / aiohttp.ClientError: 逾時或網路錯誤
+        """
+        await self.open()
+        headers = {'X-Line-Retry-Key': retry_key} if retry_key else None
+        data = json.dumps(payload) if payload is not None else None
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        async with self._session.request(method, self.base_url + path, data=data, headers=headers,
+                                         timeout=client_timeout) as response:
+            body = await response.read()
+            try:
+                content = json.loads(body.decode('utf-8')) if body else {}
+            except ValueError:
+                content = {}
+            request_id = response.headers.get('x-line-request-id')
+            if response.status >= 400:
+                raise LineBotApiError(
+                    response.status, dict(response.headers), request_id=request_id,
+                    accepted_request_id=response.headers.get('x-line-accepted-request-id'),
+                    error=Error(message=content.get('message', ''), details=content.get('details')))
+            return content, request_id
+
+    @staticmethod
+    def _text(message):
+        return [{'type': 'text', 'text': message}]
+
+    async def push(self, to, message, retry_key=None, timeout=None):
+        """
+        發送文字訊息給一位使用者
+
+        Args:
+            to (str): 收件者 User ID
+            message (str): 訊息內容
+            retry_key (str, optional): X-Line-Retry-Key
+            timeout (float, optional): 逾時秒數
+
+        Returns:
+            str: X-Line-Request-Id
+        """
+        _, request_id = await self._request('POST', '/v2/bot/message/push',
+                                            {'to': to, 'messages': self._text(message)}, retry_key, timeout)
+        return request_id
+
+    async def multicast(self, to, message, retry_key=None, timeout=None):
+        """
+        發送文字訊息給多位使用者（最多 500 位）
+
+        Returns:
+            str: X-Line-Request-Id
+        """
+        _, request_id = await self._request('POST', '/v2/bot/message/multicast',
+                                            {'to': list(to), 'messages': self._text(message)}, retry_key, timeout)
+        return request_id
+
+    async def narrowcast(self, audience_group_id, message, retry_key=None, timeout=None):
+        """
+        發送文字訊息給受眾（audience group），不篩選人口屬性，且不超過剩餘額度
+
+        Returns:
+            str: X-Line-Request-Id
+        """
+        payload = {
+            'messages': self._text(message),
+            'recipient': {'type': 'audience', 'audienceGroupId': audience_group_id},
+            'limit': {'upToRemainingQuota': True},
+        }
+        _, request_id = await self._request('POST', '/v2/bot/message/narrowcast', payload, retry_key, timeout)
+        return request_id
+
+    async def broadcast(self, message, retry_key=None, timeout=None):
+        """
+        發送文字訊息給所有好友
+
+        Returns:
+            str: X-Line-Request-Id
+        """
+        _, request_id = await self._request('POST', '/v2/bot/message/broadcast',
+                                            {'messages': self._text(message)}, retry_key, timeout)
+        return request_id
+
+    async def get_quota(self):
+        """
+        Returns:
+            int: 每月訊息額度，沒有上限時返回 None
+        """
+        content, _ = await self._request('GET', '/v2/bot/message/quota')
+        return content.get('value') if content.get('type') == 'limited' else None
+
+    async def get_quota_consumption(self):
+        """
+        Returns:
+            int: 本月已使用的訊息數
+        """
+        content, _ = await self._request('GET', '/v2/bot/message/quota/consumption')
+        return content.get('totalUsage', 0)
+
+    async def get_profile(self, user_id):
+        """
+        Returns:
+            dict: 使用者個人資料（userId、displayName 等）
+        """
+        content, _ = await self._request('GET', f'/v2/bot/profile/{user_id}')
+        return content
+
+    async def push_many(self, pushes):
+        """
+        同時發送多則 push（同時發送中的請求數受連線池大小限制）
+
+        Args:
+            pushes (iterable): [(User ID, 訊息內容), ...]
+
+        Returns:
+            list: 每則訊息的 X-Line-Request-Id，失敗的為例外物件
+        """
+        return await asyncio.gather(*(self.push(to, message) for to, message in pushes),
+                                    return_exceptions=True)
+
+
+def benchmark(count=200, latency=0.02, pool_size=DEFAULT_POOL_SIZE):
+    """
+    在本機替身伺服器上比較 SDK（send_line_push）與 AsyncLineClient 的發送速度
+    兩種方式各以並行數 1 與 pool_size 量測，同一並行數的比較只反映連線重用與 Token 只驗證一次的差異
+
+    Args:
+        count (int): 每種方式發送的訊息數
+        latency (float): 替身伺服器回應延遲秒數
+        pool_size (int): 並行數（SDK 的執行緒數、AsyncLineClient 的連線池大小）
+
+    Returns:
+        dict: {'sdk', 'sdk_pooled', 'async_serial', 'async'}，各含 seconds、per_second、connections、failed、concurrency
+    """
+    from stand_in_servers import StandInSuite
+
+    user_ids = [f"U{index:032x}" for index in range(count)]
+    saved_token = line_notify.CHANNEL_ACCESS_TOKEN
+    line_notify.CHANNEL_ACCESS_TOKEN = "L" * 120 + "="
+    results = {}
+    try:
+        with StandInSuite(services=('line',), latency=latency) as suite:
+            server = suite['line']
+
+            def measure(name, concurrency, send_all):
+                connections_before = server.connection_count
+                started = time.perf_counter()
+                failed = send_all()
+                elapsed = time.perf_counter() - started
+                results[name] = {'seconds': elapsed, 'per_second': count / elapsed,
+                                 'connections': server.connection_count - connections_before,
+                                 'failed': failed, 'concurrency': concurrency}
+
+            def send_sdk(workers):
+                def send_all():
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        delivered = executor.map(
+                            lambda user_id: line_notify.send_line_push("效能測試", user_id=user_id), user_ids)
+                        return sum(1 for success in delivered if not success)
+                return send_all
+
+            def send_async(size):
+                async def run():
+                    async with AsyncLineClient(pool_size=size) as client:
+                        return await client.push_many((user_id, "效能測試") for user_id in user_ids)
+
+                def send_all():
+                    return sum(1 for outcome in asyncio.run(run()) if isinstance(outcome, Exception))
+                return send_all
+
+            # send_line_push 每則訊息都會輸出記錄，測試期間關閉以免影響計時
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                measure('sdk', 1, send_sdk(1))
+                measure('sdk_pooled', pool_size, send_sdk(pool_size))
+            measure('async_serial', 1, send_async(1))
+            measure('async', pool_size, send_async(pool_size))
+    finally:
+        line_notify.CHANNEL_ACCESS_TOKEN = saved_token
+    return results
+
+
+def print_benchmark(results, count):
+    """輸出效能比較結果"""
+    print("=" * 60)
+    print(f"LINE 發送效能比較（{count} 則）")
+    print("=" * 60)
+    for name, label in (('sdk', "SDK send_line_push"), ('sdk_pooled', "SDK send_line_push"),
+                        ('async_serial', "AsyncLineClient"), ('async', "AsyncLineClient")):
+        stats = results[name]
+        print(f"{label:<20} 並行 {stats['concurrency']:>3}：{stats['seconds']:.2f} 秒，{stats['per_second']:.1f} 則/秒，"
+              f"連線 {stats['connections']} 個，失敗 {stats['failed']} 則")
+    # 同一並行數下比較，加速只來自連線重用與 Token 只驗證一次
+    print(f"加速（並行 1）: {results['sdk']['seconds'] / results['async_serial']['seconds']:.1f} 倍")
+    print(f"加速（並行 {results['async']['concurrency']}）: "
+          f"{results['sdk_pooled']['seconds'] / results['async']['seconds']:.1f} 倍")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="非同步 LINE 用戶端效能比較")
+    parser.add_argument('--count', type=int, default=200, help="每種方式發送的訊息數")
+    parser.add_argument('--latency', type=float, default=0.02, help="替身伺服器回應延遲秒數")
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE, help="連線池大小")
+    args = parser.parse_args()
+
+    print_benchmark(benchmark(count=args.count, latency=args.latency, pool_size=args.pool_size), args.count)
@@ -0,0 +1,254 @@
+"""
+LINE 推播的冪等重試
+send_line_push 只嘗試一次，逾時時無法得知訊息是否已送達。
+本模組為每則邏輯通知產生固定的 X-Line-Retry-Key：
+  - 網路錯誤、逾時與 5xx／429 回應在執行時間預算內以退避重試，每次重試都帶同一個 key
+  - LINE 已接受過相同 key 的請求時回傳 409，視為已送達，不會重複推播
+  - 每則通知的 key 與發送結果保存在 line_delivery.json，下次執行重送同一則通知時沿用同一個 key，
+    已送達的通知直接略過
+LINE 只在 24 小時內辨識相同的 retry key，超過的紀錄會被清除。
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+import requests
+from linebot.exceptions import LineBotApiError
+from linebot.models import TextSendMessage
+from linebot.models.filter import DemographicFilter
+from linebot.models.limit import Limit
+from linebot.models.recipient import AudienceRecipient
+
+import line_notify
+from delivery_planner import MULTICAST, NARROWCAST, PUSH
+from retry_policy import MIN_ATTEMPT_SECONDS, RETRYABLE_STATUSES, RetryPolicy, get_run_deadline, parse_retry_after
+
+
+LINE_DELIVERY_FILE = "line_delivery.json"
+RETRY_KEY_TTL_SECONDS = 24 * 60 * 60
+
+PENDING = 'pending'
+DELIVERED = 'delivered'
+FAILED = 'failed'
+
+# LINE 推播的重試策略（單次逾時沿用 LINE_TIMEOUT，會再受時間預算限制）
+LINE_RETRY_POLICY = RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=15.0, timeout=line_notify.LINE_TIMEOUT)
+
+
+class LineDelivery:
+    """
+    帶有固定 retry key 的 LINE 推播與發送結果紀錄
+    """
+
+    def __init__(self, path=LINE_DELIVERY_FILE, policy=LINE_RETRY_POLICY):
+        """
+        Args:
+            path (str): 發送紀錄檔路徑
+            policy (RetryPolicy): 重試策略
+        """
+        self.path = path
+        self.policy = policy
+        self.entries = {}  # {通知 ID: {'retry_key', 'recipient', 'status', 'attempts', 'request_id', ...}}
+        self._lock = threading.Lock()  # 常駐程式會在多個執行緒同時發送
+
+    def entry(self, notification_id):
+        return self.entries.get(notification_id)
+
+    def _begin(self, notification_id, recipient, now):
+        with self._lock:
+            entry = self.entries.get(notification_id)
+            if entry is None or now - entry['created_at'] >= RETRY_KEY_TTL_SECONDS:
+                entry = {'retry_key': str(uuid.uuid4()), 'recipient': recipient, 'status': PENDING,
+                         'attempts': 0, 'request_id': None, 'error': None,
+                         'created_at': now, 'updated_at': now}
+                self.entries[notification_id] = entry
+            return entry
+
+    def _finish(self, entry, status, request_id=None, error=None):
+        with self._lock:
+            entry['status'] = status
+            entry['request_id'] = request_id
+            entry['error'] = error
+            entry['updated_at'] = time.time()
+        self.save()
+
+    def send(self, message, user_id=None, notification_id=None, deadline=None):
+        """
+        以 push 發送一則邏輯通知，可安全地重試
+
+        Args:
+            message (str): 訊息內容
+            user_id (str, optional): 收件者，未指定時使用 USER_ID
+            notification_id (str, optional): 邏輯通知 ID（例如 "report:2026-01-01 09"），
+                跨執行重送同一則通知時使用相同 ID；未指定時產生新的 ID
+            deadline (Deadline, optional): 時間預算，預設為本次執行的預算
+
+        Returns:
+            bool: 已送達（包括先前已送達）返回 True
+        """
+        prepared = line_notify.prepare_push(user_id)
+        if prepared is None:
+            return False
+        line_bot_api, user_id_str = prepared
+
+        def request(retry_key, timeout):
+            line_bot_api.push_message(user_id_str, TextSendMessage(text=message),
+                                      retry_key=retry_key, timeout=timeout)
+        return self._deliver(notification_id, user_id_str, request, deadline)
+
+    def send_plan(self, message, steps, notification_id=None, deadline=None):
+        """
+        依 delivery_planner 規劃的步驟發送（push / multicast / narrowcast / broadcast），
+        每個步驟有各自的 retry key
+
+        Args:
+            message (str): 訊息內容
+            steps (list): plan_delivery 返回的發送步驟
+            notification_id (str, optional): 邏輯通知 ID，各步驟使用 "ID#序號"
+            deadline (Deadline, optional): 時間預算
+
+        Returns:
+            list: 每個步驟的 (步驟, 是否送達)
+        """
+        notification_id = notification_id or f"notify:{uuid.uuid4()}"
+        if len(steps) == 1 and steps[0]['kind'] == PUSH:
+            return [(steps[0], self.send(message, steps[0]['to'], notification_id, deadline))]
+        line_bot_api = line_notify.prepare_api()
+        if line_bot_api is None:
+            return [(step, False) for step in steps]
+        messages = TextSendMessage(text=message)
+        results = []
+        for index, step in enumerate(steps):
+            kind = step['kind']
+            if kind == PUSH:
+                def request(retry_key, timeout, to=step['to']):
+                    line_bot_api.push_message(to, messages, retry_key=retry_key, timeout=timeout)
+            elif kind == MULTICAST:
+                def request(retry_key, timeout, to=step['to']):
+                    line_bot_api.multicast(to, messages, retry_key=retry_key, timeout=timeout)
+            elif kind == NARROWCAST:
+                def request(retry_key, timeout, group_id=step['audience_group_id']):
+                    # SDK 要求 filter 與 limit；不篩選人口屬性，且不超過剩餘額度
+                    line_bot_api.narrowcast(messages, retry_key=retry_key,
+                                            recipient=AudienceRecipient(group_id), filter=DemographicFilter(),
+                                            limit=Limit(up_to_remaining_quota=True), timeout=timeout)
+            else:
+                def request(retry_key, timeout):
+                    line_bot_api.broadcast(messages, retry_key=retry_key, timeout=timeout)
+            recipient = step['to'] if kind == PUSH else f"{kind}:{step['recipients']}"
+            print(f"  發送步驟 {index + 1}/{len(steps)}: {kind}（{step['recipients']} 人）")
+            results.append((step, self._deliver(f"{notification_id}#{index}", recipient, request, deadline)))
+        return results
+
+    def _deliver(self, notification_id, recipient, request, deadline=None):
+        """
+        以固定的 retry key 重試一個 LINE 發送請求
+
+        Args:
+            notification_id (str, optional): 邏輯通知 ID
+            recipient (str): 收件者說明（記錄用）
+            request (callable): request(retry_key, timeout) 發送請求，失敗時拋出例外
+            deadline (Deadline, optional): 時間預算
+
+        Returns:
+            bool: 已送達返回 True
+        """
+        deadline = deadline or get_run_deadline()
+        notification_id = notification_id or f"push:{uuid.uuid4()}"
+        entry = self._begin(notification_id, recipient, time.time())
+        if entry['status'] == DELIVERED:
+            print(f"ℹ️  通知 {notification_id} 先前已送達，略過")
+            return True
+
+        for attempt in range(self.policy.max_attempts):
+            # 第一次一律嘗試（逾時至少 LINE_MIN_TIMEOUT 秒），之後的重試受時間預算限制
+            if attempt > 0 and deadline.remaining() < MIN_ATTEMPT_SECONDS:
+                print(f"  ⚠️  已達執行時間預算，停止發送（剩餘 {deadline.remaining():.1f} 秒）")
+                break
+            if attempt > 0:
+                print(f"  重試發送第 {attempt} 次（retry key: {entry['retry_key']}）...")
+            entry['attempts'] += 1
+            retry_after = None
+            try:
+                timeout = max(line_notify.LINE_MIN_TIMEOUT, deadline.clamp(self.policy.timeout))
+                request(entry['retry_key'], timeout)
+                print(f"✓ 訊息已成功發送")
+                self._finish(entry, DELIVERED)
+                return True
+            except LineBotApiError as e:
+                if e.status_code == 409:
+                    # 相同 retry key 的請求先前已被接受（例如上次逾時但實際已送達）
+                    print(f"✓ LINE 已接受過此通知（request id: {e.accepted_request_id}），不重複推播")
+                    self._finish(entry, DELIVERED, request_id=e.accepted_request_id)
+                    return True
+                if e.status_code not in RETRYABLE_STATUSES:
+                    line_notify.report_push_error(e)
+                    self._finish(entry, FAILED, error=f"{e.status_code}: {e.error.message if e.error else e}")
+                    return False
+                print(f"  LINE 回應狀態碼 {e.status_code}")
+                if self.policy.honor_retry_after:
+                    retry_after = parse_retry_after((e.headers or {}).get('Retry-After'))
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                print(f"  發送時發生網路錯誤: {type(e).__name__}")
+            except Exception as e:
+                line_notify.report_push_error(e)
+                self._finish(entry, FAILED, error=str(e))
+                return False
+
+            if attempt >= self.policy.max_attempts - 1:
+                break
+            delay = retry_after if retry_after is not None else self.policy.backoff(attempt)
+            if delay > deadline.remaining() - MIN_ATTEMPT_SECONDS:
+                print(f"  ⚠️  需等待 {delay:.1f} 秒，超過剩餘執行時間預算，停止重試")
+                break
+            time.sleep(delay)
+
+        # 仍可能已送達：保留 retry key，下次重送同一則通知時由 LINE 判斷是否重複
+        print(f"✗ LINE 通知發送失敗（已嘗試 {entry['attempts']} 次），保留 retry key 供下次重送")
+        self._finish(entry, PENDING, error='retries exhausted')
+        return False
+
+    def pending(self):
+        """
+        Returns:
+            list: 尚未確認送達的通知 ID
+        """
+        return [notification_id for notification_id, entry in self.entries.items() if entry['status'] == PENDING]
+
+    @classmethod
+    def load(cls, path=LINE_DELIVERY_FILE, policy=LINE_RETRY_POLICY):
+        """
+        讀取發送紀錄
+
+        Returns:
+            LineDelivery: 發送器
+        """
+        delivery = cls(path, policy)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                delivery.entries = data.get('entries', {})
+        except Exception as e:
+            print(f"⚠️  讀取 LINE 發送紀錄時發生錯誤: {e}")
+        return delivery
+
+    def save(self):
+        """
+        寫入發送紀錄（清除超過 retry key 有效期的紀錄）
+        """
+        cutoff = time.time() - RETRY_KEY_TTL_SECONDS
+        with self._lock:
+            self.entries = {notification_id: entry for notification_id, entry in self.entries.items()
+                            if entry['created_at'] >= cutoff}
+            data = {'version': 1, 'entries': self.entries}
+            try:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"⚠️  保存 LINE 發送紀錄時發生錯誤: {e}")
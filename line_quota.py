@@ -0,0 +1,330 @@
+"""
+LINE 每月訊息額度追蹤
+免費方案每月可推播的訊息數有上限，每小時的日報表、價格警報與錯誤通知都會消耗額度。
+本模組：
+  - 跨執行累計每位收件者本月的推播數（line_quota.json）
+  - 可用時以 /v2/bot/message/quota 與 /v2/bot/message/quota/consumption 校正上限與已用量
+  - 依本月目前的使用速度推估月底用量與額度用完的時間
+  - 推估會超過上限時自動降級：日報表改為每日固定時段的摘要，保留額度給警報
+"""
+
+import calendar
+import json
+import os
+import threading
+from datetime import timedelta
+
+from linebot import LineBotApi
+
+import line_notify
+from delivery_planner import MULTICAST, PUSH, format_plan, plan_delivery
+from report_schedule import DEFAULT_SUBSCRIBER
+from retry_policy import get_run_deadline
+
+
+LINE_QUOTA_FILE = "line_quota.json"
+
+# 未能查詢 API 時使用的每月額度（可用環境變數覆寫）
+DEFAULT_MONTHLY_LIMIT = int(os.getenv("LINE_MONTHLY_QUOTA", "200"))
+# 保留給價格警報與錯誤通知的額度
+ALERT_RESERVE = 20
+# 摘要模式下發送日報表的台灣時間（時）
+DIGEST_HOURS = (9, 21)
+# 推估使用速度時的最短觀察時間，避免月初少量推播造成誤判
+MIN_PROJECTION_SECONDS = 24 * 60 * 60
+
+NORMAL = 'normal'
+DIGEST = 'digest'
+ALERTS_ONLY = 'alerts_only'
+EXHAUSTED = 'exhausted'
+
+MODE_LABELS = {
+    NORMAL: '正常',
+    DIGEST: '摘要模式',
+    ALERTS_ONLY: '僅發送警報',
+    EXHAUSTED: '額度已用完',
+}
+
+
+def fetch_quota_usage():
+    """
+    查詢 LINE Messaging API 的本月額度與已用量
+
+    Returns:
+        tuple: (每月上限，無上限時為 None, 已用量)，查詢失敗時返回 None
+    """
+    token = ''.join((line_notify.CHANNEL_ACCESS_TOKEN or '').split())
+    if not token:
+        return None
+    try:
+        api = LineBotApi(token, endpoint=line_notify.LINE_API_BASE_URL)
+        timeout = max(line_notify.LINE_MIN_TIMEOUT, get_run_deadline().clamp(line_notify.LINE_TIMEOUT))
+        quota = api.get_message_quota(timeout=timeout)
+        consumption = api.get_message_quota_consumption(timeout=timeout)
+        limit = quota.value if quota.type == 'limited' else None
+        return limit, consumption.total_usage
+    except Exception as e:
+        print(f"⚠️  查詢 LINE 訊息額度時發生錯誤: {e}")
+        return None
+
+
+class QuotaTracker:
+    """
+    本月 LINE 推播額度的使用狀況
+    """
+
+    def __init__(self, path=LINE_QUOTA_FILE, limit=DEFAULT_MONTHLY_LIMIT, delivery=None, audience=None,
+                 report_audience=None):
+        """
+        Args:
+            path (str): 狀態檔路徑
+            limit (int, optional): 每月上限，None 表示無上限
+            delivery (LineDelivery, optional): 冪等重試的發送器，未指定時以 send_line_push 發送一次
+            audience (Audience, optional): 預設收件對象，多位收件者時依 delivery_planner 選擇發送方式
+            report_audience (Audience, optional): 預設日報表的收件對象（user_id 為 DEFAULT_SUBSCRIBER 時），
+                未指定時與 audience 相同
+        """
+        self.path = path
+        self.limit = limit
+        self.delivery = delivery
+        self.audience = audience
+        self.report_audience = report_audience
+        self.month = None
+        self.pushes = {}          # {收件者: 本月推播數}
+        self.api_usage = None     # 最近一次查詢 API 得到的已用量
+        self.api_synced_at = None
+        self._dirty = False
+        self._lock = threading.Lock()  # 常駐程式會在多個執行緒同時發送
+
+    def _roll_month(self, taiwan_time):
+        month = taiwan_time.strftime('%Y-%m')
+        if month != self.month:
+            self._dirty = True
+            self.month = month
+            self.pushes = {}
+            self.api_usage = None
+            self.api_synced_at = None
+
+    def sync(self, taiwan_time, usage=None):
+        """
+        以 API 查詢結果校正上限與已用量
+
+        Args:
+            taiwan_time (datetime): 台灣時間
+            usage (tuple, optional): fetch_quota_usage 的結果，未指定時即時查詢
+
+        Returns:
+            bool: 是否成功取得 API 資料
+        """
+        self._roll_month(taiwan_time)
+        if usage is None:
+            usage = fetch_quota_usage()
+        if usage is None:
+            return False
+        self.limit, self.api_usage = usage
+        self.api_synced_at = taiwan_time.strftime('%Y-%m-%d %H:%M:%S')
+        self._dirty = True
+        return True
+
+    def record_push(self, recipient, taiwan_time, count=1):
+        """
+        記錄一則成功的推播
+        """
+        with self._lock:
+            self._roll_month(taiwan_time)
+            self.pushes[recipient] = self.pushes.get(recipient, 0) + count
+            self._dirty = True
+            if self.api_usage is not None:
+                self.api_usage += count
+
+    def used(self):
+        """
+        Returns:
+            int: 本月已用量（本機累計與 API 已用量取較大者）
+        """
+        return max(sum(self.pushes.values()), self.api_usage or 0)
+
+    def remaining(self):
+        """
+        Returns:
+            int: 本月剩餘額度，無上限時為 None
+        """
+        if self.limit is None:
+            return None
+        return max(self.limit - self.used(), 0)
+
+    def projection(self, taiwan_time):
+        """
+        依本月的使用速度推估月底用量
+
+        Returns:
+            dict: {'used', 'limit', 'projected', 'exhausted_at'}，exhausted_at 為預估用完的台灣時間
+                  （月底前不會用完時為 None）
+        """
+        self._roll_month(taiwan_time)
+        month_start = taiwan_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        days_in_month = calendar.monthrange(taiwan_time.year, taiwan_time.month)[1]
+        month_end = month_start + timedelta(days=days_in_month)
+        elapsed = (taiwan_time - month_start).total_seconds()
+        rate = self.used() / max(elapsed, MIN_PROJECTION_SECONDS)  # 每秒推播數
+        projected = self.used() + rate * (month_end - taiwan_time).total_seconds()
+        exhausted_at = None
+        if self.limit is not None and rate > 0:
+            exhausted_at = taiwan_time + timedelta(seconds=self.remaining() / rate)
+            if exhausted_at >= month_end:
+                exhausted_at = None
+        return {'used': self.used(), 'limit': self.limit, 'projected': projected, 'exhausted_at': exhausted_at}
+
+    def mode(self, taiwan_time):
+        """
+        Returns:
+            str: NORMAL、DIGEST（日報表改為摘要）、ALERTS_ONLY（只發送警報）或 EXHAUSTED
+        """
+        if self.limit is None:
+            return NORMAL
+        remaining = self.remaining()
+        if remaining <= 0:
+            return EXHAUSTED
+        if remaining <= ALERT_RESERVE:
+            return ALERTS_ONLY
+        if self.projection(taiwan_time)['projected'] > self.limit - ALERT_RESERVE:
+            return DIGEST
+        return NORMAL
+
+    def allows_report(self, taiwan_time):
+        """
+        Returns:
+            bool: 目前的額度是否允許發送日報表（摘要模式只在 DIGEST_HOURS 發送）
+        """
+        mode = self.mode(taiwan_time)
+        if mode == NORMAL:
+            return True
+        if mode == DIGEST:
+            return taiwan_time.hour in DIGEST_HOURS
+        return False
+
+    def send(self, message, taiwan_time, user_id=None, notification_id=None, deadline=None):
+        """
+        發送 LINE 推播並計入額度（額度已用完時不發送）
+
+        Args:
+            message (str): 訊息內容
+            taiwan_time (datetime): 台灣時間
+            user_id (str, optional): 收件者，未指定時使用預設收件對象；DEFAULT_SUBSCRIBER 表示預設日報表的收件對象
+            notification_id (str, optional): 邏輯通知 ID，重送同一則通知時 LINE 不會重複推播
+            deadline (Deadline, optional): 重試的時間預算
+
+        Returns:
+            bool: 發送成功返回 True
+        """
+        if self.mode(taiwan_time) == EXHAUSTED:
+            print(f"✗ 本月 LINE 訊息額度已用完（{self.used()}/{self.limit}），不發送通知")
+            return False
+        audience = self.audience
+        if user_id == DEFAULT_SUBSCRIBER:
+            # 有自己排程的訂閱者不收預設日報表
+            user_id = None
+            if self.report_audience is not None:
+                audience = self.report_audience
+        if user_id is None and self.delivery is not None and audience is not None:
+            steps = plan_delivery(audience)
+            if not (len(steps) == 1 and steps[0]['kind'] == PUSH):
+                return self._send_plan(message, steps, taiwan_time, notification_id, deadline)
+            user_id = steps[0]['to']
+        if self.delivery is not None:
+            success = self.delivery.send(message, user_id, notification_id, deadline)
+        else:
+            success = line_notify.send_line_push(message, user_id)
+        if success:
+            self.record_push(user_id or line_notify.USER_ID, taiwan_time)
+        return success
+
+    def _send_plan(self, message, steps, taiwan_time, notification_id, deadline):
+        """
+        以 multicast / narrowcast / broadcast 發送給多位收件者，依送達的步驟計入額度
+
+        Returns:
+            bool: 所有步驟都送達時返回 True
+        """
+        if not steps:
+            print("⚠️  沒有收件者，不發送通知")
+            return False
+        print(f"  發送計畫: {format_plan(steps)}")
+        results = self.delivery.send_plan(message, steps, notification_id, deadline)
+        for step, delivered in results:
+            if not delivered:
+                continue
+            if step['kind'] in (PUSH, MULTICAST):
+                for recipient in ([step['to']] if step['kind'] == PUSH else step['to']):
+                    self.record_push(recipient, taiwan_time)
+            else:
+                self.record_push(f"{step['kind']}:{step['audience_group_id'] or '*'}", taiwan_time,
+                                 step['recipients'])
+        return all(delivered for _, delivered in results)
+
+    @classmethod
+    def load(cls, path=LINE_QUOTA_FILE, delivery=None, audience=None, report_audience=None):
+        """
+        讀取狀態檔
+
+        Returns:
+            QuotaTracker: 額度追蹤
+        """
+        tracker = cls(path, delivery=delivery, audience=audience, report_audience=report_audience)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                tracker.month = data.get('month')
+                tracker.pushes = data.get('pushes', {})
+                tracker.limit = data.get('limit', tracker.limit)
+                tracker.api_usage = data.get('api_usage')
+                tracker.api_synced_at = data.get('api_synced_at')
+        except Exception as e:
+            print(f"⚠️  讀取 LINE 額度記錄時發生錯誤: {e}")
+        return tracker
+
+    def save(self):
+        """
+        有變更時寫入狀態檔
+        """
+        if not self._dirty:
+            return
+        data = {
+            'version': 1,
+            'month': self.month,
+            'limit': self.limit,
+            'pushes': self.pushes,
+            'api_usage': self.api_usage,
+            'api_synced_at': self.api_synced_at,
+        }
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            print(f"⚠️  保存 LINE 額度記錄時發生錯誤: {e}")
+
+
+def format_quota_status(tracker, taiwan_time):
+    """
+    Returns:
+        str: 日報表中的【LINE 額度】段落，無上限時為空字串
+    """
+    if tracker.limit is None:
+        return ""
+    projection = tracker.projection(taiwan_time)
+    mode = tracker.mode(taiwan_time)
+    lines = ["【LINE 額度】", f"本月已用: {projection['used']} / {projection['limit']}"]
+    if projection['exhausted_at'] is not None:
+        lines.append(f"預估用完: {projection['exhausted_at'].strftime('%m-%d %H:%M')}")
+    else:
+        lines.append(f"預估月底用量: {projection['projected']:.0f}")
+    if mode == DIGEST:
+        hours = '、'.join(f"{hour:02d}" for hour in DIGEST_HOURS)
+        lines.append(f"模式: {MODE_LABELS[mode]}（日報表改為每日 {hours} 時發送，保留額度給警報）")
+    elif mode != NORMAL:
+        lines.append(f"模式: {MODE_LABELS[mode]}")
+    return "\n".join(lines)
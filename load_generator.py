@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+壓力測試工具
+合成 N 個訂閱者與 M 條區間警報規則（寫成設定檔），以固定速率改變替身伺服器的價格，
+由常駐程式的管線（PriceDaemon.build_pipeline）走完整的
+「擷取 → 正規化 → 儲存 → 評估 → 產生訊息 → 合併 → 發送」流程，
+並回報吞吐量、價格跳動到通知送達的 p50/p99 延遲與峰值記憶體（RSS）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import line_notify
+from daemon import PriceDaemon
+from monitor_config import CONFIG_FILE
+from stand_in_servers import StandInSuite
+
+
+def synthesize_subscribers(count):
+    """
+    Returns:
+        list: 合成的 LINE User ID（格式與真實 ID 相同: U + 32 位十六進位）
+    """
+    return [f"U{index:032x}" for index in range(count)]
+
+
+def synthesize_rules(count, rng):
+    """
+    合成區間警報規則（設定檔 rules.windows 的格式），每條規則的視窗長度不同
+
+    Returns:
+        list: [{'minutes': int, 'threshold': float}, ...]
+    """
+    return [{'minutes': index + 1, 'threshold': rng.choice((0.05, 0.1, 0.2, 0.5, 1.0))}
+            for index in range(count)]
+
+
+def write_config(path, subscribers, rules):
+    """
+    寫入壓力測試用的設定檔：所有訂閱者收警報，價格變化警報不冷卻
+    """
+    data = {
+        'version': 1,
+        'subscribers': subscribers,
+        'rules': {
+            'price_change': {'threshold': 0.5, 'cooldown_seconds': 0, 'rearm_band': 0.1},
+            'windows': rules,
+            'indicators': [],
+        },
+        'sources': ['coingecko'],
+        'channels': [],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def percentile(sorted_values, fraction):
+    """
+    Args:
+        sorted_values (list): 已排序的數值
+        fraction (float): 百分位（0-1）
+
+    Returns:
+        float: 最近秩法計算的百分位數，無資料時返回 0.0
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    """
+    Returns:
+        float: 本程序的峰值常駐記憶體（MB）
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 單位為 KB，macOS 為 bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_load(subscribers=100, rules=1000, tick_rate=5.0, duration=10.0,
+             send_workers=16, volatility=0.002, latency=0.0, error_rate=0.0, seed=None):
+    """
+    執行壓力測試
+
+    Args:
+        subscribers (int): 訂閱者數量
+        rules (int): 區間警報規則數量
+        tick_rate (float): 每秒價格跳動次數
+        duration (float): 測試秒數
+        send_workers (int): 發送階段的並行數
+        volatility (float): 每次跳動的價格標準差（比例）
+        latency (float): 替身伺服器回應延遲秒數
+        error_rate (float): 替身伺服器 500 錯誤比例
+        seed (int, optional): 亂數種子
+
+    Returns:
+        dict: 測試結果統計
+    """
+    rng = random.Random(seed)
+    subscriber_ids = synthesize_subscribers(subscribers)
+    rule_list = synthesize_rules(rules, rng)
+
+    latencies = []
+    results = {'sent': 0, 'failed': 0}
+    counters = {'ticks': 0, 'fetch_failures': 0}
+    lock = threading.Lock()
+    price = 4359.16
+
+    saved_token = line_notify.CHANNEL_ACCESS_TOKEN
+    line_notify.CHANNEL_ACCESS_TOKEN = "L" * 120 + "="
+
+    try:
+        suite = StandInSuite(latency=latency, error_rate=error_rate, seed=seed)
+        # 流程各步驟大量輸出記錄，測試期間關閉以免成為瓶頸
+        with suite, tempfile.TemporaryDirectory() as state_dir, \
+                open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            suite['coingecko'].set_price(price)
+            config_path = os.path.join(state_dir, CONFIG_FILE)
+            write_config(config_path, subscriber_ids, rule_list)
+            # 不合併通知，量測每則通知的延遲
+            daemon = PriceDaemon(state_dir=state_dir, interval=1.0 / tick_rate,
+                                 max_ticks=max(1, int(duration * tick_rate)),
+                                 deliver_concurrency=send_workers, coalesce_window=0, config_path=config_path)
+            # 壓力測試不受每月額度限制
+            daemon.quota.limit = None
+            pipeline = daemon.build_pipeline()
+
+            async def ticks():
+                nonlocal price
+                async for raw in daemon.ingest():
+                    counters['ticks'] += 1
+                    if raw['price_data'] is None:
+                        counters['fetch_failures'] += 1
+                    yield raw
+                    # 下一次擷取取得新的價格
+                    price = round(price * (1 + rng.gauss(0, volatility)), 2)
+                    suite['coingecko'].set_price(price)
+
+            send = daemon.send
+
+            def counted_send(message, user_id, notification_id):
+                success = send(message, user_id, notification_id)
+                with lock:
+                    results['sent' if success else 'failed'] += 1
+                return success
+
+            deliver = pipeline.stages[-1].handler
+
+            async def timed_deliver(message):
+                result = await deliver(message)
+                latencies.append(time.time() - message['tick']['fetched_at'])
+                return result
+
+            daemon.send = counted_send
+            pipeline.stages[-1].handler = timed_deliver
+            pipeline.source = ticks
+
+            started = time.perf_counter()
+            asyncio.run(pipeline.run())
+            elapsed = time.perf_counter() - started
+            stats = pipeline.stats()
+            recipients = daemon.quota.used()
+    finally:
+        line_notify.CHANNEL_ACCESS_TOKEN = saved_token
+
+    latencies.sort()
+    evaluated = stats['evaluate']['processed']
+    return {
+        'ticks': counters['ticks'],
+        'ticks_evaluated': evaluated,
+        'fetch_failures': counters['fetch_failures'],
+        'notifications_sent': results['sent'],
+        'notifications_failed': results['failed'],
+        'recipients': recipients,
+        'elapsed': elapsed,
+        'ticks_per_second': evaluated / elapsed if elapsed else 0.0,
+        'notifications_per_second': (results['sent'] + results['failed']) / elapsed if elapsed else 0.0,
+        'p50_latency_ms': percentile(latencies, 0.50) * 1000,
+        'p99_latency_ms': percentile(latencies, 0.99) * 1000,
+        'peak_rss_mb': peak_rss_mb(),
+        'pipeline': stats,
+    }
+
+
+def print_report(stats):
+    """輸出壓力測試結果"""
+    print("=" * 60)
+    print("壓力測試結果")
+    print("=" * 60)
+    print(f"執行時間: {stats['elapsed']:.1f} 秒")
+    print(f"價格跳動: 擷取 {stats['ticks']} 次，評估 {stats['ticks_evaluated']} 次（{stats['ticks_per_second']:.1f} 次/秒），"
+          f"抓取失敗 {stats['fetch_failures']} 次")
+    print(f"通知: 成功 {stats['notifications_sent']} 則，失敗 {stats['notifications_failed']} 則"
+          f"（{stats['notifications_per_second']:.1f} 則/秒），收件人次 {stats['recipients']}")
+    print(f"跳動到通知延遲: p50 {stats['p50_latency_ms']:.1f} ms，p99 {stats['p99_latency_ms']:.1f} ms")
+    print(f"峰值記憶體: {stats['peak_rss_mb']:.1f} MB")
+    print(f"管線統計: {stats['pipeline']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="黃金價格監控壓力測試")
+    parser.add_argument('--subscribers', type=int, default=100, help="訂閱者數量")
+    parser.add_argument('--rules', type=int, default=1000, help="區間警報規則數量")
+    parser.add_argument('--tick-rate', type=float, default=5.0, help="每秒價格跳動次數")
+    parser.add_argument('--duration', type=float, default=10.0, help="測試秒數")
+    parser.add_argument('--send-workers', type=int, default=16, help="發送階段的並行數")
+    parser.add_argument('--volatility', type=float, default=0.002, help="每次跳動的價格標準差（比例）")
+    parser.add_argument('--latency', type=float, default=0.0, help="替身伺服器回應延遲秒數")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="替身伺服器 500 錯誤比例")
+    parser.add_argument('--seed', type=int, default=None, help="亂數種子")
+    args = parser.parse_args()
+
+    print_report(run_load(
+        subscribers=args.subscribers,
+        rules=args.rules,
+        tick_rate=args.tick_rate,
+        duration=args.duration,
+        send_workers=args.send_workers,
+        volatility=args.volatility,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ))
@@ -1,9 +1,32 @@
 from datetime import datetime, timezone, timedelta
 import os
 import json
+import time
+import uuid
 from get_gold_price import get_gold_price
 from get_bot_gold_price import get_bot_gold_price
-from line_notify import send_line_push
+from retry_policy import RUN_BUDGET_SECONDS, start_run_deadline
+from tick_dedup import TickDeduplicator
+from window_alerts import GOLD_ASSET, WindowAlertMonitor, format_window_changes
+from quantile_sketch import PriceDistribution, format_percentiles
+from price_history import HISTORY_FILE, load_price_history
+from range_index import RangeIndex
+from indicators import IndicatorSet, format_indicator_triggers, gate_indicator_triggers
+from alert_state import PRICE_CHANGE_RULE, AlertStateStore, rule_key
+from line_quota import MODE_LABELS, QuotaTracker, format_quota_status
+from line_delivery import LineDelivery
+from outbox import DELIVERED, QUEUED, Outbox, send_deadline
+from notifier import notify_channels
+from report_schedule import DEFAULT_SUBSCRIBER, ReportScheduler
+from monitor_config import load_config
+from error_throttle import (
+    FETCH_ERROR,
+    SYSTEM_ERROR,
+    ErrorThrottle,
+    format_error_summary,
+    format_recovery_message,
+    format_throttle_note,
+)
 
 
 def get_taiwan_time():
@@ -17,7 +40,8 @@ def get_taiwan_time():
     return datetime.now(taiwan_tz)
 
 
-def format_notification_message(current_price, day_high, day_low, bot_price=None):
+def format_notification_message(current_price, day_high, day_low, bot_price=None, percentiles=None,
+                                highlights=None):
     """
     格式化 LINE 通知訊息（每日黃金價格報告格式）
     
@@ -25,7 +49,9 @@ def format_notification_message(current_price, day_high, day_low, bot_price=None
         current_price (float): 當前價格（USD/盎司）
         day_high (float): 當天最高價（USD/盎司）
         day_low (float): 當天最低價（USD/盎司）
-        bot_price (dict, optional): 台灣銀行價格，格式為 {'price': float, 'unit': str}
+        bot_price (BotQuote, optional): 台灣銀行價格
+        percentiles (list, optional): PriceDistribution.percentiles 的結果（當前價格的歷史分位）
+        highlights (list, optional): RangeIndex.highlights 的結果（例如「創 30 天新高」）
     
     Returns:
         str: 格式化後的訊息
@@ -46,16 +72,23 @@ def format_notification_message(current_price, day_high, day_low, bot_price=None
     message += f"報告時間: {current_time}\n"
     message += f"日期: {current_date}\n"
     message += "\n【國際價格（USD/盎司）】\n"
-    message += f"當前價格: ${current_price:.2f}\n"
+    message += f"當前價格: ${current_price:.2f}"
+    if highlights:
+        message += f"（{'、'.join(highlights)}）"
+    message += "\n"
     message += "-------------------\n"
     message += f"當天最高: ${day_high:.2f}\n"
     message += f"當天最低: ${day_low:.2f}\n"
     message += f"波動幅度: {volatility:.2f}%\n"
     
+    # 添加歷史分位
+    if percentiles:
+        message += "\n" + format_percentiles(percentiles) + "\n"
+    
     # 添加台灣銀行價格
-    if bot_price and 'price' in bot_price:
+    if bot_price:
         message += "\n【台灣銀行黃金牌告匯率】\n"
-        message += f"本行賣出: {bot_price['price']:.2f} {bot_price.get('unit', '台幣/公克')}\n"
+        message += f"本行賣出: {bot_price.price:.2f} {bot_price.unit}\n"
     else:
         message += "\n【台灣銀行黃金牌告匯率】\n"
         message += "本行賣出: 無法取得\n"
@@ -63,22 +96,328 @@ def format_notification_message(current_price, day_high, day_low, bot_price=None
     return message
 
 
+# 狀態檔案與警報閾值（main 與常駐程式共用）
+LAST_PRICE_FILE = "last_price.json"
+DAILY_PRICE_FILE = "daily_price.json"
+LAST_REPORT_FILE = "last_report_time.json"
+PRICE_CHANGE_THRESHOLD = 5.0  # 5% 的價格變化閾值（設定檔未指定時的預設值）
+NOTIFY_RESERVE_SECONDS = 20  # 執行時間預算中保留給 LINE 通知的秒數
+
+
+def format_fetch_error_message(taiwan_time, error_time):
+    """
+    格式化價格獲取失敗的錯誤通知
+    
+    Args:
+        taiwan_time (str): 台灣時間字串
+        error_time (str): UTC 時間字串
+    
+    Returns:
+        str: 格式化後的錯誤訊息
+    """
+    error_message = f"⚠️ 黃金價格獲取失敗\n\n"
+    error_message += f"報告時間: {taiwan_time}\n"
+    error_message += f"UTC 時間: {error_time}\n"
+    error_message += f"錯誤原因: 無法連接到黃金價格 API\n\n"
+    error_message += f"已嘗試的 API:\n"
+    error_message += f"1. 幣安 API (Binance)\n\n"
+    error_message += f"請檢查:\n"
+    error_message += f"1. 網路連線是否正常\n"
+    error_message += f"2. 幣安 API 服務是否可用\n"
+    error_message += f"3. GitHub Actions 執行環境是否正常"
+    return error_message
+
+
+def format_alert_message(current_price, day_high, day_low, bot_price, last_price, price_change_percent, level=1):
+    """
+    格式化價格變化警報（日報表內容加上價格變化資訊）
+    
+    Args:
+        current_price (float): 當前價格（USD/盎司）
+        day_high (float): 當天最高價（USD/盎司）
+        day_low (float): 當天最低價（USD/盎司）
+        bot_price (BotQuote, optional): 台灣銀行價格
+        last_price (float): 上次價格（USD/盎司）
+        price_change_percent (float): 相對於上次價格的變化百分比
+        level (int): 警報等級，大於 1 表示變化持續擴大後的升級通知
+    
+    Returns:
+        str: 格式化後的警報訊息
+    """
+    message = format_notification_message(current_price, day_high, day_low, bot_price)
+    # 添加價格變化信息
+    if price_change_percent:
+        change_direction = "上漲" if current_price > last_price else "下跌"
+        title = "⚠️ 價格變化警報" if level <= 1 else f"⚠️ 價格變化警報（升級：第 {level} 級）"
+        message = f"{title}\n\n" + message
+        message += f"\n\n【價格變化】\n"
+        message += f"相對於上次價格: {change_direction} {price_change_percent:.2f}%\n"
+        message += f"上次價格: ${last_price:.2f}\n"
+        message += f"當前價格: ${current_price:.2f}"
+    return message
+
+
+def format_window_alert_message(current_price, day_high, day_low, bot_price, triggers):
+    """
+    格式化滑動視窗警報（日報表內容加上區間變化資訊）
+    
+    Args:
+        current_price (float): 當前價格（USD/盎司）
+        day_high (float): 當天最高價（USD/盎司）
+        day_low (float): 當天最低價（USD/盎司）
+        bot_price (BotQuote, optional): 台灣銀行價格
+        triggers (list): WindowAlertMonitor.update 返回的警報
+    
+    Returns:
+        str: 格式化後的警報訊息
+    """
+    message = format_notification_message(current_price, day_high, day_low, bot_price)
+    return f"⚠️ 價格區間警報\n\n" + message + "\n\n" + format_window_changes(triggers)
+
+
+def format_indicator_alert_message(current_price, day_high, day_low, bot_price, triggers, values):
+    """
+    格式化技術指標警報（日報表內容加上指標資訊）
+    
+    Args:
+        current_price (float): 當前價格（USD/盎司）
+        day_high (float): 當天最高價（USD/盎司）
+        day_low (float): 當天最低價（USD/盎司）
+        bot_price (BotQuote, optional): 台灣銀行價格
+        triggers (list): IndicatorSet.evaluate 返回的警報
+        values (dict): 當前指標值
+    
+    Returns:
+        str: 格式化後的警報訊息
+    """
+    message = format_notification_message(current_price, day_high, day_low, bot_price)
+    return f"⚠️ 技術指標警報\n\n" + message + "\n\n" + format_indicator_triggers(triggers, values)
+
+
+def load_last_price(path=LAST_PRICE_FILE):
+    """
+    讀取上次價格
+    
+    Returns:
+        float: 上次價格，沒有記錄時返回 None
+    """
+    last_price = None
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                last_data = json.load(f)
+                last_price = last_data.get('last_price')
+                if last_price:
+                    print(f"✓ 讀取上次價格: ${last_price:.2f}")
+    except Exception as e:
+        print(f"⚠️  讀取上次價格時發生錯誤: {e}")
+    return last_price
+
+
+def save_last_price(current_price, utc_now, taiwan_time, path=LAST_PRICE_FILE, source=None, upstream_ts=None):
+    """
+    保存當前價格到 last_price.json（含資料來源與上游時間戳，供下次執行去重）
+    """
+    try:
+        price_data_to_save = {
+            'last_price': current_price,
+            'timestamp': utc_now.strftime('%Y-%m-%d %H:%M:%S'),
+            'taiwan_time': taiwan_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'source': source,
+            'upstream_ts': upstream_ts
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(price_data_to_save, f, ensure_ascii=False, indent=2)
+        print(f"✓ 已保存當前價格到 {path}")
+    except Exception as e:
+        print(f"⚠️  保存價格時發生錯誤: {e}")
+
+
+def load_daily_range(current_date, path=DAILY_PRICE_FILE):
+    """
+    讀取當日價格記錄（不同日期的記錄視為新的一天）
+    
+    Args:
+        current_date (str): 當前台灣日期（YYYY-MM-DD）
+    
+    Returns:
+        tuple: (當日最高價, 當日最低價)，沒有當日記錄時為 (None, None)
+    """
+    tracked_day_high = None
+    tracked_day_low = None
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                daily_data = json.load(f)
+                stored_date = daily_data.get('date')
+                # 檢查是否為同一天
+                if stored_date == current_date:
+                    tracked_day_high = daily_data.get('day_high')
+                    tracked_day_low = daily_data.get('day_low')
+                    print(f"✓ 讀取當日價格記錄: 最高 ${tracked_day_high:.2f}, 最低 ${tracked_day_low:.2f}")
+                    if tracked_day_high == tracked_day_low:
+                        print(f"  ⚠️  注意：最高和最低價相同（可能是首次執行或價格未變化）")
+                else:
+                    print(f"  新的一天（儲存日期: {stored_date}, 當前日期: {current_date}），重置當日價格記錄")
+        else:
+            print(f"  daily_price.json 不存在，將創建新記錄")
+    except Exception as e:
+        print(f"⚠️  讀取當日價格記錄時發生錯誤: {e}")
+        import traceback
+        traceback.print_exc()
+    return tracked_day_high, tracked_day_low
+
+
+def update_daily_range(current_price, tracked_day_high, tracked_day_low):
+    """
+    以當前價格更新當日最高和最低價
+    
+    Returns:
+        tuple: (更新後最高價, 更新後最低價)
+    """
+    # 記錄更新前的值
+    old_high = tracked_day_high
+    old_low = tracked_day_low
+    
+    high_updated = False
+    low_updated = False
+    
+    if tracked_day_high is None:
+        tracked_day_high = current_price
+        high_updated = True
+        print(f"  ✓ 初始化最高價: ${tracked_day_high:.2f}")
+    elif current_price > tracked_day_high:
+        tracked_day_high = current_price
+        high_updated = True
+        print(f"  ✓ 更新最高價: ${old_high:.2f} → ${tracked_day_high:.2f}")
+    
+    if tracked_day_low is None:
+        tracked_day_low = current_price
+        low_updated = True
+        print(f"  ✓ 初始化最低價: ${tracked_day_low:.2f}")
+    elif current_price < tracked_day_low:
+        tracked_day_low = current_price
+        low_updated = True
+        print(f"  ✓ 更新最低價: ${old_low:.2f} → ${tracked_day_low:.2f}")
+    
+    # 如果都沒有更新，說明價格在範圍內
+    if not high_updated and not low_updated and tracked_day_high is not None:
+        print(f"  ℹ️  當前價格 ${current_price:.2f} 在範圍內（最高: ${tracked_day_high:.2f}, 最低: ${tracked_day_low:.2f}）")
+    
+    return tracked_day_high, tracked_day_low
+
+
+def save_daily_range(current_date, tracked_day_high, tracked_day_low, taiwan_time, path=DAILY_PRICE_FILE):
+    """
+    保存當日價格記錄
+    """
+    try:
+        daily_data_to_save = {
+            'date': current_date,
+            'day_high': tracked_day_high,
+            'day_low': tracked_day_low,
+            'last_update': taiwan_time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(daily_data_to_save, f, ensure_ascii=False, indent=2)
+        print(f"✓ 已更新當日價格記錄: 最高 ${tracked_day_high:.2f}, 最低 ${tracked_day_low:.2f}")
+    except Exception as e:
+        print(f"⚠️  保存當日價格記錄時發生錯誤: {e}")
+
+
+def calculate_price_change(current_price, last_price):
+    """
+    計算相對於上次價格的變化百分比（絕對值）
+    
+    Returns:
+        float: 變化百分比，沒有上次價格時返回 None
+    """
+    if last_price and last_price > 0:
+        price_change_percent = abs((current_price - last_price) / last_price) * 100
+        change_direction = "上漲" if current_price > last_price else "下跌"
+        print(f"  價格變化: {change_direction} {price_change_percent:.2f}% (相對於上次價格 ${last_price:.2f})")
+        return price_change_percent
+    print("  這是首次執行，無法計算價格變化")
+    return None
+
+
+def load_last_report_time(path=LAST_REPORT_FILE):
+    """
+    讀取上次報告發送時間
+    
+    Returns:
+        datetime: 上次發送的台灣時間，沒有記錄時返回 None
+    """
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                report_data = json.load(f)
+                last_report_str = report_data.get('taiwan_time', '')
+                if last_report_str:
+                    # 解析上次發送時間
+                    last_report_time = datetime.strptime(last_report_str, '%Y-%m-%d %H:%M:%S')
+                    # 轉換為台灣時區
+                    return last_report_time.replace(tzinfo=timezone(timedelta(hours=8)))
+    except Exception as e:
+        print(f"⚠️  讀取上次報告時間時發生錯誤: {e}")
+    return None
+
+
+def save_last_report_time(utc_now, taiwan_time, path=LAST_REPORT_FILE):
+    """
+    記錄本次報告的發送時間
+    """
+    try:
+        report_data = {
+            'date': utc_now.strftime('%Y-%m-%d'),
+            'time': utc_now.strftime('%Y-%m-%d %H:%M:%S'),
+            'taiwan_time': taiwan_time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report_data, f, ensure_ascii=False, indent=2)
+        print(f"✓ 已記錄報告發送時間")
+    except Exception as e:
+        print(f"⚠️  記錄報告時間時發生錯誤: {e}")
+
+
 def main():
     """
     主程式：每10分鐘檢查一次黃金價格
     - 每隔10分鐘檢查一次黃金價格
     - 追蹤當日最低與最高價
     - 價格變化超過5%時立即發送警報（相對於上次價格）
-    - 固定在整點發送日報表（允許5分鐘誤差）
+    - 價格在滑動視窗內（例如 6 小時）累積變化超過閾值時發送區間警報
+    - 依排程發送日報表（REPORT_CRON，預設每個整點；個別訂閱者可設定自己的排程與時區）
+    - 門檻、規則、排程、收件者與通知管道可由設定檔 monitor_config.json 指定
     """
-    PRICE_CHANGE_THRESHOLD = 5.0  # 5% 的價格變化閾值
-    
+    # 設定檔有誤時直接結束，不以錯誤的設定執行
+    config = load_config()
+    threshold = config.threshold
     print("黃金價格監控系統啟動...")
-    print(f"價格變化觸發閾值: {PRICE_CHANGE_THRESHOLD}%")
+    print(f"設定來源: {config.source}")
+    print(f"價格變化觸發閾值: {threshold}%")
     print("執行頻率: 每10分鐘檢查一次價格")
-    print("日報表發送時間: 整點（不同小時或0-20分鐘，台灣時間）")
+    print("日報表發送時間: 依排程（REPORT_CRON，預設每個整點，台灣時間）")
+    print(f"執行時間預算: {RUN_BUDGET_SECONDS:.0f} 秒")
     print("-" * 50)
     
+    # 所有 API 請求（含重試等待）共用同一個時間預算，確保在下次排程前結束
+    run_deadline = start_run_deadline()
+    # 抓取價格時保留時間給之後的 LINE 通知
+    fetch_deadline = run_deadline.with_reserve(NOTIFY_RESERVE_SECONDS)
+    # 錯誤通知依錯誤類別節流，API 中斷期間不會每次執行都發送
+    error_throttle = ErrorThrottle.load()
+    # 所有推播都經由額度追蹤發送，跨執行累計本月用量；
+    # 每則通知帶固定的 retry key，在時間預算內安全地重試
+    # 收件對象有多位時依 delivery_planner 選擇 multicast / narrowcast / broadcast
+    quota = QuotaTracker.load(delivery=LineDelivery.load(), audience=config.recipients(os.getenv("USER_ID")),
+                              report_audience=config.report_recipients(os.getenv("USER_ID")))
+    # 通知先寫入 outbox 再發送；LINE 暫時無法連線時保留到下次執行重送，不會遺失
+    outbox = Outbox.load()
+    
+    def send(message, user_id, notification_id):
+        return quota.send(message, get_taiwan_time(), user_id, notification_id, send_deadline())
+    
     try:
         # 檢查環境變數是否設定（GitHub Actions）
         channel_token = os.getenv("CHANNEL_ACCESS_TOKEN")
@@ -100,8 +439,17 @@ def main():
         print(f"  CHANNEL_ACCESS_TOKEN: {'已設定' if channel_token else '未設定'}")
         print(f"  USER_ID: {'已設定' if user_id else '未設定'}")
         
+        # 以 LINE API 校正本月額度與已用量
+        if quota.sync(get_taiwan_time()):
+            print(f"✓ LINE 訊息額度: 本月已用 {quota.used()} / {quota.limit if quota.limit is not None else '無上限'}")
+        
+        # 重送上次執行未送達的通知
+        if outbox.entries:
+            delivered, remaining = outbox.replay(send)
+            print(f"✓ outbox 重送: 送達 {delivered} 則，仍待送 {remaining} 則")
+        
         # 獲取黃金價格（包含當前價格和開盤價）
-        price_data = get_gold_price()
+        price_data = get_gold_price(fetch_deadline, config.sources)
         
         if price_data is None:
             taiwan_time_obj = get_taiwan_time()
@@ -110,24 +458,23 @@ def main():
             print(f"[{error_time}] 無法獲取黃金價格")
             print("   這可能是 API 連接問題，請檢查網路連線")
             
-            # 即使無法獲取價格，也發送錯誤通知（強制發送）
-            error_message = f"⚠️ 黃金價格獲取失敗\n\n"
-            error_message += f"報告時間: {taiwan_time}\n"
-            error_message += f"UTC 時間: {error_time}\n"
-            error_message += f"錯誤原因: 無法連接到黃金價格 API\n\n"
-            error_message += f"已嘗試的 API:\n"
-            error_message += f"1. 幣安 API (Binance)\n\n"
-            error_message += f"請檢查:\n"
-            error_message += f"1. 網路連線是否正常\n"
-            error_message += f"2. 幣安 API 服務是否可用\n"
-            error_message += f"3. GitHub Actions 執行環境是否正常"
+            # 第一次失敗立即通知，之後依指數退避間隔才再通知
+            decision = error_throttle.record_failure(FETCH_ERROR, time.time())
+            error_throttle.save()
+            if not decision['notify']:
+                print(f"ℹ️  價格獲取已連續失敗 {decision['failures']} 次，未到下次通知時間，略過錯誤通知"
+                      f"（已略過 {decision['suppressed']} 則）")
+                return
+            error_message = format_fetch_error_message(taiwan_time, error_time) + format_throttle_note(decision)
             
             print(f"\n準備發送錯誤通知到 LINE...")
             print(f"錯誤訊息內容:\n{error_message}\n")
-            success = send_line_push(error_message)
+            status = outbox.deliver(error_message, send, kind='error')
             
-            if success:
+            if status == DELIVERED:
                 print("✓ 錯誤通知已成功發送")
+            elif status == QUEUED:
+                print("⚠️  錯誤通知暫時無法送達，下次執行時重送")
             else:
                 print("✗ 錯誤通知發送失敗")
                 print("   可能的原因:")
@@ -140,18 +487,39 @@ def main():
             # 所以我們應該 return，但確保錯誤通知已發送
             return
         
-        current_price = price_data['current_price']
-        open_price = price_data['open_price']
-        # 注意：API 返回的 day_high 和 day_low 都是當前價格（API 只提供當前價格）
-        # 實際的最高/最低價由 tracked_day_high 和 tracked_day_low 追蹤
+        # 價格獲取恢復正常時發送一則恢復通知
+        for recovery in error_throttle.record_success(FETCH_ERROR, time.time()):
+            recovery_message = format_recovery_message(recovery, get_taiwan_time().strftime('%Y-%m-%d %H:%M:%S'))
+            print(f"\n準備發送恢復通知...\n{recovery_message}\n")
+            status = outbox.deliver(recovery_message, send, kind='recovery')
+            if status == DELIVERED:
+                print("✓ 恢復通知已成功發送")
+            elif status == QUEUED:
+                print("⚠️  恢復通知暫時無法送達，下次執行時重送")
+            else:
+                print("✗ 恢復通知發送失敗")
+        
+        current_price = price_data.price
+        open_price = price_data.open_price
+        # 注意：API 只提供當前價格，當日最高/最低價由 tracked_day_high 和 tracked_day_low 追蹤
+        
+        price_source = price_data.source
+        upstream_ts = price_data.upstream_ts
+        
+        # 價格跳動去重：來源、價格與上游時間戳都與上次相同時，略過狀態寫入與警報評估
+        deduplicator = TickDeduplicator()
+        deduplicator.seed_from_last_price_file(LAST_PRICE_FILE)
+        is_duplicate_tick = deduplicator.is_duplicate(price_source, current_price, upstream_ts)
+        if is_duplicate_tick:
+            print(f"ℹ️  價格未變化（來源: {price_source}, 價格: ${current_price:.2f}, 上游時間戳: {upstream_ts}），略過狀態更新與警報評估")
         
         # 獲取台灣銀行黃金牌告匯率
         print("\n嘗試獲取台灣銀行黃金牌告匯率...")
         bot_price_data = None
         try:
-            bot_price_data = get_bot_gold_price()
+            bot_price_data = get_bot_gold_price(fetch_deadline)
             if bot_price_data:
-                print(f"✓ 成功獲取台灣銀行價格: {bot_price_data['price']:.2f} {bot_price_data.get('unit', '台幣/公克')}")
+                print(f"✓ 成功獲取台灣銀行價格: {bot_price_data.price:.2f} {bot_price_data.unit}")
             else:
                 print("⚠️  無法獲取台灣銀行價格，將在報告中標註")
         except Exception as e:
@@ -163,97 +531,46 @@ def main():
         current_date = taiwan_time.strftime('%Y-%m-%d')
         
         # 讀取上次價格和當日價格記錄
-        last_price_file = "last_price.json"
-        daily_price_file = "daily_price.json"
-        last_price = None
-        tracked_day_high = None
-        tracked_day_low = None
+        last_price = load_last_price()
+        tracked_day_high, tracked_day_low = load_daily_range(current_date)
         
-        try:
-            # 讀取上次價格
-            if os.path.exists(last_price_file):
-                with open(last_price_file, 'r', encoding='utf-8') as f:
-                    last_data = json.load(f)
-                    last_price = last_data.get('last_price')
-                    if last_price:
-                        print(f"✓ 讀取上次價格: ${last_price:.2f}")
-        except Exception as e:
-            print(f"⚠️  讀取上次價格時發生錯誤: {e}")
+        # 更新並保存當日最高和最低價（重複的價格跳動只在換日時寫入）
+        stored_range = (tracked_day_high, tracked_day_low)
+        tracked_day_high, tracked_day_low = update_daily_range(current_price, tracked_day_high, tracked_day_low)
+        if not is_duplicate_tick or (tracked_day_high, tracked_day_low) != stored_range:
+            save_daily_range(current_date, tracked_day_high, tracked_day_low, taiwan_time)
         
-        # 讀取或初始化當日價格記錄
-        try:
-            if os.path.exists(daily_price_file):
-                with open(daily_price_file, 'r', encoding='utf-8') as f:
-                    daily_data = json.load(f)
-                    stored_date = daily_data.get('date')
-                    # 檢查是否為同一天
-                    if stored_date == current_date:
-                        tracked_day_high = daily_data.get('day_high')
-                        tracked_day_low = daily_data.get('day_low')
-                        print(f"✓ 讀取當日價格記錄: 最高 ${tracked_day_high:.2f}, 最低 ${tracked_day_low:.2f}")
-                        if tracked_day_high == tracked_day_low:
-                            print(f"  ⚠️  注意：最高和最低價相同（可能是首次執行或價格未變化）")
-                    else:
-                        print(f"  新的一天（儲存日期: {stored_date}, 當前日期: {current_date}），重置當日價格記錄")
-            else:
-                print(f"  daily_price.json 不存在，將創建新記錄")
-        except Exception as e:
-            print(f"⚠️  讀取當日價格記錄時發生錯誤: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        # 記錄更新前的值
-        old_high = tracked_day_high
-        old_low = tracked_day_low
-        
-        # 更新當日最高和最低價
-        high_updated = False
-        low_updated = False
-        
-        if tracked_day_high is None:
-            tracked_day_high = current_price
-            high_updated = True
-            print(f"  ✓ 初始化最高價: ${tracked_day_high:.2f}")
-        elif current_price > tracked_day_high:
-            tracked_day_high = current_price
-            high_updated = True
-            print(f"  ✓ 更新最高價: ${old_high:.2f} → ${tracked_day_high:.2f}")
-        
-        if tracked_day_low is None:
-            tracked_day_low = current_price
-            low_updated = True
-            print(f"  ✓ 初始化最低價: ${tracked_day_low:.2f}")
-        elif current_price < tracked_day_low:
-            tracked_day_low = current_price
-            low_updated = True
-            print(f"  ✓ 更新最低價: ${old_low:.2f} → ${tracked_day_low:.2f}")
-        
-        # 如果都沒有更新，說明價格在範圍內
-        if not high_updated and not low_updated and tracked_day_high is not None:
-            print(f"  ℹ️  當前價格 ${current_price:.2f} 在範圍內（最高: ${tracked_day_high:.2f}, 最低: ${tracked_day_low:.2f}）")
-        
-        # 保存當日價格記錄
-        try:
-            daily_data_to_save = {
-                'date': current_date,
-                'day_high': tracked_day_high,
-                'day_low': tracked_day_low,
-                'last_update': taiwan_time.strftime('%Y-%m-%d %H:%M:%S')
-            }
-            with open(daily_price_file, 'w', encoding='utf-8') as f:
-                json.dump(daily_data_to_save, f, ensure_ascii=False, indent=2)
-            print(f"✓ 已更新當日價格記錄: 最高 ${tracked_day_high:.2f}, 最低 ${tracked_day_low:.2f}")
-        except Exception as e:
-            print(f"⚠️  保存當日價格記錄時發生錯誤: {e}")
-        
-        # 計算價格變化百分比（相對於上次價格）
+        # 計算價格變化百分比（相對於上次價格），重複的價格跳動不需評估
         price_change_percent = None
-        if last_price and last_price > 0:
-            price_change_percent = abs((current_price - last_price) / last_price) * 100
-            change_direction = "上漲" if current_price > last_price else "下跌"
-            print(f"  價格變化: {change_direction} {price_change_percent:.2f}% (相對於上次價格 ${last_price:.2f})")
-        else:
-            print("  這是首次執行，無法計算價格變化")
+        change_decision = None
+        window_triggers = []
+        if not is_duplicate_tick:
+            price_change_percent = calculate_price_change(current_price, last_price)
+            # 價格變化警報的冷卻、遲滯與升級狀態：價格在閾值附近來回時不會每次輪詢都通知
+            alert_state = AlertStateStore.load()
+            change_decision = alert_state.evaluate(rule_key(GOLD_ASSET, PRICE_CHANGE_RULE), price_change_percent,
+                                                   threshold, time.time(), config.alert_policy)
+            alert_state.save()
+            # 滑動視窗警報：偵測多次輪詢間累積的緩慢漲跌
+            window_monitor = WindowAlertMonitor.load(rules=config.window_rules)
+            window_triggers = window_monitor.update(GOLD_ASSET, time.time(), current_price)
+            window_monitor.save()
+        
+        # 長期價格分布（30 天 / 90 天 / 1 年），每筆新價格更新當日的 t-digest
+        price_distribution = PriceDistribution.load()
+        if not is_duplicate_tick:
+            price_distribution.update(GOLD_ASSET, taiwan_time.date(), current_price)
+            price_distribution.save()
+        
+        # 技術指標（每筆新價格增量更新，沒有狀態檔時從歷史價格重播一次），規則條件成立且不在冷卻中時觸發警報
+        indicator_set = IndicatorSet.load(rules=config.indicator_rules, history_path=HISTORY_FILE)
+        indicator_triggers = []
+        if not is_duplicate_tick:
+            indicator_set.update(current_price)
+            indicator_triggers = gate_indicator_triggers(indicator_set.evaluate(), indicator_set.rules, alert_state,
+                                                         GOLD_ASSET, time.time(), config.alert_policy)
+            indicator_set.save()
+            alert_state.save()
         
         # 計算當天的價格波動幅度（使用追蹤的當日最高和最低價）
         if tracked_day_high and tracked_day_high > 0:
@@ -288,144 +605,144 @@ def main():
         print(f"   GitHub Event: {github_event}")
         print(f"   是否手動觸發: {is_manual_trigger}")
         
-        # 檢查是否為日報表發送時間
-        # 使用時間間隔檢查：如果距離上次發送超過55分鐘，且當前時間在整點時段（0-10分鐘），就發送
-        # 這樣可以確保每小時發送一次，同時涵蓋 GitHub Actions 的執行時間點
-        is_daily_report_time = False
-        
-        # 讀取上次報告發送時間
-        last_report_file = "last_report_time.json"
-        last_report_time = None
-        try:
-            if os.path.exists(last_report_file):
-                with open(last_report_file, 'r', encoding='utf-8') as f:
-                    report_data = json.load(f)
-                    last_report_str = report_data.get('taiwan_time', '')
-                    if last_report_str:
-                        # 解析上次發送時間
-                        last_report_time = datetime.strptime(last_report_str, '%Y-%m-%d %H:%M:%S')
-                        # 轉換為台灣時區
-                        last_report_time = last_report_time.replace(tzinfo=timezone(timedelta(hours=8)))
-        except Exception as e:
-            print(f"⚠️  讀取上次報告時間時發生錯誤: {e}")
-            last_report_time = None
-        
-        # 檢查是否應該發送日報表
-        # 簡化邏輯：只要當前小時與上次發送的小時不同，就發送
-        # 這樣可以確保每個整點都能發送，不受時間範圍限制
-        # 同時檢查時間範圍（0-20分鐘）作為額外保障
-        should_send_by_hour = False
-        should_send_by_range = False
-        
-        # 檢查是否為不同的小時
-        if last_report_time is not None:
-            last_hour = last_report_time.hour
-            should_send_by_hour = taiwan_hour != last_hour
-        
-        # 檢查是否在時間範圍內
-        should_send_by_range = 0 <= taiwan_minute <= 20
-        
-        # 如果滿足任一條件，就發送
-        if should_send_by_hour or should_send_by_range or last_report_time is None:
-            is_daily_report_time = True
-            
-            if last_report_time is None:
-                # 沒有上次發送記錄，發送
-                print(f"   ✓ 檢測到日報表發送時間: {taiwan_hour:02d}:{taiwan_minute:02d} (首次發送)")
-            else:
-                # 計算時間差
-                time_diff = taiwan_time - last_report_time
-                minutes_diff = time_diff.total_seconds() / 60
-                last_hour = last_report_time.hour
-                
-                # 記錄發送原因
-                reasons = []
-                if should_send_by_hour:
-                    reasons.append(f"不同小時（上次: {last_hour:02d}時，當前: {taiwan_hour:02d}時）")
-                if should_send_by_range:
-                    reasons.append(f"在時間範圍內（{taiwan_minute}分鐘）")
-                if minutes_diff >= 50:
-                    reasons.append(f"距離上次發送 {int(minutes_diff)} 分鐘")
-                
-                print(f"   ✓ 檢測到日報表發送時間: {taiwan_hour:02d}:{taiwan_minute:02d}")
-                print(f"   發送原因: {', '.join(reasons) if reasons else '首次發送'}")
-        
-        if not is_daily_report_time and not is_manual_trigger:
+        # 日報表依各訂閱者的排程發送，每個時段只發送一次（送達或寫入 outbox 後才記錄在 report_schedule.json）
+        report_scheduler = ReportScheduler.load(config.schedules, taiwan_time,
+                                                last_report_time=load_last_report_time())
+        due_reports = report_scheduler.pop_due(taiwan_time)
+        
+        # 本月額度不足時日報表降級為每日固定時段的摘要，保留額度給警報；略過的時段不補發
+        if due_reports and not is_manual_trigger and not quota.allows_report(taiwan_time):
+            print(f"   ℹ️  LINE 額度{MODE_LABELS[quota.mode(taiwan_time)]}（本月已用 {quota.used()} / {quota.limit}），"
+                  f"本時段不發送日報表")
+            for item in due_reports:
+                report_scheduler.complete(item['subscriber'], item['slot'])
+            due_reports = []
+        
+        default_report = next((item for item in due_reports if item['subscriber'] == DEFAULT_SUBSCRIBER), None)
+        subscriber_reports = [item for item in due_reports if item is not default_report]
+        is_report_time = default_report is not None
+        if is_report_time:
+            print(f"   ✓ 日報表排程時段: {default_report['slot'].strftime('%Y-%m-%d %H:%M')}")
+        elif not is_manual_trigger:
             print(f"   ✗ 非日報表發送時間（當前時間: {taiwan_hour:02d}:{taiwan_minute:02d}）")
         
         # 檢查價格變化是否超過5%
         should_send_alert = False
-        if price_change_percent and price_change_percent >= PRICE_CHANGE_THRESHOLD:
+        is_change_alert = change_decision is not None
+        if is_change_alert:
+            should_send_alert = True
+            print(f"\n⚠️  價格變化超過 {threshold}% ({price_change_percent:.2f}%)，觸發警報通知"
+                  f"（等級 {change_decision['level']}）")
+        for trigger in window_triggers:
             should_send_alert = True
-            print(f"\n⚠️  價格變化超過 {PRICE_CHANGE_THRESHOLD}% ({price_change_percent:.2f}%)，觸發警報通知")
+            print(f"\n⚠️  {trigger['window_minutes']} 分鐘內價格變化 {trigger['change']:.2f}% "
+                  f">= {trigger['threshold']}%，觸發區間警報通知")
+        for trigger in indicator_triggers:
+            should_send_alert = True
+            print(f"\n⚠️  技術指標規則成立: {trigger['rule']}（{trigger['label']}），觸發指標警報通知")
         
         # 決定是否發送通知
         # 1. 價格變化超過5%：立即發送警報
         # 2. 日報表時間（整點）：發送日報表
         # 3. 手動觸發：發送日報表
-        should_send = should_send_alert or is_daily_report_time or is_manual_trigger
+        should_send = should_send_alert or is_report_time or is_manual_trigger
+        
+        def format_daily_report():
+            """
+            Returns:
+                tuple: (日報表內容, 併入報告的錯誤摘要)
+            """
+            percentiles = price_distribution.percentiles(GOLD_ASSET, current_price, taiwan_time.date())
+            # 以回補的歷史價格判斷是否創 N 天新高／新低
+            highlights = RangeIndex.from_history(load_price_history()).highlights(current_price, time.time())
+            report = format_notification_message(current_price, tracked_day_high, tracked_day_low,
+                                                 bot_price_data, percentiles, highlights)
+            # 上次日報表後被略過的錯誤通知次數併入本次報告
+            summary = error_throttle.report_summary()
+            if summary:
+                report += "\n" + format_error_summary(summary) + "\n"
+            quota_status = format_quota_status(quota, taiwan_time)
+            if quota_status:
+                report += "\n" + quota_status + "\n"
+            return report, summary
         
         if should_send:
             if should_send_alert:
                 print(f"\n⚠️  準備發送價格變化警報通知...")
-                print(f"   發送原因: 價格變化 {price_change_percent:.2f}% >= {PRICE_CHANGE_THRESHOLD}%")
-            elif is_daily_report_time:
+                if is_change_alert:
+                    print(f"   發送原因: 價格變化 {price_change_percent:.2f}% >= {threshold}%")
+                elif window_triggers:
+                    print(f"   發送原因: 區間價格變化超過閾值")
+                else:
+                    print(f"   發送原因: 技術指標規則成立")
+            elif is_report_time:
                 print(f"\n📊 準備發送每日黃金價格報告...")
                 print(f"   發送原因: 日報表發送時間（{taiwan_hour:02d}:{taiwan_minute:02d}）")
             elif is_manual_trigger:
                 print(f"\n📊 準備發送每日黃金價格報告（手動觸發）...")
             
             # 格式化通知訊息（使用追蹤的當日最高和最低價）
-            if should_send_alert:
-                message = format_notification_message(current_price, tracked_day_high, tracked_day_low, bot_price_data)
-                # 添加價格變化信息
-                if price_change_percent:
-                    change_direction = "上漲" if current_price > last_price else "下跌"
-                    message = f"⚠️ 價格變化警報\n\n" + message
-                    message += f"\n\n【價格變化】\n"
-                    message += f"相對於上次價格: {change_direction} {price_change_percent:.2f}%\n"
-                    message += f"上次價格: ${last_price:.2f}\n"
-                    message += f"當前價格: ${current_price:.2f}"
+            error_summary = {}
+            if is_change_alert:
+                message = format_alert_message(current_price, tracked_day_high, tracked_day_low,
+                                               bot_price_data, last_price, price_change_percent,
+                                               change_decision['level'])
+                if window_triggers:
+                    message += "\n\n" + format_window_changes(window_triggers)
+            elif window_triggers:
+                message = format_window_alert_message(current_price, tracked_day_high, tracked_day_low,
+                                                      bot_price_data, window_triggers)
+            elif should_send_alert:
+                message = format_indicator_alert_message(current_price, tracked_day_high, tracked_day_low,
+                                                         bot_price_data, indicator_triggers, indicator_set.values)
             else:
-                message = format_notification_message(current_price, tracked_day_high, tracked_day_low, bot_price_data)
+                message, error_summary = format_daily_report()
+            # 同時成立的技術指標規則併入同一則警報
+            if indicator_triggers and (is_change_alert or window_triggers):
+                message += "\n\n" + format_indicator_triggers(indicator_triggers, indicator_set.values)
             
             # 發送 LINE 通知
             print(f"\n準備發送訊息到 LINE...")
             print(f"訊息內容預覽:\n{message}\n")
             
             try:
-                success = send_line_push(message)
+                # 同一排程時段的日報表使用相同的通知 ID，上次逾時但已送達時不會重複推播；
+                # 非排程時段的報告（手動觸發）每次執行都是新的報告，使用不重複的 ID
+                notification_id = None
+                if default_report is not None and not should_send_alert:
+                    notification_id = default_report['notification_id']
+                elif not should_send_alert:
+                    notification_id = f"report:manual:{taiwan_time.strftime('%Y-%m-%d %H:%M')}:{uuid.uuid4().hex[:8]}"
+                kind = 'alert' if should_send_alert else 'report'
+                # 警報發送給所有收件者；日報表不發送給有自己排程的訂閱者
+                status = outbox.deliver(message, send, notification_id=notification_id,
+                                        user_id=None if should_send_alert else DEFAULT_SUBSCRIBER, kind=kind)
+                
+                # 同時分送到其他有設定的管道（webhook、Telegram、電子郵件）
+                if config.channels:
+                    for channel, delivered in notify_channels(config.channels, message, kind).items():
+                        print(f"  {channel.name}: {'已送達' if delivered else '發送失敗'}")
                 
-                if success:
-                    print("✓ LINE 通知已成功發送")
+                # 已寫入 outbox 的通知一定會在之後送達，狀態照常更新，下次執行的判斷不受 LINE 中斷影響
+                if status in (DELIVERED, QUEUED):
+                    if status == DELIVERED:
+                        print("✓ LINE 通知已成功發送")
+                    else:
+                        print("⚠️  LINE 通知暫時無法送達，已保留在 outbox，下次執行時重送")
                     
                     # 保存當前價格到 last_price.json
-                    try:
-                        price_data_to_save = {
-                            'last_price': current_price,
-                            'timestamp': utc_now.strftime('%Y-%m-%d %H:%M:%S'),
-                            'taiwan_time': taiwan_time.strftime('%Y-%m-%d %H:%M:%S')
-                        }
-                        with open(last_price_file, 'w', encoding='utf-8') as f:
-                            json.dump(price_data_to_save, f, ensure_ascii=False, indent=2)
-                        print(f"✓ 已保存當前價格到 {last_price_file}")
-                    except Exception as e:
-                        print(f"⚠️  保存價格時發生錯誤: {e}")
+                    if not is_duplicate_tick:
+                        save_last_price(current_price, utc_now, taiwan_time,
+                                        source=price_source, upstream_ts=upstream_ts)
                     
                     # 記錄本次報告的發送時間（用於追蹤）
-                    if is_daily_report_time or is_manual_trigger:
-                        try:
-                            last_report_file = "last_report_time.json"
-                            report_data = {
-                                'date': utc_now.strftime('%Y-%m-%d'),
-                                'time': utc_now.strftime('%Y-%m-%d %H:%M:%S'),
-                                'taiwan_time': taiwan_time.strftime('%Y-%m-%d %H:%M:%S')
-                            }
-                            with open(last_report_file, 'w', encoding='utf-8') as f:
-                                json.dump(report_data, f, ensure_ascii=False, indent=2)
-                            print(f"✓ 已記錄報告發送時間")
-                        except Exception as e:
-                            print(f"⚠️  記錄報告時間時發生錯誤: {e}")
+                    if is_report_time or is_manual_trigger:
+                        save_last_report_time(utc_now, taiwan_time)
+                        if not should_send_alert:
+                            error_throttle.clear_report_summary(error_summary)
+                    # 本時段已處理（與警報同時成立時由警報取代），發送失敗時不記錄，下次執行重新發送
+                    if default_report is not None:
+                        report_scheduler.complete(DEFAULT_SUBSCRIBER, default_report['slot'])
                 else:
                     print("✗ LINE 通知發送失敗")
                     print("   可能的原因:")
@@ -445,22 +762,43 @@ def main():
             # 價格變化未超過5%，且非日報表時間，不發送通知
             print(f"\n✓ 價格變化在正常範圍內")
             if price_change_percent:
-                print(f"   價格變化: {price_change_percent:.2f}% < {PRICE_CHANGE_THRESHOLD}%")
+                print(f"   價格變化: {price_change_percent:.2f}% < {threshold}%")
             print(f"   當前時間: {taiwan_time.strftime('%Y-%m-%d %H:%M:%S')} (台灣時間)")
             print(f"   非日報表發送時間，不發送通知")
             
             # 即使不發送通知，也保存當前價格
-            try:
-                price_data_to_save = {
-                    'last_price': current_price,
-                    'timestamp': utc_now.strftime('%Y-%m-%d %H:%M:%S'),
-                    'taiwan_time': taiwan_time.strftime('%Y-%m-%d %H:%M:%S')
-                }
-                with open(last_price_file, 'w', encoding='utf-8') as f:
-                    json.dump(price_data_to_save, f, ensure_ascii=False, indent=2)
-                print(f"✓ 已保存當前價格到 {last_price_file}")
-            except Exception as e:
-                print(f"⚠️  保存價格時發生錯誤: {e}")
+            if not is_duplicate_tick:
+                save_last_price(current_price, utc_now, taiwan_time,
+                                source=price_source, upstream_ts=upstream_ts)
+
+        # 有自己排程的訂閱者個別發送日報表
+        if subscriber_reports:
+            report_message, report_summary = format_daily_report()
+            any_delivered = False
+            for item in subscriber_reports:
+                print(f"\n📊 發送日報表給 {item['subscriber']}（排程時段 {item['slot'].strftime('%Y-%m-%d %H:%M %Z')}）")
+                status = outbox.deliver(report_message, send, notification_id=item['notification_id'],
+                                        user_id=item['subscriber'], kind='report')
+                if status in (DELIVERED, QUEUED):
+                    report_scheduler.complete(item['subscriber'], item['slot'])
+                    any_delivered = True
+                else:
+                    print(f"✗ 日報表發送失敗，下次執行重新發送")
+            if any_delivered:
+                error_throttle.clear_report_summary(report_summary)
+        report_scheduler.save()
+
+        # 本次執行成功完成，結束進行中的系統錯誤
+        for recovery in error_throttle.record_success(SYSTEM_ERROR, time.time()):
+            recovery_message = format_recovery_message(recovery, get_taiwan_time().strftime('%Y-%m-%d %H:%M:%S'))
+            status = outbox.deliver(recovery_message, send, kind='recovery')
+            if status == DELIVERED:
+                print("✓ 系統錯誤恢復通知已成功發送")
+            elif status == QUEUED:
+                print("⚠️  系統錯誤恢復通知暫時無法送達，下次執行時重送")
+            else:
+                print("✗ 系統錯誤恢復通知發送失敗")
+        error_throttle.save()
         
         print("-" * 50)
         print("程式執行完成")
@@ -474,17 +812,27 @@ def main():
         import traceback
         traceback.print_exc()
         
-        # 嘗試發送錯誤通知
+        # 嘗試發送錯誤通知（相同例外類別依指數退避節流）
         try:
-            error_message = f"❌ 系統錯誤\n\n"
-            error_message += f"錯誤時間: {error_time}\n"
-            error_message += f"錯誤訊息: {str(e)}\n\n"
-            error_message += f"請檢查 GitHub Actions 執行日誌以獲取詳細資訊。"
-            send_line_push(error_message)
+            decision = error_throttle.record_failure(f"{SYSTEM_ERROR}:{type(e).__name__}", time.time())
+            error_throttle.save()
+            if decision['notify']:
+                error_message = f"❌ 系統錯誤\n\n"
+                error_message += f"錯誤時間: {error_time}\n"
+                error_message += f"錯誤訊息: {str(e)}\n\n"
+                error_message += f"請檢查 GitHub Actions 執行日誌以獲取詳細資訊。"
+                error_message += format_throttle_note(decision)
+                outbox.deliver(error_message, send, kind='error')
+            else:
+                print(f"ℹ️  相同錯誤已連續發生 {decision['failures']} 次，略過錯誤通知")
         except:
             print("無法發送錯誤通知")
         
         raise
+    
+    finally:
+        quota.save()
+        outbox.compact()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,528 @@
+"""
+監控設定檔
+價格變化閾值、日報表排程與收件者原本寫死在 main() 中，或來自 CHANNEL_ACCESS_TOKEN / USER_ID 等環境變數。
+改由一個宣告式的 JSON 設定檔（預設 monitor_config.json，可用 MONITOR_CONFIG 指定路徑）描述：
+  - subscribers：LINE 收件者，可各自設定日報表排程與時區
+  - rules：價格變化警報（閾值、冷卻、遲滯、升級）、區間警報視窗、技術指標規則
+  - schedule：預設收件對象的日報表排程
+  - sources：價格來源的使用順序
+  - channels：LINE 以外的通知管道（webhook、Telegram、電子郵件）
+
+設定檔先完整驗證，再編譯成規則與排程引擎直接使用的物件
+（AlertPolicy、視窗規則、指標規則、CronSchedule、Audience、Channel），有任何錯誤時整份設定都不套用。
+字串中的 ${VAR} 以環境變數取代，token、密碼等機密不必寫在檔案中。
+沒有設定檔或省略某個區段時，該區段沿用原本的環境變數與預設值。
+
+常駐程式以 ConfigWatcher 在每次擷取前比對檔案的修改時間，變更時重新編譯，
+只重建內容有變動的區段（見 SECTIONS），不需要重新啟動。
+範例見 monitor_config.example.json。
+"""
+
+import json
+import os
+import re
+
+from alert_state import (
+    DEFAULT_COOLDOWN_SECONDS,
+    DEFAULT_ESCALATION_STEP,
+    DEFAULT_REARM_BAND,
+    AlertPolicy,
+)
+from delivery_planner import Audience
+from get_gold_price import DEFAULT_SOURCES, PRICE_SOURCES
+from indicators import DEFAULT_INDICATOR_RULES, parse_rule
+from notifier import KIND_LABELS, EmailChannel, TelegramChannel, WebhookChannel, channels_from_env
+from report_schedule import (
+    DEFAULT_SUBSCRIBER,
+    DEFAULT_TIMEZONE,
+    CronSchedule,
+    parse_subscriber_schedules,
+    schedules_from_env,
+)
+from window_alerts import DEFAULT_WINDOW_RULES
+
+
+CONFIG_FILE = os.getenv("MONITOR_CONFIG", "monitor_config.json")
+
+# 與 main.PRICE_CHANGE_THRESHOLD 相同（main 匯入本模組，因此不反向匯入）
+DEFAULT_PRICE_CHANGE_THRESHOLD = 5.0
+
+# 重新載入時分別比對的區段
+SUBSCRIBERS = 'subscribers'
+PRICE_CHANGE = 'rules.price_change'
+WINDOWS = 'rules.windows'
+INDICATORS = 'rules.indicators'
+SCHEDULE = 'schedule'
+SOURCES = 'sources'
+CHANNELS = 'channels'
+SECTIONS = (SUBSCRIBERS, PRICE_CHANGE, WINDOWS, INDICATORS, SCHEDULE, SOURCES, CHANNELS)
+
+_TOP_LEVEL_KEYS = ('version', 'subscribers', 'rules', 'schedule', 'sources', 'channels')
+_RULE_KEYS = ('price_change', 'windows', 'indicators')
+_USER_ID_PATTERN = re.compile(r'^U[0-9a-f]{32}$')
+_ENV_PATTERN = re.compile(r'\$\{(\w+)\}')
+
+# 各類管道的必填欄位與可選欄位
+_CHANNEL_FIELDS = {
+    'webhook': (('url',), ()),
+    'telegram': (('token', 'chat_id'), ('base_url',)),
+    'email': (('host', 'to'), ('from', 'port', 'username', 'password', 'starttls')),
+}
+_CHANNEL_COMMON_FIELDS = ('type', 'kinds', 'rate', 'burst', 'concurrency')
+
+
+class ConfigError(ValueError):
+    """
+    設定檔格式錯誤（errors 列出所有問題）
+    """
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("；".join(self.errors))
+
+
+def expand_env(value):
+    """
+    Returns:
+        將字串（含巢狀的 list / dict）中的 ${VAR} 以環境變數取代後的值，未設定的變數取代為空字串
+    """
+    if isinstance(value, str):
+        return _ENV_PATTERN.sub(lambda match: os.getenv(match.group(1), ''), value)
+    if isinstance(value, list):
+        return [expand_env(item) for item in value]
+    if isinstance(value, dict):
+        return {key: expand_env(item) for key, item in value.items()}
+    return value
+
+
+def _number(errors, where, value, minimum=0.0, allow_equal=True, integer=False):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or (integer and not isinstance(value, int)):
+        errors.append(f"{where} 必須是{'整數' if integer else '數字'}: {value!r}")
+        return None
+    if value < minimum or (not allow_equal and value == minimum):
+        errors.append(f"{where} 必須{'大於或等於' if allow_equal else '大於'} {minimum:g}: {value!r}")
+        return None
+    return value
+
+
+def _unknown_keys(errors, where, data, allowed):
+    for key in data:
+        if key not in allowed:
+            errors.append(f"{where} 有未知的欄位: {key}")
+
+
+def _compile_price_change(errors, data):
+    if data is None:
+        return DEFAULT_PRICE_CHANGE_THRESHOLD, AlertPolicy()
+    if not isinstance(data, dict):
+        errors.append("rules.price_change 必須是物件")
+        return DEFAULT_PRICE_CHANGE_THRESHOLD, AlertPolicy()
+    _unknown_keys(errors, "rules.price_change", data,
+                  ('threshold', 'cooldown_seconds', 'rearm_band', 'escalation_step'))
+    threshold = _number(errors, "rules.price_change.threshold",
+                        data.get('threshold', DEFAULT_PRICE_CHANGE_THRESHOLD), allow_equal=False)
+    policy = AlertPolicy(
+        cooldown_seconds=_number(errors, "rules.price_change.cooldown_seconds",
+                                 data.get('cooldown_seconds', DEFAULT_COOLDOWN_SECONDS)),
+        rearm_band=_number(errors, "rules.price_change.rearm_band", data.get('rearm_band', DEFAULT_REARM_BAND)),
+        escalation_step=_number(errors, "rules.price_change.escalation_step",
+                                data.get('escalation_step', DEFAULT_ESCALATION_STEP)),
+    )
+    return threshold, policy
+
+
+def _compile_windows(errors, data):
+    if data is None:
+        return tuple(DEFAULT_WINDOW_RULES)
+    if not isinstance(data, list):
+        errors.append("rules.windows 必須是列表")
+        return ()
+    rules = []
+    for index, rule in enumerate(data):
+        where = f"rules.windows[{index}]"
+        if not isinstance(rule, dict):
+            errors.append(f"{where} 必須是 {{\"minutes\", \"threshold\"}} 物件")
+            continue
+        _unknown_keys(errors, where, rule, ('minutes', 'threshold'))
+        minutes = _number(errors, f"{where}.minutes", rule.get('minutes'), allow_equal=False, integer=True)
+        threshold = _number(errors, f"{where}.threshold", rule.get('threshold'), allow_equal=False)
+        if minutes is not None and threshold is not None:
+            if any(existing == minutes for existing, _ in rules):
+                errors.append(f"{where}.minutes 重複: {minutes}")
+            rules.append((minutes, float(threshold)))
+    return tuple(rules)
+
+
+def _compile_indicators(errors, data):
+    if data is None:
+        return tuple(DEFAULT_INDICATOR_RULES)
+    if not isinstance(data, list):
+        errors.append("rules.indicators 必須是列表")
+        return ()
+    rules = []
+    for index, text in enumerate(data):
+        try:
+            if not isinstance(text, str):
+                raise ValueError(f"必須是字串: {text!r}")
+            parse_rule(text)
+            rules.append(' '.join(text.split()))
+        except ValueError as e:
+            errors.append(f"rules.indicators[{index}] {e}")
+    return tuple(rules)
+
+
+def _compile_schedule(errors, data):
+    """返回 {DEFAULT_SUBSCRIBER: CronSchedule}，停用預設排程時為空 dict"""
+    if data is None:
+        return {subscriber: schedule for subscriber, schedule in schedules_from_env().items()
+                if subscriber == DEFAULT_SUBSCRIBER}
+    if not isinstance(data, dict):
+        errors.append("schedule 必須是物件")
+        return {}
+    _unknown_keys(errors, "schedule", data, ('cron', 'timezone'))
+    expression = data.get('cron')
+    if not expression:
+        return {}
+    try:
+        return {DEFAULT_SUBSCRIBER: CronSchedule(expression, data.get('timezone', DEFAULT_TIMEZONE))}
+    except ValueError as e:
+        errors.append(f"schedule {e}")
+        return {}
+
+
+def _compile_subscribers(errors, data, default_tz):
+    """返回 (Audience, {User ID: CronSchedule})，沒有 subscribers 區段時 Audience 為 None（依環境變數）"""
+    if data is None:
+        return None, parse_subscriber_schedules(os.getenv("REPORT_SCHEDULES", ""), default_tz)
+    if not isinstance(data, list):
+        errors.append("subscribers 必須是列表")
+        return Audience(), {}
+    user_ids = []
+    personal = {}
+    for index, entry in enumerate(data):
+        where = f"subscribers[{index}]"
+        if isinstance(entry, str):
+            entry = {'id': entry}
+        if not isinstance(entry, dict):
+            errors.append(f"{where} 必須是 User ID 字串或物件")
+            continue
+        _unknown_keys(errors, where, entry, ('id', 'name', 'schedule', 'timezone'))
+        user_id = str(entry.get('id') or '').strip()
+        if not _USER_ID_PATTERN.match(user_id):
+            errors.append(f"{where}.id 不是有效的 LINE User ID（U 開頭加 32 位十六進位）: {user_id!r}")
+            continue
+        if user_id in user_ids:
+            errors.append(f"{where}.id 重複: {user_id}")
+            continue
+        user_ids.append(user_id)
+        if entry.get('schedule'):
+            try:
+                personal[user_id] = CronSchedule(entry['schedule'], entry.get('timezone', default_tz))
+            except ValueError as e:
+                errors.append(f"{where}.schedule {e}")
+    if not user_ids:
+        errors.append("subscribers 至少需要一位收件者")
+    return Audience(user_ids), personal
+
+
+def _compile_sources(errors, data):
+    if data is None:
+        return tuple(DEFAULT_SOURCES)
+    if not isinstance(data, list) or not data:
+        errors.append(f"sources 必須是非空的列表，可用的來源: {', '.join(PRICE_SOURCES)}")
+        return tuple(DEFAULT_SOURCES)
+    for name in data:
+        if name not in PRICE_SOURCES:
+            errors.append(f"sources 有未知的價格來源: {name!r}（可用: {', '.join(PRICE_SOURCES)}）")
+    if len(set(data)) != len(data):
+        errors.append("sources 有重複的價格來源")
+    return tuple(name for name in data if name in PRICE_SOURCES)
+
+
+def _compile_channel(errors, where, spec):
+    if not isinstance(spec, dict):
+        errors.append(f"{where} 必須是物件")
+        return None
+    kind = spec.get('type')
+    if kind not in _CHANNEL_FIELDS:
+        errors.append(f"{where}.type 必須是 {', '.join(_CHANNEL_FIELDS)} 之一: {kind!r}")
+        return None
+    required, optional = _CHANNEL_FIELDS[kind]
+    _unknown_keys(errors, where, spec, _CHANNEL_COMMON_FIELDS + required + optional)
+    missing = [name for name in required if not spec.get(name)]
+    if missing:
+        errors.append(f"{where} 缺少必填欄位: {', '.join(missing)}")
+        return None
+    options = {}
+    kinds = spec.get('kinds')
+    if kinds is not None:
+        unknown = [name for name in kinds if name not in KIND_LABELS] if isinstance(kinds, list) else [kinds]
+        if unknown:
+            errors.append(f"{where}.kinds 有未知的通知類型: {unknown}（可用: {', '.join(KIND_LABELS)}）")
+            return None
+        options['kinds'] = kinds
+    for name in ('rate', 'burst', 'concurrency'):
+        if name in spec:
+            value = _number(errors, f"{where}.{name}", spec[name], allow_equal=False, integer=name != 'rate')
+            if value is None:
+                return None
+            options[name] = value
+    if kind == 'webhook':
+        return WebhookChannel(spec['url'], **options)
+    if kind == 'telegram':
+        if 'base_url' in spec:
+            options['base_url'] = spec['base_url']
+        return TelegramChannel(spec['token'], str(spec['chat_id']), **options)
+    recipients = spec['to'] if isinstance(spec['to'], list) else [address.strip() for address in spec['to'].split(',')]
+    port = spec.get('port', 587)
+    if _number(errors, f"{where}.port", port, allow_equal=False, integer=True) is None:
+        return None
+    return EmailChannel(spec['host'], [address for address in recipients if address],
+                        spec.get('from') or spec.get('username') or "gold-price@localhost",
+                        port=port, username=spec.get('username') or None, password=spec.get('password') or None,
+                        starttls=spec.get('starttls'), **options)
+
+
+def _compile_channels(errors, data):
+    if data is None:
+        return channels_from_env()
+    if not isinstance(data, list):
+        errors.append("channels 必須是列表")
+        return []
+    channels = [_compile_channel(errors, f"channels[{index}]", spec) for index, spec in enumerate(data)]
+    return [channel for channel in channels if channel is not None]
+
+
+class MonitorConfig:
+    """
+    驗證並編譯後的設定
+    """
+
+    def __init__(self, data=None, source='環境變數'):
+        """
+        Args:
+            data (dict, optional): 設定檔內容（已取代 ${VAR}），None 表示全部使用環境變數與預設值
+            source (str): 設定來源（顯示用）
+
+        Raises:
+            ConfigError: 設定內容有誤
+        """
+        data = {} if data is None else data
+        errors = []
+        if not isinstance(data, dict):
+            raise ConfigError(["設定檔的最上層必須是物件"])
+        _unknown_keys(errors, "設定檔", data, _TOP_LEVEL_KEYS)
+        if data.get('version', 1) != 1:
+            errors.append(f"不支援的設定檔版本: {data.get('version')!r}")
+        rules = data.get('rules') or {}
+        if not isinstance(rules, dict):
+            errors.append("rules 必須是物件")
+            rules = {}
+        _unknown_keys(errors, "rules", rules, _RULE_KEYS)
+        schedule = data.get('schedule')
+        default_tz = schedule.get('timezone', DEFAULT_TIMEZONE) if isinstance(schedule, dict) \
+            else os.getenv("REPORT_TIMEZONE", DEFAULT_TIMEZONE)
+
+        self.source = source
+        self.threshold, self.alert_policy = _compile_price_change(errors, rules.get('price_change'))
+        self.window_rules = _compile_windows(errors, rules.get('windows'))
+        self.indicator_rules = _compile_indicators(errors, rules.get('indicators'))
+        self.default_schedules = _compile_schedule(errors, schedule)
+        self.audience, self.subscriber_schedules = _compile_subscribers(errors, data.get('subscribers'), default_tz)
+        self.sources = _compile_sources(errors, data.get('sources'))
+        self.channels = _compile_channels(errors, data.get('channels'))
+        if errors:
+            raise ConfigError(errors)
+        # 各區段的正規化內容，重新載入時比對哪些區段有變動
+        self._fingerprints = {
+            SUBSCRIBERS: data.get('subscribers'),
+            PRICE_CHANGE: rules.get('price_change'),
+            WINDOWS: rules.get('windows'),
+            INDICATORS: rules.get('indicators'),
+            SCHEDULE: schedule,
+            SOURCES: data.get('sources'),
+            CHANNELS: data.get('channels'),
+        }
+        self._fingerprints = {section: json.dumps(value, sort_keys=True, ensure_ascii=False)
+                              for section, value in self._fingerprints.items()}
+
+    @property
+    def schedules(self):
+        """
+        Returns:
+            dict: 日報表排程 {訂閱者: CronSchedule}（DEFAULT_SUBSCRIBER 為預設收件對象）
+        """
+        schedules = dict(self.default_schedules)
+        report_audience = self.report_recipients()
+        if report_audience is not None and not report_audience.user_ids:
+            # 所有收件者都有自己的排程，預設排程沒有收件者
+            schedules.pop(DEFAULT_SUBSCRIBER, None)
+        schedules.update(self.subscriber_schedules)
+        return schedules
+
+    def recipients(self, default_user_id=None):
+        """
+        Args:
+            default_user_id (str, optional): 沒有 subscribers 區段且未設定 USER_IDS 時的收件者
+
+        Returns:
+            Audience: 設定檔的收件者，沒有 subscribers 區段時依環境變數（USER_IDS、LINE_BROADCAST 等）
+        """
+        if self.audience is None:
+            return Audience.from_env(default_user_id)
+        return self.audience
+
+    def report_recipients(self, default_user_id=None):
+        """
+        預設日報表的收件者：有自己排程的訂閱者只收自己排程的日報表，不重複收到預設排程的日報表
+
+        Args:
+            default_user_id (str, optional): 同 recipients
+
+        Returns:
+            Audience: 排除有自己排程的訂閱者後的收件者，沒有需要排除的訂閱者時返回 None（與 recipients 相同）
+        """
+        audience = self.recipients(default_user_id)
+        personal = set(self.subscriber_schedules)
+        # 發送給所有好友（broadcast）時無法排除個別訂閱者
+        if audience.everyone or not personal.intersection(audience.user_ids):
+            return None
+        return Audience([user_id for user_id in audience.user_ids if user_id not in personal])
+
+    def changed_sections(self, previous):
+        """
+        Args:
+            previous (MonitorConfig): 上一版設定，None 表示全部區段都視為變動
+
+        Returns:
+            list: 內容有變動的區段（SECTIONS 中的名稱）
+        """
+        if previous is None:
+            return list(SECTIONS)
+        return [section for section in SECTIONS if self._fingerprints[section] != previous._fingerprints[section]]
+
+    def summary(self):
+        """
+        Returns:
+            list: 設定摘要（每項一行）
+        """
+        policy = self.alert_policy
+        lines = [
+            f"設定來源: {self.source}",
+            f"收件者: {len(self.audience)} 位" if self.audience is not None else "收件者: 依環境變數",
+            f"價格變化警報: 閾值 {self.threshold:g}%，冷卻 {policy.cooldown_seconds:g} 秒，"
+            f"遲滯 {policy.rearm_band:g}，升級間距 {policy.escalation_step:g}",
+            "區間警報: " + ('、'.join(f"{minutes} 分鐘 {threshold:g}%" for minutes, threshold in self.window_rules)
+                        or '停用'),
+            f"技術指標規則: {len(self.indicator_rules)} 條",
+            "日報表排程: " + (' '.join(self.default_schedules[DEFAULT_SUBSCRIBER].spec)
+                           if self.default_schedules else '停用')
+            + (f"（另有 {len(self.subscriber_schedules)} 位收件者自訂排程）" if self.subscriber_schedules else ''),
+            f"價格來源: {' → '.join(self.sources)}",
+            "其他通知管道: " + ('、'.join(channel.name for channel in self.channels) or '無'),
+        ]
+        return lines
+
+
+def load_config(path=None):
+    """
+    讀取並編譯設定檔；檔案不存在時使用環境變數與預設值
+
+    Args:
+        path (str, optional): 設定檔路徑，預設為 CONFIG_FILE
+
+    Returns:
+        MonitorConfig: 設定
+
+    Raises:
+        ConfigError: 設定檔無法解析或內容有誤
+    """
+    path = path or CONFIG_FILE
+    if not os.path.exists(path):
+        return MonitorConfig()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError([f"無法讀取設定檔 {path}: {e}"])
+    return MonitorConfig(expand_env(data), source=path)
+
+
+class ConfigWatcher:
+    """
+    依修改時間重新載入設定檔
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str, optional): 設定檔路徑，預設為 CONFIG_FILE
+        """
+        self.path = path or CONFIG_FILE
+        self.config = None
+        self._stamp = None
+
+    def _current_stamp(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def load(self):
+        """
+        第一次載入設定
+
+        Returns:
+            MonitorConfig: 設定
+
+        Raises:
+            ConfigError: 設定檔內容有誤
+        """
+        self._stamp = self._current_stamp()
+        self.config = load_config(self.path)
+        return self.config
+
+    def poll(self):
+        """
+        檔案的修改時間變更時重新載入；新的設定有誤時保留目前的設定
+
+        Returns:
+            list: 有變動的區段，沒有重新載入或沒有變動時為空列表
+        """
+        stamp = self._current_stamp()
+        if stamp == self._stamp:
+            return []
+        self._stamp = stamp
+        try:
+            config = load_config(self.path)
+        except ConfigError as e:
+            print(f"✗ 設定檔有誤，繼續使用目前的設定:")
+            for error in e.errors:
+                print(f"   - {error}")
+            return []
+        changed = config.changed_sections(self.config)
+        self.config = config
+        if changed:
+            print(f"ℹ️  設定檔已重新載入，變動的區段: {', '.join(changed)}")
+        return changed
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="驗證監控設定檔並顯示編譯後的摘要")
+    parser.add_argument('path', nargs='?', default=None, help=f"設定檔路徑（預設 {CONFIG_FILE}）")
+    args = parser.parse_args()
+
+    try:
+        config = load_config(args.path)
+    except ConfigError as e:
+        print("✗ 設定檔有誤:")
+        for error in e.errors:
+            print(f"   - {error}")
+        sys.exit(1)
+    print("✓ 設定檔驗證通過")
+    for line in config.summary():
+        print(f"  {line}")
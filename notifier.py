@@ -0,0 +1,462 @@
+"""
+多管道通知
+一則通知同時送到所有訂閱的管道：LINE、SMTP 電子郵件、通用 webhook 與 Telegram 風格的 HTTP API。
+每個管道有自己的 asyncio 工作者（並行數）、權杖桶速率限制器與重試策略，
+某個管道變慢或中斷時只影響該管道的佇列，不會拖慢其他管道。
+
+額外管道以環境變數設定（未設定的管道不啟用）：
+  WEBHOOK_URL                                   → webhook（POST JSON: {"text", "kind"}）
+  TELEGRAM_BOT_TOKEN、TELEGRAM_CHAT_ID          → Telegram（TELEGRAM_API_BASE_URL 可指向替身伺服器）
+  SMTP_HOST、EMAIL_TO（逗號分隔）、EMAIL_FROM   → 電子郵件（SMTP_PORT、SMTP_USERNAME、SMTP_PASSWORD、SMTP_STARTTLS）
+  <管道>_KINDS（例如 EMAIL_KINDS=report）       → 只訂閱指定類型的通知，未設定時訂閱全部
+"""
+
+import abc
+import asyncio
+import os
+import smtplib
+import time
+import uuid
+from email.message import EmailMessage
+
+import aiohttp
+from linebot.exceptions import LineBotApiError
+
+from delivery_planner import MULTICAST, NARROWCAST, PUSH, Audience, plan_delivery
+from line_async import AsyncLineClient
+from retry_policy import RETRYABLE_STATUSES, RetryPolicy
+
+
+# 各管道預設的重試策略
+CHANNEL_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=10.0, timeout=10)
+
+# 通知類型的中文名稱（郵件主旨用）
+KIND_LABELS = {
+    'report': '日報表',
+    'alert': '價格警報',
+    'window_alert': '區間警報',
+    'indicator_alert': '指標警報',
+    'error': '錯誤通知',
+    'recovery': '恢復通知',
+}
+
+
+class ChannelError(Exception):
+    """
+    管道回報的發送錯誤
+    """
+
+    def __init__(self, message, retryable=True):
+        """
+        Args:
+            message (str): 錯誤說明
+            retryable (bool): 是否值得重試（暫時性錯誤）
+        """
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class AsyncRateLimiter:
+    """
+    權杖桶速率限制器（asyncio 版，與 backfill.HostRateLimiter 相同的演算法）
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        Args:
+            rate (float): 每秒補充的權杖數（即每秒允許的請求數）
+            burst (int): 權杖桶容量（允許的突發請求數）
+        """
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        """
+        取得一個權杖，不足時等待
+        """
+        if self._lock is None:
+            # 在事件迴圈中建立（Python 3.9 的 asyncio.Lock 會綁定建立時的迴圈）
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Channel(abc.ABC):
+    """
+    通知管道的基底類別，子類別實作 send()
+    """
+
+    name = 'channel'
+
+    def __init__(self, rate=1.0, burst=1, concurrency=1, policy=CHANNEL_RETRY_POLICY, kinds=None):
+        """
+        Args:
+            rate (float): 每秒最多發送數
+            burst (int): 允許的突發發送數
+            concurrency (int): 同時發送中的訊息數（工作者數）
+            policy (RetryPolicy): 重試策略（max_attempts、退避與單次逾時）
+            kinds (iterable, optional): 訂閱的通知類型，None 表示全部
+        """
+        self.limiter = AsyncRateLimiter(rate, burst)
+        self.concurrency = max(1, concurrency)
+        self.policy = policy
+        self.kinds = set(kinds) if kinds else None
+
+    def subscribes(self, kind):
+        return self.kinds is None or kind is None or kind in self.kinds
+
+    async def open(self):
+        """建立連線等資源（在事件迴圈中呼叫）"""
+
+    async def close(self):
+        """釋放資源"""
+
+    @abc.abstractmethod
+    async def send(self, text, kind=None, delivery=None):
+        """
+        發送一則訊息，失敗時拋出 ChannelError 或網路例外
+
+        Args:
+            text (str): 訊息內容
+            kind (str, optional): 通知類型
+            delivery (dict, optional): 同一則通知各次嘗試共用的狀態，重試時由 Notifier 傳入同一個 dict
+        """
+
+
+class _HTTPChannel(Channel):
+    """以共用的 aiohttp 連線池 POST JSON 的管道"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._session = None
+
+    async def open(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _post(self, url, payload):
+        """
+        Returns:
+            dict: 回應內容
+
+        Raises:
+            ChannelError: 回應錯誤狀態碼（依 retry_statuses 判斷是否可重試）
+        """
+        await self.open()
+        async with self._session.post(url, json=payload,
+                                      timeout=aiohttp.ClientTimeout(total=self.policy.timeout)) as response:
+            try:
+                content = await response.json(content_type=None)
+            except ValueError:
+                content = None
+            if response.status >= 400:
+                raise ChannelError(f"HTTP {response.status}", retryable=response.status in self.policy.retry_statuses)
+            return content if isinstance(content, dict) else {}
+
+
+class WebhookChannel(_HTTPChannel):
+    """
+    通用 webhook：POST {"text": 訊息, "kind": 類型}
+    """
+
+    name = 'webhook'
+
+    def __init__(self, url, rate=5.0, burst=5, concurrency=4, **kwargs):
+        super().__init__(rate=rate, burst=burst, concurrency=concurrency, **kwargs)
+        self.url = url
+
+    async def send(self, text, kind=None, delivery=None):
+        await self._post(self.url, {'text': text, 'kind': kind})
+
+
+class TelegramChannel(_HTTPChannel):
+    """
+    Telegram Bot API 風格的 sendMessage（單一聊天室每秒約 1 則）
+    """
+
+    name = 'telegram'
+
+    def __init__(self, token, chat_id, base_url="https://api.telegram.org", rate=1.0, burst=1, concurrency=1,
+                 **kwargs):
+        super().__init__(rate=rate, burst=burst, concurrency=concurrency, **kwargs)
+        self.url = f"{base_url.rstrip('/')}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+
+    async def send(self, text, kind=None, delivery=None):
+        content = await self._post(self.url, {'chat_id': self.chat_id, 'text': text})
+        if not content.get('ok', False):
+            raise ChannelError(f"Telegram 回應錯誤: {content.get('description', content)}", retryable=False)
+
+
+class EmailChannel(Channel):
+    """
+    以 SMTP 寄送電子郵件（smtplib 在執行緒中執行，不阻塞事件迴圈）
+    """
+
+    name = 'email'
+
+    def __init__(self, host, recipients, sender, port=587, username=None, password=None, starttls=None,
+                 rate=0.5, burst=2, concurrency=2, **kwargs):
+        """
+        Args:
+            host (str): SMTP 主機
+            recipients (list): 收件者
+            sender (str): 寄件者
+            port (int): SMTP 埠號
+            username (str, optional): 登入帳號
+            password (str, optional): 登入密碼
+            starttls (bool, optional): 是否使用 STARTTLS，未指定時有登入帳號才使用
+        """
+        super().__init__(rate=rate, burst=burst, concurrency=concurrency, **kwargs)
+        self.host = host
+        self.port = port
+        self.recipients = list(recipients)
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = bool(username) if starttls is None else starttls
+
+    def _send_sync(self, text, kind):
+        message = EmailMessage()
+        message['Subject'] = f"黃金價格監控 - {KIND_LABELS.get(kind, '通知')}"
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content(text)
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.policy.timeout) as smtp:
+                if self.starttls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password or '')
+                smtp.send_message(message)
+        except smtplib.SMTPResponseException as e:
+            # 4xx 為暫時性錯誤，5xx 為永久性錯誤
+            raise ChannelError(f"SMTP {e.smtp_code}: {e.smtp_error!r}", retryable=400 <= e.smtp_code < 500)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise ChannelError(f"收件者被拒絕: {list(e.recipients)}", retryable=False)
+
+    async def send(self, text, kind=None, delivery=None):
+        await asyncio.to_thread(self._send_sync, text, kind)
+
+
+class LineChannel(Channel):
+    """
+    以非同步 LINE 用戶端發送，多位收件者時依 delivery_planner 改用 multicast / narrowcast / broadcast。
+    每個步驟有固定的 X-Line-Retry-Key，重試時只重送尚未送達的步驟
+    """
+
+    name = 'line'
+
+    def __init__(self, audience, token=None, base_url=None, rate=20.0, burst=20, concurrency=8, **kwargs):
+        """
+        Args:
+            audience (Audience): 收件對象
+            token (str, optional): Channel Access Token，未指定時使用 CHANNEL_ACCESS_TOKEN
+            base_url (str, optional): Messaging API 基礎網址
+        """
+        super().__init__(rate=rate, burst=burst, concurrency=concurrency, **kwargs)
+        self.audience = audience
+        self.client = AsyncLineClient(token, base_url, pool_size=self.concurrency, timeout=self.policy.timeout)
+
+    async def open(self):
+        await self.client.open()
+
+    async def close(self):
+        await self.client.close()
+
+    async def send(self, text, kind=None, delivery=None):
+        delivery = {} if delivery is None else delivery
+        if 'steps' not in delivery:
+            # 第一次嘗試時規劃步驟並產生各步驟的 retry key，重試時沿用
+            delivery['steps'] = [(step, str(uuid.uuid4())) for step in plan_delivery(self.audience)]
+            delivery['done'] = set()
+        if not delivery['steps']:
+            raise ChannelError("沒有可用的 LINE 收件者", retryable=False)
+        for index, (step, retry_key) in enumerate(delivery['steps']):
+            if index in delivery['done']:
+                continue
+            try:
+                await self._send_step(step, text, retry_key)
+            except LineBotApiError as e:
+                # 409：先前逾時的嘗試其實已被接受，視為已送達
+                if e.status_code != 409:
+                    raise ChannelError(f"LINE {e.status_code}: {e.error.message if e.error else e}",
+                                       retryable=e.status_code in RETRYABLE_STATUSES)
+            delivery['done'].add(index)
+
+    async def _send_step(self, step, text, retry_key):
+        if step['kind'] == PUSH:
+            await self.client.push(step['to'], text, retry_key=retry_key)
+        elif step['kind'] == MULTICAST:
+            await self.client.multicast(step['to'], text, retry_key=retry_key)
+        elif step['kind'] == NARROWCAST:
+            await self.client.narrowcast(step['audience_group_id'], text, retry_key=retry_key)
+        else:
+            await self.client.broadcast(text, retry_key=retry_key)
+
+
+class Notifier:
+    """
+    將通知分送到所有訂閱的管道，每個管道有自己的佇列與工作者
+    """
+
+    def __init__(self, channels):
+        """
+        Args:
+            channels (list): Channel 物件
+        """
+        self.channels = list(channels)
+        self._queues = []  # 與 channels 對應的佇列
+        self._workers = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def start(self):
+        """開啟各管道並啟動工作者"""
+        for channel in self.channels:
+            await channel.open()
+            queue = asyncio.Queue()
+            self._queues.append(queue)
+            self._workers.extend(asyncio.create_task(self._worker(channel, queue), name=f"{channel.name}-{n}")
+                                 for n in range(channel.concurrency))
+
+    async def stop(self):
+        """等待佇列中的訊息發送完畢後停止工作者並關閉各管道"""
+        for queue in self._queues:
+            await queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queues = []
+        for channel in self.channels:
+            await channel.close()
+
+    async def notify(self, text, kind=None):
+        """
+        同時發送到所有訂閱此類型的管道
+
+        Args:
+            text (str): 訊息內容
+            kind (str, optional): 通知類型（report、alert 等）
+
+        Returns:
+            dict: {管道: 是否送達}（以管道物件為鍵，同類型的多個管道各有一筆結果）
+        """
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for channel, queue in zip(self.channels, self._queues):
+            if channel.subscribes(kind):
+                future = futures[channel] = loop.create_future()
+                await queue.put((text, kind, future))
+        results = await asyncio.gather(*futures.values())
+        return dict(zip(futures, results))
+
+    async def _worker(self, channel, queue):
+        while True:
+            text, kind, future = await queue.get()
+            try:
+                delivered = await self._send_with_retry(channel, text, kind)
+                if not future.done():
+                    future.set_result(delivered)
+            finally:
+                queue.task_done()
+
+    async def _send_with_retry(self, channel, text, kind):
+        """
+        依管道的速率限制與重試策略發送
+
+        Returns:
+            bool: 送達返回 True
+        """
+        policy = channel.policy
+        delivery = {}  # 各次嘗試共用，管道據此只重送尚未完成的部分
+        for attempt in range(policy.max_attempts):
+            await channel.limiter.acquire()
+            try:
+                await asyncio.wait_for(channel.send(text, kind, delivery), policy.timeout)
+                print(f"✓ [{channel.name}] 通知已送達")
+                return True
+            except ChannelError as e:
+                if not e.retryable:
+                    print(f"✗ [{channel.name}] 通知發送失敗: {e}")
+                    return False
+                print(f"  [{channel.name}] 暫時性錯誤: {e}")
+            except (asyncio.TimeoutError, aiohttp.ClientError, OSError) as e:
+                print(f"  [{channel.name}] 網路錯誤: {type(e).__name__}")
+            except Exception as e:
+                print(f"✗ [{channel.name}] 通知發送時發生錯誤: {e}")
+                return False
+            if attempt < policy.max_attempts - 1:
+                await asyncio.sleep(policy.backoff(attempt))
+        print(f"✗ [{channel.name}] 通知發送失敗（已嘗試 {policy.max_attempts} 次）")
+        return False
+
+
+def _kinds_from_env(prefix):
+    value = os.getenv(f"{prefix}_KINDS", "")
+    return [kind.strip() for kind in value.split(',') if kind.strip()] or None
+
+
+def channels_from_env(include_line=False):
+    """
+    依環境變數建立通知管道
+
+    Args:
+        include_line (bool): 是否包含 LINE 管道（main.py 與 daemon.py 的 LINE 通知另經額度追蹤與 outbox 發送）
+
+    Returns:
+        list: Channel 物件
+    """
+    channels = []
+    if include_line:
+        channels.append(LineChannel(Audience.from_env(os.getenv("USER_ID")), kinds=_kinds_from_env('LINE')))
+    if os.getenv("WEBHOOK_URL"):
+        channels.append(WebhookChannel(os.getenv("WEBHOOK_URL"), kinds=_kinds_from_env('WEBHOOK')))
+    if os.getenv("TELEGRAM_BOT_TOKEN") and os.getenv("TELEGRAM_CHAT_ID"):
+        channels.append(TelegramChannel(os.getenv("TELEGRAM_BOT_TOKEN"), os.getenv("TELEGRAM_CHAT_ID"),
+                                        os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org"),
+                                        kinds=_kinds_from_env('TELEGRAM')))
+    recipients = [address.strip() for address in os.getenv("EMAIL_TO", "").split(',') if address.strip()]
+    if os.getenv("SMTP_HOST") and recipients:
+        starttls = os.getenv("SMTP_STARTTLS")
+        channels.append(EmailChannel(os.getenv("SMTP_HOST"), recipients,
+                                     os.getenv("EMAIL_FROM") or os.getenv("SMTP_USERNAME") or "gold-price@localhost",
+                                     port=int(os.getenv("SMTP_PORT", "587")),
+                                     username=os.getenv("SMTP_USERNAME"), password=os.getenv("SMTP_PASSWORD"),
+                                     starttls=None if starttls is None else starttls in ("1", "true", "yes"),
+                                     kinds=_kinds_from_env('EMAIL')))
+    return channels
+
+
+def notify_channels(channels, text, kind=None):
+    """
+    同步版本：啟動工作者、分送一則通知後關閉（供 main.py 單次執行使用）
+
+    Returns:
+        dict: {管道: 是否送達}
+    """
+    async def run():
+        async with Notifier(channels) as notifier:
+            return await notifier.notify(text, kind)
+    return asyncio.run(run())
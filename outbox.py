@@ -0,0 +1,266 @@
+"""
+通知 outbox：跨執行至少送達一次
+LINE 無法連線時，main() 該次的日報表或警報原本會直接遺失，last_report_time.json 也不會更新，
+下一次執行的判斷因此改變。本模組在發送前先把通知附加到 notification_outbox.jsonl，送達後再附加一筆完成紀錄：
+  - 本次執行只做一次短暫的發送（OUTBOX_SEND_SECONDS 秒內），LINE 中斷時不會耗盡整次執行的時間預算
+  - 未送達的通知留在 outbox，下次執行（或常駐程式的下一次擷取）以相同的通知 ID 重送；
+    LineDelivery 沿用同一個 retry key，先前其實已送達的通知不會重複推播
+  - 超過 OUTBOX_MAX_AGE_SECONDS 的通知已失去時效，標記為過期不再重送
+紀錄檔只附加寫入（寫入後 fsync），已完成的紀錄累積過多時改寫為只含待送通知的新檔。
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from retry_policy import Deadline, get_run_deadline
+
+
+OUTBOX_FILE = "notification_outbox.jsonl"
+OUTBOX_MAX_AGE_SECONDS = 6 * 60 * 60
+# 本次執行中每則通知的發送時間預算（含重試），其餘交給下次重送
+OUTBOX_SEND_SECONDS = 15
+# 紀錄檔超過此筆數時改寫
+COMPACT_THRESHOLD = 200
+
+# deliver() 的結果
+DELIVERED = 'delivered'  # 已送達
+QUEUED = 'queued'  # 未送達，已保留在 outbox 待重送
+FAILED = 'failed'  # 未送達，且無法寫入 outbox
+
+
+def send_deadline(seconds=OUTBOX_SEND_SECONDS):
+    """
+    Returns:
+        Deadline: 單則通知的發送預算（不超過本次執行的剩餘預算）
+    """
+    return Deadline(get_run_deadline().clamp(seconds))
+
+
+def format_replay_message(entry):
+    """
+    在重送的通知前加上原定發送時間
+
+    Args:
+        entry (dict): outbox 中的通知
+
+    Returns:
+        str: 重送的訊息內容
+    """
+    queued_at = datetime.fromtimestamp(entry['created_at'], timezone(timedelta(hours=8)))
+    return f"⏱ 延遲送達（原定 {queued_at.strftime('%Y-%m-%d %H:%M')} 發送）\n\n" + entry['message']
+
+
+class Outbox:
+    """
+    附加寫入的通知紀錄，保存尚未送達的通知
+    """
+
+    def __init__(self, path=OUTBOX_FILE, max_age=OUTBOX_MAX_AGE_SECONDS):
+        """
+        Args:
+            path (str): 紀錄檔路徑
+            max_age (float): 通知的有效秒數，超過後不再重送
+        """
+        self.path = path
+        self.max_age = max_age
+        self.entries = {}  # 待送通知 {通知 ID: {'id', 'message', 'user_id', 'kind', 'created_at'}}
+        self._records = 0  # 紀錄檔目前的筆數
+        self._in_flight = set()  # 發送中的通知，重送時略過
+        self._lock = threading.Lock()  # 常駐程式會在多個執行緒同時發送
+
+    def _append(self, record):
+        """
+        附加一筆紀錄並寫入磁碟
+
+        Returns:
+            bool: 寫入成功返回 True
+        """
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._records += 1
+            return True
+        except Exception as e:
+            print(f"⚠️  寫入通知 outbox 時發生錯誤: {e}")
+            return False
+
+    def enqueue(self, message, notification_id=None, user_id=None, kind=None, now=None):
+        """
+        在發送前記錄一則通知
+
+        Args:
+            message (str): 訊息內容
+            notification_id (str, optional): 邏輯通知 ID，未指定時產生新的 ID
+            user_id (str, optional): 收件者，未指定時依收件對象發送
+            kind (str, optional): 通知類型（report、alert 等，記錄用）
+            now (float, optional): 目前時間戳
+
+        Returns:
+            str: 通知 ID，無法寫入紀錄檔時返回 None
+        """
+        notification_id = notification_id or f"notify:{uuid.uuid4()}"
+        with self._lock:
+            if notification_id in self.entries:
+                return notification_id
+            entry = {'id': notification_id, 'message': message, 'user_id': user_id, 'kind': kind,
+                     'created_at': time.time() if now is None else now}
+            if not self._append(dict(entry, op='add')):
+                return None
+            self.entries[notification_id] = entry
+        return notification_id
+
+    def mark(self, notification_id, op='done', now=None):
+        """
+        記錄通知已送達（op='done'）或已過期（op='expired'）
+        """
+        with self._lock:
+            if self.entries.pop(notification_id, None) is None:
+                return
+            self._append({'op': op, 'id': notification_id, 'at': time.time() if now is None else now})
+            compact = self._records >= COMPACT_THRESHOLD
+        if compact:
+            self.compact()
+
+    def deliver(self, message, send, notification_id=None, user_id=None, kind=None, now=None):
+        """
+        先寫入 outbox 再發送一次；送達時標記完成，未送達的留待下次重送
+
+        Args:
+            message (str): 訊息內容
+            send (callable): send(message, user_id, notification_id) 發送，送達時返回 True
+            notification_id (str, optional): 邏輯通知 ID
+            user_id (str, optional): 收件者
+            kind (str, optional): 通知類型
+            now (float, optional): 目前時間戳
+
+        Returns:
+            str: DELIVERED、QUEUED 或 FAILED
+        """
+        notification_id = notification_id or f"notify:{uuid.uuid4()}"
+        stored = self.enqueue(message, notification_id, user_id, kind, now) is not None
+        with self._lock:
+            self._in_flight.add(notification_id)
+        try:
+            delivered = send(message, user_id, notification_id)
+        except Exception as e:
+            print(f"✗ 發送通知時發生錯誤: {e}")
+            delivered = False
+        finally:
+            with self._lock:
+                self._in_flight.discard(notification_id)
+        if delivered:
+            self.mark(notification_id, now=now)
+            return DELIVERED
+        if stored:
+            print(f"⚠️  通知暫時無法送達，已保留在 outbox，下次執行時重送（{notification_id}）")
+            return QUEUED
+        return FAILED
+
+    def pending(self):
+        """
+        Returns:
+            list: 待送通知（不含發送中的），依建立時間排序
+        """
+        with self._lock:
+            entries = [entry for notification_id, entry in self.entries.items()
+                       if notification_id not in self._in_flight]
+        return sorted(entries, key=lambda entry: entry['created_at'])
+
+    def expire(self, now=None):
+        """
+        將超過有效時間的通知標記為過期
+
+        Returns:
+            list: 過期的通知
+        """
+        now = time.time() if now is None else now
+        expired = [entry for entry in self.pending() if now - entry['created_at'] > self.max_age]
+        for entry in expired:
+            print(f"⚠️  通知 {entry['id']} 已超過 {self.max_age / 3600:.0f} 小時仍未送達，不再重送")
+            self.mark(entry['id'], op='expired', now=now)
+        return expired
+
+    def replay(self, send, now=None):
+        """
+        重送 outbox 中的待送通知（先清除過期的）；某則仍無法送達時停止，其餘留待下次
+
+        Args:
+            send (callable): send(message, user_id, notification_id) 發送，送達時返回 True
+            now (float, optional): 目前時間戳
+
+        Returns:
+            tuple: (本次送達數, 仍待送數)
+        """
+        self.expire(now)
+        delivered = 0
+        for entry in self.pending():
+            print(f"ℹ️  重送先前未送達的通知 {entry['id']}（{entry.get('kind') or '通知'}）")
+            with self._lock:
+                self._in_flight.add(entry['id'])
+            try:
+                ok = send(format_replay_message(entry), entry['user_id'], entry['id'])
+            except Exception as e:
+                print(f"✗ 重送通知時發生錯誤: {e}")
+                ok = False
+            finally:
+                with self._lock:
+                    self._in_flight.discard(entry['id'])
+            if not ok:
+                print("⚠️  LINE 仍無法送達，其餘通知留待下次重送")
+                break
+            self.mark(entry['id'], now=now)
+            delivered += 1
+        return delivered, len(self.entries)
+
+    @classmethod
+    def load(cls, path=OUTBOX_FILE, max_age=OUTBOX_MAX_AGE_SECONDS):
+        """
+        讀取紀錄檔（寫到一半的最後一筆會被略過）
+
+        Returns:
+            Outbox: outbox
+        """
+        outbox = cls(path, max_age)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            print("⚠️  通知 outbox 有不完整的紀錄，已略過")
+                            continue
+                        outbox._records += 1
+                        op = record.pop('op', None)
+                        if op == 'add':
+                            outbox.entries[record['id']] = record
+                        else:
+                            outbox.entries.pop(record.get('id'), None)
+        except Exception as e:
+            print(f"⚠️  讀取通知 outbox 時發生錯誤: {e}")
+        return outbox
+
+    def compact(self):
+        """
+        改寫紀錄檔，只保留待送通知
+        """
+        with self._lock:
+            if self._records == len(self.entries):
+                return
+            try:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for entry in self.entries.values():
+                        f.write(json.dumps(dict(entry, op='add'), ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._records = len(self.entries)
+            except Exception as e:
+                print(f"⚠️  改寫通知 outbox 時發生錯誤: {e}")
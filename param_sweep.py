@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+警報參數掃描工具
+以回補的歷史價格（price_history.json）評估大量「閾值 / 視窗 / 冷卻時間」組合：
+  - 警報規則：價格在視窗內相對最低價上漲或相對最高價下跌超過閾值（與 window_alerts.py 相同），
+    觸發後在冷卻時間內不再通知
+  - 事件：價格在 event_horizon 小時內變化超過 event_move%，視為應該被提前通知的行情
+每個組合回報警報次數、每 30 天警報數（LINE 額度）、提前捕捉的事件數與平均提前時間。
+
+同一視窗的所有閾值以 NumPy 一次向量化計算，不同視窗分散到多個行程平行執行。
+"""
+
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from price_history import HISTORY_FILE, get_price_series, load_price_history
+from range_index import HOURLY, aggregate_series
+
+
+DEFAULT_THRESHOLDS = "1:8:0.25"      # 起點:終點（含）:間距，單位 %
+DEFAULT_WINDOWS = "1,2,3,4,6,8,12,18,24,48"  # 小時
+DEFAULT_COOLDOWNS = "0,1,2,3,6,12,24"        # 小時
+DEFAULT_EVENT_MOVE = 3.0
+DEFAULT_EVENT_HORIZON = 24
+DEFAULT_MIN_LEAD = 1  # 至少提前幾小時才算捕捉到事件
+
+# 行程池中共用的價格與事件（由 initializer 設定，避免每個工作重複傳送）
+_PRICES = None
+_EVENTS = None
+_EVENT_HORIZON = None
+_MIN_LEAD = None
+
+
+def parse_range(text):
+    """
+    解析 "起點:終點:間距" 或逗號分隔的數值
+
+    Returns:
+        list: 數值
+    """
+    if ':' in text:
+        start, stop, step = (float(part) for part in text.split(':'))
+        return [round(value, 6) for value in np.arange(start, stop + step / 2, step)]
+    return [float(part) for part in text.split(',') if part.strip()]
+
+
+def resample_hourly(series):
+    """
+    將價格序列轉為每小時一筆的等距收盤價（缺少的小時沿用前一筆）
+
+    Returns:
+        ndarray: 每小時收盤價
+    """
+    starts, _, _, closes = aggregate_series(series, HOURLY)
+    if not starts:
+        return np.array([], dtype=float)
+    starts = np.asarray(starts)
+    grid = np.arange(starts[0], starts[-1] + 1, HOURLY)
+    positions = np.searchsorted(starts, grid, side='right') - 1
+    return np.asarray(closes, dtype=float)[positions]
+
+
+def window_moves(prices, window):
+    """
+    Returns:
+        tuple: (相對視窗最低價的漲幅 %, 相對視窗最高價的跌幅 %)，視窗不足處為 0
+    """
+    rise = np.zeros(len(prices))
+    drop = np.zeros(len(prices))
+    if len(prices) > window:
+        windows = np.lib.stride_tricks.sliding_window_view(prices, window + 1)
+        low = windows.min(axis=1)
+        high = windows.max(axis=1)
+        current = prices[window:]
+        rise[window:] = (current - low) / low * 100
+        drop[window:] = (high - current) / high * 100
+    return rise, drop
+
+
+def apply_cooldown(candidates, cooldown):
+    """
+    依冷卻時間篩選觸發點：觸發後 cooldown 小時內的候選點不再通知
+
+    Args:
+        candidates (ndarray): 條件成立的索引（遞增）
+        cooldown (int): 冷卻小時數
+
+    Returns:
+        ndarray: 實際通知的索引
+    """
+    if cooldown <= 1 or len(candidates) == 0:
+        return candidates
+    selected = []
+    position = 0
+    while position < len(candidates):
+        index = candidates[position]
+        selected.append(index)
+        position = np.searchsorted(candidates, index + cooldown, side='left')
+    return np.asarray(selected, dtype=candidates.dtype)
+
+
+def find_events(prices, move, horizon):
+    """
+    找出 horizon 小時內變化超過 move% 的行情起點（同一段行情只記一次）
+
+    Returns:
+        ndarray: 事件索引（價格首次達到變化幅度的時間點）
+    """
+    if len(prices) <= horizon:
+        return np.array([], dtype=np.int64)
+    rise, drop = window_moves(prices, horizon)
+    candidates = np.flatnonzero(np.maximum(rise, drop) >= move)
+    return apply_cooldown(candidates, horizon)
+
+
+def score_alerts(alerts, events, horizon, total_hours, min_lead=DEFAULT_MIN_LEAD):
+    """
+    Args:
+        alerts (ndarray): 警報索引
+        events (ndarray): 事件索引
+        horizon (int): 事件時間範圍（小時）
+        total_hours (int): 歷史資料小時數
+        min_lead (int): 警報至少早於事件幾小時才算捕捉
+
+    Returns:
+        dict: 警報次數、每 30 天警報數、捕捉事件數、平均提前小時數、有效警報比例
+    """
+    result = {
+        'alerts': int(len(alerts)),
+        'alerts_per_30d': len(alerts) / max(total_hours / 720, 1e-9),
+        'events': int(len(events)),
+        'caught': 0,
+        'mean_lead_hours': float('nan'),
+        'precision': float('nan'),
+    }
+    if len(events) and len(alerts):
+        # 每個事件取 (事件 - horizon, 事件 - min_lead] 之間最早的警報
+        lo = np.searchsorted(alerts, events - horizon + 1, side='left')
+        hi = np.searchsorted(alerts, events - min_lead, side='right')
+        caught = lo < hi
+        result['caught'] = int(caught.sum())
+        if caught.any():
+            result['mean_lead_hours'] = float((events[caught] - alerts[lo[caught]]).mean())
+        # 警報後 horizon 小時內出現事件視為有效警報
+        next_event = np.searchsorted(events, alerts, side='left')
+        has_next = next_event < len(events)
+        useful = np.zeros(len(alerts), dtype=bool)
+        useful[has_next] = events[next_event[has_next]] - alerts[has_next] < horizon
+        result['precision'] = float(useful.mean())
+    return result
+
+
+def evaluate_window(prices, events, event_horizon, window, thresholds, cooldowns, min_lead=DEFAULT_MIN_LEAD):
+    """
+    評估單一視窗下所有閾值與冷卻時間組合（所有閾值一次向量化比較）
+
+    Returns:
+        list: 每個組合的結果 dict
+    """
+    rise, drop = window_moves(prices, int(window))
+    move = np.maximum(rise, drop)
+    # 形狀 (閾值數, 小時數) 的觸發條件
+    triggered = move[np.newaxis, :] >= np.asarray(thresholds)[:, np.newaxis]
+    results = []
+    for threshold, row in zip(thresholds, triggered):
+        candidates = np.flatnonzero(row)
+        for cooldown in cooldowns:
+            alerts = apply_cooldown(candidates, int(cooldown))
+            result = score_alerts(alerts, events, event_horizon, len(prices), min_lead)
+            result.update({'threshold': threshold, 'window_hours': window, 'cooldown_hours': cooldown})
+            results.append(result)
+    return results
+
+
+def _init_worker(prices, events, event_horizon, min_lead):
+    global _PRICES, _EVENTS, _EVENT_HORIZON, _MIN_LEAD
+    _PRICES, _EVENTS, _EVENT_HORIZON, _MIN_LEAD = prices, events, event_horizon, min_lead
+
+
+def _evaluate_window_task(args):
+    window, thresholds, cooldowns = args
+    return evaluate_window(_PRICES, _EVENTS, _EVENT_HORIZON, window, thresholds, cooldowns, _MIN_LEAD)
+
+
+def run_sweep(prices, thresholds, windows, cooldowns, event_move=DEFAULT_EVENT_MOVE,
+              event_horizon=DEFAULT_EVENT_HORIZON, min_lead=DEFAULT_MIN_LEAD, workers=None):
+    """
+    執行參數掃描
+
+    Args:
+        prices (ndarray): 每小時收盤價
+        thresholds (list): 閾值 %
+        windows (list): 視窗小時數
+        cooldowns (list): 冷卻小時數
+        event_move (float): 事件的變化幅度 %
+        event_horizon (int): 事件的時間範圍（小時）
+        min_lead (int): 警報至少早於事件幾小時才算捕捉
+        workers (int, optional): 行程數，1 表示在目前行程執行
+
+    Returns:
+        list: 所有組合的結果 dict
+    """
+    prices = np.asarray(prices, dtype=float)
+    events = find_events(prices, event_move, event_horizon)
+    tasks = [(window, list(thresholds), list(cooldowns)) for window in windows]
+    results = []
+    if workers == 1:
+        for window, task_thresholds, task_cooldowns in tasks:
+            results.extend(evaluate_window(prices, events, event_horizon, window,
+                                           task_thresholds, task_cooldowns, min_lead))
+        return results
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(prices, events, event_horizon, min_lead)) as executor:
+        for window_results in executor.map(_evaluate_window_task, tasks):
+            results.extend(window_results)
+    return results
+
+
+def rank_results(results, max_per_30d=None):
+    """
+    依「捕捉事件數多、警報少」排序，可限制每 30 天警報數（LINE 額度）
+
+    Returns:
+        list: 排序後的結果
+    """
+    if max_per_30d is not None:
+        results = [r for r in results if r['alerts_per_30d'] <= max_per_30d]
+    return sorted(results, key=lambda r: (-r['caught'], r['alerts'], -np.nan_to_num(r['mean_lead_hours'])))
+
+
+def print_results(results, top=20):
+    print(f"{'閾值%':>6} {'視窗h':>6} {'冷卻h':>6} {'警報':>6} {'每30天':>8} {'捕捉':>9} {'提前h':>7} {'有效率':>7}")
+    for r in results[:top]:
+        lead = f"{r['mean_lead_hours']:.1f}" if not np.isnan(r['mean_lead_hours']) else '-'
+        precision = f"{r['precision'] * 100:.0f}%" if not np.isnan(r['precision']) else '-'
+        print(f"{r['threshold']:>6.2f} {r['window_hours']:>6.0f} {r['cooldown_hours']:>6.0f} "
+              f"{r['alerts']:>6} {r['alerts_per_30d']:>8.1f} {r['caught']:>4}/{r['events']:<4} "
+              f"{lead:>7} {precision:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="以歷史價格掃描警報閾值、視窗與冷卻時間")
+    parser.add_argument('--history-file', default=HISTORY_FILE, help="歷史價格檔案")
+    parser.add_argument('--source', default=None, help="只使用指定來源（coingecko / binance）")
+    parser.add_argument('--thresholds', default=DEFAULT_THRESHOLDS, help="閾值 %%，例如 1:8:0.25 或 2,3,5")
+    parser.add_argument('--windows', default=DEFAULT_WINDOWS, help="視窗小時數")
+    parser.add_argument('--cooldowns', default=DEFAULT_COOLDOWNS, help="冷卻小時數")
+    parser.add_argument('--event-move', type=float, default=DEFAULT_EVENT_MOVE, help="事件變化幅度 %%")
+    parser.add_argument('--event-horizon', type=int, default=DEFAULT_EVENT_HORIZON, help="事件時間範圍（小時）")
+    parser.add_argument('--min-lead', type=int, default=DEFAULT_MIN_LEAD, help="至少提前幾小時才算捕捉到事件")
+    parser.add_argument('--max-per-30d', type=float, default=None, help="每 30 天最多警報數（LINE 額度）")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="行程數")
+    parser.add_argument('--top', type=int, default=20, help="顯示前幾名")
+    parser.add_argument('--csv', default=None, help="輸出所有結果到 CSV 檔")
+    args = parser.parse_args()
+
+    prices = resample_hourly(get_price_series(load_price_history(args.history_file), source=args.source))
+    if len(prices) == 0:
+        print(f"✗ {args.history_file} 沒有歷史價格，請先執行 backfill.py")
+        raise SystemExit(1)
+
+    thresholds = parse_range(args.thresholds)
+    windows = parse_range(args.windows)
+    cooldowns = parse_range(args.cooldowns)
+    print(f"歷史資料: {len(prices)} 小時，組合數: {len(thresholds) * len(windows) * len(cooldowns)}")
+
+    results = run_sweep(prices, thresholds, windows, cooldowns, args.event_move, args.event_horizon,
+                        args.min_lead, args.workers)
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"✓ 已輸出 {len(results)} 筆結果到 {args.csv}")
+    print_results(rank_results(results, args.max_per_30d), args.top)
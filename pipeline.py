@@ -0,0 +1,212 @@
+"""
+非同步分段處理管線
+各處理階段以有界 asyncio 佇列串接，每個階段有自己的並行數，
+佇列滿時依溢位策略處理：
+  - BLOCK: 上游等待（背壓）
+  - DROP_OLDEST: 丟棄最舊的項目
+  - COALESCE: 相同鍵值的項目以新值取代舊值；佇列已滿時丟棄最舊的可合併項目，
+              沒有可合併項目時才讓上游等待
+"""
+
+import asyncio
+from collections import deque
+
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+COALESCE = 'coalesce'
+
+OVERFLOW_POLICIES = (BLOCK, DROP_OLDEST, COALESCE)
+
+
+class BoundedQueue:
+    """
+    支援溢位策略的有界非同步佇列
+    """
+
+    def __init__(self, maxsize, policy=BLOCK, key=None):
+        """
+        Args:
+            maxsize (int): 佇列容量
+            policy (str): 溢位策略（BLOCK、DROP_OLDEST、COALESCE）
+            key (callable, optional): COALESCE 策略用的鍵值函數，返回 None 表示該項目不可合併
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢位策略: {policy}")
+        if policy == COALESCE and key is None:
+            raise ValueError("COALESCE 策略需要提供 key 函數")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.key = key
+        self.dropped = 0
+        self.coalesced = 0
+        self._items = deque()
+        # 延後到事件迴圈中才建立（Python 3.9 的 Condition 建立時即綁定事件迴圈）
+        self._condition = None
+
+    @property
+    def _changed(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def qsize(self):
+        return len(self._items)
+
+    async def put(self, item):
+        """放入項目，依溢位策略處理佇列已滿的情況"""
+        async with self._changed:
+            if self.policy == COALESCE and self._replace_same_key(item):
+                self.coalesced += 1
+                self._changed.notify_all()
+                return
+            while len(self._items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                    break
+                if self.policy == COALESCE and self._evict_oldest_coalescable():
+                    self.dropped += 1
+                    break
+                await self._changed.wait()
+            self._items.append(item)
+            self._changed.notify_all()
+
+    async def get(self):
+        """取出最舊的項目，佇列為空時等待"""
+        async with self._changed:
+            while not self._items:
+                await self._changed.wait()
+            item = self._items.popleft()
+            self._changed.notify_all()
+            return item
+
+    def _replace_same_key(self, item):
+        item_key = self.key(item)
+        if item_key is None:
+            return False
+        for index, queued in enumerate(self._items):
+            if self.key(queued) == item_key:
+                self._items[index] = item
+                return True
+        return False
+
+    def _evict_oldest_coalescable(self):
+        for index, queued in enumerate(self._items):
+            if self.key(queued) is not None:
+                del self._items[index]
+                return True
+        return False
+
+
+class Stage:
+    """
+    管線中的一個處理階段
+    handler 為 async 函數，接收一個項目並返回：
+      None（不往下游傳遞）、單一項目，或項目的 list
+    """
+
+    def __init__(self, name, handler, concurrency=1, queue_size=100, overflow=BLOCK, key=None, queue=None,
+                 pending=None):
+        """
+        Args:
+            name (str): 階段名稱
+            handler (callable): async 處理函數
+            concurrency (int): 同時處理的工作數
+            queue_size (int): 輸入佇列容量
+            overflow (str): 輸入佇列的溢位策略
+            key (callable, optional): COALESCE 策略用的鍵值函數
+            queue (optional): 自訂的輸入佇列（需提供 put / get / qsize / dropped / coalesced，
+                例如 delivery_queue.PriorityDeliveryQueue），指定時忽略 queue_size、overflow 與 key
+            pending (callable, optional): 返回處理函數在工作者之外仍暫存的項目數
+                （例如 coalescer.Coalescer.pending），drain 會等待其歸零
+        """
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.queue = queue if queue is not None else BoundedQueue(queue_size, overflow, key)
+        self.pending = pending or (lambda: 0)
+        self.processed = 0
+        self.errors = 0
+        self.active = 0
+
+
+class Pipeline:
+    """
+    由資料來源與多個階段組成的處理管線
+    """
+
+    def __init__(self, source, stages):
+        """
+        Args:
+            source (callable): 無參數的 async generator 函數，產生送入第一個階段的項目
+            stages (list): Stage 物件，依處理順序排列
+        """
+        if not stages:
+            raise ValueError("管線至少需要一個階段")
+        self.source = source
+        self.stages = stages
+
+    async def _run_source(self):
+        first = self.stages[0].queue
+        async for item in self.source():
+            await first.put(item)
+
+    async def _run_worker(self, index):
+        stage = self.stages[index]
+        downstream = self.stages[index + 1].queue if index + 1 < len(self.stages) else None
+        while True:
+            item = await stage.queue.get()
+            stage.active += 1
+            try:
+                try:
+                    result = await stage.handler(item)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    stage.errors += 1
+                    print(f"⚠️  管線階段 {stage.name} 處理失敗: {e}")
+                    continue
+                stage.processed += 1
+                if result is None or downstream is None:
+                    continue
+                for output in (result if isinstance(result, list) else [result]):
+                    await downstream.put(output)
+            finally:
+                stage.active -= 1
+
+    async def run(self):
+        """啟動所有階段並執行到資料來源結束或被取消"""
+        workers = [
+            asyncio.create_task(self._run_worker(index), name=f"{stage.name}-{n}")
+            for index, stage in enumerate(self.stages)
+            for n in range(stage.concurrency)
+        ]
+        try:
+            await self._run_source()
+            await self.drain()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def drain(self):
+        """等待所有佇列清空且沒有正在處理或暫存的項目"""
+        while any(stage.queue.qsize() or stage.active or stage.pending() for stage in self.stages):
+            await asyncio.sleep(0.01)
+
+    def stats(self):
+        """
+        Returns:
+            dict: {階段名稱: {'processed', 'errors', 'queued', 'dropped', 'coalesced'}}
+        """
+        return {
+            stage.name: {
+                'processed': stage.processed,
+                'errors': stage.errors,
+                'queued': stage.queue.qsize(),
+                'dropped': stage.queue.dropped,
+                'coalesced': stage.queue.coalesced,
+            }
+            for stage in self.stages
+        }
@@ -0,0 +1,123 @@
+"""
+歷史價格儲存模組
+以 JSON 檔案保存各資料來源的歷史價格點（Unix 秒, USD/盎司）
+供歷史回補、報表與警報規則共用
+"""
+
+import json
+import os
+
+
+HISTORY_FILE = "price_history.json"
+
+
+def load_price_history(path=HISTORY_FILE):
+    """
+    讀取歷史價格儲存檔
+
+    Args:
+        path (str): 歷史價格檔案路徑
+
+    Returns:
+        dict: {資料來源: {Unix 秒: 價格}}，檔案不存在或格式錯誤時返回空字典
+    """
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"⚠️  讀取歷史價格時發生錯誤: {e}")
+        return {}
+
+    history = {}
+    for source, points in data.get('sources', {}).items():
+        history[source] = {int(ts): float(price) for ts, price in points}
+    return history
+
+
+def save_price_history(history, path=HISTORY_FILE):
+    """
+    保存歷史價格（先寫入暫存檔再替換，避免中斷時留下損壞的檔案）
+
+    Args:
+        history (dict): {資料來源: {Unix 秒: 價格}}
+        path (str): 歷史價格檔案路徑
+    """
+    data = {
+        'version': 1,
+        'sources': {
+            source: [[ts, points[ts]] for ts in sorted(points)]
+            for source, points in history.items()
+        }
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def merge_price_points(history, source, points):
+    """
+    將價格點合併到歷史記錄中（相同時間戳以新值覆蓋）
+
+    Args:
+        history (dict): {資料來源: {Unix 秒: 價格}}
+        source (str): 資料來源名稱（例如 'coingecko'、'binance'）
+        points (iterable): (Unix 秒, 價格) 序列
+
+    Returns:
+        int: 新增的價格點數量
+    """
+    series = history.setdefault(source, {})
+    added = 0
+    for ts, price in points:
+        ts = int(ts)
+        if ts not in series:
+            added += 1
+        series[ts] = float(price)
+    return added
+
+
+def count_points_in_range(history, source, start_ts, end_ts):
+    """
+    計算指定來源在 [start_ts, end_ts) 區間內已有的價格點數量
+
+    Args:
+        history (dict): {資料來源: {Unix 秒: 價格}}
+        source (str): 資料來源名稱
+        start_ts (int): 起始時間（Unix 秒，包含）
+        end_ts (int): 結束時間（Unix 秒，不包含）
+
+    Returns:
+        int: 區間內的價格點數量
+    """
+    series = history.get(source, {})
+    return sum(1 for ts in series if start_ts <= ts < end_ts)
+
+
+def get_price_series(history, source=None, start_ts=None, end_ts=None):
+    """
+    取得依時間排序的價格序列
+
+    Args:
+        history (dict): {資料來源: {Unix 秒: 價格}}
+        source (str, optional): 資料來源名稱；未指定時合併所有來源
+        start_ts (int, optional): 起始時間（Unix 秒，包含）
+        end_ts (int, optional): 結束時間（Unix 秒，不包含）
+
+    Returns:
+        list: [(Unix 秒, 價格), ...]
+    """
+    merged = {}
+    sources = [source] if source else sorted(history)
+    for name in sources:
+        for ts, price in history.get(name, {}).items():
+            if start_ts is not None and ts < start_ts:
+                continue
+            if end_ts is not None and ts >= end_ts:
+                continue
+            # 多個來源有相同時間戳時保留先出現的來源
+            merged.setdefault(ts, price)
+    return sorted(merged.items())
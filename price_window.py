@@ -0,0 +1,185 @@
+"""
+近期價格的環形緩衝區
+以兩個型別化的 array('d')（時間戳、價格）保存固定數量的最新價格跳動，
+每筆跳動不會建立 Python 物件，報告與規則查詢近期區間時不需讀取磁碟。
+
+常駐程式結束時以 mmap 寫出快照，啟動時直接映射快照檔案還原（不逐筆重播），
+重新啟動後仍保有當日最高價與最低價。
+"""
+
+import mmap
+import os
+import struct
+from array import array
+
+
+WINDOW_SNAPSHOT_FILE = "price_window.bin"
+
+# 每分鐘一筆時可保存 7 天
+DEFAULT_CAPACITY = 7 * 24 * 60
+
+# 快照格式: 標頭（識別碼, 容量, 筆數, 下一個寫入位置）+ 時間戳欄 + 價格欄（皆為 float64）
+_MAGIC = b'GOLDRB01'
+_HEADER = struct.Struct('<8sQQQ')
+_ITEM_SIZE = 8
+
+
+class PriceRingBuffer:
+    """
+    固定容量的價格環形緩衝區，滿了之後覆蓋最舊的資料
+    時間戳需依寫入順序遞增（以 Unix 秒表示）
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        Args:
+            capacity (int): 最多保存的跳動筆數
+        """
+        if capacity <= 0:
+            raise ValueError("capacity 必須大於 0")
+        self.capacity = capacity
+        self._timestamps = array('d', bytes(_ITEM_SIZE * capacity))
+        self._prices = array('d', bytes(_ITEM_SIZE * capacity))
+        self._head = 0  # 下一筆寫入的位置
+        self._count = 0
+        self._mmap = None
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, price):
+        """
+        寫入一筆價格跳動
+        """
+        self._timestamps[self._head] = timestamp
+        self._prices[self._head] = price
+        self._head = (self._head + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def _physical(self, logical):
+        """將時間順序的索引（0 = 最舊）轉為陣列位置"""
+        return (self._head - self._count + logical) % self.capacity
+
+    def latest(self):
+        """
+        Returns:
+            tuple: (時間戳, 價格)，沒有資料時返回 None
+        """
+        if self._count == 0:
+            return None
+        index = self._physical(self._count - 1)
+        return self._timestamps[index], self._prices[index]
+
+    def _first_index_since(self, start_ts):
+        """二分搜尋第一筆時間戳 >= start_ts 的邏輯索引"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamps[self._physical(middle)] < start_ts:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _segments(self, start_ts=None):
+        """
+        Returns:
+            list: 查詢區間對應的陣列片段 [(起點, 終點), ...]（最多兩段，依時間順序）
+        """
+        first = 0 if start_ts is None else self._first_index_since(start_ts)
+        if first >= self._count:
+            return []
+        begin = self._physical(first)
+        end = self._physical(self._count - 1) + 1
+        if begin < end:
+            return [(begin, end)]
+        return [(begin, self.capacity), (0, end)]
+
+    def since(self, start_ts=None):
+        """
+        取得時間順序的近期資料
+
+        Args:
+            start_ts (float, optional): 起始時間戳（含），未指定時返回全部
+
+        Returns:
+            tuple: (時間戳 array, 價格 array)
+        """
+        timestamps = array('d')
+        prices = array('d')
+        for begin, end in self._segments(start_ts):
+            timestamps.extend(self._timestamps[begin:end])
+            prices.extend(self._prices[begin:end])
+        return timestamps, prices
+
+    def high_low(self, start_ts=None):
+        """
+        Args:
+            start_ts (float, optional): 起始時間戳（含）
+
+        Returns:
+            tuple: (最高價, 最低價)，區間內沒有資料時為 (None, None)
+        """
+        segments = self._segments(start_ts)
+        if not segments:
+            return None, None
+        high = max(max(self._prices[begin:end]) for begin, end in segments)
+        low = min(min(self._prices[begin:end]) for begin, end in segments)
+        return high, low
+
+    def snapshot(self, path=WINDOW_SNAPSHOT_FILE):
+        """
+        以 mmap 寫出快照（先寫入暫存檔再取代，避免中斷時留下損毀的檔案）
+        """
+        column_size = _ITEM_SIZE * self.capacity
+        total_size = _HEADER.size + 2 * column_size
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb+') as f:
+            f.truncate(total_size)
+            with mmap.mmap(f.fileno(), total_size) as mm:
+                mm[:_HEADER.size] = _HEADER.pack(_MAGIC, self.capacity, self._count, self._head)
+                offset = _HEADER.size
+                mm[offset:offset + column_size] = memoryview(self._timestamps).cast('B')
+                offset += column_size
+                mm[offset:offset + column_size] = memoryview(self._prices).cast('B')
+                mm.flush()
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def restore(cls, path=WINDOW_SNAPSHOT_FILE, capacity=DEFAULT_CAPACITY):
+        """
+        從快照還原，檔案以寫入時複製（copy-on-write）方式映射，
+        不逐筆讀取，還原時間與資料量無關
+
+        Args:
+            path (str): 快照路徑
+            capacity (int): 快照不存在或無效時新建緩衝區的容量
+
+        Returns:
+            PriceRingBuffer: 還原的緩衝區
+        """
+        if not os.path.exists(path):
+            return cls(capacity)
+        try:
+            with open(path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            magic, saved_capacity, count, head = _HEADER.unpack_from(mm)
+            column_size = _ITEM_SIZE * saved_capacity
+            if magic != _MAGIC or len(mm) != _HEADER.size + 2 * column_size:
+                raise ValueError("快照格式不符")
+        except (OSError, ValueError, struct.error) as e:
+            print(f"⚠️  無法還原價格快照 {path}: {e}，改用新的緩衝區")
+            return cls(capacity)
+
+        buffer = cls.__new__(cls)
+        buffer.capacity = saved_capacity
+        view = memoryview(mm)
+        offset = _HEADER.size
+        # 欄位直接指向映射的記憶體，與 array('d') 一樣支援索引、切片與寫入
+        buffer._timestamps = view[offset:offset + column_size].cast('d')
+        buffer._prices = view[offset + column_size:offset + 2 * column_size].cast('d')
+        buffer._count = count
+        buffer._head = head
+        buffer._mmap = mm
+        return buffer
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+長期價格分布的串流分位數估計
+以 t-digest 估計當前價格在過去 30 天、90 天、1 年價格分布中的百分位，
+記憶體用量固定，不需保存或排序每一筆價格。
+
+每個資產每天維護一個 t-digest，查詢某個期間時合併期間內的每日 digest；
+超過最長期間的舊資料會被移除，所以歷史再長，狀態大小也不會增加。
+狀態保存在 price_distribution.json。
+"""
+
+import argparse
+import json
+import math
+import os
+from datetime import datetime, timedelta, timezone
+
+
+PRICE_DISTRIBUTION_FILE = "price_distribution.json"
+
+# 報告顯示的期間: (標籤, 天數)
+HORIZONS = (
+    ('30 天', 30),
+    ('90 天', 90),
+    ('1 年', 365),
+)
+
+DEFAULT_COMPRESSION = 50
+
+# 期間內至少有這麼多筆價格才顯示百分位
+MIN_SAMPLES = 10
+
+TAIWAN_TZ = timezone(timedelta(hours=8))
+
+
+class TDigest:
+    """
+    合併式 t-digest（使用 k1 尺度函數），可合併、可序列化
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        """
+        Args:
+            compression (float): 壓縮參數，質心數量約在 compression/2 到 compression 之間
+        """
+        self.compression = compression
+        self._means = []
+        self._weights = []
+        self._buffer = []
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, weight=1.0):
+        """
+        加入一個數值
+        """
+        self._buffer.append((value, weight))
+        self.count += weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        """
+        合併另一個 digest（例如把每日 digest 合併成 30 天的分布）
+        """
+        if other.count == 0:
+            return
+        other._compress()
+        self._buffer.extend(zip(other._means, other._weights))
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        self._buffer = []
+        total = self.count
+        means = []
+        weights = []
+        cumulative = 0.0
+        current_mean, current_weight = items[0]
+        k_left = self._k(0.0)
+        for mean, weight in items[1:]:
+            q_right = (cumulative + current_weight + weight) / total
+            if self._k(min(q_right, 1.0)) - k_left <= 1:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                means.append(current_mean)
+                weights.append(current_weight)
+                cumulative += current_weight
+                k_left = self._k(cumulative / total)
+                current_mean, current_weight = mean, weight
+        means.append(current_mean)
+        weights.append(current_weight)
+        self._means = means
+        self._weights = weights
+
+    def centroid_count(self):
+        self._compress()
+        return len(self._means)
+
+    def cdf(self, value):
+        """
+        Returns:
+            float: 小於等於 value 的比例（0-1），沒有資料時返回 None
+        """
+        if self.count == 0:
+            return None
+        self._compress()
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        total = self.count
+        # 每個質心的累積權重中心點
+        previous_x, previous_c = self.min, 0.0
+        cumulative = 0.0
+        for mean, weight in zip(self._means, self._weights):
+            center = cumulative + weight / 2
+            if value < mean:
+                span = mean - previous_x
+                fraction = (value - previous_x) / span if span > 0 else 1.0
+                return (previous_c + fraction * (center - previous_c)) / total
+            previous_x, previous_c = mean, center
+            cumulative += weight
+        span = self.max - previous_x
+        fraction = (value - previous_x) / span if span > 0 else 1.0
+        return (previous_c + fraction * (total - previous_c)) / total
+
+    def quantile(self, q):
+        """
+        Args:
+            q (float): 分位（0-1）
+
+        Returns:
+            float: 估計的分位數值，沒有資料時返回 None
+        """
+        if self.count == 0:
+            return None
+        self._compress()
+        target = q * self.count
+        previous_x, previous_c = self.min, 0.0
+        cumulative = 0.0
+        for mean, weight in zip(self._means, self._weights):
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - previous_c
+                fraction = (target - previous_c) / span if span > 0 else 0.0
+                return previous_x + fraction * (mean - previous_x)
+            previous_x, previous_c = mean, center
+            cumulative += weight
+        span = self.count - previous_c
+        fraction = (target - previous_c) / span if span > 0 else 1.0
+        return previous_x + min(fraction, 1.0) * (self.max - previous_x)
+
+    def to_dict(self):
+        self._compress()
+        return {
+            'means': [round(mean, 4) for mean in self._means],
+            'weights': self._weights,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data, compression=DEFAULT_COMPRESSION):
+        digest = cls(compression)
+        digest._means = list(data.get('means', []))
+        digest._weights = list(data.get('weights', []))
+        digest.count = float(sum(digest._weights))
+        digest.min = data.get('min', math.inf)
+        digest.max = data.get('max', -math.inf)
+        return digest
+
+
+class PriceDistribution:
+    """
+    每個資產每天一個 t-digest，依期間合併後查詢百分位
+    """
+
+    def __init__(self, path=PRICE_DISTRIBUTION_FILE, horizons=HORIZONS, compression=DEFAULT_COMPRESSION):
+        """
+        Args:
+            path (str): 狀態檔路徑
+            horizons (tuple): (標籤, 天數) 期間
+            compression (float): 每日 digest 的壓縮參數
+        """
+        self.path = path
+        self.horizons = horizons
+        self.compression = compression
+        self.max_days = max(days for _, days in horizons)
+        self._days = {}  # {資產: {'YYYY-MM-DD': TDigest}}
+
+    def update(self, asset, day, price):
+        """
+        加入一筆價格
+
+        Args:
+            asset (str): 資產代號
+            day (date): 台灣日期
+            price (float): 價格
+        """
+        days = self._days.setdefault(asset, {})
+        key = day.isoformat()
+        digest = days.get(key)
+        if digest is None:
+            digest = days[key] = TDigest(self.compression)
+            self.prune(day)
+        digest.add(price)
+
+    def prune(self, today):
+        """
+        移除超過最長期間的每日 digest
+        """
+        cutoff = (today - timedelta(days=self.max_days - 1)).isoformat()
+        for days in self._days.values():
+            for key in [key for key in days if key < cutoff]:
+                del days[key]
+
+    def horizon_digest(self, asset, today, days):
+        """
+        Returns:
+            TDigest: 合併 today 往前 days 天（含當天）的每日 digest
+        """
+        merged = TDigest(self.compression * 2)
+        cutoff = (today - timedelta(days=days - 1)).isoformat()
+        end = today.isoformat()
+        for key, digest in self._days.get(asset, {}).items():
+            if cutoff <= key <= end:
+                merged.merge(digest)
+        return merged
+
+    def percentiles(self, asset, price, today):
+        """
+        Returns:
+            list: [(標籤, 百分位 0-100, 期間內資料天數, 期間天數), ...]，資料不足的期間不列出
+        """
+        results = []
+        asset_days = self._days.get(asset, {})
+        for label, days in self.horizons:
+            digest = self.horizon_digest(asset, today, days)
+            if digest.count < MIN_SAMPLES:
+                continue
+            cutoff = (today - timedelta(days=days - 1)).isoformat()
+            covered = sum(1 for key in asset_days if cutoff <= key <= today.isoformat())
+            results.append((label, digest.cdf(price) * 100, covered, days))
+        return results
+
+    @classmethod
+    def load(cls, path=PRICE_DISTRIBUTION_FILE, horizons=HORIZONS):
+        """
+        Returns:
+            PriceDistribution: 從狀態檔讀取的分布（檔案不存在時為空）
+        """
+        distribution = cls(path, horizons)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                distribution.compression = data.get('compression', distribution.compression)
+                for asset, days in data.get('assets', {}).items():
+                    distribution._days[asset] = {
+                        key: TDigest.from_dict(digest, distribution.compression)
+                        for key, digest in days.items()
+                    }
+        except Exception as e:
+            print(f"⚠️  讀取價格分布時發生錯誤: {e}")
+        return distribution
+
+    def save(self):
+        """
+        寫入狀態檔
+        """
+        data = {
+            'version': 1,
+            'compression': self.compression,
+            'assets': {
+                asset: {key: digest.to_dict() for key, digest in sorted(days.items())}
+                for asset, days in self._days.items()
+            },
+        }
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️  保存價格分布時發生錯誤: {e}")
+
+
+def seed_from_history(distribution, history, asset, source=None):
+    """
+    以回補的歷史價格（price_history.json）建立分布
+    分布中已有的日期不加入：這些日期的 digest 由即時價格建立，包含歷史檔案沒有的價格，
+    再加入歷史價格會重複計算
+
+    Returns:
+        int: 加入的價格筆數
+    """
+    from price_history import get_price_series
+
+    existing = set(distribution._days.get(asset, {}))
+    count = 0
+    for ts, price in get_price_series(history, source=source):
+        day = datetime.fromtimestamp(ts, TAIWAN_TZ).date()
+        if day.isoformat() in existing:
+            continue
+        distribution.update(asset, day, price)
+        count += 1
+    return count
+
+
+def format_percentiles(percentiles):
+    """
+    Args:
+        percentiles (list): PriceDistribution.percentiles 的結果
+
+    Returns:
+        str: 訊息中的【歷史分位】段落，沒有資料時為空字串
+    """
+    if not percentiles:
+        return ""
+    lines = ["【歷史分位】"]
+    for label, percentile, covered, days in percentiles:
+        note = f"（僅 {covered} 天資料）" if covered < days else ""
+        lines.append(f"{label}: 第 {percentile:.0f} 百分位{note}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from price_history import HISTORY_FILE, load_price_history
+    from window_alerts import GOLD_ASSET
+
+    parser = argparse.ArgumentParser(description="以歷史價格建立價格分布")
+    parser.add_argument('--history-file', default=HISTORY_FILE, help="歷史價格檔案")
+    parser.add_argument('--source', default=None, help="只使用指定來源（coingecko / binance）")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="捨棄現有的價格分布（含即時價格建立的每日 digest），完全以歷史價格重建")
+    args = parser.parse_args()
+
+    # 預設保留現有的分布，只補上還沒有資料的日期
+    distribution = PriceDistribution() if args.rebuild else PriceDistribution.load()
+    added = seed_from_history(distribution, load_price_history(args.history_file), GOLD_ASSET, args.source)
+    distribution.save()
+    today = datetime.now(TAIWAN_TZ).date()
+    print(f"✓ 已加入 {added} 筆價格，保存到 {distribution.path}")
+    for label, days in HORIZONS:
+        digest = distribution.horizon_digest(GOLD_ASSET, today, days)
+        if digest.count:
+            print(f"  {label}: 中位數 ${digest.quantile(0.5):.2f}，"
+                  f"5%-95% ${digest.quantile(0.05):.2f} - ${digest.quantile(0.95):.2f}")
@@ -46,27 +46,21 @@ def main():
         return
     
     print(f"✓ 價格獲取成功")
-    print(f"  當前價格: ${price_data['current_price']:.2f}")
-    print(f"  開盤價格: ${price_data['open_price']:.2f}")
-    print(f"  當天最高: ${price_data['day_high']:.2f}")
-    print(f"  當天最低: ${price_data['day_low']:.2f}")
+    print(f"  資料來源: {price_data.source}")
+    print(f"  當前價格: ${price_data.price:.2f}")
+    print(f"  開盤價格: ${price_data.open_price:.2f}")
     
-    # 計算波動
-    volatility = ((price_data['day_high'] - price_data['day_low']) / price_data['day_high']) * 100
-    change = ((price_data['current_price'] - price_data['open_price']) / price_data['open_price']) * 100
+    # 計算漲跌幅
+    change = ((price_data.price - price_data.open_price) / price_data.open_price) * 100
     
-    print(f"  波動幅度: {volatility:.2f}%")
     print(f"  漲跌幅: {change:+.2f}%")
     
     # 發送測試通知
     print("\n2. 發送測試通知...")
     test_message = f"🧪 測試通知\n\n"
     test_message += f"測試時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-    test_message += f"當前價格: ${price_data['current_price']:.2f}\n"
-    test_message += f"開盤價格: ${price_data['open_price']:.2f}\n"
-    test_message += f"當天最高: ${price_data['day_high']:.2f}\n"
-    test_message += f"當天最低: ${price_data['day_low']:.2f}\n"
-    test_message += f"波動幅度: {volatility:.2f}%\n"
+    test_message += f"當前價格: ${price_data.price:.2f}\n"
+    test_message += f"開盤價格: ${price_data.open_price:.2f}\n"
     test_message += f"漲跌幅: {change:+.2f}%\n\n"
     test_message += f"這是一則測試訊息，用於驗證系統功能。"
     
@@ -0,0 +1,151 @@
+"""
+價格報價型別
+以 __slots__ 定義的不可變報價物件，取代抓取函數原本回傳的字典：
+  - PriceQuote: 國際金價（CoinGecko / 幣安，USD/盎司）
+  - BotQuote: 台灣銀行黃金存摺牌價（台幣/公克）
+沒有 __dict__，每個物件只保存固定欄位，回放或回補時大量建立也很省記憶體。
+執行 `python3 quotes.py` 可量測與字典形式的記憶體差異。
+"""
+
+import time
+
+
+class _Quote:
+    """不可變報價的共用行為"""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} 是不可變物件，無法修改 {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} 是不可變物件，無法刪除 {name}")
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def __reduce__(self):
+        # 支援 pickle（例如送入 ProcessPoolExecutor）
+        return (_rebuild, (type(self), self._values()))
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: 可直接寫入 JSON 的欄位字典
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _rebuild(cls, values):
+    return cls(**dict(zip(cls.__slots__, values)))
+
+
+# 繞過不可變限制的初始化設定函數
+_set = object.__setattr__
+
+
+class PriceQuote(_Quote):
+    """
+    國際金價報價（USD/盎司）
+
+    Attributes:
+        source (str): 資料來源（'coingecko'、'binance'）
+        price (float): 當前價格
+        open_price (float): 24 小時前的開盤價
+        fetched_at (float): 取得時間（Unix 秒）
+        upstream_ts (int): 上游資料時間戳（Unix 秒），來源未提供時為 None
+        latency (float): 抓取耗時（秒，含重試）
+        retry_count (int): 重試次數
+    """
+
+    __slots__ = ('source', 'price', 'open_price', 'fetched_at', 'upstream_ts', 'latency', 'retry_count')
+
+    def __init__(self, source, price, open_price=None, fetched_at=None, upstream_ts=None,
+                 latency=0.0, retry_count=0):
+        price = float(price)
+        _set(self, 'source', source)
+        _set(self, 'price', price)
+        _set(self, 'open_price', float(open_price) if open_price is not None else price)
+        _set(self, 'fetched_at', fetched_at if fetched_at is not None else time.time())
+        _set(self, 'upstream_ts', upstream_ts)
+        _set(self, 'latency', latency)
+        _set(self, 'retry_count', retry_count)
+
+
+class BotQuote(_Quote):
+    """
+    台灣銀行黃金存摺「本行賣出」牌價
+
+    Attributes:
+        source (str): 資料來源（'台灣銀行'）
+        price (float): 價格
+        unit (str): 單位（通常是 '台幣/公克'）
+        fetched_at (float): 取得時間（Unix 秒）
+        upstream_ts (int): 牌價掛牌時間（Unix 秒），無法解析時為 None
+        latency (float): 抓取耗時（秒）
+        retry_count (int): 重試次數
+    """
+
+    __slots__ = ('source', 'price', 'unit', 'fetched_at', 'upstream_ts', 'latency', 'retry_count')
+
+    def __init__(self, price, unit='台幣/公克', source='台灣銀行', fetched_at=None,
+                 upstream_ts=None, latency=0.0, retry_count=0):
+        _set(self, 'source', source)
+        _set(self, 'price', float(price))
+        _set(self, 'unit', unit)
+        _set(self, 'fetched_at', fetched_at if fetched_at is not None else time.time())
+        _set(self, 'upstream_ts', upstream_ts)
+        _set(self, 'latency', latency)
+        _set(self, 'retry_count', retry_count)
+
+
+def measure_memory(count=1_000_000):
+    """
+    量測建立 count 個 PriceQuote 與等價字典所需的記憶體
+
+    Returns:
+        dict: {'quote_bytes': int, 'dict_bytes': int, 'reduction': float}
+    """
+    import tracemalloc
+
+    def allocate(factory):
+        tracemalloc.start()
+        items = [factory(index) for index in range(count)]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del items
+        return current
+
+    now = time.time()
+    quote_bytes = allocate(lambda index: PriceQuote(
+        'coingecko', 4000.0 + index, 4000.0, now, int(now) + index, 0.05, 0))
+    dict_bytes = allocate(lambda index: {
+        'source': 'coingecko', 'price': 4000.0 + index, 'open_price': 4000.0,
+        'fetched_at': now, 'upstream_ts': int(now) + index, 'latency': 0.05, 'retry_count': 0})
+    return {
+        'quote_bytes': quote_bytes,
+        'dict_bytes': dict_bytes,
+        'reduction': 1 - quote_bytes / dict_bytes,
+    }
+
+
+if __name__ == "__main__":
+    result = measure_memory()
+    print("=" * 60)
+    print("報價物件記憶體量測（1,000,000 筆）")
+    print("=" * 60)
+    print(f"PriceQuote: {result['quote_bytes'] / 1024 / 1024:.1f} MB")
+    print(f"dict:       {result['dict_bytes'] / 1024 / 1024:.1f} MB")
+    print(f"減少:       {result['reduction'] * 100:.1f}%")
@@ -0,0 +1,277 @@
+"""
+歷史價格的區間查詢索引
+將價格依小時（或每日）彙總成最高價、最低價、收盤價陣列：
+  - 靜態歷史（回補資料）使用稀疏表（sparse table），任意區間最高／最低價 O(1)，
+    收盤價總和以前綴和 O(1)
+  - 即時尾端（常駐程式新收到的價格）使用線段樹（segment tree），更新與查詢 O(log n)
+可回答「是否為 N 天新高」、「任意期間最低價」等問題，不需重新掃描歷史。
+"""
+
+import bisect
+import math
+
+from price_history import get_price_series
+
+
+HOURLY = 3600
+DAILY = 86400
+
+# 報告檢查的新高／新低期間: (天數, 標籤)
+HIGHLIGHT_HORIZONS = (
+    (7, '7 天'),
+    (30, '30 天'),
+    (90, '90 天'),
+    (365, '1 年'),
+)
+
+
+def aggregate_series(series, bucket_seconds=HOURLY):
+    """
+    將 (Unix 秒, 價格) 序列依時間區段彙總
+
+    Args:
+        series (list): 依時間排序的 [(Unix 秒, 價格), ...]
+        bucket_seconds (int): 區段長度（秒）
+
+    Returns:
+        tuple: (區段起點 list, 最高價 list, 最低價 list, 收盤價 list)
+    """
+    starts, highs, lows, closes = [], [], [], []
+    for ts, price in series:
+        start = ts - ts % bucket_seconds
+        if starts and starts[-1] == start:
+            highs[-1] = max(highs[-1], price)
+            lows[-1] = min(lows[-1], price)
+            closes[-1] = price
+        else:
+            starts.append(start)
+            highs.append(price)
+            lows.append(price)
+            closes.append(price)
+    return starts, highs, lows, closes
+
+
+class SparseTable:
+    """
+    靜態陣列的區間最值查詢（建立 O(n log n)，查詢 O(1)）
+    只適用於 min / max 這類重疊不影響結果的運算
+    """
+
+    def __init__(self, values, op=max):
+        """
+        Args:
+            values (list): 數值陣列
+            op (callable): max 或 min
+        """
+        self.op = op
+        self.size = len(values)
+        self._levels = [list(values)]
+        width = 1
+        while width * 2 <= self.size:
+            previous = self._levels[-1]
+            self._levels.append([op(previous[i], previous[i + width])
+                                 for i in range(self.size - width * 2 + 1)])
+            width *= 2
+
+    def query(self, left, right):
+        """
+        Args:
+            left (int): 起點索引（含）
+            right (int): 終點索引（不含）
+
+        Returns:
+            float: 區間 [left, right) 的最值
+        """
+        level = (right - left).bit_length() - 1
+        row = self._levels[level]
+        return self.op(row[left], row[right - (1 << level)])
+
+
+class SegmentTree:
+    """
+    可追加與單點更新的線段樹，同時維護區間最高、最低與總和
+    """
+
+    def __init__(self, capacity=64):
+        self._capacity = 1
+        while self._capacity < capacity:
+            self._capacity *= 2
+        self._max = [-math.inf] * (2 * self._capacity)
+        self._min = [math.inf] * (2 * self._capacity)
+        self._sum = [0.0] * (2 * self._capacity)
+        self.size = 0
+
+    def _grow(self):
+        values = [(self._max[self._capacity + i], self._min[self._capacity + i], self._sum[self._capacity + i])
+                  for i in range(self.size)]
+        self.__init__(self._capacity * 2)
+        for high, low, total in values:
+            self.append(high, low, total)
+
+    def append(self, high, low, total):
+        """
+        追加一個區段（最高價, 最低價, 總和）
+        """
+        if self.size == self._capacity:
+            self._grow()
+        self.size += 1
+        self.update(self.size - 1, high, low, total)
+
+    def update(self, index, high, low, total):
+        """
+        更新第 index 個區段並重新計算祖先節點，O(log n)
+        """
+        node = self._capacity + index
+        self._max[node], self._min[node], self._sum[node] = high, low, total
+        node //= 2
+        while node:
+            left, right = 2 * node, 2 * node + 1
+            self._max[node] = max(self._max[left], self._max[right])
+            self._min[node] = min(self._min[left], self._min[right])
+            self._sum[node] = self._sum[left] + self._sum[right]
+            node //= 2
+
+    def query(self, left, right):
+        """
+        Args:
+            left (int): 起點索引（含）
+            right (int): 終點索引（不含）
+
+        Returns:
+            tuple: (最高, 最低, 總和)
+        """
+        high, low, total = -math.inf, math.inf, 0.0
+        left += self._capacity
+        right += self._capacity
+        while left < right:
+            if left & 1:
+                high = max(high, self._max[left])
+                low = min(low, self._min[left])
+                total += self._sum[left]
+                left += 1
+            if right & 1:
+                right -= 1
+                high = max(high, self._max[right])
+                low = min(low, self._min[right])
+                total += self._sum[right]
+            left //= 2
+            right //= 2
+        return high, low, total
+
+
+class RangeIndex:
+    """
+    靜態歷史（稀疏表 + 前綴和）加上即時尾端（線段樹）的區間查詢索引
+    """
+
+    def __init__(self, starts=(), highs=(), lows=(), closes=(), bucket_seconds=HOURLY):
+        """
+        Args:
+            starts, highs, lows, closes: aggregate_series 的結果（靜態歷史）
+            bucket_seconds (int): 區段長度（秒）
+        """
+        self.bucket_seconds = bucket_seconds
+        self._static_starts = list(starts)
+        self._static_max = SparseTable(highs, max)
+        self._static_min = SparseTable(lows, min)
+        self._prefix = [0.0]
+        for close in closes:
+            self._prefix.append(self._prefix[-1] + close)
+        self._tail_starts = []
+        self._tail = SegmentTree()
+        self._tail_last = None  # 最後一個尾端區段的 (最高, 最低, 收盤)
+
+    @classmethod
+    def from_history(cls, history, source=None, bucket_seconds=HOURLY):
+        """
+        以 price_history.json 的內容建立索引
+
+        Returns:
+            RangeIndex: 索引
+        """
+        return cls(*aggregate_series(get_price_series(history, source=source), bucket_seconds),
+                   bucket_seconds=bucket_seconds)
+
+    def __len__(self):
+        return len(self._static_starts) + len(self._tail_starts)
+
+    def add(self, timestamp, price):
+        """
+        加入即時價格（時間需晚於靜態歷史），同一區段內的價格合併為最高／最低／收盤
+        """
+        start = timestamp - timestamp % self.bucket_seconds
+        if self._static_starts and start <= self._static_starts[-1]:
+            return
+        if self._tail_starts and self._tail_starts[-1] == start:
+            high, low, _ = self._tail_last
+            self._tail_last = (max(high, price), min(low, price), price)
+            self._tail.update(len(self._tail_starts) - 1, *self._tail_last)
+        elif not self._tail_starts or start > self._tail_starts[-1]:
+            self._tail_starts.append(start)
+            self._tail_last = (price, price, price)
+            self._tail.append(*self._tail_last)
+
+    def query(self, start_ts, end_ts):
+        """
+        查詢 [start_ts, end_ts) 內所有區段的統計（以區段起點判斷是否在範圍內）
+
+        Returns:
+            dict: {'high', 'low', 'mean', 'sum', 'count'}，範圍內沒有資料時返回 None
+        """
+        high, low, total, count = -math.inf, math.inf, 0.0, 0
+
+        left = bisect.bisect_left(self._static_starts, start_ts)
+        right = bisect.bisect_left(self._static_starts, end_ts)
+        if left < right:
+            high = self._static_max.query(left, right)
+            low = self._static_min.query(left, right)
+            total += self._prefix[right] - self._prefix[left]
+            count += right - left
+
+        left = bisect.bisect_left(self._tail_starts, start_ts)
+        right = bisect.bisect_left(self._tail_starts, end_ts)
+        if left < right:
+            tail_high, tail_low, tail_total = self._tail.query(left, right)
+            high, low = max(high, tail_high), min(low, tail_low)
+            total += tail_total
+            count += right - left
+
+        if count == 0:
+            return None
+        return {'high': high, 'low': low, 'mean': total / count, 'sum': total, 'count': count}
+
+    def last_days(self, now_ts, days):
+        """
+        Returns:
+            dict: 最近 days 天（含當前區段）的統計，沒有資料時返回 None
+        """
+        return self.query(now_ts - days * DAILY, now_ts + self.bucket_seconds)
+
+    def highlights(self, price, now_ts, horizons=HIGHLIGHT_HORIZONS):
+        """
+        找出當前價格創下的最長期間新高或新低
+
+        Returns:
+            list: 例如 ['創 30 天新高']，歷史資料不足一個期間時不判斷該期間
+        """
+        first_start = self._static_starts[0] if self._static_starts else (
+            self._tail_starts[0] if self._tail_starts else None)
+        if first_start is None:
+            return []
+        new_high = new_low = None
+        for days, label in horizons:
+            if now_ts - days * DAILY < first_start:
+                break
+            stats = self.last_days(now_ts, days)
+            if stats is None:
+                break
+            if price >= stats['high']:
+                new_high = label
+            if price <= stats['low']:
+                new_low = label
+        results = []
+        if new_high:
+            results.append(f"創 {new_high}新高")
+        if new_low:
+            results.append(f"創 {new_low}新低")
+        return results
@@ -0,0 +1,468 @@
+"""
+日報表排程
+原本 main() 以「與上次發送的小時不同」或「整點後 0-20 分鐘」判斷是否發送日報表，
+搭配每 10 分鐘執行一次的 cron，GitHub Actions 延遲或提早執行時會重複發送或漏發。
+
+改為每位訂閱者一個 cron 格式的排程（分 時 日 月 星期，各自的時區），
+下一次到期時間放在 min-heap 中：
+  - 取出到期的排程為 O(log n)，數千個訂閱者也只處理真正到期的部分
+  - 每個時段（slot）只發送一次：發送成功後才把該時段記錄在 report_schedule.json，
+    通知 ID 由訂閱者與時段組成，重送時 LINE 不會重複推播
+  - 停機期間錯過多個時段時只補發最近的一個
+
+排程來源（環境變數）：
+  - REPORT_CRON：預設收件對象的排程，預設 "0 * * * *"（每個整點），設為空字串表示不發送
+  - REPORT_TIMEZONE：預設排程的時區，預設 Asia/Taipei
+  - REPORT_SCHEDULES：個別訂閱者的排程，以分號分隔，例如
+    "Uxxxx=0 9 * * *;Uyyyy=30 8 * * 1-5 America/New_York"（時區可省略）
+"""
+
+import heapq
+import itertools
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover - Python 3.9 以上都有 zoneinfo
+    ZoneInfo = None
+
+
+REPORT_SCHEDULE_FILE = "report_schedule.json"
+
+DEFAULT_SUBSCRIBER = '*'
+DEFAULT_CRON = "0 * * * *"
+DEFAULT_TIMEZONE = "Asia/Taipei"
+
+# 沒有發送記錄時往前找最近的時段（首次執行立即補發最近一次報告）
+FIRST_RUN_LOOKBACK = timedelta(days=1)
+# 錯過的時段超過此範圍時直接從這段時間內開始找，不逐一走過停機期間的每個時段
+CATCH_UP_SCAN = timedelta(days=1)
+# 尋找下一個時段的上限（例如 "0 0 31 2 *" 永遠不會成立）
+MAX_SEARCH_DAYS = 366 * 5
+
+# (名稱, 最小值, 最大值)
+_FIELDS = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 6),
+)
+
+_OFFSET_PATTERN = re.compile(r'^(?:UTC)?([+-])(\d{1,2})(?::?(\d{2}))?$')
+
+
+def parse_timezone(name):
+    """
+    解析時區名稱
+
+    Args:
+        name (str): IANA 時區名稱（例如 "Asia/Taipei"），或固定時差（例如 "+08:00"、"UTC-5"）
+
+    Returns:
+        tzinfo: 時區
+    """
+    match = _OFFSET_PATTERN.match(name.strip())
+    if match:
+        sign, hours, minutes = match.groups()
+        offset = timedelta(hours=int(hours), minutes=int(minutes or 0))
+        return timezone(-offset if sign == '-' else offset)
+    if name.strip().upper() == 'UTC':
+        return timezone.utc
+    if ZoneInfo is None:
+        raise ValueError(f"不支援的時區: {name}")
+    try:
+        return ZoneInfo(name.strip())
+    except Exception:
+        raise ValueError(f"不支援的時區: {name}")
+
+
+def _parse_field(text, name, low, high):
+    # 星期日可寫成 0 或 7
+    upper = 7 if name == 'weekday' else high
+    values = set()
+    for part in text.split(','):
+        body, slash, step = part.partition('/')
+        step = int(step) if slash else 1
+        if step <= 0:
+            raise ValueError(f"{name} 欄位的間隔必須大於 0: {part}")
+        if body == '*':
+            start, end = low, high
+        elif '-' in body:
+            start, end = (int(value) for value in body.split('-', 1))
+        else:
+            # "5/15" 表示從 5 開始每 15
+            start = int(body)
+            end = high if slash else start
+        if start < low or end > upper or start > end:
+            raise ValueError(f"{name} 欄位超出範圍 {low}-{high}: {part}")
+        values.update(value % 7 if name == 'weekday' else value for value in range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronSchedule:
+    """
+    cron 格式的排程（分 時 日 月 星期），在指定時區計算
+    """
+
+    def __init__(self, expression, tz=DEFAULT_TIMEZONE):
+        """
+        Args:
+            expression (str): cron 運算式，例如 "0 * * * *"、"*/30 9-17 * * 1-5"
+            tz (str): 時區名稱
+
+        Raises:
+            ValueError: 運算式或時區格式錯誤
+        """
+        fields = expression.split()
+        if len(fields) != len(_FIELDS):
+            raise ValueError(f"cron 運算式需要 5 個欄位: {expression!r}")
+        self.expression = ' '.join(fields)
+        self.tz_name = tz
+        self.tz = parse_timezone(tz)
+        try:
+            parsed = [_parse_field(text, *spec) for text, spec in zip(fields, _FIELDS)]
+        except ValueError as e:
+            raise ValueError(f"cron 運算式格式錯誤 {expression!r}: {e}")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = parsed
+        # 與 cron 相同：日與星期都有限制時，任一成立即可
+        self._day_restricted = fields[2] != '*'
+        self._weekday_restricted = fields[4] != '*'
+
+    @property
+    def spec(self):
+        """(運算式, 時區)，用於比較排程是否變更"""
+        return (self.expression, self.tz_name)
+
+    def _day_matches(self, local):
+        day_ok = local.day in self.days
+        weekday_ok = (local.weekday() + 1) % 7 in self.weekdays
+        if self._day_restricted and self._weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after):
+        """
+        Args:
+            after (datetime): 有時區的時間
+
+        Returns:
+            datetime: after 之後（不含）第一個符合排程的時間（排程的時區），找不到時返回 None
+        """
+        local = after.astimezone(self.tz).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit = local + timedelta(days=MAX_SEARCH_DAYS)
+        while local < limit:
+            if local.month not in self.months:
+                year, month = (local.year + 1, 1) if local.month == 12 else (local.year, local.month + 1)
+                local = datetime(year, month, 1)
+                continue
+            if not self._day_matches(local):
+                local = datetime(local.year, local.month, local.day) + timedelta(days=1)
+                continue
+            hour = next((h for h in self.hours if h >= local.hour), None)
+            if hour is None:
+                local = datetime(local.year, local.month, local.day) + timedelta(days=1)
+                continue
+            if hour != local.hour:
+                local = local.replace(hour=hour, minute=0)
+            minute = next((m for m in self.minutes if m >= local.minute), None)
+            if minute is None:
+                local = local.replace(minute=0) + timedelta(hours=1)
+                continue
+            candidate = local.replace(minute=minute, tzinfo=self.tz)
+            # 夏令時間切換時，牆上時間可能對應到 after 之前的時刻
+            if candidate > after:
+                return candidate
+            local = local.replace(minute=minute) + timedelta(minutes=1)
+        return None
+
+
+class ReportScheduler:
+    """
+    以 min-heap 管理所有訂閱者的下一次報告時間
+    """
+
+    def __init__(self, path=REPORT_SCHEDULE_FILE):
+        """
+        Args:
+            path (str): 狀態檔路徑（各訂閱者最後發送的時段）
+        """
+        self.path = path
+        self._schedules = {}    # {訂閱者: CronSchedule}
+        self._last_slot = {}    # {訂閱者: 最後發送的時段（ISO 字串）}
+        self._heap = []         # [(到期 Unix 秒, 序號, 訂閱者, 版本)]
+        self._version = {}      # {訂閱者: 版本}，排程變更後舊的 heap 項目失效
+        self._in_flight = {}    # {訂閱者: 已取出、尚未完成的時段}
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._schedules)
+
+    def __contains__(self, subscriber):
+        return subscriber in self._schedules
+
+    def schedule_of(self, subscriber):
+        return self._schedules.get(subscriber)
+
+    def last_slot(self, subscriber):
+        """
+        Returns:
+            datetime: 訂閱者最後發送的時段，沒有記錄時返回 None
+        """
+        value = self._last_slot.get(subscriber)
+        return datetime.fromisoformat(value) if value else None
+
+    def _push(self, subscriber, due):
+        if due is None:
+            print(f"⚠️  排程 {self._schedules[subscriber].expression!r} 找不到下一次發送時間（{subscriber}）")
+            return
+        heapq.heappush(self._heap, (due.timestamp(), next(self._sequence), subscriber,
+                                    self._version[subscriber]))
+
+    def set_schedule(self, subscriber, schedule, now):
+        """
+        新增或更新訂閱者的排程；排程未變更時不做任何事
+
+        Args:
+            subscriber (str): 訂閱者（User ID，DEFAULT_SUBSCRIBER 表示預設收件對象）
+            schedule (CronSchedule): 排程
+            now (datetime): 目前時間
+        """
+        current = self._schedules.get(subscriber)
+        if current is not None and current.spec == schedule.spec:
+            return
+        self._schedules[subscriber] = schedule
+        self._version[subscriber] = self._version.get(subscriber, 0) + 1
+        if subscriber in self._in_flight:
+            # 取出中的時段完成後才排下一次
+            return
+        last = self.last_slot(subscriber)
+        self._push(subscriber, schedule.next_after(last if last is not None else now - FIRST_RUN_LOOKBACK))
+
+    def update(self, schedules, now):
+        """
+        以新的排程取代全部排程：新增或變更的訂閱者重新計算下一次時間，未變更的保留，不在其中的移除
+
+        Args:
+            schedules (dict): {訂閱者: CronSchedule}
+            now (datetime): 目前時間
+        """
+        for subscriber in [subscriber for subscriber in self._schedules if subscriber not in schedules]:
+            self.remove(subscriber)
+        for subscriber, schedule in schedules.items():
+            self.set_schedule(subscriber, schedule, now)
+
+    def remove(self, subscriber):
+        """移除訂閱者的排程（heap 中的項目在取出時略過）"""
+        self._schedules.pop(subscriber, None)
+        self._version[subscriber] = self._version.get(subscriber, 0) + 1
+        self._in_flight.pop(subscriber, None)
+
+    def _latest_slot(self, schedule, due, now):
+        # 錯過多個時段時只保留最近的一個
+        if now - due > CATCH_UP_SCAN:
+            candidate = schedule.next_after(now - CATCH_UP_SCAN)
+            if candidate is not None and candidate <= now:
+                due = candidate
+        following = schedule.next_after(due)
+        while following is not None and following <= now:
+            due, following = following, schedule.next_after(following)
+        return due
+
+    def next_due(self):
+        """
+        Returns:
+            float: 最早的到期時間（Unix 秒），沒有排程時返回 None
+        """
+        while self._heap:
+            _, _, subscriber, version = self._heap[0]
+            if self._version.get(subscriber) == version and subscriber in self._schedules:
+                return self._heap[0][0]
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now):
+        """
+        取出已到期的排程；取出的時段在 complete() 或 release() 之前不會再次取出
+
+        Args:
+            now (datetime): 目前時間
+
+        Returns:
+            list: [{'subscriber', 'slot', 'notification_id'}, ...]
+        """
+        due = []
+        now_ts = now.timestamp()
+        while self._heap and self._heap[0][0] <= now_ts:
+            due_ts, _, subscriber, version = heapq.heappop(self._heap)
+            schedule = self._schedules.get(subscriber)
+            if schedule is None or self._version.get(subscriber) != version:
+                continue
+            slot = self._latest_slot(schedule, datetime.fromtimestamp(due_ts, schedule.tz), now)
+            self._in_flight[subscriber] = slot
+            due.append({'subscriber': subscriber, 'slot': slot,
+                        'notification_id': report_notification_id(subscriber, slot)})
+        return due
+
+    def complete(self, subscriber, slot):
+        """
+        記錄時段已發送（或已決定略過），排入下一次時段
+
+        Args:
+            subscriber (str): 訂閱者
+            slot (datetime): pop_due() 取出的時段
+        """
+        self._in_flight.pop(subscriber, None)
+        self._last_slot[subscriber] = slot.isoformat()
+        schedule = self._schedules.get(subscriber)
+        if schedule is not None:
+            self._push(subscriber, schedule.next_after(slot))
+
+    def release(self, subscriber, slot):
+        """
+        發送失敗時放回排程，下一次檢查時重新取出同一時段
+        """
+        self._in_flight.pop(subscriber, None)
+        if subscriber in self._schedules:
+            self._push(subscriber, slot)
+
+    @classmethod
+    def load(cls, schedules, now, path=REPORT_SCHEDULE_FILE, last_report_time=None):
+        """
+        讀取狀態檔並建立排程
+
+        Args:
+            schedules (dict): {訂閱者: CronSchedule}
+            now (datetime): 目前時間
+            path (str): 狀態檔路徑
+            last_report_time (datetime, optional): 舊版 last_report_time.json 的發送時間，
+                預設收件對象沒有記錄時以此為最後發送時間
+
+        Returns:
+            ReportScheduler: 排程器
+        """
+        scheduler = cls(path)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    scheduler._last_slot = json.load(f).get('last_slot', {})
+        except Exception as e:
+            print(f"⚠️  讀取日報表排程狀態時發生錯誤: {e}")
+        if DEFAULT_SUBSCRIBER not in scheduler._last_slot and last_report_time is not None:
+            scheduler._last_slot[DEFAULT_SUBSCRIBER] = last_report_time.isoformat()
+        for subscriber, schedule in schedules.items():
+            scheduler.set_schedule(subscriber, schedule, now)
+        return scheduler
+
+    def save(self):
+        """
+        寫入狀態檔
+        """
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'last_slot': self._last_slot}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️  保存日報表排程狀態時發生錯誤: {e}")
+
+
+def report_notification_id(subscriber, slot):
+    """
+    Returns:
+        str: 時段的通知 ID，同一時段重送時 LINE 不會重複推播
+    """
+    slot_text = slot.strftime('%Y-%m-%d %H:%M')
+    if subscriber == DEFAULT_SUBSCRIBER:
+        return f"report:{slot_text}"
+    return f"report:{subscriber}:{slot_text}"
+
+
+def parse_subscriber_schedules(text, default_tz=DEFAULT_TIMEZONE):
+    """
+    解析 REPORT_SCHEDULES
+
+    Args:
+        text (str): "訂閱者=cron 運算式 [時區];..."
+        default_tz (str): 未指定時區時使用的時區
+
+    Returns:
+        dict: {訂閱者: CronSchedule}（格式錯誤的項目略過）
+    """
+    schedules = {}
+    for entry in text.split(';'):
+        if not entry.strip():
+            continue
+        subscriber, _, spec = entry.partition('=')
+        fields = spec.split()
+        try:
+            if not subscriber.strip() or len(fields) not in (5, 6):
+                raise ValueError("格式應為 訂閱者=分 時 日 月 星期 [時區]")
+            tz = fields[5] if len(fields) == 6 else default_tz
+            schedules[subscriber.strip()] = CronSchedule(' '.join(fields[:5]), tz)
+        except ValueError as e:
+            print(f"✗ 略過日報表排程 {entry.strip()!r}: {e}")
+    return schedules
+
+
+def schedules_from_env():
+    """
+    從環境變數讀取日報表排程（REPORT_CRON、REPORT_TIMEZONE、REPORT_SCHEDULES）
+
+    Returns:
+        dict: {訂閱者: CronSchedule}
+    """
+    default_tz = os.getenv("REPORT_TIMEZONE", DEFAULT_TIMEZONE)
+    schedules = {}
+    expression = os.getenv("REPORT_CRON", DEFAULT_CRON)
+    if expression.strip():
+        try:
+            schedules[DEFAULT_SUBSCRIBER] = CronSchedule(expression, default_tz)
+        except ValueError as e:
+            print(f"✗ REPORT_CRON 格式錯誤，改用預設排程 {DEFAULT_CRON!r}: {e}")
+            schedules[DEFAULT_SUBSCRIBER] = CronSchedule(DEFAULT_CRON, DEFAULT_TIMEZONE)
+    schedules.update(parse_subscriber_schedules(os.getenv("REPORT_SCHEDULES", ""), default_tz))
+    return schedules
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    parser = argparse.ArgumentParser(description="日報表排程：顯示下一次發送時間，或測試大量排程的效能")
+    parser.add_argument('--benchmark', type=int, default=0, help="建立指定數量的隨機排程並測量取出到期排程的時間")
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    if args.benchmark:
+        rng = random.Random(0)
+        zones = ["Asia/Taipei", "Asia/Tokyo", "Europe/London", "America/New_York", "+05:30"]
+        schedules = {f"U{index:032d}": CronSchedule(f"{rng.randrange(60)} {rng.randrange(24)} * * *", rng.choice(zones))
+                     for index in range(args.benchmark)}
+        started = time.perf_counter()
+        scheduler = ReportScheduler(path=None)
+        for subscriber, schedule in schedules.items():
+            scheduler.set_schedule(subscriber, schedule, now)
+        built = time.perf_counter() - started
+        fired = 0
+        started = time.perf_counter()
+        for minute in range(24 * 60):
+            for item in scheduler.pop_due(now + timedelta(minutes=minute)):
+                scheduler.complete(item['subscriber'], item['slot'])
+                fired += 1
+        elapsed = time.perf_counter() - started
+        print(f"建立 {args.benchmark} 個排程: {built * 1000:.1f} ms")
+        print(f"模擬 24 小時（每分鐘檢查一次）: 發送 {fired} 次（含首次執行補發），共 {elapsed * 1000:.1f} ms")
+    else:
+        schedules = schedules_from_env()
+        scheduler = ReportScheduler.load(schedules, now)
+        for subscriber, schedule in schedules.items():
+            last = scheduler.last_slot(subscriber)
+            following = schedule.next_after(max(last, now) if last else now)
+            print(f"{subscriber}: {schedule.expression} ({schedule.tz_name})")
+            print(f"  上次發送: {last.isoformat() if last else '無'}")
+            print(f"  下次發送: {following.isoformat() if following else '無'}")
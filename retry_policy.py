@@ -0,0 +1,249 @@
+"""
+統一的重試策略與執行時間預算
+- RetryPolicy: 指數退避加隨機抖動（full jitter），可依 Retry-After 標頭等待
+- Deadline: 整次執行的時間預算，每次嘗試的逾時與等待時間都不會超過剩餘預算，
+            確保一次執行（例如每 10 分鐘的排程）一定在設定的時間內結束
+"""
+
+import math
+import os
+import random
+import ssl
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+
+# 每次執行的時間預算（秒），可用環境變數調整
+RUN_BUDGET_SECONDS = float(os.getenv("RUN_BUDGET_SECONDS", "180"))
+
+# 預設會重試的 HTTP 狀態碼
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# 剩餘預算低於此值時不再發出新的請求
+MIN_ATTEMPT_SECONDS = 1.0
+
+
+class Deadline:
+    """
+    以 time.monotonic() 計算的截止時間
+    """
+
+    def __init__(self, seconds=None):
+        """
+        Args:
+            seconds (float, optional): 預算秒數，None 表示沒有期限
+        """
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        """
+        Returns:
+            float: 剩餘秒數（沒有期限時為無限大，已過期時為 0）
+        """
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def clamp(self, seconds):
+        """
+        Returns:
+            float: 不超過剩餘預算的秒數
+        """
+        return min(seconds, self.remaining())
+
+    def with_reserve(self, seconds):
+        """
+        保留一段時間給後續步驟（例如發送 LINE 通知）
+
+        Returns:
+            Deadline: 提早 seconds 秒到期的新截止時間
+        """
+        child = Deadline()
+        if self.expires_at is not None:
+            child.expires_at = self.expires_at - seconds
+        return child
+
+
+_run_deadline = None
+
+
+def start_run_deadline(seconds=None):
+    """
+    開始本次執行的時間預算
+
+    Args:
+        seconds (float, optional): 預算秒數，預設為 RUN_BUDGET_SECONDS
+
+    Returns:
+        Deadline: 本次執行的截止時間
+    """
+    global _run_deadline
+    _run_deadline = Deadline(RUN_BUDGET_SECONDS if seconds is None else seconds)
+    return _run_deadline
+
+
+def get_run_deadline():
+    """
+    Returns:
+        Deadline: 本次執行的截止時間，尚未開始時返回沒有期限的 Deadline
+    """
+    return _run_deadline if _run_deadline is not None else Deadline()
+
+
+def parse_retry_after(value, now=None):
+    """
+    解析 Retry-After 標頭（秒數或 HTTP 日期）
+
+    Returns:
+        float: 需要等待的秒數，無法解析時返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+class RetryPolicy:
+    """
+    HTTP 請求的重試策略
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0, timeout=15.0,
+                 honor_retry_after=True, retry_statuses=RETRYABLE_STATUSES, rng=None):
+        """
+        Args:
+            max_attempts (int): 最多嘗試次數（含第一次）
+            base_delay (float): 退避基準秒數，第 n 次重試的上限為 base_delay * 2^n
+            max_delay (float): 單次等待上限秒數
+            timeout (float): 單次請求逾時秒數（會再受剩餘預算限制）
+            honor_retry_after (bool): 429/503 回應帶有 Retry-After 時是否依其等待
+            retry_statuses (tuple): 需要重試的 HTTP 狀態碼
+            rng (random.Random, optional): 抖動用的亂數產生器
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.honor_retry_after = honor_retry_after
+        self.retry_statuses = tuple(retry_statuses)
+        self.rng = rng or random.Random()
+
+    def backoff(self, attempt):
+        """
+        指數退避加 full jitter：在 [0, min(max_delay, base_delay * 2^attempt)] 間隨機取值
+
+        Args:
+            attempt (int): 已失敗的次數（從 0 開始）
+
+        Returns:
+            float: 等待秒數
+        """
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def next_delay(self, attempt, response=None):
+        """
+        計算下次重試前的等待秒數，優先使用 Retry-After
+
+        Returns:
+            float: 等待秒數
+        """
+        if self.honor_retry_after and response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return retry_after
+        return self.backoff(attempt)
+
+    def get(self, url, **kwargs):
+        """
+        在重試策略與時間預算內發送 GET 請求
+
+        Returns:
+            tuple: (最後一次的回應或 None, 重試次數)
+        """
+        return self.request('GET', url, **kwargs)
+
+    def request(self, method, url, deadline=None, ssl_fallback=False, before_attempt=None, **kwargs):
+        """
+        在重試策略與時間預算內發送請求，不需重試的回應（包括 4xx 錯誤）直接返回
+
+        Args:
+            method (str): HTTP 方法
+            url (str): 請求網址
+            deadline (Deadline, optional): 時間預算，預設為本次執行的預算
+            ssl_fallback (bool): SSL 錯誤時是否改用不驗證憑證的連線重試
+            before_attempt (callable, optional): 每次發送前呼叫（例如速率限制器的 acquire）
+            **kwargs: 傳給 requests.request 的其他參數
+
+        Returns:
+            tuple: (最後一次的回應或 None, 重試次數)
+        """
+        deadline = deadline or get_run_deadline()
+        verify = kwargs.pop('verify', True)
+        response = None
+        attempt = 0
+
+        for attempt in range(self.max_attempts):
+            if deadline.remaining() < MIN_ATTEMPT_SECONDS:
+                print(f"  ⚠️  已達執行時間預算，停止請求（剩餘 {deadline.remaining():.1f} 秒）")
+                break
+            if attempt > 0:
+                print(f"  重試第 {attempt} 次...")
+
+            if before_attempt is not None:
+                before_attempt()
+            response = None
+            error = None
+            try:
+                response = requests.request(method, url, timeout=deadline.clamp(self.timeout),
+                                            verify=verify, **kwargs)
+            except (requests.exceptions.SSLError, ssl.SSLError) as ssl_error:
+                error = ssl_error
+                if ssl_fallback and verify:
+                    print(f"  SSL 錯誤: {ssl_error}，改用備用 SSL 設定重試...")
+                    verify = False
+                    continue
+            except requests.exceptions.Timeout as timeout_error:
+                error = timeout_error
+                print(f"  請求超時")
+            except requests.exceptions.ConnectionError as conn_error:
+                error = conn_error
+                print(f"  連接錯誤: {conn_error}")
+            except requests.exceptions.RequestException as request_error:
+                error = request_error
+                print(f"  發生錯誤: {request_error}")
+
+            if response is not None and response.status_code not in self.retry_statuses:
+                return response, attempt
+
+            if attempt >= self.max_attempts - 1:
+                break
+
+            delay = self.next_delay(attempt, response)
+            if delay > deadline.remaining() - MIN_ATTEMPT_SECONDS:
+                print(f"  ⚠️  需等待 {delay:.1f} 秒，超過剩餘執行時間預算，停止重試")
+                break
+            if response is not None:
+                reason = "請求頻率過高" if response.status_code == 429 else f"狀態碼 {response.status_code}"
+                print(f"  {reason}，等待 {delay:.1f} 秒後重試...")
+            elif error is not None:
+                print(f"  等待 {delay:.1f} 秒後重試...")
+            time.sleep(delay)
+
+        return response, attempt
@@ -6,6 +6,8 @@
 import os
 import re
 
+from monitor_config import CONFIG_FILE, ConfigError, load_config
+
 def main():
     print("=" * 60)
     print("Channel Token 和 User ID 設定狀態")
@@ -58,6 +60,20 @@ def main():
     except Exception as e:
         print(f"✗ 無法讀取 update_channel_token.py: {e}")
     
+    print()
+    print("=" * 60)
+    print("【設定檔】")
+    print("-" * 60)
+    
+    # 規則、排程、收件者與通知管道（沒有設定檔時依環境變數）
+    try:
+        for line in load_config().summary():
+            print(f"  {line}")
+    except ConfigError as e:
+        print(f"✗ 設定檔有誤（{CONFIG_FILE}）:")
+        for error in e.errors:
+            print(f"  - {error}")
+    
     print()
     print("=" * 60)
     print("【驗證建議】")
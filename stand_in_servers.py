@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+本機替身伺服器
+模擬 CoinGecko、幣安、台灣銀行黃金牌價頁面與 LINE Messaging API，
+另有記錄所有 POST 的 HTTP 接收端（webhook、Telegram 風格 API）與 SMTP 除錯伺服器，
+讓測試、壓力測試與失敗情境測試可以完全離線執行。
+
+各服務回傳 fixtures/ 目錄中錄製的 JSON / HTML，並可設定：
+  - 回應延遲（latency）
+  - 隨機 500 錯誤比例（error_rate）
+  - 隨機 429 錯誤比例（rate_limit_rate，附帶 Retry-After）
+  - 地理位置限制（geo_block，固定回傳 451）
+
+抓取模組透過環境變數指向替身伺服器：
+  COINGECKO_BASE_URL、BINANCE_BASE_URL、BOT_BASE_URL、LINE_API_BASE_URL
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SERVICES = ('coingecko', 'binance', 'bot', 'line')
+
+# 記錄所有 POST 請求的 HTTP 接收端（webhook 與 Telegram 風格的通知管道），不在預設啟動的服務中
+SINK = 'sink'
+
+# 各服務對應的環境變數與抓取模組屬性
+BASE_URL_SETTINGS = {
+    'coingecko': ('COINGECKO_BASE_URL', 'get_gold_price', 'COINGECKO_BASE_URL'),
+    'binance': ('BINANCE_BASE_URL', 'get_gold_price', 'BINANCE_BASE_URL'),
+    'bot': ('BOT_BASE_URL', 'get_bot_gold_price', 'BOT_BASE_URL'),
+    'line': ('LINE_API_BASE_URL', 'line_notify', 'LINE_API_BASE_URL'),
+}
+
+# 測試用的 LINE 憑證（格式正確，只對替身伺服器有效）
+TEST_CHANNEL_ACCESS_TOKEN = "A" * 120 + "="
+TEST_USER_ID = "U" + "0" * 32
+
+
+def _load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class StandInConfig:
+    """
+    替身伺服器的失敗注入設定（執行期間可直接修改屬性）
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 geo_block=False, retry_after=1, seed=None):
+        """
+        Args:
+            latency (float): 每個請求的延遲秒數
+            error_rate (float): 回傳 500 的機率（0-1）
+            rate_limit_rate (float): 回傳 429 的機率（0-1）
+            geo_block (bool): 是否一律回傳 451（模擬幣安地理位置限制）
+            retry_after (int): 429 回應的 Retry-After 秒數
+            seed (int, optional): 亂數種子，用於重現失敗序列
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.geo_block = geo_block
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    """預設的 listen backlog（5）在大量並行連線時會溢位，造成約 1 秒的 SYN 重傳延遲"""
+
+    request_queue_size = 128
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """依伺服器的 service 屬性分派請求"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # 壓力測試時請求量很大，不輸出存取記錄
+        pass
+
+    def setup(self):
+        # 每個 TCP 連線建立一個 handler，keep-alive 連線上的後續請求沿用同一個
+        super().setup()
+        # 標頭與內容分兩次寫出，keep-alive 連線上需關閉 Nagle 以免每個請求多等一次延遲 ACK
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.stand_in.record_connection()
+
+    def _send(self, status, body=b'', content_type='application/json', headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, data, headers=None):
+        self._send(status, json.dumps(data, ensure_ascii=False), headers=headers)
+
+    def _inject_failure(self):
+        """依設定注入延遲與錯誤，已回應錯誤時返回 True"""
+        stand_in = self.server.stand_in
+        config = stand_in.config
+        if config.latency > 0:
+            time.sleep(config.latency)
+        if config.geo_block:
+            self._send_json(451, {'code': 0, 'msg': 'Service unavailable from a restricted location'})
+            return True
+        if config.rate_limit_rate > 0 and config.random.random() < config.rate_limit_rate:
+            self._send_json(429, {'message': 'Too Many Requests'},
+                            headers={'Retry-After': str(config.retry_after)})
+            return True
+        if config.error_rate > 0 and config.random.random() < config.error_rate:
+            self._send_json(500, {'message': 'Internal Server Error'})
+            return True
+        return False
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        try:
+            return json.loads(raw.decode('utf-8')) if raw else {}
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        self.server.stand_in.record_request('GET', self.path)
+        # LINE 的 GET 端點（額度、個人資料）也需要驗證
+        if self.server.stand_in.service == 'line' and not self._check_line_auth():
+            return
+        if self._inject_failure():
+            return
+        url = urlparse(self.path)
+        handler = getattr(self.server.stand_in, f'get_{self.server.stand_in.service}', None)
+        result = handler(url.path, parse_qs(url.query)) if handler else None
+        if result is None:
+            self._send_json(404, {'message': 'Not Found'})
+            return
+        status, body, content_type = result
+        self._send(status, body, content_type=content_type)
+
+    def do_POST(self):
+        stand_in = self.server.stand_in
+        stand_in.record_request('POST', self.path)
+        if stand_in.service not in ('line', SINK):
+            self._send_json(405, {'message': 'Method Not Allowed'})
+            return
+        if stand_in.service == 'line' and not self._check_line_auth():
+            return
+        payload = self._read_body()
+        if self._inject_failure():
+            return
+        if payload is None:
+            self._send_json(400, {'message': 'The request body has 1 error(s)'})
+            return
+        if stand_in.service == SINK:
+            status, data, headers = stand_in.post_sink(urlparse(self.path).path, payload)
+        else:
+            status, data, headers = stand_in.post_line(
+                urlparse(self.path).path, payload, self.headers.get('X-Line-Retry-Key'))
+        self._send_json(status, data, headers=headers)
+
+    def _check_line_auth(self):
+        auth = self.headers.get('Authorization', '')
+        if not auth.startswith('Bearer ') or len(auth) <= len('Bearer '):
+            self._send_json(401, {'message': 'Authentication failed. Confirm that the access token in the authorization header is valid.'})
+            return False
+        return True
+
+
+class StandInServer:
+    """
+    單一服務的替身伺服器（在背景執行緒中運行）
+    """
+
+    def __init__(self, service, config=None, host='127.0.0.1', port=0):
+        """
+        Args:
+            service (str): 服務名稱（coingecko、binance、bot、line、sink）
+            config (StandInConfig, optional): 失敗注入設定
+            host (str): 監聽位址
+            port (int): 監聽埠號，0 表示自動分配
+        """
+        if service not in SERVICES and service != SINK:
+            raise ValueError(f"未知的服務: {service}")
+        self.service = service
+        self.config = config or StandInConfig()
+        self.price = None
+        self.request_count = 0
+        self.connection_count = 0
+        self.line_messages = []
+        self.sink_messages = []
+        self._accepted_retry_keys = {}
+        self._lock = threading.Lock()
+        self._fixtures = {
+            'coingecko': json.loads(_load_fixture('coingecko_simple_price.json')),
+            'binance': json.loads(_load_fixture('binance_ticker_price.json')),
+            'binance_24hr': json.loads(_load_fixture('binance_ticker_24hr.json')),
+            'bot': _load_fixture('bot_gold.html'),
+        }
+        self._httpd = _StandInHTTPServer((host, port), _StandInHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stand_in = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def set_price(self, price):
+        """設定回傳的 USD 價格（None 表示使用錄製值）"""
+        self.price = price
+
+    def record_request(self, method, path):
+        """累計收到的請求數"""
+        with self._lock:
+            self.request_count += 1
+
+    def record_connection(self):
+        """累計建立的 TCP 連線數"""
+        with self._lock:
+            self.connection_count += 1
+
+    # ---- CoinGecko ----
+
+    def get_coingecko(self, path, query):
+        if path == '/api/v3/simple/price':
+            data = json.loads(json.dumps(self._fixtures['coingecko']))
+            if self.price is not None:
+                data['pax-gold']['usd'] = self.price
+                data['pax-gold']['last_updated_at'] = int(time.time())
+            return 200, json.dumps(data), 'application/json'
+        if path == '/api/v3/coins/pax-gold/market_chart/range':
+            start_ts = int(float(query.get('from', ['0'])[0]))
+            end_ts = int(float(query.get('to', ['0'])[0]))
+            first = ((start_ts + 3599) // 3600) * 3600
+            prices = [[ts * 1000, self._synthetic_price(ts)] for ts in range(first, end_ts, 3600)]
+            return 200, json.dumps({'prices': prices, 'market_caps': [], 'total_volumes': []}), 'application/json'
+        return None
+
+    # ---- 幣安 ----
+
+    def get_binance(self, path, query):
+        if path == '/api/v3/ticker/price':
+            data = dict(self._fixtures['binance'])
+            if self.price is not None:
+                data['price'] = f"{self.price:.8f}"
+            return 200, json.dumps(data), 'application/json'
+        if path == '/api/v3/ticker/24hr':
+            data = dict(self._fixtures['binance_24hr'])
+            if self.price is not None:
+                data['lastPrice'] = f"{self.price:.8f}"
+                data['closeTime'] = int(time.time() * 1000)
+            return 200, json.dumps(data), 'application/json'
+        if path == '/api/v3/klines':
+            start_ms = int(query.get('startTime', ['0'])[0])
+            end_ms = int(query.get('endTime', [str(int(time.time() * 1000))])[0])
+            limit = int(query.get('limit', ['500'])[0])
+            klines = []
+            open_ms = ((start_ms + 3599999) // 3600000) * 3600000
+            while open_ms <= end_ms and len(klines) < limit:
+                close = self._synthetic_price(open_ms // 1000)
+                klines.append([open_ms, f"{close:.2f}", f"{close + 1:.2f}", f"{close - 1:.2f}",
+                               f"{close:.2f}", "12.5", open_ms + 3599999, "0", 10, "0", "0", "0"])
+                open_ms += 3600000
+            return 200, json.dumps(klines), 'application/json'
+        return None
+
+    # ---- 台灣銀行 ----
+
+    def get_bot(self, path, query):
+        if path == '/gold':
+            return 200, self._fixtures['bot'], 'text/html'
+        return None
+
+    # ---- LINE Messaging API ----
+
+    def get_line(self, path, query):
+        if path == '/v2/bot/message/quota':
+            return 200, json.dumps({'type': 'limited', 'value': 200}), 'application/json'
+        if path == '/v2/bot/message/quota/consumption':
+            with self._lock:
+                used = sum(len(m['to']) for m in self.line_messages)
+            return 200, json.dumps({'totalUsage': used}), 'application/json'
+        if path.startswith('/v2/bot/profile/'):
+            user_id = path.rsplit('/', 1)[-1]
+            return 200, json.dumps({'userId': user_id, 'displayName': 'stand-in'}), 'application/json'
+        return None
+
+    def post_line(self, path, payload, retry_key):
+        """
+        模擬 LINE 推播端點，記錄收到的訊息
+        同一 X-Line-Retry-Key 重複送出時比照 LINE 回傳 409 與原請求 ID
+
+        Returns:
+            tuple: (狀態碼, 回應內容, 額外標頭)
+        """
+        kinds = {
+            '/v2/bot/message/push': 'push',
+            '/v2/bot/message/multicast': 'multicast',
+            '/v2/bot/message/broadcast': 'broadcast',
+            '/v2/bot/message/narrowcast': 'narrowcast',
+        }
+        kind = kinds.get(path)
+        if kind is None:
+            return 404, {'message': 'Not Found'}, None
+        if not payload.get('messages'):
+            return 400, {'message': 'The request body has 1 error(s)'}, None
+
+        if kind == 'push':
+            recipients = [payload.get('to')]
+        elif kind == 'multicast':
+            recipients = list(payload.get('to') or [])
+            if len(recipients) > 500:
+                return 400, {'message': 'Size must be between 1 and 500'}, None
+        else:
+            recipients = ['*']
+
+        with self._lock:
+            if retry_key and retry_key in self._accepted_retry_keys:
+                return 409, {'message': 'The retry key is already accepted'}, {
+                    'x-line-accepted-request-id': self._accepted_retry_keys[retry_key]}
+            request_id = f"standin-{len(self.line_messages) + 1}"
+            if retry_key:
+                self._accepted_retry_keys[retry_key] = request_id
+            self.line_messages.append({
+                'kind': kind,
+                'to': recipients,
+                'messages': payload['messages'],
+                'retry_key': retry_key,
+                'received_at': time.time(),
+            })
+        if kind == 'narrowcast':
+            return 202, {}, {'x-line-request-id': request_id}
+        return 200, {'sentMessages': [{'id': request_id}]}, {'x-line-request-id': request_id}
+
+    # ---- HTTP 接收端 ----
+
+    def post_sink(self, path, payload):
+        """
+        記錄收到的 POST（webhook 或 Telegram 風格的 /bot<token>/sendMessage）
+
+        Returns:
+            tuple: (狀態碼, 回應內容, 額外標頭)
+        """
+        with self._lock:
+            self.sink_messages.append({'path': path, 'payload': payload, 'received_at': time.time()})
+            message_id = len(self.sink_messages)
+        return 200, {'ok': True, 'result': {'message_id': message_id}}, None
+
+    def _synthetic_price(self, ts):
+        """依時間戳產生可重現的歷史價格"""
+        base = self.price if self.price is not None else 4359.16
+        return round(base * (1 + 0.01 * ((ts // 3600) % 24 - 12) / 12), 2)
+
+
+class StandInSuite:
+    """
+    一次啟動全部替身伺服器，並將抓取模組指向它們
+    """
+
+    def __init__(self, services=SERVICES, **config_kwargs):
+        """
+        Args:
+            services (iterable): 要啟動的服務
+            **config_kwargs: 傳給每個服務 StandInConfig 的參數
+        """
+        self.servers = {
+            service: StandInServer(service, StandInConfig(**config_kwargs))
+            for service in services
+        }
+        self._saved = {}
+
+    def __getitem__(self, service):
+        return self.servers[service]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        for server in self.servers.values():
+            server.start()
+        self.configure_clients()
+        return self
+
+    def stop(self):
+        self.restore_clients()
+        for server in self.servers.values():
+            server.stop()
+
+    def env(self):
+        """
+        Returns:
+            dict: 指向替身伺服器的環境變數
+        """
+        return {BASE_URL_SETTINGS[service][0]: server.base_url
+                for service, server in self.servers.items() if service in BASE_URL_SETTINGS}
+
+    def configure_clients(self):
+        """將已載入的抓取模組與環境變數指向替身伺服器"""
+        import importlib
+        for service, server in self.servers.items():
+            if service not in BASE_URL_SETTINGS:
+                continue
+            env_name, module_name, attr = BASE_URL_SETTINGS[service]
+            module = importlib.import_module(module_name)
+            self._saved[service] = (os.environ.get(env_name), getattr(module, attr))
+            os.environ[env_name] = server.base_url
+            setattr(module, attr, server.base_url)
+
+    def restore_clients(self):
+        """還原抓取模組與環境變數"""
+        import importlib
+        for service, (env_value, attr_value) in self._saved.items():
+            env_name, module_name, attr = BASE_URL_SETTINGS[service]
+            if env_value is None:
+                os.environ.pop(env_name, None)
+            else:
+                os.environ[env_name] = env_value
+            setattr(importlib.import_module(module_name), attr, attr_value)
+        self._saved = {}
+
+
+def _apply_env(values):
+    """設定環境變數，值為 None 時移除"""
+    for name, value in values.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+@contextlib.contextmanager
+def stand_in_main_run(env=None, services=SERVICES, **config_kwargs):
+    """
+    以替身伺服器在暫存目錄中執行 main.main() 的測試環境：
+    設定測試用的 LINE 憑證（line_notify 屬性與環境變數）與額外的環境變數、啟動 StandInSuite 並切換到暫存目錄，
+    離開時還原憑證、環境變數與工作目錄
+
+    Args:
+        env (dict, optional): 額外的環境變數，值為 None 時移除；執行期間修改這些變數也會在離開時還原
+        services (iterable): 要啟動的服務
+        **config_kwargs: 傳給每個服務 StandInConfig 的參數
+
+    Yields:
+        StandInSuite: 已啟動的替身伺服器
+    """
+    import line_notify
+    env = {'CHANNEL_ACCESS_TOKEN': TEST_CHANNEL_ACCESS_TOKEN, 'USER_ID': TEST_USER_ID, **(env or {})}
+    saved = (line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID)
+    saved_env = {name: os.environ.get(name) for name in env}
+    cwd = os.getcwd()
+    try:
+        line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = TEST_CHANNEL_ACCESS_TOKEN, TEST_USER_ID
+        _apply_env(env)
+        with StandInSuite(services, **config_kwargs) as suite, tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                yield suite
+            finally:
+                os.chdir(cwd)
+    finally:
+        line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = saved
+        _apply_env(saved_env)
+
+
+class _StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """只實作寄信所需指令的 SMTP 對話（EHLO/HELO、MAIL、RCPT、DATA、RSET、NOOP、QUIT）"""
+
+    def _reply(self, line):
+        self.wfile.write((line + '\r\n').encode('utf-8'))
+        self.wfile.flush()
+
+    def handle(self):
+        stand_in = self.server.stand_in
+        config = stand_in.config
+        sender, recipients = None, []
+        self._reply('220 stand-in ESMTP ready')
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self._reply('250 stand-in')
+            elif command == 'MAIL':
+                if config.latency > 0:
+                    time.sleep(config.latency)
+                if config.error_rate > 0 and config.random.random() < config.error_rate:
+                    # 暫時性錯誤，寄件端應稍後重試
+                    self._reply('451 4.3.0 Temporary failure')
+                    continue
+                sender, recipients = line.split(':', 1)[1].strip().strip('<>'), []
+                self._reply('250 OK')
+            elif command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip().strip('<>'))
+                self._reply('250 OK')
+            elif command == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    # 去除行首跳脫的句點
+                    lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                stand_in.record_mail(sender, recipients, b''.join(lines))
+                sender, recipients = None, []
+                self._reply('250 OK: queued')
+            elif command == 'RSET':
+                sender, recipients = None, []
+                self._reply('250 OK')
+            elif command == 'NOOP':
+                self._reply('250 OK')
+            elif command == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class StandInSMTPServer:
+    """
+    SMTP 除錯伺服器：接受所有郵件並保存在 messages 中（不轉寄）
+    """
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        """
+        Args:
+            config (StandInConfig, optional): 失敗注入設定（latency、error_rate 以 451 暫時性錯誤回應）
+            host (str): 監聽位址
+            port (int): 監聽埠號，0 表示自動分配
+        """
+        self.config = config or StandInConfig()
+        self.messages = []  # [{'from', 'to', 'data'}, ...]
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), _StandInSMTPHandler)
+        self._server.daemon_threads = True
+        self._server.stand_in = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def record_mail(self, sender, recipients, data):
+        """保存收到的郵件"""
+        with self._lock:
+            self.messages.append({'from': sender, 'to': list(recipients), 'data': data})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="啟動本機替身伺服器")
+    parser.add_argument('--latency', type=float, default=0.0, help="每個請求的延遲秒數")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="回傳 500 的機率（0-1）")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="回傳 429 的機率（0-1）")
+    parser.add_argument('--geo-block', action='store_true', help="幣安一律回傳 451")
+    args = parser.parse_args()
+
+    servers = {service: StandInServer(service, StandInConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        geo_block=args.geo_block and service == 'binance',
+    )).start() for service in SERVICES}
+
+    print("替身伺服器已啟動，請設定以下環境變數：")
+    for service, server in servers.items():
+        print(f"  export {BASE_URL_SETTINGS[service][0]}={server.base_url}")
+    print("按 Ctrl+C 結束")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers.values():
+            server.stop()
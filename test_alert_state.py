@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+測試警報規則的冷卻時間、遲滯重新啟用與升級等級
+"""
+
+import os
+import tempfile
+
+import main
+from alert_state import ALERT_STATE_FILE, AlertPolicy, AlertStateStore
+from stand_in_servers import stand_in_main_run
+
+
+def test_cooldown_and_hysteresis_suppress_flapping():
+    store = AlertStateStore(path=os.devnull)
+    policy = AlertPolicy(cooldown_seconds=600, rearm_band=1.0, escalation_step=0)
+    # 數值在 5% 閾值附近來回，只在第一次超過時通知
+    values = [5.2, 4.8, 5.1, 4.5, 5.3]
+    fired = [store.evaluate('XAU:price_change', value, 5.0, index * 60, policy) for index, value in enumerate(values)]
+    assert [decision is not None for decision in fired] == [True, False, False, False, False]
+    # 回落到遲滯帶以下重新啟用，但仍在冷卻時間內
+    assert store.evaluate('XAU:price_change', 3.9, 5.0, 360, policy) is None
+    assert store.state('XAU:price_change')['armed']
+    assert store.evaluate('XAU:price_change', 5.5, 5.0, 420, policy) is None
+    # 冷卻結束後再次超過閾值才通知
+    assert store.evaluate('XAU:price_change', 5.5, 5.0, 700, policy)['level'] == 1
+    assert store.evaluate('XAG:price_change', 5.5, 5.0, 700, policy) is not None
+    assert store.evaluate('XAU:price_change', None, 5.0, 800, policy) is None
+
+
+def test_escalation_levels_and_persistence():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, ALERT_STATE_FILE)
+        policy = AlertPolicy(cooldown_seconds=3600, rearm_band=1.0, escalation_step=2.5, max_level=3)
+        store = AlertStateStore(path)
+        assert store.evaluate('XAU:price_change', 5.0, 5.0, 0, policy)['level'] == 1
+        store.save()
+
+        # 重新啟動後沿用狀態：變化持續擴大時升級，不受冷卻限制
+        restored = AlertStateStore.load(path)
+        assert restored.evaluate('XAU:price_change', 6.0, 5.0, 60, policy) is None
+        decision = restored.evaluate('XAU:price_change', 7.6, 5.0, 120, policy)
+        assert decision['level'] == 2 and decision['escalated']
+        assert restored.evaluate('XAU:price_change', 9.0, 5.0, 180, policy) is None
+        assert restored.evaluate('XAU:price_change', 10.0, 5.0, 240, policy)['level'] == 3
+        # 已達最高等級
+        assert restored.evaluate('XAU:price_change', 20.0, 5.0, 300, policy) is None
+        assert restored.state('XAU:price_change') == {'armed': False, 'level': 3, 'last_fired': 240}
+
+
+def test_main_change_alert_does_not_flap():
+    with stand_in_main_run() as suite:
+        # 價格在兩個相差約 6% 的水準之間來回，每次輪詢的變化都超過 5%
+        for price in (4000.0, 4240.0, 4000.0, 4240.0):
+            suite['coingecko'].set_price(price)
+            main.main()
+        texts = [m['messages'][0]['text'] for m in suite['line'].line_messages]
+        assert sum(text.startswith("⚠️ 價格變化警報") for text in texts) == 1
+        assert os.path.exists(ALERT_STATE_FILE)
+
+
+if __name__ == "__main__":
+    test_cooldown_and_hysteresis_suppress_flapping()
+    test_escalation_levels_and_persistence()
+    test_main_change_alert_does_not_flap()
+    print("✓ 警報狀態測試通過")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+測試歷史價格回補的分段規劃與續傳邏輯（不連網，以假抓取函數代替 API）
+"""
+
+import os
+import tempfile
+
+import backfill
+from price_history import load_price_history
+
+
+def _fake_fetcher(calls):
+    def fetch(start_ts, end_ts, limiter):
+        calls.append((start_ts, end_ts))
+        return [(ts, 2000.0 + ts % 7) for ts in range(start_ts, end_ts, 3600)]
+    return fetch
+
+
+def test_plan_chunks_aligned():
+    """分段邊界應對齊固定網格"""
+    chunk = backfill.CHUNK_SECONDS
+    chunks = backfill.plan_chunks(chunk + 123, 3 * chunk + 5)
+    assert chunks == [(chunk, 2 * chunk), (2 * chunk, 3 * chunk), (3 * chunk, 4 * chunk)]
+
+
+def test_backfill_resumes_and_skips():
+    """第二次執行應略過已完成的分段，只重新抓取尚未結束的最新分段"""
+    calls = []
+    original = backfill.FETCHERS['coingecko']
+    backfill.FETCHERS['coingecko'] = _fake_fetcher(calls)
+    backfill.HOST_RATE_LIMITS['coingecko'] = (1000.0, 10)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            history_file = os.path.join(tmp, 'history.json')
+            progress_file = os.path.join(tmp, 'progress.json')
+            now_ts = 10 * backfill.CHUNK_SECONDS + 1800
+
+            stats = backfill.run_backfill(days=60, sources=('coingecko',), workers=2,
+                                          history_file=history_file, progress_file=progress_file,
+                                          now_ts=now_ts)
+            assert stats['failed'] == 0
+            assert stats['fetched'] == len(calls) == 3
+            history = load_price_history(history_file)
+            assert len(history['coingecko']) == stats['points']
+
+            calls.clear()
+            stats = backfill.run_backfill(days=60, sources=('coingecko',), workers=2,
+                                          history_file=history_file, progress_file=progress_file,
+                                          now_ts=now_ts + 3600)
+            # 只有包含目前時間的分段需要再抓
+            assert len(calls) == 1
+            assert calls[0][0] == 10 * backfill.CHUNK_SECONDS
+            assert stats['skipped'] == 2
+    finally:
+        backfill.FETCHERS['coingecko'] = original
+        backfill.HOST_RATE_LIMITS['coingecko'] = (0.5, 1)
+
+
+if __name__ == "__main__":
+    test_plan_chunks_aligned()
+    test_backfill_resumes_and_skips()
+    print("✓ 回補測試通過")
@@ -5,6 +5,7 @@
 
 import requests
 import json
+from get_gold_price import BINANCE_BASE_URL
 
 def test_binance_api():
     """測試幣安 API"""
@@ -13,7 +14,7 @@ def test_binance_api():
     print("=" * 60)
     print()
     
-    api_url = "https://api.binance.com/api/v3/ticker/price?symbol=PAXGUSDT"
+    api_url = f"{BINANCE_BASE_URL}/api/v3/ticker/price?symbol=PAXGUSDT"
     
     print(f"API URL: {api_url}")
     print()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+測試通知合併視窗
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+import line_notify
+from coalescer import Coalescer, merge_notifications
+from daemon import PriceDaemon
+from pipeline import BLOCK, Pipeline, Stage
+from main import LAST_REPORT_FILE
+from report_schedule import REPORT_SCHEDULE_FILE
+from stand_in_servers import StandInSuite
+
+
+def _message(kind, text, **extra):
+    return dict({'kind': kind, 'text': text, 'tick': {'n': text}}, **extra)
+
+
+def test_burst_is_merged_and_urgent_bypasses_window():
+    emitted = []
+
+    async def emit(message):
+        emitted.append(message)
+
+    coalescer = Coalescer(window=0.2, emit=emit)
+
+    async def run():
+        started = time.perf_counter()
+        results = [await coalescer.add(message) for message in (
+            _message('report', "報告"),
+            _message('window_alert', "區間警報"),
+            _message('alert', "升級警報", level=2),
+            _message('alert', "價格警報", level=1),
+            _message('recovery', "其他收件者", user_id="U2"),
+        )]
+        # add 不等待視窗結束
+        assert time.perf_counter() - started < 0.1 and coalescer.pending() == 2
+        while coalescer.pending():
+            await asyncio.sleep(0.01)
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+    # 升級後的警報直接發送，其餘同一收件者的通知合併為一則
+    assert [result and result['text'] for result in results] == [None, None, "升級警報", None, None]
+    merged, other = emitted
+    assert merged['kind'] == 'alert' and [part['text'] for part in merged['parts']] == ["價格警報", "區間警報", "報告"]
+    assert merged['text'].startswith("📬 合併 3 則通知")
+    assert merged['text'].index("價格警報") < merged['text'].index("區間警報") < merged['text'].index("報告")
+    assert other['text'] == "其他收件者"
+    assert coalescer.merged == 2
+    assert elapsed < 1.0
+
+    # 視窗為 0 時不合併
+    assert asyncio.run(Coalescer(window=0).add(_message('report', "報告")))['text'] == "報告"
+    assert merge_notifications([_message('report', "a"), _message('error', "b")])['kind'] == 'error'
+
+
+def test_open_windows_do_not_delay_urgent_alerts():
+    delivered = []
+    coalescer = Coalescer(window=1.0)
+
+    async def source():
+        # 8 位收件者同時開啟視窗，之後才到達的升級警報不排在這些視窗之後
+        for index in range(8):
+            yield _message('report', f"報告 {index}", user_id=f"U{index}")
+        await asyncio.sleep(0.05)
+        yield _message('alert', "升級警報", level=3)
+
+    async def deliver(message):
+        delivered.append((message['text'], time.perf_counter() - started))
+
+    deliver_stage = Stage('deliver', deliver)
+    coalescer.emit = deliver_stage.queue.put
+    pipeline = Pipeline(source, [
+        Stage('coalesce', coalescer.add, queue_size=4, overflow=BLOCK, pending=coalescer.pending),
+        deliver_stage,
+    ])
+    started = time.perf_counter()
+    asyncio.run(pipeline.run())
+    assert delivered[0][0] == "升級警報" and delivered[0][1] < 0.5
+    # 所有視窗都在一個視窗時間後送出，drain 會等待開啟中的視窗
+    assert len(delivered) == 9 and max(elapsed for _, elapsed in delivered) < 1.5
+
+
+def test_daemon_merges_alert_and_report_from_same_tick():
+    saved = (line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID)
+    line_notify.CHANNEL_ACCESS_TOKEN = "A" * 120 + "="
+    line_notify.USER_ID = "U" + "0" * 32
+    try:
+        with StandInSuite() as suite, tempfile.TemporaryDirectory() as state_dir:
+            asyncio.run(PriceDaemon(state_dir=state_dir, interval=0, max_ticks=1).run())
+            messages = suite['line'].line_messages
+            assert len(messages) == 1
+
+            # 價格上漲 10% 觸發警報，同時本小時的報告尚未發送
+            os.remove(os.path.join(state_dir, LAST_REPORT_FILE))
+            os.remove(os.path.join(state_dir, REPORT_SCHEDULE_FILE))
+            suite['coingecko'].set_price(4359.16 * 1.1)
+            daemon = PriceDaemon(state_dir=state_dir, interval=0, max_ticks=1, coalesce_window=0.3)
+            asyncio.run(daemon.run())
+            assert len(messages) == 2
+            text = messages[1]['messages'][0]['text']
+            assert text.startswith("📬 合併 2 則通知")
+            assert text.index("⚠️ 價格變化警報") < text.index("📊 每日黃金價格報告")
+            # 合併的報告照常記錄發送時間
+            assert os.path.exists(os.path.join(state_dir, LAST_REPORT_FILE))
+            assert daemon.coalescer.merged == 1
+    finally:
+        line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = saved
+
+
+if __name__ == "__main__":
+    test_burst_is_merged_and_urgent_bypasses_window()
+    test_open_windows_do_not_delay_urgent_alerts()
+    test_daemon_merges_alert_and_report_from_same_tick()
+    print("✓ 通知合併視窗測試通過")
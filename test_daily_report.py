@@ -54,9 +54,10 @@ def main():
         print("✗ 無法獲取黃金價格")
         sys.exit(1)
     
-    current_price = price_data['current_price']
-    day_high = price_data['day_high']
-    day_low = price_data['day_low']
+    # 單次測試沒有追蹤記錄，以當前價格作為當天最高/最低價
+    current_price = price_data.price
+    day_high = current_price
+    day_low = current_price
     
     print(f"✓ 價格獲取成功")
     print(f"  當前價格: ${current_price:.2f}")
@@ -21,7 +21,7 @@ def test_daily_report():
         print("✗ 無法獲取國際價格")
         return
     
-    print(f"✓ 國際價格: ${price_data['current_price']:.2f} USD/盎司")
+    print(f"✓ 國際價格: ${price_data.price:.2f} USD/盎司")
     print()
     
     # 獲取台灣銀行價格
@@ -29,7 +29,7 @@ def test_daily_report():
     bot_price_data = get_bot_gold_price()
     
     if bot_price_data:
-        print(f"✓ 台灣銀行價格: {bot_price_data['price']:.2f} {bot_price_data.get('unit', '台幣/公克')}")
+        print(f"✓ 台灣銀行價格: {bot_price_data.price:.2f} {bot_price_data.unit}")
     else:
         print("⚠️  無法獲取台灣銀行價格")
     print()
@@ -37,9 +37,9 @@ def test_daily_report():
     # 格式化日報表
     print("3. 格式化日報表...")
     message = format_notification_message(
-        price_data['current_price'],
-        price_data['day_high'],
-        price_data['day_low'],
+        price_data.price,
+        price_data.price,
+        price_data.price,
         bot_price_data
     )
     
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+測試依收件對象選擇 push / multicast / narrowcast / broadcast
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import line_notify
+from delivery_planner import (
+    BROADCAST,
+    MULTICAST,
+    NARROWCAST,
+    PUSH,
+    Audience,
+    format_plan,
+    naive_cost,
+    plan_cost,
+    plan_delivery,
+)
+from line_delivery import LINE_DELIVERY_FILE, LineDelivery
+from line_quota import LINE_QUOTA_FILE, QuotaTracker
+from stand_in_servers import StandInSuite
+
+
+TEST_TOKEN = "A" * 120 + "="
+
+
+def _user_ids(count):
+    return [f"U{index:032x}" for index in range(count)]
+
+
+def test_plan_picks_cheapest_shape():
+    assert [step['kind'] for step in plan_delivery(Audience(_user_ids(1)))] == [PUSH]
+    assert plan_delivery(Audience()) == []
+
+    audience = Audience(_user_ids(1200) + _user_ids(5))  # 重複的 User ID 只發送一次
+    steps = plan_delivery(audience)
+    assert [(step['kind'], step['recipients']) for step in steps] == [(MULTICAST, 500), (MULTICAST, 500), (MULTICAST, 200)]
+    assert sorted(uid for step in steps for uid in step['to']) == sorted(_user_ids(1200))
+    assert plan_cost(steps) == (3, 1200)
+    assert naive_cost(audience) == (1200, 1200)
+    assert format_plan(steps) == "multicast x 3（1,200 人）"
+
+    # 有相同對象的受眾時以一次 narrowcast 取代多次 multicast
+    steps = plan_delivery(Audience(_user_ids(1200), audience_group_id=42))
+    assert [(step['kind'], step['audience_group_id']) for step in steps] == [(NARROWCAST, 42)]
+    assert [step['kind'] for step in plan_delivery(Audience(_user_ids(3), audience_group_id=42))] == [MULTICAST]
+
+    steps = plan_delivery(Audience(everyone=True, follower_count=3000))
+    assert [(step['kind'], step['recipients']) for step in steps] == [(BROADCAST, 3000)]
+
+
+def test_quota_tracker_sends_plan_through_stand_in():
+    saved = line_notify.CHANNEL_ACCESS_TOKEN
+    line_notify.CHANNEL_ACCESS_TOKEN = TEST_TOKEN
+    now = datetime.now(timezone(timedelta(hours=8)))
+    try:
+        with StandInSuite(services=('line',)) as suite, tempfile.TemporaryDirectory() as tmp:
+            delivery = LineDelivery(os.path.join(tmp, LINE_DELIVERY_FILE))
+            users = _user_ids(3)
+            tracker = QuotaTracker(os.path.join(tmp, LINE_QUOTA_FILE), limit=None,
+                                   delivery=delivery, audience=Audience(users))
+            assert tracker.send("日報表", now, notification_id="report:1")
+            messages = suite['line'].line_messages
+            assert [(m['kind'], m['to']) for m in messages] == [('multicast', users)]
+            assert tracker.pushes == {uid: 1 for uid in users}
+
+            tracker.audience = Audience(everyone=True, follower_count=10)
+            assert tracker.send("公告", now)
+            assert [m['kind'] for m in messages] == ['multicast', 'broadcast']
+            assert tracker.used() == 13
+
+            tracker.audience = Audience(_user_ids(600), audience_group_id=7)
+            assert tracker.send("日報表", now)
+            assert messages[-1]['kind'] == 'narrowcast'
+            # 指定收件者時仍以 push 發送
+            assert tracker.send("個人通知", now, user_id=users[0])
+            assert messages[-1]['kind'] == 'push' and messages[-1]['to'] == [users[0]]
+            assert suite['line'].request_count == 4
+    finally:
+        line_notify.CHANNEL_ACCESS_TOKEN = saved
+
+
+if __name__ == "__main__":
+    test_plan_picks_cheapest_shape()
+    test_quota_tracker_sends_plan_through_stand_in()
+    print("✓ 發送規劃測試通過")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+測試依優先順序發送的通知佇列
+"""
+
+import asyncio
+
+from delivery_queue import PriorityDeliveryQueue, priority_of, ALERT, DIGEST, ERROR, REPORT
+from pipeline import Pipeline, Stage
+
+
+def _drain(queue):
+    async def run():
+        return [await queue.get() for _ in range(queue.qsize())]
+    return asyncio.run(run())
+
+
+def test_priority_order_and_fairness_across_recipients():
+    queue = PriorityDeliveryQueue(100)
+
+    async def fill():
+        for index in range(4):
+            await queue.put({'kind': 'report', 'user_id': 'A', 'n': index})
+        await queue.put({'kind': 'report', 'user_id': 'B', 'n': 0})
+        await queue.put({'kind': 'report', 'user_id': 'B', 'n': 1})
+        await queue.put({'kind': 'report', 'digest': True, 'user_id': 'C', 'n': 0})
+        await queue.put({'kind': 'recovery', 'user_id': 'A', 'n': 0})
+        await queue.put({'kind': 'alert', 'user_id': 'B', 'n': 0})
+
+    asyncio.run(fill())
+    order = [(message['kind'], message['user_id'], message['n']) for message in _drain(queue)]
+    assert order == [
+        ('alert', 'B', 0),
+        ('recovery', 'A', 0),
+        # 同一等級內各收件者輪流
+        ('report', 'A', 0), ('report', 'B', 0), ('report', 'A', 1), ('report', 'B', 1),
+        ('report', 'A', 2), ('report', 'A', 3),
+        ('report', 'C', 0),
+    ]
+    assert [priority_of({'kind': kind}) for kind in ('window_alert', 'error', 'report', 'digest')] == \
+        [ALERT, ERROR, REPORT, DIGEST]
+
+    stats = queue.wait_stats()
+    assert list(stats) == ['警報', '錯誤通知', '報告', '摘要']
+    assert stats['報告']['count'] == 6
+
+
+def test_same_key_replaces_queued_item():
+    queue = PriorityDeliveryQueue(10, key=lambda message: message['kind'] if message['kind'] == 'report' else None)
+
+    async def fill():
+        await queue.put({'kind': 'report', 'n': 0})
+        await queue.put({'kind': 'alert', 'n': 0})
+        await queue.put({'kind': 'report', 'n': 1})
+        await queue.put({'kind': 'alert', 'n': 1})
+
+    asyncio.run(fill())
+    assert queue.coalesced == 1
+    assert [(message['kind'], message['n']) for message in _drain(queue)] == \
+        [('alert', 0), ('alert', 1), ('report', 1)]
+
+
+def test_alert_preempts_report_backlog():
+    delivered = []
+
+    async def source():
+        for index in range(20):
+            yield {'kind': 'report', 'user_id': f"U{index}"}
+        yield {'kind': 'alert', 'user_id': 'U0'}
+
+    async def passthrough(item):
+        return item
+
+    async def rate_limited_deliver(message):
+        await asyncio.sleep(0.02)
+        delivered.append(message['kind'])
+
+    async def scenario():
+        queue = PriorityDeliveryQueue(50)
+        pipeline = Pipeline(source, [
+            Stage('render', passthrough),
+            Stage('deliver', rate_limited_deliver, queue=queue),
+        ])
+        await pipeline.run()
+        return queue.wait_stats()
+
+    stats = asyncio.run(scenario())
+    assert len(delivered) == 21
+    # 警報排在尚未發送的報告之前，不必等待全部報告送完
+    assert delivered.index('alert') <= 2
+    assert stats['警報']['mean_ms'] < stats['報告']['mean_ms']
+
+
+if __name__ == "__main__":
+    test_priority_order_and_fairness_across_recipients()
+    test_same_key_replaces_queued_item()
+    test_alert_preempts_report_backlog()
+    print("✓ 優先順序發送佇列測試通過")
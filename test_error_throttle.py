@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+測試錯誤通知節流：第一次失敗立即通知、指數退避、單一恢復通知與日報表錯誤摘要
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+
+import main
+from error_throttle import (
+    ERROR_THROTTLE_FILE,
+    FETCH_ERROR,
+    SYSTEM_ERROR,
+    ErrorThrottle,
+    format_error_summary,
+)
+from stand_in_servers import stand_in_main_run
+
+
+def test_exponential_backoff_per_error_class():
+    throttle = ErrorThrottle(path=os.devnull, base_backoff=600, max_backoff=2400)
+    # 每 5 分鐘失敗一次：通知時間為 0、600（+10 分）、1800（+20 分）、3900（+35 分，達上限 40 分前）…
+    notified = [minute for minute in range(0, 120, 5)
+                if throttle.record_failure(FETCH_ERROR, minute * 60)['notify']]
+    assert notified == [0, 10, 30, 70, 110]
+    # 不同錯誤類別分別節流
+    assert throttle.record_failure(f"{SYSTEM_ERROR}:ValueError", 0)['notify']
+    assert throttle.report_summary()[FETCH_ERROR] == 24 - 5
+
+
+def test_single_recovery_and_report_summary():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, ERROR_THROTTLE_FILE)
+        throttle = ErrorThrottle(path)
+        assert throttle.record_failure(FETCH_ERROR, 0)['notify']
+        decision = throttle.record_failure(FETCH_ERROR, 600)
+        assert not decision['notify'] and decision['suppressed'] == 1
+        throttle.record_failure(f"{SYSTEM_ERROR}:KeyError", 700)
+        throttle.save()
+
+        restored = ErrorThrottle.load(path)
+        recoveries = restored.record_success(FETCH_ERROR, 1200)
+        assert [(r['error_class'], r['failures'], r['duration']) for r in recoveries] == [(FETCH_ERROR, 2, 1200)]
+        assert restored.record_success(FETCH_ERROR, 1800) == []
+        assert [r['error_class'] for r in restored.record_success(SYSTEM_ERROR, 1800)] == [f"{SYSTEM_ERROR}:KeyError"]
+
+        summary = restored.report_summary()
+        assert summary == {FETCH_ERROR: 1}
+        assert "黃金價格獲取失敗: 略過 1 則通知" in format_error_summary(summary)
+        # 報告產生後才發生的略過次數保留到下一次報告
+        restored._unreported[FETCH_ERROR] += 2
+        restored.clear_report_summary(summary)
+        assert restored.report_summary() == {FETCH_ERROR: 2}
+
+
+def test_main_throttles_fetch_errors_during_outage():
+    with stand_in_main_run() as suite:
+        suite['coingecko'].config.geo_block = True
+        suite['binance'].config.geo_block = True
+        for _ in range(3):
+            main.main()
+        texts = [m['messages'][0]['text'] for m in suite['line'].line_messages]
+        assert len(texts) == 1 and texts[0].startswith("⚠️ 黃金價格獲取失敗")
+
+        # API 恢復：一則恢復通知，日報表附上被略過的錯誤通知次數
+        suite['coingecko'].config.geo_block = False
+        suite['binance'].config.geo_block = False
+        suite['coingecko'].set_price(4000.0)
+        main.main()
+        texts = [m['messages'][0]['text'] for m in suite['line'].line_messages]
+        assert texts[1].startswith("✅ 黃金價格獲取失敗已恢復")
+        assert "失敗次數: 3" in texts[1]
+        assert texts[2].startswith("📊 每日黃金價格報告")
+        assert "黃金價格獲取失敗: 略過 2 則通知" in texts[2]
+        assert ErrorThrottle.load().report_summary() == {}
+
+
+
+def test_main_reports_queued_recovery_as_pending():
+    with stand_in_main_run() as suite:
+        suite['coingecko'].config.geo_block = True
+        suite['binance'].config.geo_block = True
+        main.main()
+
+        # API 恢復時 LINE 無法連線：恢復通知寫入 outbox，不應顯示為發送失敗
+        suite['coingecko'].config.geo_block = False
+        suite['binance'].config.geo_block = False
+        suite['line'].config.geo_block = True
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main.main()
+        assert "恢復通知暫時無法送達，下次執行時重送" in output.getvalue()
+        assert "✗ 恢復通知發送失敗" not in output.getvalue()
+
+        suite['line'].config.geo_block = False
+        main.main()
+        texts = [m['messages'][0]['text'] for m in suite['line'].line_messages]
+        assert any("黃金價格獲取失敗已恢復" in text for text in texts)
+
+if __name__ == "__main__":
+    test_exponential_backoff_per_error_class()
+    test_single_recovery_and_report_summary()
+    test_main_throttles_fetch_errors_during_outage()
+    test_main_reports_queued_recovery_as_pending()
+    print("✓ 錯誤通知節流測試通過")
@@ -23,10 +23,9 @@ def test_fallback():
         print("=" * 60)
         print("✓ 測試成功！成功獲取價格數據")
         print("=" * 60)
-        print(f"當前價格: ${price_data['current_price']:.2f}")
-        print(f"開盤價格: ${price_data['open_price']:.2f}")
-        print(f"當天最高: ${price_data['day_high']:.2f}")
-        print(f"當天最低: ${price_data['day_low']:.2f}")
+        print(f"資料來源: {price_data.source}")
+        print(f"當前價格: ${price_data.price:.2f}")
+        print(f"開盤價格: ${price_data.open_price:.2f}")
     else:
         print()
         print("=" * 60)
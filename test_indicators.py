@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+測試技術指標：增量版本與 NumPy 批次版本的結果一致，以及指標警報規則
+"""
+
+import os
+import random
+import tempfile
+
+import numpy as np
+
+import indicators
+from alert_state import AlertPolicy, AlertStateStore
+from indicators import EMA, MACD, RSI, SMA, Bollinger, IndicatorSet, gate_indicator_triggers, parse_rule
+from price_history import merge_price_points, save_price_history
+
+
+def _random_walk(count, seed=21):
+    rng = random.Random(seed)
+    price = 4000.0
+    prices = []
+    for _ in range(count):
+        price *= 1 + rng.gauss(0, 0.003)
+        prices.append(price)
+    return prices
+
+
+def _incremental(indicator, prices, width=1):
+    rows = []
+    for price in prices:
+        value = indicator.update(price)
+        if value is None:
+            rows.append((np.nan,) * width)
+        else:
+            rows.append(value if isinstance(value, tuple) else (value,))
+    return np.array(rows)
+
+
+def _assert_same(incremental, batch):
+    batch = np.column_stack(batch) if isinstance(batch, tuple) else batch.reshape(-1, 1)
+    assert incremental.shape == batch.shape
+    assert np.array_equal(np.isnan(incremental), np.isnan(batch))
+    assert np.allclose(incremental, batch, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_incremental_matches_batch():
+    prices = _random_walk(5000)
+    _assert_same(_incremental(SMA(20), prices), indicators.sma(prices, 20))
+    _assert_same(_incremental(EMA(12), prices), indicators.ema(prices, 12))
+    _assert_same(_incremental(EMA(200), prices), indicators.ema(prices, 200))
+    _assert_same(_incremental(RSI(14), prices), indicators.rsi(prices, 14))
+    _assert_same(_incremental(Bollinger(20, 2.0), prices, width=3), indicators.bollinger(prices, 20, 2.0))
+    _assert_same(_incremental(MACD(12, 26, 9), prices, width=3), indicators.macd(prices, 12, 26, 9))
+
+
+def test_short_series_and_flat_prices():
+    _assert_same(_incremental(EMA(12), [1.0] * 5), indicators.ema([1.0] * 5, 12))
+    flat = [4000.0] * 40
+    _assert_same(_incremental(RSI(14), flat), indicators.rsi(flat, 14))
+    assert RSI(3).update(1.0) is None
+
+
+def test_saved_state_continues_identically():
+    prices = _random_walk(300, seed=4)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'indicator_state.json')
+        uninterrupted = IndicatorSet(path=os.devnull)
+        for price in prices:
+            uninterrupted.update(price)
+
+        first = IndicatorSet(path=path)
+        for price in prices[:150]:
+            first.update(price)
+        first.save()
+        resumed = IndicatorSet.load(path)
+        for price in prices[150:]:
+            resumed.update(price)
+
+        for name, value in uninterrupted.values.items():
+            assert abs(resumed.values[name] - value) <= 1e-9 * max(1.0, abs(value))
+
+
+def _assert_state_close(left, right):
+    if isinstance(left, dict):
+        assert sorted(left) == sorted(right)
+        for key in left:
+            _assert_state_close(left[key], right[key])
+    elif isinstance(left, (list, tuple)):
+        assert len(left) == len(right)
+        for a, b in zip(left, right):
+            _assert_state_close(a, b)
+    elif isinstance(left, float):
+        assert abs(left - right) <= 1e-9 * max(1.0, abs(left)), (left, right)
+    else:
+        assert left == right
+
+
+def test_seeded_state_matches_incremental_updates():
+    rules = ["rsi_14 > 70", "price > bb_upper", "macd_hist crosses_above 0"]
+    prices = _random_walk(400, seed=9)
+    for count in (0, 1, 2, 13, 15, 25, 34, 35, 400):
+        incremental = IndicatorSet(rules, path=os.devnull)
+        for price in prices[:count]:
+            incremental.update(price)
+            incremental.evaluate()
+        seeded = IndicatorSet(rules, path=os.devnull)
+        seeded.seed(prices[:count])
+        for name, indicator in incremental.indicators.items():
+            _assert_state_close(indicator.to_dict(), seeded.indicators[name].to_dict())
+        _assert_state_close(incremental.values, seeded.values)
+        _assert_state_close(incremental._previous, seeded._previous)
+        # 交叉規則每次只看前後兩筆，不使用觸發狀態
+        assert incremental._active.get("rsi_14 > 70") == seeded._active.get("rsi_14 > 70")
+        assert incremental._active.get("price > bb_upper") == seeded._active.get("price > bb_upper")
+
+    # 沒有狀態檔時從歷史價格重播，之後的即時更新與從頭增量計算相同
+    with tempfile.TemporaryDirectory() as tmp:
+        history_path = os.path.join(tmp, 'price_history.json')
+        history = {}
+        merge_price_points(history, 'binance', [(1700000000 + index * 600, price)
+                                                for index, price in enumerate(prices[:300])])
+        save_price_history(history, history_path)
+        resumed = IndicatorSet.load(os.path.join(tmp, 'indicator_state.json'), rules, history_path)
+        for price in prices[300:]:
+            resumed.update(price)
+            resumed.evaluate()
+        _assert_state_close(incremental.values, resumed.values)
+        _assert_state_close(incremental._previous, resumed._previous)
+        assert IndicatorSet.load(os.path.join(tmp, 'missing.json')).values == {}
+
+
+def test_rules_are_edge_triggered():
+    indicator_set = IndicatorSet(rules=["rsi_14 > 70", "macd_hist crosses_below 0"], path=os.devnull)
+    fired = []
+    prices = [4000.0 + i * 5 for i in range(60)] + [4295.0 - i * 8 for i in range(40)]
+    for price in prices:
+        indicator_set.update(price)
+        fired.extend(trigger['rule'] for trigger in indicator_set.evaluate())
+    # 持續上漲期間 RSI 一直高於 70，只在首次成立時通知；轉跌後 MACD 柱狀體向下穿越 0 一次
+    assert fired == ["rsi_14 > 70", "macd_hist crosses_below 0"]
+
+
+def test_default_rules_are_empty_and_hits_respect_cooldown():
+    assert IndicatorSet(path=os.devnull).rules == []
+    indicator_set = IndicatorSet(rules=["price > sma_20"], path=os.devnull)
+    store = AlertStateStore(os.devnull)
+    policy = AlertPolicy(cooldown_seconds=3600)
+    raw, notified = [], []
+    # 價格在 SMA 附近來回，每 10 分鐘一筆：邊緣觸發每 20 分鐘成立一次，冷卻時間內只通知一次
+    prices = [4000.0] * 20 + [4010.0, 3990.0] * 30
+    for index, price in enumerate(prices):
+        indicator_set.update(price)
+        triggers = indicator_set.evaluate()
+        raw.extend(index for _ in triggers)
+        hits = gate_indicator_triggers(triggers, indicator_set.rules, store, 'XAU', index * 600.0, policy)
+        notified.extend(index for _ in hits)
+    assert len(raw) == 30 and notified == list(range(20, 80, 6))
+
+
+def test_parse_rule():
+    assert parse_rule("price < bb_lower") == ('price', '<', 'bb_lower')
+    assert parse_rule("rsi_14 >= 65") == ('rsi_14', '>=', 65.0)
+    try:
+        parse_rule("rsi_14 is high")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("無效規則應拋出 ValueError")
+
+
+if __name__ == "__main__":
+    test_incremental_matches_batch()
+    test_short_series_and_flat_prices()
+    test_saved_state_continues_identically()
+    test_seeded_state_matches_incremental_updates()
+    test_rules_are_edge_triggered()
+    test_default_rules_are_empty_and_hits_respect_cooldown()
+    test_parse_rule()
+    print("✓ 技術指標測試通過")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+測試非同步 LINE Messaging API 用戶端
+"""
+
+import asyncio
+import time
+
+from linebot.exceptions import LineBotApiError
+
+import line_notify
+from line_async import AsyncLineClient, benchmark
+from stand_in_servers import StandInSuite
+
+
+TEST_TOKEN = "A" * 120 + "="
+TEST_USER_ID = "U" + "0" * 32
+
+
+def _user_ids(count):
+    return [f"U{index:032x}" for index in range(count)]
+
+
+def test_token_is_validated_once():
+    try:
+        AsyncLineClient("short")
+        assert False, "格式錯誤的 Token 應該拋出 ValueError"
+    except ValueError:
+        pass
+    # 建立時即清理 Token，之後的請求不再重新驗證
+    client = AsyncLineClient(" " + TEST_TOKEN + "\n", base_url="http://127.0.0.1:1/")
+    assert client._headers['Authorization'] == f"Bearer {TEST_TOKEN}"
+    assert client.base_url == "http://127.0.0.1:1"
+
+
+def test_endpoints_against_stand_in():
+    with StandInSuite(services=('line',)) as suite:
+        server = suite['line']
+
+        async def run():
+            async with AsyncLineClient(TEST_TOKEN) as client:
+                request_id = await client.push(TEST_USER_ID, "價格警報", retry_key="key-1")
+                try:
+                    await client.push(TEST_USER_ID, "價格警報", retry_key="key-1")
+                    assert False, "重複的 retry key 應該回傳 409"
+                except LineBotApiError as e:
+                    assert e.status_code == 409 and e.accepted_request_id == request_id
+                await client.multicast(_user_ids(3), "日報表")
+                await client.broadcast("公告")
+                assert await client.get_quota() == 200
+                assert await client.get_quota_consumption() == 5
+                assert (await client.get_profile(TEST_USER_ID))['userId'] == TEST_USER_ID
+
+        asyncio.run(run())
+        assert [m['kind'] for m in server.line_messages] == ['push', 'multicast', 'broadcast']
+        # 所有請求共用同一個 keep-alive 連線
+        assert server.connection_count == 1
+
+
+def test_concurrent_sends_share_pool():
+    with StandInSuite(services=('line',), latency=0.2) as suite:
+        server = suite['line']
+
+        async def run():
+            async with AsyncLineClient(TEST_TOKEN, pool_size=20) as client:
+                return await client.push_many((uid, "價格警報") for uid in _user_ids(100))
+
+        started = time.perf_counter()
+        outcomes = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+        assert not [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        assert len(server.line_messages) == 100
+        # 依序發送需 20 秒；20 個並行連線約 1 秒
+        assert elapsed < 5, elapsed
+        assert server.connection_count <= 20
+
+
+def test_benchmark_reports_both_paths():
+    saved = line_notify.CHANNEL_ACCESS_TOKEN
+    results = benchmark(count=20, latency=0.01, pool_size=8)
+    assert line_notify.CHANNEL_ACCESS_TOKEN == saved
+    assert all(stats['failed'] == 0 for stats in results.values())
+    assert results['sdk']['connections'] == 20 and results['sdk_pooled']['connections'] == 20
+    assert results['async_serial']['connections'] == 1
+    assert results['async']['connections'] <= 8
+    assert results['sdk_pooled']['concurrency'] == results['async']['concurrency'] == 8
+
+
+if __name__ == "__main__":
+    test_token_is_validated_once()
+    test_endpoints_against_stand_in()
+    test_concurrent_sends_share_pool()
+    test_benchmark_reports_both_paths()
+    print("✓ 非同步 LINE 用戶端測試通過")
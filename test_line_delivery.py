@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+測試以 X-Line-Retry-Key 冪等重試 LINE 推播
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+
+import line_notify
+import main
+from line_delivery import DELIVERED, LINE_DELIVERY_FILE, PENDING, LineDelivery
+from retry_policy import Deadline, RetryPolicy
+from stand_in_servers import StandInSuite, stand_in_main_run
+
+
+TEST_TOKEN = "A" * 120 + "="
+TEST_USER_ID = "U" + "0" * 32
+FAST_POLICY = RetryPolicy(max_attempts=4, base_delay=0.05, max_delay=0.2, timeout=1, rng=random.Random(1))
+
+
+def _with_credentials(test):
+    def wrapper():
+        saved = (line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID)
+        line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = TEST_TOKEN, TEST_USER_ID
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                test(os.path.join(tmp, LINE_DELIVERY_FILE))
+        finally:
+            line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = saved
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@_with_credentials
+def test_retries_server_errors_with_same_key(path):
+    with StandInSuite(services=('line',), error_rate=0.6, seed=7) as suite:
+        delivery = LineDelivery(path, FAST_POLICY)
+        assert delivery.send("測試訊息", notification_id="report:2026-01-01 09", deadline=Deadline(30))
+        posts = suite['line'].request_count
+        assert posts > 1
+        assert len(suite['line'].line_messages) == 1
+        entry = delivery.entry("report:2026-01-01 09")
+        assert entry['status'] == DELIVERED and entry['attempts'] == posts
+        assert suite['line'].line_messages[0]['retry_key'] == entry['retry_key']
+
+
+@_with_credentials
+def test_timed_out_push_is_not_duplicated(path):
+    with StandInSuite(services=('line',), latency=3.0) as suite:
+        config = suite['line'].config
+        # 第一次請求逾時（LINE 實際上已收到），之後的重試恢復正常速度
+        timer = threading.Timer(1.0, setattr, (config, 'latency', 0.0))
+        timer.start()
+        delivery = LineDelivery(path, FAST_POLICY)
+        try:
+            assert delivery.send("價格警報", notification_id="alert:1", deadline=Deadline(30))
+        finally:
+            timer.cancel()
+        assert delivery.entry("alert:1")['attempts'] >= 2
+        # 等待第一次請求在替身伺服器處理完成
+        threading.Event().wait(2.5)
+        assert len(suite['line'].line_messages) == 1
+
+
+@_with_credentials
+def test_outcomes_persist_across_runs(path):
+    with StandInSuite(services=('line',)) as suite:
+        first = LineDelivery(path, FAST_POLICY)
+        assert first.send("日報表", notification_id="report:2026-01-01 10")
+        # 模擬上一次執行送出後沒收到回應：紀錄仍為 pending，下次以同一個 retry key 重送
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data['entries']["report:2026-01-01 10"]['status'] = PENDING
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+        second = LineDelivery.load(path, FAST_POLICY)
+        assert second.send("日報表", notification_id="report:2026-01-01 10")
+        assert second.entry("report:2026-01-01 10")['request_id'] == 'standin-1'
+        # 已確認送達的通知直接略過
+        third = LineDelivery.load(path, FAST_POLICY)
+        assert third.send("日報表", notification_id="report:2026-01-01 10")
+        assert len(suite['line'].line_messages) == 1
+        assert suite['line'].request_count == 2
+        assert third.pending() == []
+
+
+def test_manual_reports_in_same_hour_are_each_sent():
+    # 停用預設排程並模擬手動觸發，只有手動觸發會發送報告
+    env = {
+        'REPORT_CRON': "",
+        'REPORT_SCHEDULES': "",
+        'GITHUB_EVENT_NAME': "workflow_dispatch",
+    }
+    with stand_in_main_run(env) as suite:
+        main.main()
+        main.main()
+        # 同一小時內的第二次手動觸發不會被當成已送達的報告略過
+        messages = suite['line'].line_messages
+        assert len(messages) == 2
+        assert all(m['messages'][0]['text'].startswith("📊 每日黃金價格報告") for m in messages)
+
+
+if __name__ == "__main__":
+    test_retries_server_errors_with_same_key()
+    test_timed_out_push_is_not_duplicated()
+    test_outcomes_persist_across_runs()
+    test_manual_reports_in_same_hour_are_each_sent()
+    print("✓ LINE 冪等重試測試通過")
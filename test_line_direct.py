@@ -8,6 +8,7 @@ import sys
 from linebot import LineBotApi
 from linebot.models import TextSendMessage
 from linebot.exceptions import LineBotApiError
+from line_notify import LINE_API_BASE_URL
 
 def test_line_notification():
     """測試 LINE 通知"""
@@ -39,7 +40,7 @@ def test_line_notification():
     # 初始化 LineBotApi
     print(f"\n2. 初始化 LINE Bot API...")
     try:
-        line_bot_api = LineBotApi(channel_token)
+        line_bot_api = LineBotApi(channel_token, endpoint=LINE_API_BASE_URL)
         print("✓ LineBotApi 初始化成功")
     except Exception as e:
         print(f"✗ LineBotApi 初始化失敗: {e}")
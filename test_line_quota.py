@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+測試 LINE 每月訊息額度追蹤、用量推估與日報表降級
+"""
+
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import line_notify
+import main
+from line_quota import (
+    ALERTS_ONLY,
+    DIGEST,
+    EXHAUSTED,
+    LINE_QUOTA_FILE,
+    NORMAL,
+    QuotaTracker,
+    format_quota_status,
+)
+from stand_in_servers import stand_in_main_run
+
+
+TAIWAN = timezone(timedelta(hours=8))
+
+
+def test_projection_and_degrade_modes():
+    tracker = QuotaTracker(path=os.devnull, limit=200)
+    now = datetime(2026, 4, 10, 12, 0, tzinfo=TAIWAN)
+    # 9.5 天用了 38 則：每天 4 則，月底約 120 則
+    tracker.record_push('U1', now, 30)
+    tracker.record_push('U2', now, 8)
+    assert tracker.pushes == {'U1': 30, 'U2': 8}
+    projection = tracker.projection(now)
+    assert abs(projection['projected'] - 120) < 1e-6
+    assert projection['exhausted_at'] is None
+    assert tracker.mode(now) == NORMAL and tracker.allows_report(now)
+
+    # 每小時報告的速度：預估月底前用完，改為摘要模式
+    tracker.record_push('U1', now, 62)
+    projection = tracker.projection(now)
+    assert projection['exhausted_at'] is not None and projection['exhausted_at'].month == 4
+    assert tracker.mode(now) == DIGEST
+    assert not tracker.allows_report(now)
+    assert tracker.allows_report(now.replace(hour=21))
+    assert "摘要模式" in format_quota_status(tracker, now)
+
+    tracker.record_push('U1', now, 85)
+    assert tracker.mode(now) == ALERTS_ONLY and not tracker.allows_report(now.replace(hour=9))
+    tracker.record_push('U1', now, 15)
+    assert tracker.mode(now) == EXHAUSTED
+
+    # 換月後重新累計
+    next_month = datetime(2026, 5, 1, 0, 5, tzinfo=TAIWAN)
+    assert tracker.used() == 200
+    tracker.record_push('U1', next_month)
+    assert tracker.used() == 1 and tracker.mode(next_month) == NORMAL
+
+
+def test_sync_prefers_api_usage_and_persists():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, LINE_QUOTA_FILE)
+        now = datetime(2026, 4, 20, 8, 0, tzinfo=TAIWAN)
+        tracker = QuotaTracker(path)
+        tracker.record_push('U1', now, 5)
+        # 其他程式也使用同一個頻道：API 的用量較大時以 API 為準
+        assert tracker.sync(now, usage=(500, 40))
+        assert tracker.limit == 500 and tracker.used() == 40
+        tracker.record_push('U1', now)
+        assert tracker.used() == 41
+        tracker.save()
+
+        restored = QuotaTracker.load(path)
+        assert restored.limit == 500 and restored.used() == 41 and restored.pushes == {'U1': 6}
+        # 無上限方案一律正常發送
+        restored.sync(now, usage=(None, 41))
+        assert restored.mode(now) == NORMAL and format_quota_status(restored, now) == ""
+
+
+def test_main_counts_pushes_and_queries_quota_api():
+    with stand_in_main_run() as suite:
+        suite['coingecko'].set_price(4000.0)
+        main.main()
+        with open(LINE_QUOTA_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # 替身伺服器回報每月上限 200 則
+        assert data['limit'] == 200
+        assert data['pushes'] == {line_notify.USER_ID: 1}
+        texts = [m['messages'][0]['text'] for m in suite['line'].line_messages]
+        assert "【LINE 額度】" in texts[0]
+
+
+if __name__ == "__main__":
+    test_projection_and_degrade_modes()
+    test_sync_prefers_api_usage_and_persists()
+    test_main_counts_pushes_and_queries_quota_api()
+    print("✓ LINE 額度追蹤測試通過")
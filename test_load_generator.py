@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+壓力測試工具的短時間冒煙測試（使用本機替身伺服器）
+"""
+
+from load_generator import percentile, run_load
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 0.50) == 50.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_run_load_smoke():
+    stats = run_load(subscribers=5, rules=20, tick_rate=20, duration=0.5,
+                     send_workers=4, volatility=0.01, seed=7)
+    assert stats['ticks'] > 0 and stats['ticks_evaluated'] > 0
+    assert stats['fetch_failures'] == 0
+    # 通知經過常駐程式管線的每個階段，multicast 給所有訂閱者
+    assert stats['notifications_sent'] > 0
+    assert stats['pipeline']['deliver']['processed'] == stats['notifications_sent']
+    assert stats['recipients'] == 5 * stats['notifications_sent']
+    assert stats['notifications_failed'] == 0
+    assert stats['p99_latency_ms'] >= stats['p50_latency_ms'] > 0
+    assert stats['peak_rss_mb'] > 0
+
+
+if __name__ == "__main__":
+    test_percentile()
+    test_run_load_smoke()
+    print("✓ 壓力測試工具測試通過")
@@ -47,12 +47,11 @@ def test_gold_price():
             return False
         
         print(f"✓ 成功獲取黃金價格")
-        print(f"  當前價格: ${price_data['current_price']:.2f}")
-        print(f"  開盤價格: ${price_data['open_price']:.2f}")
-        print(f"  當日最高: ${price_data['day_high']:.2f}")
-        print(f"  當日最低: ${price_data['day_low']:.2f}")
+        print(f"  資料來源: {price_data.source}")
+        print(f"  當前價格: ${price_data.price:.2f}")
+        print(f"  開盤價格: ${price_data.open_price:.2f}")
         
-        change = ((price_data['current_price'] - price_data['open_price']) / price_data['open_price']) * 100
+        change = ((price_data.price - price_data.open_price) / price_data.open_price) * 100
         print(f"  漲跌幅: {change:+.2f}%")
         
         print()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+測試監控設定檔（驗證、編譯與熱重新載入）
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import line_notify
+from daemon import PriceDaemon
+from delivery_planner import Audience
+from line_delivery import LINE_DELIVERY_FILE, LineDelivery
+from line_quota import LINE_QUOTA_FILE, QuotaTracker
+from monitor_config import (
+    CHANNELS,
+    INDICATORS,
+    SCHEDULE,
+    SUBSCRIBERS,
+    WINDOWS,
+    ConfigError,
+    ConfigWatcher,
+    MonitorConfig,
+    load_config,
+)
+from report_schedule import DEFAULT_SUBSCRIBER
+from stand_in_servers import StandInSuite
+
+
+USER_A = "U" + "0" * 32
+USER_B = "U" + "b" * 32
+
+
+def _config(**overrides):
+    data = {
+        'version': 1,
+        'subscribers': [USER_A, {'id': USER_B, 'schedule': "0 9 * * *", 'timezone': "Asia/Tokyo"}],
+        'rules': {
+            'price_change': {'threshold': 3.0, 'cooldown_seconds': 600},
+            'windows': [{'minutes': 60, 'threshold': 2.0}, {'minutes': 360, 'threshold': 3.0}],
+            'indicators': ["rsi_14 > 70"],
+        },
+        'schedule': {'cron': "0 * * * *", 'timezone': "Asia/Taipei"},
+        'sources': ["binance", "coingecko"],
+        'channels': [{'type': 'webhook', 'url': "${TEST_WEBHOOK_URL}", 'kinds': ['alert']}],
+    }
+    data.update(overrides)
+    return data
+
+
+def _write(path, data):
+    # 寫入後推進修改時間，避免檔案系統的時間解析度讓兩次寫入的修改時間相同
+    stamp = os.stat(path).st_mtime_ns + 10 ** 9 if os.path.exists(path) else None
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    if stamp is not None:
+        os.utime(path, ns=(stamp, stamp))
+
+
+def test_config_compiles_into_engine_objects():
+    os.environ['TEST_WEBHOOK_URL'] = "http://127.0.0.1:9/hook"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "monitor_config.json")
+            _write(path, _config())
+            config = load_config(path)
+    finally:
+        os.environ.pop('TEST_WEBHOOK_URL')
+    assert config.threshold == 3.0 and config.alert_policy.cooldown_seconds == 600
+    assert config.alert_policy.rearm_band == 1.0
+    assert config.window_rules == ((60, 2.0), (360, 3.0))
+    assert config.indicator_rules == ("rsi_14 > 70",)
+    assert config.recipients().user_ids == [USER_A, USER_B]
+    assert sorted(config.schedules) == sorted([DEFAULT_SUBSCRIBER, USER_B])
+    assert config.schedules[USER_B].spec == ("0 9 * * *", "Asia/Tokyo")
+    assert config.sources == ("binance", "coingecko")
+    # ${VAR} 以環境變數取代
+    assert [channel.name for channel in config.channels] == ['webhook']
+    assert config.channels[0].url == "http://127.0.0.1:9/hook" and config.channels[0].kinds == {'alert'}
+
+    # 沒有設定檔時沿用環境變數與預設值
+    defaults = load_config(os.path.join(tempfile.gettempdir(), "missing-monitor-config.json"))
+    assert defaults.threshold == 5.0 and defaults.audience is None
+    if not os.getenv("USER_IDS"):
+        assert defaults.recipients(USER_A).user_ids == [USER_A]
+
+    # 所有錯誤一次列出
+    try:
+        MonitorConfig(_config(subscribers=["bad"], sources=["nope"], schedule={'cron': "* *"},
+                              rules={'windows': [{'minutes': 0, 'threshold': 1}], 'indicators': ["rsi_14 >"]},
+                              channels=[{'type': 'webhook'}]))
+        assert False
+    except ConfigError as e:
+        assert len(e.errors) == 7, e.errors
+
+
+def test_default_report_skips_subscribers_with_own_schedule():
+    saved = (line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID)
+    line_notify.CHANNEL_ACCESS_TOKEN = "A" * 120 + "="
+    line_notify.USER_ID = USER_A
+    user_c = "U" + "c" * 32
+    now = datetime.now(timezone(timedelta(hours=8)))
+    config = MonitorConfig(_config(subscribers=[USER_A, user_c, {'id': USER_B, 'schedule': "0 9 * * *"}],
+                                   channels=[]))
+    assert config.recipients().user_ids == [USER_A, user_c, USER_B]
+    assert config.report_recipients().user_ids == [USER_A, user_c]
+    assert MonitorConfig(_config(subscribers=[USER_A], channels=[])).report_recipients() is None
+    # 所有收件者都有自己的排程時不保留預設排程
+    only_personal = MonitorConfig(_config(subscribers=[{'id': USER_B, 'schedule': "0 9 * * *"}], channels=[]))
+    assert sorted(only_personal.schedules) == [USER_B]
+    try:
+        with StandInSuite(services=('line',)) as suite, tempfile.TemporaryDirectory() as tmp:
+            tracker = QuotaTracker(os.path.join(tmp, LINE_QUOTA_FILE), limit=None,
+                                   delivery=LineDelivery(os.path.join(tmp, LINE_DELIVERY_FILE)),
+                                   audience=config.recipients(), report_audience=config.report_recipients())
+            # 預設日報表不發給有自己排程的訂閱者，警報發給所有收件者
+            assert tracker.send("日報表", now, user_id=DEFAULT_SUBSCRIBER)
+            assert tracker.send("警報", now)
+            messages = suite['line'].line_messages
+            assert [m['to'] for m in messages] == [[USER_A, user_c], [USER_A, user_c, USER_B]]
+
+            tracker.report_audience = Audience([user_c])
+            assert tracker.send("日報表", now, user_id=DEFAULT_SUBSCRIBER)
+            assert (messages[-1]['kind'], messages[-1]['to']) == ('push', [user_c])
+    finally:
+        line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = saved
+
+
+def test_watcher_reports_only_changed_sections():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "monitor_config.json")
+        _write(path, _config(channels=[]))
+        watcher = ConfigWatcher(path)
+        first = watcher.load()
+        assert watcher.poll() == []
+
+        data = _config(channels=[])
+        data['rules']['windows'].append({'minutes': 1440, 'threshold': 5.0})
+        data['schedule'] = {'cron': "30 * * * *"}
+        _write(path, data)
+        assert watcher.poll() == [WINDOWS, SCHEDULE]
+        assert watcher.config is not first
+
+        # 有誤的設定不套用，繼續使用目前的設定
+        current = watcher.config
+        _write(path, _config(sources=[]))
+        assert watcher.poll() == [] and watcher.config is current
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("{ not json")
+        os.utime(path, ns=(os.stat(path).st_mtime_ns + 10 ** 9,) * 2)
+        assert watcher.poll() == [] and watcher.config is current
+
+
+def test_daemon_rebuilds_only_changed_parts_without_restart():
+    saved = (line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID)
+    line_notify.CHANNEL_ACCESS_TOKEN = "A" * 120 + "="
+    line_notify.USER_ID = USER_A
+    try:
+        with StandInSuite() as suite, tempfile.TemporaryDirectory() as state_dir:
+            path = os.path.join(state_dir, "monitor_config.json")
+            _write(path, _config(channels=[]))
+            daemon = PriceDaemon(state_dir=state_dir, interval=0, max_ticks=1, config_path=path)
+            assert daemon.threshold == 3.0 and daemon.sources == ("binance", "coingecko")
+            window = daemon.window_alerts
+            window.update('XAU', 1000.0, 4000.0)
+            kept_window = window._windows['XAU'][60]
+            scheduler = daemon.report_scheduler
+            tokyo_version = scheduler._version[USER_B]
+            notifier = daemon.notifier
+
+            data = _config(channels=[{'type': 'webhook', 'url': suite['line'].base_url + "/hook"}])
+            data['subscribers'] = [USER_A, {'id': USER_B, 'schedule': "0 9 * * *", 'timezone': "Asia/Tokyo"},
+                                   "U" + "c" * 32]
+            data['rules']['windows'] = [{'minutes': 60, 'threshold': 1.0}]
+            data['rules']['indicators'] = ["rsi_14 < 30"]
+            data['schedule'] = {'cron': "15 * * * *"}
+            _write(path, data)
+
+            async def reload():
+                await daemon.notifier.start()
+                await daemon.reload_config()
+                await daemon.notifier.stop()
+
+            asyncio.run(reload())
+            # 同一個物件更新規則，仍存在的視窗保留原本的價格
+            assert daemon.window_alerts is window and window.rules == ((60, 1.0),)
+            assert window._windows['XAU'] == {60: kept_window}
+            assert [text for text, _ in daemon.indicators.rules] == ["rsi_14 < 30"]
+            assert daemon.quota.audience.user_ids == [USER_A, USER_B, "U" + "c" * 32]
+            assert daemon.quota.report_audience.user_ids == [USER_A, "U" + "c" * 32]
+            # 排程未變動的訂閱者不重新計算
+            assert scheduler._version[USER_B] == tokyo_version
+            assert scheduler.schedule_of(DEFAULT_SUBSCRIBER).expression == "15 * * * *"
+            assert daemon.notifier is not notifier and [c.name for c in daemon.notifier.channels] == ['webhook']
+            assert daemon.threshold == 3.0
+            assert daemon.config_watcher.config.changed_sections(None)[0] == SUBSCRIBERS
+            assert INDICATORS in daemon.config_watcher.config.changed_sections(MonitorConfig(_config(channels=[])))
+            assert CHANNELS in daemon.config_watcher.config.changed_sections(MonitorConfig(_config(channels=[])))
+    finally:
+        line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = saved
+
+
+if __name__ == "__main__":
+    test_config_compiles_into_engine_objects()
+    test_default_report_skips_subscribers_with_own_schedule()
+    test_watcher_reports_only_changed_sections()
+    test_daemon_rebuilds_only_changed_parts_without_restart()
+    print("✓ 監控設定檔測試通過")
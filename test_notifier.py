@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+測試多管道通知（LINE、電子郵件、webhook、Telegram）
+"""
+
+import asyncio
+import email
+import email.policy
+import os
+import random
+import time
+
+import aiohttp
+
+from delivery_planner import Audience
+from notifier import (
+    Channel,
+    EmailChannel,
+    LineChannel,
+    Notifier,
+    TelegramChannel,
+    WebhookChannel,
+    channels_from_env,
+    notify_channels,
+)
+from retry_policy import RetryPolicy
+from stand_in_servers import SINK, StandInConfig, StandInServer, StandInSMTPServer, StandInSuite
+
+
+TEST_TOKEN = "A" * 120 + "="
+FAST_POLICY = RetryPolicy(max_attempts=5, base_delay=0.05, max_delay=0.2, timeout=2, rng=random.Random(1))
+
+
+def _by_name(results):
+    return {channel.name: delivered for channel, delivered in results.items()}
+
+
+def test_alert_fans_out_to_every_subscribed_channel():
+    with StandInSuite(services=('line', SINK)) as suite, StandInSMTPServer() as smtp:
+        sink = suite[SINK]
+        channels = [
+            LineChannel(Audience(["U" + "0" * 32, "U" + "1" * 32]), token=TEST_TOKEN, policy=FAST_POLICY),
+            WebhookChannel(sink.base_url + "/hook", policy=FAST_POLICY),
+            TelegramChannel("123:abc", "42", base_url=sink.base_url, policy=FAST_POLICY),
+            EmailChannel(smtp.host, ["ops@example.com"], "bot@example.com", port=smtp.port,
+                         policy=FAST_POLICY, kinds=['report']),
+        ]
+
+        async def run():
+            async with Notifier(channels) as notifier:
+                alert = await notifier.notify("⚠️ 價格變化警報", 'alert')
+                report = await notifier.notify("📊 日報表", 'report')
+            return alert, report
+
+        alert, report = map(_by_name, asyncio.run(run()))
+        # 電子郵件只訂閱日報表
+        assert alert == {'line': True, 'webhook': True, 'telegram': True}
+        assert report == {'line': True, 'webhook': True, 'telegram': True, 'email': True}
+
+        # 兩位收件者以一次 multicast 發送
+        assert [m['kind'] for m in suite['line'].line_messages] == ['multicast', 'multicast']
+        hooks = [m['payload'] for m in sink.sink_messages if m['path'] == '/hook']
+        assert hooks == [{'text': "⚠️ 價格變化警報", 'kind': 'alert'}, {'text': "📊 日報表", 'kind': 'report'}]
+        telegram = [m['payload'] for m in sink.sink_messages if m['path'] == '/bot123:abc/sendMessage']
+        assert [payload['chat_id'] for payload in telegram] == ['42', '42']
+
+        assert len(smtp.messages) == 1 and smtp.messages[0]['to'] == ["ops@example.com"]
+        mail = email.message_from_bytes(smtp.messages[0]['data'], policy=email.policy.default)
+        assert "日報表" in str(mail['Subject']) and mail.get_content().strip() == "📊 日報表"
+
+
+def test_channels_of_the_same_type_report_separately():
+    ok = StandInServer(SINK).start()
+    failing = StandInServer(SINK, StandInConfig(error_rate=1.0)).start()
+    try:
+        channels = [WebhookChannel(ok.base_url + "/hook", policy=FAST_POLICY),
+                    WebhookChannel(failing.base_url + "/hook",
+                                   policy=RetryPolicy(max_attempts=1, base_delay=0.01, max_delay=0.01, timeout=1))]
+        results = notify_channels(channels, "⚠️ 價格變化警報", 'alert')
+        # 兩個 webhook 各有一筆結果，不會互相覆蓋
+        assert results == {channels[0]: True, channels[1]: False}
+        assert len(ok.sink_messages) == 1
+    finally:
+        ok.stop()
+        failing.stop()
+
+
+def test_line_retries_resend_only_unfinished_steps():
+    user_ids = [f"U{index:032x}" for index in range(1200)]
+    with StandInSuite(services=('line',)) as suite:
+        line = suite['line']
+        chunked = LineChannel(Audience(user_ids), token=TEST_TOKEN, policy=FAST_POLICY)
+        multicast = chunked.client.multicast
+        keys = []
+
+        async def lose_second_response(to, message, retry_key=None, timeout=None):
+            keys.append(retry_key)
+            request_id = await multicast(to, message, retry_key=retry_key, timeout=timeout)
+            if len(keys) == 2:
+                # 第二批已被 LINE 接受，但回應在途中遺失
+                raise aiohttp.ClientConnectionError("connection reset")
+            return request_id
+
+        chunked.client.multicast = lose_second_response
+        # 超過 500 人且有受眾時以一次 narrowcast 發送
+        grouped = LineChannel(Audience(user_ids, audience_group_id=42), token=TEST_TOKEN, policy=FAST_POLICY)
+        assert _by_name(notify_channels([chunked, grouped], "⚠️ 價格變化警報", 'alert')) == {'line': True}
+
+        # 重試只重送第二批（沿用同一個 retry key），第一批不再送出
+        assert len(keys) == 4 and keys[2] == keys[1] and len(set(keys)) == 3
+        messages = line.line_messages
+        assert [m['kind'] for m in messages].count('multicast') == 3
+        assert sorted(to for m in messages if m['kind'] == 'multicast' for to in m['to']) == user_ids
+        assert [m['kind'] for m in messages].count('narrowcast') == 1
+
+    # 基底類別未實作 send() 時不能建立
+    try:
+        Channel()
+        assert False
+    except TypeError:
+        pass
+
+
+def test_each_channel_retries_and_rate_limits_independently():
+    sink = StandInServer(SINK, StandInConfig(error_rate=0.5, seed=3)).start()
+    try:
+        with StandInSMTPServer(StandInConfig(error_rate=0.5, seed=1)) as smtp:
+            # 暫時性錯誤（HTTP 500、SMTP 451）依各管道的重試策略重試
+            webhook = WebhookChannel(sink.base_url + "/hook", policy=FAST_POLICY)
+            mail = EmailChannel(smtp.host, ["ops@example.com"], "bot@example.com", port=smtp.port,
+                                rate=50, burst=50, policy=FAST_POLICY)
+            # 每秒 5 則、沒有突發額度
+            telegram = TelegramChannel("1:x", "7", base_url=sink.base_url, rate=5.0, burst=1,
+                                       policy=FAST_POLICY)
+
+            async def run():
+                async with Notifier([webhook, mail]) as notifier:
+                    results = [await notifier.notify(f"警報 {index}", 'alert') for index in range(4)]
+                sink.config.error_rate = 0.0
+                async with Notifier([telegram]) as notifier:
+                    started = time.perf_counter()
+                    await asyncio.gather(*(notifier.notify(f"警報 {index}") for index in range(6)))
+                    return results, time.perf_counter() - started
+
+            results, elapsed = asyncio.run(run())
+            assert all(_by_name(result) == {'webhook': True, 'email': True} for result in results)
+            assert len(smtp.messages) == 4
+            assert len([m for m in sink.sink_messages if m['path'] == '/hook']) == 4
+            assert sink.request_count > 4
+            # 第一則立即發送，其餘 5 則每 0.2 秒一則
+            assert elapsed >= 0.9, elapsed
+    finally:
+        sink.stop()
+
+
+def test_slow_channel_does_not_block_others():
+    fast = StandInServer(SINK).start()
+    slow = StandInServer(SINK, StandInConfig(latency=0.5)).start()
+    try:
+        channels = [WebhookChannel(slow.base_url + "/slow", concurrency=4, policy=FAST_POLICY),
+                    TelegramChannel("1:x", "7", base_url=fast.base_url, rate=100, burst=100, concurrency=4,
+                                    policy=FAST_POLICY)]
+
+        async def run():
+            async with Notifier(channels) as notifier:
+                started = time.perf_counter()
+                results = await asyncio.gather(*(notifier.notify(f"警報 {index}") for index in range(4)))
+                return results, time.perf_counter() - started
+
+        results, elapsed = asyncio.run(run())
+        assert all(_by_name(result) == {'webhook': True, 'telegram': True} for result in results)
+        # 4 個 webhook 工作者同時等待慢速接收端：約 0.5 秒而不是 2 秒
+        assert elapsed < 1.5, elapsed
+        assert fast.sink_messages[-1]['received_at'] < slow.sink_messages[0]['received_at']
+    finally:
+        fast.stop()
+        slow.stop()
+
+
+def test_channels_from_env():
+    names = ('WEBHOOK_URL', 'WEBHOOK_KINDS', 'TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHAT_ID', 'TELEGRAM_API_BASE_URL',
+             'SMTP_HOST', 'SMTP_PORT', 'EMAIL_TO', 'EMAIL_FROM')
+    saved = {name: os.environ.get(name) for name in names}
+    try:
+        for name in names:
+            os.environ.pop(name, None)
+        assert channels_from_env() == []
+        with StandInSuite(services=(SINK,)) as suite, StandInSMTPServer() as smtp:
+            os.environ.update({
+                'WEBHOOK_URL': suite[SINK].base_url + "/hook",
+                'WEBHOOK_KINDS': "alert, error",
+                'TELEGRAM_BOT_TOKEN': "1:x",
+                'TELEGRAM_CHAT_ID': "7",
+                'TELEGRAM_API_BASE_URL': suite[SINK].base_url,
+                'SMTP_HOST': smtp.host,
+                'SMTP_PORT': str(smtp.port),
+                'EMAIL_TO': "a@example.com, b@example.com",
+            })
+            channels = channels_from_env()
+            assert [channel.name for channel in channels] == ['webhook', 'telegram', 'email']
+            assert channels[0].kinds == {'alert', 'error'}
+            assert channels[2].recipients == ["a@example.com", "b@example.com"] and not channels[2].starttls
+            assert _by_name(notify_channels(channels, "📊 日報表", 'report')) == {'telegram': True, 'email': True}
+            assert smtp.messages[0]['to'] == ["a@example.com", "b@example.com"]
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+if __name__ == "__main__":
+    test_alert_fans_out_to_every_subscribed_channel()
+    test_channels_of_the_same_type_report_separately()
+    test_line_retries_resend_only_unfinished_steps()
+    test_each_channel_retries_and_rate_limits_independently()
+    test_slow_channel_does_not_block_others()
+    test_channels_from_env()
+    print("✓ 多管道通知測試通過")
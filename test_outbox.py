@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+測試通知 outbox（跨執行至少送達一次）
+"""
+
+import json
+import os
+import tempfile
+
+import main
+from main import LAST_REPORT_FILE
+from outbox import COMPACT_THRESHOLD, DELIVERED, OUTBOX_FILE, QUEUED, Outbox
+from stand_in_servers import stand_in_main_run
+
+
+def test_pending_notifications_survive_reload():
+    sent = []
+
+    def failing(message, user_id, notification_id):
+        return False
+
+    def working(message, user_id, notification_id):
+        sent.append((message, notification_id))
+        return True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, OUTBOX_FILE)
+        outbox = Outbox(path, max_age=3600)
+        assert outbox.deliver("日報表", failing, notification_id="report:1", kind='report', now=1000) == QUEUED
+        assert outbox.deliver("過期警報", failing, notification_id="alert:old", kind='alert', now=0) == QUEUED
+        assert outbox.deliver("恢復通知", working, kind='recovery', now=1000) == DELIVERED
+        # 寫到一半的最後一筆（例如程式被中斷）不影響讀取
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"op": "add", "id": "par')
+
+        reloaded = Outbox.load(path, max_age=3600)
+        assert sorted(reloaded.entries) == ["alert:old", "report:1"]
+        assert reloaded.replay(working, now=4000) == (1, 0)
+        # 重送沿用原本的通知 ID（LineDelivery 因此沿用同一個 retry key），並註明原定時間
+        assert len(sent) == 2 and sent[1][1] == "report:1"
+        assert sent[1][0].startswith("⏱ 延遲送達") and sent[1][0].endswith("日報表")
+
+        reloaded.compact()
+        with open(path, 'r', encoding='utf-8') as f:
+            assert f.read() == ""
+        assert Outbox.load(path).entries == {}
+
+
+def test_replay_stops_while_line_is_down_and_log_compacts():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, OUTBOX_FILE)
+        outbox = Outbox(path)
+        for index in range(3):
+            outbox.enqueue(f"通知 {index}", notification_id=f"n{index}", now=100 + index)
+        calls = []
+
+        def failing(message, user_id, notification_id):
+            calls.append(notification_id)
+            return False
+
+        # LINE 仍無法連線時只嘗試最舊的一則
+        assert outbox.replay(failing, now=200) == (0, 3)
+        assert calls == ["n0"]
+
+        for index in range(COMPACT_THRESHOLD):
+            outbox.deliver("警報", lambda message, user_id, notification_id: True)
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        assert len(lines) < COMPACT_THRESHOLD
+        assert sorted(Outbox.load(path).entries) == ["n0", "n1", "n2"]
+
+
+def test_main_queues_report_when_line_is_down():
+    with stand_in_main_run() as suite:
+        suite['coingecko'].set_price(4000.0)
+        suite['line'].config.geo_block = True
+        main.main()
+        assert suite['line'].line_messages == []
+        # 報告已寫入 outbox，發送時間照常記錄
+        assert os.path.exists(LAST_REPORT_FILE)
+        with open(OUTBOX_FILE, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        assert [record['kind'] for record in records] == ['report']
+
+        suite['line'].config.geo_block = False
+        main.main()
+        texts = [m['messages'][0]['text'] for m in suite['line'].line_messages]
+        assert len(texts) == 1 and texts[0].startswith("⏱ 延遲送達")
+        assert Outbox.load(OUTBOX_FILE).entries == {}
+
+
+if __name__ == "__main__":
+    test_pending_notifications_survive_reload()
+    test_replay_stops_while_line_is_down_and_log_compacts()
+    test_main_queues_report_when_line_is_down()
+    print("✓ 通知 outbox 測試通過")
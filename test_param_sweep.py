@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+測試警報參數掃描
+"""
+
+import numpy as np
+
+from param_sweep import (
+    apply_cooldown,
+    find_events,
+    parse_range,
+    rank_results,
+    resample_hourly,
+    run_sweep,
+    score_alerts,
+    window_moves,
+)
+from range_index import HOURLY
+
+
+def _slow_slide_prices():
+    """200 小時平盤後，每小時下跌 0.5%、共 12 小時，再回到平盤"""
+    prices = [4000.0] * 200
+    for _ in range(12):
+        prices.append(prices[-1] * 0.995)
+    prices += [prices[-1]] * 100
+    return np.array(prices)
+
+
+def test_parse_range_and_resample():
+    assert parse_range("1:2:0.5") == [1.0, 1.5, 2.0]
+    assert parse_range("3,6") == [3.0, 6.0]
+    # 缺少的小時沿用前一筆價格
+    series = [(0, 10.0), (HOURLY + 5, 11.0), (4 * HOURLY, 12.0)]
+    assert resample_hourly(series).tolist() == [10.0, 11.0, 11.0, 11.0, 12.0]
+
+
+def test_window_moves_and_cooldown():
+    prices = np.array([100.0, 101.0, 103.0, 99.0])
+    rise, drop = window_moves(prices, 2)
+    assert rise[:2].tolist() == [0.0, 0.0]
+    assert abs(rise[2] - 3.0) < 1e-9
+    assert abs(drop[3] - (103 - 99) / 103 * 100) < 1e-9
+    candidates = np.array([1, 2, 3, 10, 11, 30])
+    assert apply_cooldown(candidates, 0).tolist() == candidates.tolist()
+    assert apply_cooldown(candidates, 5).tolist() == [1, 10, 30]
+
+
+def test_events_and_lead_time():
+    prices = _slow_slide_prices()
+    events = find_events(prices, 5.0, 24)
+    assert len(events) == 1
+    # 2% / 6 小時視窗在第 4 小時下跌時觸發，早於累積 5% 的事件
+    alerts = apply_cooldown(np.flatnonzero(np.maximum(*window_moves(prices, 6)) >= 2.0), 24)
+    score = score_alerts(alerts, events, 24, len(prices))
+    assert score['alerts'] == 1
+    assert score['caught'] == 1
+    assert score['mean_lead_hours'] > 0
+    assert score['precision'] == 1.0
+
+
+def test_process_pool_matches_serial():
+    prices = _slow_slide_prices()
+    grid = dict(thresholds=[1.0, 2.0, 5.0, 8.0], windows=[2, 6, 24], cooldowns=[0, 6])
+    serial = run_sweep(prices, event_move=5.0, workers=1, **grid)
+    pooled = run_sweep(prices, event_move=5.0, workers=2, **grid)
+    assert len(serial) == 4 * 3 * 2
+    assert [(r['threshold'], r['window_hours'], r['cooldown_hours'], r['alerts']) for r in serial] == \
+           [(r['threshold'], r['window_hours'], r['cooldown_hours'], r['alerts']) for r in pooled]
+    # 8% 的閾值在這段資料中從未觸發；排序首位應捕捉到事件
+    assert all(r['alerts'] == 0 for r in serial if r['threshold'] == 8.0)
+    best = rank_results(serial, max_per_30d=100)[0]
+    assert best['caught'] == 1
+
+
+if __name__ == "__main__":
+    test_parse_range_and_resample()
+    test_window_moves_and_cooldown()
+    test_events_and_lead_time()
+    test_process_pool_matches_serial()
+    print("✓ 參數掃描測試通過")
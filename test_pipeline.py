@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+測試分段管線的溢位策略與常駐程式的完整流程（使用本機替身伺服器）
+"""
+
+import asyncio
+import tempfile
+
+import line_notify
+from daemon import PriceDaemon
+from pipeline import BLOCK, COALESCE, DROP_OLDEST, BoundedQueue, Pipeline, Stage
+from quotes import PriceQuote
+from stand_in_servers import StandInSuite
+
+
+def test_drop_oldest_queue():
+    async def scenario():
+        queue = BoundedQueue(2, DROP_OLDEST)
+        for item in (1, 2, 3):
+            await queue.put(item)
+        return [await queue.get(), await queue.get()], queue.dropped
+
+    items, dropped = asyncio.run(scenario())
+    assert items == [2, 3]
+    assert dropped == 1
+
+
+def test_coalesce_queue():
+    async def scenario():
+        queue = BoundedQueue(2, COALESCE, key=lambda item: item.get('key'))
+        await queue.put({'key': 'tick', 'value': 1})
+        await queue.put({'key': None, 'value': 'alert'})
+        # 相同鍵值取代舊值
+        await queue.put({'key': 'tick', 'value': 2})
+        # 佇列已滿時丟棄最舊的可合併項目，不可合併的項目保留
+        await queue.put({'key': 'report', 'value': 3})
+        return [await queue.get(), await queue.get()], queue.coalesced, queue.dropped
+
+    items, coalesced, dropped = asyncio.run(scenario())
+    assert [item['value'] for item in items] == ['alert', 3]
+    assert coalesced == 1
+    assert dropped == 1
+
+
+def test_slow_stage_does_not_stall_source():
+    """下游變慢時，來源仍能持續產生項目，過時項目被合併"""
+    produced = []
+    delivered = []
+
+    async def source():
+        for index in range(50):
+            produced.append(index)
+            yield {'source': 'gold', 'value': index}
+
+    async def passthrough(item):
+        return item
+
+    async def slow_deliver(item):
+        await asyncio.sleep(0.01)
+        delivered.append(item['value'])
+
+    async def scenario():
+        pipeline = Pipeline(source, [
+            Stage('normalize', passthrough, queue_size=1, overflow=COALESCE, key=lambda item: item['source']),
+            Stage('deliver', slow_deliver, queue_size=1, overflow=BLOCK),
+        ])
+        await pipeline.run()
+        return pipeline.stats()
+
+    stats = asyncio.run(scenario())
+    assert len(produced) == 50
+    assert delivered[-1] == 49
+    assert len(delivered) < 50
+    assert stats['normalize']['coalesced'] > 0
+
+
+def test_daemon_pipeline_end_to_end():
+    saved = (line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID)
+    line_notify.CHANNEL_ACCESS_TOKEN = "A" * 120 + "="
+    line_notify.USER_ID = "U" + "0" * 32
+    try:
+        with StandInSuite() as suite, tempfile.TemporaryDirectory() as state_dir:
+            # 第一次：首次執行發送報告
+            asyncio.run(PriceDaemon(state_dir=state_dir, interval=0, max_ticks=1).run())
+            messages = suite['line'].line_messages
+            assert len(messages) == 1
+            assert messages[0]['messages'][0]['text'].startswith("📊 每日黃金價格報告")
+
+            # 第二次：價格上漲 10% 觸發警報，本小時已發送過報告
+            suite['coingecko'].set_price(4359.16 * 1.1)
+            asyncio.run(PriceDaemon(state_dir=state_dir, interval=0, max_ticks=1).run())
+            assert len(messages) == 2
+            assert messages[1]['messages'][0]['text'].startswith("⚠️ 價格變化警報")
+    finally:
+        line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = saved
+
+
+def test_tick_replaced_in_queue_is_not_lost_as_duplicate():
+    with tempfile.TemporaryDirectory() as state_dir:
+        daemon = PriceDaemon(state_dir=state_dir, interval=0, max_ticks=1)
+        queue = daemon.build_pipeline().stages[0].queue
+
+        def raw(fetched_at):
+            return {'source': 'gold', 'price_data': PriceQuote('coingecko', 4400.0, upstream_ts=1000),
+                    'bot_price': None, 'fetched_at': fetched_at}
+
+        async def run():
+            # 新價格 A 尚在佇列中時，相同價格與時間戳的 B 到達並取代 A
+            await queue.put(raw(1.0))
+            await queue.put(raw(2.0))
+            assert queue.qsize() == 1
+            first = await daemon.normalize(await queue.get())
+            second = await daemon.normalize(raw(3.0))
+            return first, second
+
+        first, second = asyncio.run(run())
+        # 取代 A 的 B 仍是新價格，會被儲存與評估；之後相同的跳動才是重複
+        assert first['duplicate'] is False and first['fetched_at'] == 2.0
+        assert second['duplicate'] is True
+
+
+if __name__ == "__main__":
+    test_drop_oldest_queue()
+    test_coalesce_queue()
+    test_slow_stage_does_not_stall_source()
+    test_daemon_pipeline_end_to_end()
+    test_tick_replaced_in_queue_is_not_lost_as_duplicate()
+    print("✓ 管線測試通過")
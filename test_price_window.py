@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+測試近期價格環形緩衝區與 mmap 快照還原
+"""
+
+import asyncio
+import os
+import tempfile
+
+import line_notify
+from daemon import PriceDaemon
+from main import DAILY_PRICE_FILE
+from price_window import WINDOW_SNAPSHOT_FILE, PriceRingBuffer
+from stand_in_servers import StandInSuite
+
+
+def test_ring_buffer_wraps_and_queries():
+    buffer = PriceRingBuffer(capacity=5)
+    assert buffer.latest() is None
+    assert buffer.high_low() == (None, None)
+    for ts in range(1, 9):
+        buffer.append(ts, 100.0 + ts * (-1) ** ts)
+    assert len(buffer) == 5
+    assert buffer.latest() == (8.0, 108.0)
+    timestamps, prices = buffer.since()
+    assert list(timestamps) == [4.0, 5.0, 6.0, 7.0, 8.0]
+    assert list(prices) == [104.0, 95.0, 106.0, 93.0, 108.0]
+    assert list(buffer.since(6.5)[0]) == [7.0, 8.0]
+    assert buffer.high_low(5) == (108.0, 93.0)
+    assert buffer.high_low(100) == (None, None)
+
+
+def test_snapshot_restore_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, WINDOW_SNAPSHOT_FILE)
+        buffer = PriceRingBuffer(capacity=4)
+        for ts in range(6):
+            buffer.append(ts, 4000.0 + ts)
+        buffer.snapshot(path)
+
+        restored = PriceRingBuffer.restore(path)
+        assert restored.capacity == 4
+        assert list(restored.since()[1]) == list(buffer.since()[1])
+        # 還原後可繼續寫入並再次寫出快照
+        restored.append(6, 3990.0)
+        assert restored.high_low() == (4005.0, 3990.0)
+        restored.snapshot(path)
+        assert list(PriceRingBuffer.restore(path).since()[0]) == [3.0, 4.0, 5.0, 6.0]
+
+
+def test_restore_ignores_corrupt_snapshot():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, WINDOW_SNAPSHOT_FILE)
+        with open(path, 'wb') as f:
+            f.write(b'not a snapshot')
+        buffer = PriceRingBuffer.restore(path, capacity=8)
+        assert buffer.capacity == 8 and len(buffer) == 0
+        assert len(PriceRingBuffer.restore(os.path.join(tmp, 'missing.bin'))) == 0
+
+
+def test_daemon_restart_keeps_intraday_high():
+    saved = (line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID)
+    line_notify.CHANNEL_ACCESS_TOKEN = "A" * 120 + "="
+    line_notify.USER_ID = "U" + "0" * 32
+    try:
+        with StandInSuite() as suite, tempfile.TemporaryDirectory() as state_dir:
+            suite['coingecko'].set_price(4500.0)
+            asyncio.run(PriceDaemon(state_dir=state_dir, interval=0, max_ticks=1).run())
+            assert os.path.exists(os.path.join(state_dir, WINDOW_SNAPSHOT_FILE))
+
+            # daily_price.json 遺失時，當日最高價由快照還原
+            os.remove(os.path.join(state_dir, DAILY_PRICE_FILE))
+            suite['coingecko'].set_price(4400.0)
+            daemon = PriceDaemon(state_dir=state_dir, interval=0, max_ticks=1)
+            asyncio.run(daemon.run())
+            assert daemon.day_high == 4500.0
+            assert daemon.day_low == 4400.0
+            assert len(daemon.window) == 2
+    finally:
+        line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = saved
+
+
+if __name__ == "__main__":
+    test_ring_buffer_wraps_and_queries()
+    test_snapshot_restore_round_trip()
+    test_restore_ignores_corrupt_snapshot()
+    test_daemon_restart_keeps_intraday_high()
+    print("✓ 環形緩衝區測試通過")
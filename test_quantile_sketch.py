@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+測試 t-digest 串流分位數估計與價格分布
+"""
+
+import bisect
+import os
+import random
+import tempfile
+from datetime import date, datetime, timedelta
+
+from quantile_sketch import TAIWAN_TZ, PriceDistribution, TDigest, format_percentiles, seed_from_history
+
+
+def test_tdigest_accuracy_and_bounded_size():
+    rng = random.Random(5)
+    values = [rng.gauss(4000, 150) for _ in range(50000)]
+    digest = TDigest(compression=50)
+    for value in values:
+        digest.add(value)
+    assert digest.centroid_count() <= 50
+    ordered = sorted(values)
+    for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+        exact = ordered[int(q * len(ordered))]
+        assert abs(digest.quantile(q) - exact) < 10
+        assert abs(digest.cdf(exact) - q) < 0.01
+    assert digest.cdf(ordered[0] - 1) == 0.0
+    assert digest.cdf(ordered[-1]) == 1.0
+
+
+def test_merged_digest_matches_single_digest():
+    rng = random.Random(9)
+    merged = TDigest()
+    whole = TDigest()
+    values = []
+    for day in range(30):
+        daily = TDigest()
+        for _ in range(500):
+            value = 3800 + day * 10 + rng.uniform(-40, 40)
+            daily.add(value)
+            whole.add(value)
+            values.append(value)
+        merged.merge(daily)
+    values.sort()
+    for probe in (3850.0, 3950.0, 4050.0):
+        exact = bisect.bisect_right(values, probe) / len(values)
+        assert abs(merged.cdf(probe) - exact) < 0.01
+        assert abs(merged.cdf(probe) - whole.cdf(probe)) < 0.01
+
+
+def test_distribution_horizons_prune_and_persist():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'price_distribution.json')
+        distribution = PriceDistribution(path)
+        start = date(2025, 1, 1)
+        # 400 天、價格逐日上漲：最新價格在 30 天分布中位於頂端
+        for offset in range(400):
+            day = start + timedelta(days=offset)
+            for tick in range(24):
+                distribution.update('XAU', day, 3000 + offset + tick / 24)
+        today = start + timedelta(days=399)
+        # 超過 1 年的每日 digest 已被移除，狀態大小固定
+        assert len(distribution._days['XAU']) == 365
+
+        distribution.save()
+        restored = PriceDistribution.load(path)
+        results = {label: (percentile, covered) for label, percentile, covered, _ in
+                   restored.percentiles('XAU', 3000 + 399 - 15, today)}
+        assert abs(results['30 天'][0] - 50) < 5
+        assert results['90 天'][0] > 80
+        assert results['1 年'][0] > 95
+        assert results['1 年'][1] == 365
+        assert "30 天: 第" in format_percentiles(restored.percentiles('XAU', 3400, today))
+
+
+def test_percentiles_need_minimum_samples():
+    distribution = PriceDistribution(os.devnull)
+    distribution.update('XAU', date(2025, 6, 1), 3300.0)
+    assert distribution.percentiles('XAU', 3300.0, date(2025, 6, 1)) == []
+    assert format_percentiles([]) == ""
+
+
+def test_seeding_keeps_days_built_from_live_ticks():
+    today = date(2026, 10, 19)
+    distribution = PriceDistribution(path=os.devnull)
+    for price in (4300.0, 4400.0, 4500.0):
+        distribution.update('XAU', today, price)
+    history = {'coingecko': {}}
+    for offset in range(3):
+        day = datetime(2026, 10, 19 - offset, 12, tzinfo=TAIWAN_TZ)
+        history['coingecko'][int(day.timestamp())] = 4000.0 + offset
+    # 今天已有即時價格建立的 digest，只補上前兩天
+    assert seed_from_history(distribution, history, 'XAU') == 2
+    assert distribution.horizon_digest('XAU', today, 1).count == 3
+    assert distribution.horizon_digest('XAU', today, 3).count == 5
+
+
+if __name__ == "__main__":
+    test_tdigest_accuracy_and_bounded_size()
+    test_merged_digest_matches_single_digest()
+    test_distribution_horizons_prune_and_persist()
+    test_percentiles_need_minimum_samples()
+    test_seeding_keeps_days_built_from_live_ticks()
+    print("✓ 分位數估計測試通過")
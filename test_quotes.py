@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+測試報價型別的不可變性與記憶體用量
+"""
+
+import pickle
+
+from quotes import BotQuote, PriceQuote, measure_memory
+
+
+def test_price_quote_is_immutable():
+    quote = PriceQuote('coingecko', 4359.16, 4340.0, fetched_at=1.0, upstream_ts=100)
+    assert not hasattr(quote, '__dict__')
+    try:
+        quote.price = 1.0
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("PriceQuote 應為不可變物件")
+    assert quote == PriceQuote('coingecko', 4359.16, 4340.0, fetched_at=1.0, upstream_ts=100)
+    assert pickle.loads(pickle.dumps(quote)) == quote
+
+
+def test_bot_quote_defaults():
+    quote = BotQuote(4364)
+    assert quote.price == 4364.0
+    assert quote.unit == '台幣/公克'
+    assert quote.source == '台灣銀行'
+    assert quote.to_dict()['price'] == 4364.0
+
+
+def test_quotes_use_less_memory_than_dicts():
+    result = measure_memory(count=20000)
+    assert result['quote_bytes'] < result['dict_bytes']
+    assert result['reduction'] > 0.3
+
+
+if __name__ == "__main__":
+    test_price_quote_is_immutable()
+    test_bot_quote_defaults()
+    test_quotes_use_less_memory_than_dicts()
+    print("✓ 報價型別測試通過")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+測試稀疏表、線段樹與歷史價格區間查詢索引
+"""
+
+import random
+
+from range_index import DAILY, HOURLY, RangeIndex, SegmentTree, SparseTable, aggregate_series
+
+
+def test_sparse_table_and_segment_tree_match_brute_force():
+    rng = random.Random(3)
+    values = [rng.uniform(3000, 5000) for _ in range(300)]
+    table_max = SparseTable(values, max)
+    table_min = SparseTable(values, min)
+    tree = SegmentTree(capacity=4)
+    for value in values:
+        tree.append(value, value, value)
+    for _ in range(500):
+        left = rng.randrange(len(values))
+        right = rng.randint(left + 1, len(values))
+        assert table_max.query(left, right) == max(values[left:right])
+        assert table_min.query(left, right) == min(values[left:right])
+        high, low, total = tree.query(left, right)
+        assert (high, low) == (max(values[left:right]), min(values[left:right]))
+        assert abs(total - sum(values[left:right])) < 1e-6
+
+
+def test_aggregate_series_buckets_high_low_close():
+    series = [(0, 10.0), (1200, 12.0), (2400, 9.0), (3600, 11.0)]
+    starts, highs, lows, closes = aggregate_series(series, HOURLY)
+    assert starts == [0, 3600]
+    assert highs == [12.0, 11.0]
+    assert lows == [9.0, 11.0]
+    assert closes == [9.0, 11.0]
+
+
+def test_range_index_spans_static_history_and_live_tail():
+    rng = random.Random(8)
+    series = [(hour * HOURLY, rng.uniform(3900, 4100)) for hour in range(24 * 60)]
+    index = RangeIndex.from_history({'coingecko': dict(series)})
+    live = []
+    for hour in range(24 * 60, 24 * 70):
+        for minute in (0, 30):
+            ts, price = hour * HOURLY + minute * 60, rng.uniform(3900, 4100)
+            index.add(ts, price)
+            live.append((ts, price))
+    assert len(index) == 24 * 70
+
+    all_points = series + live
+    for _ in range(200):
+        start = rng.randrange(0, 24 * 70) * HOURLY
+        end = start + rng.randint(1, 24 * 20) * HOURLY
+        expected = [price for ts, price in all_points if start <= ts < end]
+        stats = index.query(start, end)
+        assert stats['high'] == max(expected)
+        assert stats['low'] == min(expected)
+    assert index.query(-10 * HOURLY, 0) is None
+
+
+def test_highlights_report_longest_new_high():
+    series = [(day * DAILY, 4000.0 - day) for day in range(100)]
+    index = RangeIndex.from_history({'binance': dict(series)}, bucket_seconds=DAILY)
+    now = 100 * DAILY
+    assert index.highlights(4005.0, now) == ['創 90 天新高']
+    # 價格逐日下跌：3950 高於近 30 天所有價格，但低於 90 天前的價格
+    assert index.highlights(3950.0, now) == ['創 30 天新高']
+    assert index.highlights(3800.0, now) == ['創 90 天新低']
+    assert RangeIndex().highlights(4000.0, now) == []
+
+
+if __name__ == "__main__":
+    test_sparse_table_and_segment_tree_match_brute_force()
+    test_aggregate_series_buckets_high_low_close()
+    test_range_index_spans_static_history_and_live_tail()
+    test_highlights_report_longest_new_high()
+    print("✓ 區間查詢索引測試通過")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+測試日報表排程（cron 運算式、時區、min-heap 排程器與每個時段只發送一次）
+"""
+
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import line_notify
+import main
+from report_schedule import (
+    DEFAULT_SUBSCRIBER,
+    REPORT_SCHEDULE_FILE,
+    CronSchedule,
+    ReportScheduler,
+    parse_subscriber_schedules,
+)
+from stand_in_servers import stand_in_main_run
+
+
+TAIWAN = timezone(timedelta(hours=8))
+
+
+def test_cron_next_after_in_each_time_zone():
+    saturday = datetime(2026, 10, 17, 12, 0, tzinfo=TAIWAN)
+    assert CronSchedule("0 * * * *").next_after(saturday) == datetime(2026, 10, 17, 13, 0, tzinfo=TAIWAN)
+    # 紐約時間週一到週五 08:30（夏令時間 UTC-4）
+    weekday = CronSchedule("30 8 * * 1-5", "America/New_York").next_after(saturday)
+    assert weekday.isoformat() == "2026-10-19T08:30:00-04:00"
+    # 日與星期都有限制時任一成立即可：每月 1 日或星期日
+    either = CronSchedule("0 9 1 * 0", "+08:00")
+    assert either.next_after(saturday) == datetime(2026, 10, 18, 9, 0, tzinfo=TAIWAN)
+    assert either.next_after(datetime(2026, 10, 26, tzinfo=TAIWAN)) == datetime(2026, 11, 1, 9, 0, tzinfo=TAIWAN)
+    assert CronSchedule("5/20 9-10 * * *").minutes == [5, 25, 45]
+    assert CronSchedule("0 0 * * 7").weekdays == [0]
+    assert CronSchedule("0 0 31 2 *", "UTC").next_after(saturday) is None
+    for expression in ("0 * * *", "60 * * * *", "*/0 * * * *", "0 25 * * *"):
+        try:
+            CronSchedule(expression)
+            assert False, expression
+        except ValueError:
+            pass
+
+    schedules = parse_subscriber_schedules("U1=0 9 * * *;U2=30 8 * * 1-5 Asia/Tokyo;U3=bad")
+    assert sorted(schedules) == ["U1", "U2"]
+    assert schedules["U2"].spec == ("30 8 * * 1-5", "Asia/Tokyo")
+
+
+def test_each_slot_fires_once_and_missed_slots_collapse():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, REPORT_SCHEDULE_FILE)
+        now = datetime(2026, 10, 19, 10, 7, tzinfo=TAIWAN)
+        scheduler = ReportScheduler.load({DEFAULT_SUBSCRIBER: CronSchedule("0 * * * *")}, now, path)
+
+        # 首次執行補發最近的時段；完成前不會再次取出
+        [due] = scheduler.pop_due(now)
+        assert due['slot'] == now.replace(minute=0) and due['notification_id'] == "report:2026-10-19 10:00"
+        assert scheduler.pop_due(now + timedelta(minutes=10)) == []
+        # 發送失敗時放回，下一次檢查重新取出同一時段
+        scheduler.release(DEFAULT_SUBSCRIBER, due['slot'])
+        [retry] = scheduler.pop_due(now + timedelta(minutes=10))
+        assert retry['slot'] == due['slot']
+        scheduler.complete(DEFAULT_SUBSCRIBER, retry['slot'])
+        assert scheduler.pop_due(now + timedelta(minutes=52)) == []
+        scheduler.save()
+
+        # 重新啟動後不會重複發送；停機期間錯過的 11、12、13 點只補發 13 點
+        later = datetime(2026, 10, 19, 13, 40, tzinfo=TAIWAN)
+        reloaded = ReportScheduler.load({DEFAULT_SUBSCRIBER: CronSchedule("0 * * * *")}, later, path)
+        [missed] = reloaded.pop_due(later)
+        assert missed['slot'] == datetime(2026, 10, 19, 13, 0, tzinfo=TAIWAN)
+
+        # 舊版 last_report_time.json 的發送時間作為預設收件對象的最後時段
+        legacy = ReportScheduler.load({DEFAULT_SUBSCRIBER: CronSchedule("0 * * * *")}, later,
+                                      os.path.join(tmp, "other.json"), last_report_time=later.replace(minute=5))
+        assert legacy.pop_due(later) == []
+
+        # 排程變更後舊的 heap 項目失效；移除的訂閱者不再取出
+        reloaded.set_schedule("U1", CronSchedule("0 9 * * *"), later)
+        reloaded.set_schedule("U1", CronSchedule("0 15 * * *"), later)
+        reloaded.set_schedule("U2", CronSchedule("0 15 * * *"), later)
+        reloaded.remove("U2")
+        fired = reloaded.pop_due(later.replace(hour=15, minute=1))
+        assert [item['subscriber'] for item in fired] == ["U1"]
+        assert fired[0]['slot'].hour == 15 and fired[0]['notification_id'] == "report:U1:2026-10-19 15:00"
+
+
+def test_thousands_of_schedules_fire_exactly_once_per_day():
+    rng = random.Random(7)
+    zones = ["Asia/Taipei", "Asia/Tokyo", "Europe/London", "America/New_York", "+05:30"]
+    schedules = {f"U{index}": CronSchedule(f"{rng.randrange(60)} {rng.randrange(24)} * * *", rng.choice(zones))
+                 for index in range(3000)}
+    start = datetime(2026, 10, 19, 0, 0, tzinfo=timezone.utc)
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = ReportScheduler.load(schedules, start, os.path.join(tmp, REPORT_SCHEDULE_FILE))
+        for item in scheduler.pop_due(start):
+            scheduler.complete(item['subscriber'], item['slot'])
+
+        counts = {}
+        for minute in range(1, 24 * 60 + 1):
+            now = start + timedelta(minutes=minute)
+            for item in scheduler.pop_due(now):
+                schedule = schedules[item['subscriber']]
+                local = item['slot'].astimezone(schedule.tz)
+                assert (local.hour, local.minute) == (schedule.hours[0], schedule.minutes[0])
+                assert now - timedelta(minutes=1) < item['slot'] <= now
+                counts[item['subscriber']] = counts.get(item['subscriber'], 0) + 1
+                scheduler.complete(item['subscriber'], item['slot'])
+        assert len(counts) == len(schedules) and set(counts.values()) == {1}
+
+
+def test_main_sends_each_scheduled_report_once():
+    personal = "U" + "1" * 32
+    # 個別訂閱者每分鐘一次，確保執行時一定有到期的時段
+    env = {
+        'REPORT_CRON': None,
+        'REPORT_SCHEDULES': f"{personal}=* * * * * America/New_York",
+    }
+    with stand_in_main_run(env) as suite:
+        main.main()
+        messages = suite['line'].line_messages
+        assert sorted(m['to'][0] for m in messages) == sorted([line_notify.USER_ID, personal])
+        assert all(m['messages'][0]['text'].startswith("📊 每日黃金價格報告") for m in messages)
+        assert os.path.exists(REPORT_SCHEDULE_FILE)
+
+        # 同一時段再次執行不會重複發送預設收件對象的報告
+        os.environ['REPORT_SCHEDULES'] = ""
+        main.main()
+        assert len(messages) == 2
+
+
+if __name__ == "__main__":
+    test_cron_next_after_in_each_time_zone()
+    test_each_slot_fires_once_and_missed_slots_collapse()
+    test_thousands_of_schedules_fire_exactly_once_per_day()
+    test_main_sends_each_scheduled_report_once()
+    print("✓ 日報表排程測試通過")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+測試重試策略與執行時間預算（以本機替身伺服器注入 429/500 與延遲）
+"""
+
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import get_gold_price
+from retry_policy import Deadline, RetryPolicy, parse_retry_after
+from stand_in_servers import StandInSuite
+
+
+def test_backoff_is_bounded_full_jitter():
+    policy = RetryPolicy(base_delay=1.0, max_delay=8.0, rng=random.Random(7))
+    for attempt in range(6):
+        cap = min(8.0, 2 ** attempt)
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0 <= delay <= cap for delay in delays)
+        # full jitter 應分散在整個區間，而不是固定等待
+        assert max(delays) - min(delays) > cap / 2
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after('') is None
+    assert parse_retry_after('abc') is None
+    now = datetime(2025, 12, 19, 8, 0, 0, tzinfo=timezone.utc)
+    http_date = format_datetime(now + timedelta(seconds=10), usegmt=True)
+    assert parse_retry_after(http_date, now=now) == 10.0
+
+
+def test_deadline_reserve_and_clamp():
+    deadline = Deadline(10)
+    assert 9 < deadline.remaining() <= 10
+    assert deadline.clamp(30) <= 10
+    assert deadline.with_reserve(4).remaining() <= 6
+    assert Deadline().clamp(30) == 30
+    assert Deadline(0).expired()
+
+
+def test_retry_after_is_honored_until_attempts_exhausted():
+    with StandInSuite(services=('coingecko',), rate_limit_rate=1.0, retry_after=0) as suite:
+        policy = RetryPolicy(max_attempts=3, base_delay=0.01)
+        url = f"{suite['coingecko'].base_url}/api/v3/simple/price?ids=pax-gold&vs_currencies=usd"
+        response, retries = policy.get(url, deadline=Deadline(10))
+        assert response.status_code == 429
+        assert retries == 2
+        assert suite['coingecko'].request_count == 3
+
+
+def test_retry_after_beyond_budget_stops_early():
+    with StandInSuite(services=('coingecko',), rate_limit_rate=1.0, retry_after=30) as suite:
+        policy = RetryPolicy(max_attempts=5, base_delay=0.01)
+        url = f"{suite['coingecko'].base_url}/api/v3/simple/price?ids=pax-gold&vs_currencies=usd"
+        started = time.monotonic()
+        response, retries = policy.get(url, deadline=Deadline(5))
+        assert time.monotonic() - started < 2
+        assert response.status_code == 429
+        assert suite['coingecko'].request_count == 1
+
+
+def test_fetcher_recovers_from_injected_errors():
+    saved = get_gold_price.COINGECKO_RETRY_POLICY
+    get_gold_price.COINGECKO_RETRY_POLICY = RetryPolicy(max_attempts=10, base_delay=0.01, max_delay=0.05,
+                                                        timeout=5)
+    try:
+        with StandInSuite(services=('coingecko',), error_rate=0.5, seed=3) as suite:
+            quote = get_gold_price.get_gold_price_coingecko(Deadline(20))
+            assert quote is not None
+            assert quote.price == 4359.16
+            assert quote.retry_count == suite['coingecko'].request_count - 1
+            assert quote.retry_count > 0
+    finally:
+        get_gold_price.COINGECKO_RETRY_POLICY = saved
+
+
+def test_slow_upstream_is_bounded_by_deadline():
+    with StandInSuite(services=('coingecko', 'binance'), latency=1.5):
+        started = time.monotonic()
+        assert get_gold_price.get_gold_price(Deadline(1.2)) is None
+        # CoinGecko 逾時後預算已用完，不再嘗試幣安
+        assert time.monotonic() - started < 2.5
+
+
+if __name__ == "__main__":
+    test_backoff_is_bounded_full_jitter()
+    test_parse_retry_after()
+    test_deadline_reserve_and_clamp()
+    test_retry_after_is_honored_until_attempts_exhausted()
+    test_retry_after_beyond_budget_stops_early()
+    test_fetcher_recovers_from_injected_errors()
+    test_slow_upstream_is_bounded_by_deadline()
+    print("✓ 重試策略測試通過")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+以本機替身伺服器離線測試價格抓取與 LINE 推播
+"""
+
+import get_gold_price
+import get_bot_gold_price
+import line_notify
+from stand_in_servers import StandInSuite
+
+
+TEST_TOKEN = "A" * 120 + "="
+TEST_USER_ID = "U" + "0123456789abcdef" * 2
+
+
+def test_fetchers_against_stand_ins():
+    """CoinGecko 與台灣銀行應回傳錄製的價格"""
+    with StandInSuite() as suite:
+        price_data = get_gold_price.get_gold_price_coingecko()
+        assert price_data is not None
+        assert price_data.price == 4359.16
+
+        suite['coingecko'].set_price(4400.0)
+        assert get_gold_price.get_gold_price().price == 4400.0
+
+        bot_price = get_bot_gold_price.get_bot_gold_price()
+        assert bot_price.price == 4364.0
+        assert bot_price.upstream_ts == 1766131200
+
+
+def test_binance_geo_block_falls_back():
+    """幣安回傳 451 時不重試，直接返回 None"""
+    with StandInSuite(services=('binance',)) as suite:
+        suite['binance'].config.geo_block = True
+        assert get_gold_price.get_gold_price_binance() is None
+        assert suite['binance'].request_count == 1
+
+
+def test_binance_ticker_against_stand_in():
+    """幣安 24 小時行情應提供開盤價與上游時間戳"""
+    with StandInSuite(services=('binance',)):
+        price_data = get_gold_price.get_gold_price_binance()
+        assert price_data.price == 4358.81
+        assert price_data.open_price == 4340.65
+        assert price_data.source == 'binance'
+        assert price_data.upstream_ts == 1766134862
+
+
+def test_line_push_recorded():
+    """LINE 推播應被替身伺服器記錄"""
+    saved = (line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID)
+    line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = TEST_TOKEN, TEST_USER_ID
+    try:
+        with StandInSuite(services=('line',)) as suite:
+            assert line_notify.send_line_push("測試訊息") is True
+            messages = suite['line'].line_messages
+            assert len(messages) == 1
+            assert messages[0]['to'] == [TEST_USER_ID]
+            assert messages[0]['messages'][0]['text'] == "測試訊息"
+    finally:
+        line_notify.CHANNEL_ACCESS_TOKEN, line_notify.USER_ID = saved
+
+
+if __name__ == "__main__":
+    test_fetchers_against_stand_ins()
+    test_binance_geo_block_falls_back()
+    test_binance_ticker_against_stand_in()
+    test_line_push_recorded()
+    print("✓ 替身伺服器測試通過")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+測試價格跳動去重，以及 main.py 在價格未變化時略過狀態寫入
+"""
+
+import json
+import os
+import tempfile
+
+import main
+from stand_in_servers import stand_in_main_run
+from tick_dedup import TickDeduplicator
+
+
+def test_deduplicator_keys_on_source_price_and_timestamp():
+    dedup = TickDeduplicator()
+    assert dedup.is_duplicate('coingecko', 4359.16, 100) is False
+    assert dedup.is_duplicate('coingecko', 4359.16, 100) is True
+    # 上游時間戳更新視為新的跳動
+    assert dedup.is_duplicate('coingecko', 4359.16, 160) is False
+    # 不同來源分開記錄
+    assert dedup.is_duplicate('binance', 4359.16, 160) is False
+    assert dedup.is_duplicate('coingecko', 4360.00, 160) is False
+
+
+def test_seed_from_last_price_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'last_price.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'last_price': 4359.16, 'source': 'coingecko', 'upstream_ts': 100}, f)
+        dedup = TickDeduplicator()
+        dedup.seed_from_last_price_file(path)
+        assert dedup.is_duplicate('coingecko', 4359.16, 100) is True
+
+
+def test_main_skips_state_writes_for_unchanged_tick():
+    with stand_in_main_run():
+        main.main()
+        with open(main.LAST_PRICE_FILE, 'r', encoding='utf-8') as f:
+            first = json.load(f)
+        assert first['source'] == 'coingecko'
+        assert first['upstream_ts'] is not None
+        daily_mtime = os.stat(main.DAILY_PRICE_FILE).st_mtime_ns
+        last_mtime = os.stat(main.LAST_PRICE_FILE).st_mtime_ns
+
+        # 錄製資料的價格與 last_updated_at 不變，第二次執行不應寫入狀態檔
+        main.main()
+        assert os.stat(main.DAILY_PRICE_FILE).st_mtime_ns == daily_mtime
+        assert os.stat(main.LAST_PRICE_FILE).st_mtime_ns == last_mtime
+
+
+if __name__ == "__main__":
+    test_deduplicator_keys_on_source_price_and_timestamp()
+    test_seed_from_last_price_file()
+    test_main_skips_state_writes_for_unchanged_tick()
+    print("✓ 去重測試通過")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+測試滑動視窗最低價／最高價與區間警報
+"""
+
+import os
+import random
+import tempfile
+
+import main
+from stand_in_servers import stand_in_main_run
+from window_alerts import WINDOW_ALERT_STATE_FILE, SlidingMinMax, WindowAlertMonitor
+
+
+def test_sliding_min_max_matches_brute_force():
+    rng = random.Random(11)
+    window = SlidingMinMax(300)
+    history = []
+    ts = 0
+    for _ in range(2000):
+        ts += rng.randint(1, 60)
+        price = 4000 + rng.uniform(-50, 50)
+        history.append((ts, price))
+        window.push(ts, price)
+        in_window = [p for t, p in history if t >= ts - 300]
+        assert window.min()[1] == min(in_window)
+        assert window.max()[1] == max(in_window)
+
+
+def test_slow_slide_triggers_window_alert():
+    monitor = WindowAlertMonitor(rules=[(120, 5.0)], path=os.devnull)
+    price = 4000.0
+    fired = []
+    # 每 10 分鐘下跌 0.6%，單次輪詢的變化都遠低於 5%
+    for step in range(11):
+        fired.extend(monitor.update('XAU', step * 600, price))
+        price *= 0.994
+    assert len(fired) == 1
+    assert fired[0]['direction'] == 'down'
+    assert fired[0]['window_minutes'] == 120
+    assert fired[0]['reference'] == 4000.0
+    assert fired[0]['change'] >= 5.0
+
+
+def test_windows_are_independent_per_asset_and_persisted():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, WINDOW_ALERT_STATE_FILE)
+        rules = [(30, 1.0), (240, 3.0)]
+        monitor = WindowAlertMonitor(rules=rules, path=path)
+        assert monitor.update('XAU', 0, 100.0) == []
+        assert monitor.update('XAG', 0, 20.0) == []
+        monitor.save()
+
+        restored = WindowAlertMonitor.load(path, rules=rules)
+        triggers = restored.update('XAU', 600, 101.5)
+        assert [t['window_minutes'] for t in triggers] == [30]
+        # 觸發後重新累積，同一段變化不會重複通知
+        assert restored.update('XAU', 660, 101.6) == []
+        # 超過 30 分鐘視窗的舊價格不再參與比較，但 4 小時視窗仍保留
+        triggers = restored.update('XAU', 3000, 103.2)
+        assert [t['window_minutes'] for t in triggers] == [240]
+        assert restored.update('XAG', 600, 20.1) == []
+
+
+def test_main_sends_window_alert_for_slow_slide():
+    with stand_in_main_run() as suite:
+        price = 4000.0
+        # 每次下跌 1%，累積約 3% 時超過 60 分鐘視窗的 2% 閾值
+        for _ in range(4):
+            suite['coingecko'].set_price(price)
+            main.main()
+            price *= 0.99
+        texts = [m['messages'][0]['text'] for m in suite['line'].line_messages]
+        assert any(text.startswith("⚠️ 價格區間警報") and "下跌" in text for text in texts)
+        assert not any(text.startswith("⚠️ 價格變化警報") for text in texts)
+
+
+if __name__ == "__main__":
+    test_sliding_min_max_matches_brute_force()
+    test_slow_slide_triggers_window_alert()
+    test_windows_are_independent_per_asset_and_persisted()
+    test_main_sends_window_alert_for_slow_slide()
+    print("✓ 區間警報測試通過")
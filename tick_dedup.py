@@ -0,0 +1,56 @@
+"""
+價格跳動去重模組
+以（資料來源, 價格, 上游時間戳）判斷這次擷取的價格是否與上次完全相同，
+相同時可略過狀態寫入、規則評估與訊息產生。
+上游時間戳：CoinGecko 的 last_updated_at、幣安 24 小時行情的 closeTime
+"""
+
+import json
+import os
+
+
+class TickDeduplicator:
+    """
+    記錄每個資料來源最後一次的（價格, 上游時間戳）
+    """
+
+    def __init__(self):
+        self._last = {}
+
+    def seed(self, source, price, upstream_ts):
+        """設定資料來源最後一次的價格跳動（例如從狀態檔案還原）"""
+        if source is not None and price is not None:
+            self._last[source] = (float(price), upstream_ts)
+
+    def is_duplicate(self, source, price, upstream_ts):
+        """
+        檢查價格跳動是否與該來源上次相同，不同時記錄為最新跳動
+
+        Args:
+            source (str): 資料來源（'coingecko'、'binance'）
+            price (float): 價格
+            upstream_ts (int): 上游時間戳（Unix 秒），來源未提供時為 None
+
+        Returns:
+            bool: 與上次完全相同時返回 True
+        """
+        key = (float(price), upstream_ts)
+        if self._last.get(source) == key:
+            return True
+        self._last[source] = key
+        return False
+
+    def seed_from_last_price_file(self, path):
+        """
+        從 last_price.json 還原上次的價格跳動
+
+        Args:
+            path (str): last_price.json 路徑
+        """
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.seed(data.get('source'), data.get('last_price'), data.get('upstream_ts'))
+        except Exception as e:
+            print(f"⚠️  讀取上次價格跳動時發生錯誤: {e}")
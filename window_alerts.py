@@ -0,0 +1,204 @@
+"""
+滑動視窗價格警報
+以單調佇列（monotonic deque）維護每個時間視窗內的最低價與最高價，
+每筆價格跳動攤銷 O(1)，可偵測「Y 分鐘內變化 X%」的緩慢漲跌，
+不再只和上一次輪詢的價格比較。
+
+視窗狀態（單調佇列內容）保存在 window_alert_state.json，
+讓每 10 分鐘執行一次的 main.py 也能跨執行累積視窗。
+"""
+
+import json
+import os
+from collections import deque
+
+
+WINDOW_ALERT_STATE_FILE = "window_alert_state.json"
+
+# 預設的視窗規則: (視窗分鐘數, 變化閾值 %)
+DEFAULT_WINDOW_RULES = (
+    (60, 2.0),
+    (6 * 60, 3.0),
+    (24 * 60, 5.0),
+)
+
+GOLD_ASSET = 'XAU'
+
+
+class SlidingMinMax:
+    """
+    固定時間長度的滑動視窗最低價／最高價
+    兩個單調佇列分別保存最低價與最高價的候選 (時間戳, 價格)
+    """
+
+    def __init__(self, window_seconds):
+        """
+        Args:
+            window_seconds (float): 視窗長度（秒）
+        """
+        self.window_seconds = window_seconds
+        self._min = deque()  # 價格遞增，最左邊是視窗內最低價
+        self._max = deque()  # 價格遞減，最左邊是視窗內最高價
+
+    def push(self, timestamp, price):
+        """
+        加入一筆價格並移除超出視窗的資料
+        """
+        while self._min and self._min[-1][1] >= price:
+            self._min.pop()
+        self._min.append((timestamp, price))
+        while self._max and self._max[-1][1] <= price:
+            self._max.pop()
+        self._max.append((timestamp, price))
+
+        cutoff = timestamp - self.window_seconds
+        while self._min[0][0] < cutoff:
+            self._min.popleft()
+        while self._max[0][0] < cutoff:
+            self._max.popleft()
+
+    def min(self):
+        return self._min[0] if self._min else None
+
+    def max(self):
+        return self._max[0] if self._max else None
+
+    def reset(self, timestamp, price):
+        """觸發警報後以當前價格重新開始累積"""
+        self._min.clear()
+        self._max.clear()
+        self.push(timestamp, price)
+
+    def to_dict(self):
+        return {'min': [list(item) for item in self._min], 'max': [list(item) for item in self._max]}
+
+    def load_dict(self, data):
+        self._min = deque((ts, price) for ts, price in data.get('min', []))
+        self._max = deque((ts, price) for ts, price in data.get('max', []))
+
+
+class WindowAlertMonitor:
+    """
+    每個資產同時維護多個視窗，價格在視窗內相對最低價上漲或相對最高價下跌超過閾值時觸發
+    """
+
+    def __init__(self, rules=DEFAULT_WINDOW_RULES, path=WINDOW_ALERT_STATE_FILE):
+        """
+        Args:
+            rules (iterable): (視窗分鐘數, 變化閾值 %) 規則
+            path (str): 狀態檔路徑
+        """
+        self.rules = tuple((int(minutes), float(threshold)) for minutes, threshold in rules)
+        self.path = path
+        self._windows = {}  # {資產: {視窗分鐘數: SlidingMinMax}}
+
+    def _windows_for(self, asset):
+        windows = self._windows.get(asset)
+        if windows is None:
+            windows = {minutes: SlidingMinMax(minutes * 60) for minutes, _ in self.rules}
+            self._windows[asset] = windows
+        return windows
+
+    def set_rules(self, rules):
+        """
+        更換視窗規則（設定檔重新載入時），仍存在的視窗保留其中的價格，只為新的視窗長度建立空視窗
+
+        Args:
+            rules (iterable): (視窗分鐘數, 變化閾值 %) 規則
+        """
+        self.rules = tuple((int(minutes), float(threshold)) for minutes, threshold in rules)
+        for asset, windows in self._windows.items():
+            self._windows[asset] = {minutes: windows[minutes] if minutes in windows else SlidingMinMax(minutes * 60)
+                                    for minutes, _ in self.rules}
+
+    def update(self, asset, timestamp, price):
+        """
+        加入一筆價格並檢查所有視窗
+
+        Args:
+            asset (str): 資產代號
+            timestamp (float): Unix 秒
+            price (float): 價格
+
+        Returns:
+            list: 觸發的警報 [{'window_minutes', 'threshold', 'direction', 'change', 'reference'}, ...]
+        """
+        windows = self._windows_for(asset)
+        triggered = []
+        for minutes, threshold in self.rules:
+            window = windows[minutes]
+            window.push(timestamp, price)
+            _, low = window.min()
+            _, high = window.max()
+            rise = (price - low) / low * 100 if low > 0 else 0.0
+            drop = (high - price) / high * 100 if high > 0 else 0.0
+            if rise >= threshold and rise >= drop:
+                triggered.append({'window_minutes': minutes, 'threshold': threshold,
+                                  'direction': 'up', 'change': rise, 'reference': low})
+            elif drop >= threshold:
+                triggered.append({'window_minutes': minutes, 'threshold': threshold,
+                                  'direction': 'down', 'change': drop, 'reference': high})
+            else:
+                continue
+            # 同一段變化只通知一次
+            window.reset(timestamp, price)
+        return triggered
+
+    @classmethod
+    def load(cls, path=WINDOW_ALERT_STATE_FILE, rules=DEFAULT_WINDOW_RULES):
+        """
+        讀取狀態檔（規則變更時只還原仍存在的視窗）
+
+        Returns:
+            WindowAlertMonitor: 監控器
+        """
+        monitor = cls(rules, path)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for asset, windows in data.get('assets', {}).items():
+                    for minutes, window in monitor._windows_for(asset).items():
+                        if str(minutes) in windows:
+                            window.load_dict(windows[str(minutes)])
+        except Exception as e:
+            print(f"⚠️  讀取視窗警報狀態時發生錯誤: {e}")
+        return monitor
+
+    def save(self):
+        """
+        寫入狀態檔
+        """
+        data = {
+            'version': 1,
+            'assets': {
+                asset: {str(minutes): window.to_dict() for minutes, window in windows.items()}
+                for asset, windows in self._windows.items()
+            },
+        }
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️  保存視窗警報狀態時發生錯誤: {e}")
+
+
+def format_window_changes(triggers):
+    """
+    Args:
+        triggers (list): WindowAlertMonitor.update 返回的警報
+
+    Returns:
+        str: 訊息中的【區間變化】段落
+    """
+    lines = ["【區間變化】"]
+    for trigger in triggers:
+        minutes = trigger['window_minutes']
+        span = f"{minutes // 60} 小時" if minutes % 60 == 0 else f"{minutes} 分鐘"
+        if trigger['direction'] == 'up':
+            lines.append(f"過去 {span}內上漲 {trigger['change']:.2f}%（區間最低 ${trigger['reference']:.2f}）")
+        else:
+            lines.append(f"過去 {span}內下跌 {trigger['change']:.2f}%（區間最高 ${trigger['reference']:.2f}）")
+    return "\n".join(lines)